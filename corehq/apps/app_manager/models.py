@@ -253,6 +253,15 @@ def load_app_template(slug):
         return json.load(f)
 
 
+@memoized
+def _get_xform_code_hash():
+    """Hash of the code that adds case and meta blocks to forms, so forms
+    rendered before it changed aren't reused"""
+    from corehq.apps.app_manager import xform
+    with open(xform.__file__, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
 class IndexedSchema(DocumentSchema):
     """
     Abstract class.
@@ -1281,10 +1290,54 @@ class FormBase(DocumentSchema):
 
     @memoized
     def render_xform(self, build_profile_id=None):
+        return self._render_xform(self.get_render_xform_key(build_profile_id), build_profile_id)
+
+    @quickcache(['render_key'], timeout=24 * 60 * 60)
+    def _render_xform(self, render_key, build_profile_id):
         xform = XForm(self.source, domain=self.get_app().domain)
         self.add_stuff_to_xform(xform, build_profile_id)
         return xform.render()
 
+    def get_render_xform_key(self, build_profile_id=None):
+        """
+        A hash of everything the XML rendered by ``render_xform`` depends on,
+        so forms that haven't changed between builds aren't rendered again
+
+        That is the form's source and settings, its version and build
+        languages, the settings of the app's modules (which determine session
+        variables), the app's case types, the toggles ``XForm`` checks, and
+        the instances its source refers to, as well as the code that renders it.
+        """
+        from corehq.apps.app_manager.suite_xml.post_process.instances import (
+            get_all_instances_referenced_in_xpaths,
+        )
+        app = self.get_app()
+        instances, unknown_instance_ids = get_all_instances_referenced_in_xpaths(app, [self.source])
+        inputs = {
+            'code': _get_xform_code_hash(),
+            'source': self.source,
+            'form': self.to_json(),
+            'version': self.get_version(),
+            'langs': app.get_build_langs(build_profile_id),
+            'modules': app.get_module_settings(),
+            'app': {
+                'domain': app.domain,
+                'build_version': str(app.build_version),
+                'case_sharing': app.case_sharing,
+                'enable_auto_gps': app.enable_auto_gps,
+                'auto_gps_capture': app.auto_gps_capture,
+                'case_types': sorted(app.get_case_types()),
+            },
+            'toggles': {
+                'save_only_edited_form_fields': toggles.SAVE_ONLY_EDITED_FORM_FIELDS.enabled(
+                    app.domain, toggles.NAMESPACE_DOMAIN),
+                'dont_index_same_casetype': toggles.DONT_INDEX_SAME_CASETYPE.enabled(app.domain),
+            },
+            'instances': sorted((instance.id, instance.src) for instance in instances),
+            'unknown_instances': sorted(unknown_instance_ids),
+        }
+        return hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
     def cached_get_questions(self):
         """
         Call to get_questions with a superset of necessary information, so
@@ -5216,14 +5269,60 @@ class Application(ApplicationBase, ApplicationMediaMixin, ApplicationIntegration
 
     @time_method()
     def _make_language_files(self, prefix, build_profile_id):
+        # Only the default strings depend on the build profile, and only
+        # on its languages
+        profile_langs = tuple(self.get_build_langs(build_profile_id)) if build_profile_id else None
         return {
-            "{}{}/app_strings.txt".format(prefix, lang): self.create_app_strings(lang, build_profile_id).encode('utf-8')
+            "{}{}/app_strings.txt".format(prefix, lang): self._create_build_app_strings(
+                lang, profile_langs if lang == 'default' else None)
             for lang in ['default'] + self.get_build_langs(build_profile_id)
         }
 
+    @memoized
+    def _create_build_app_strings(self, lang, profile_langs):
+        """
+        App strings for the build profiles with the languages ``profile_langs``,
+        or for the app itself if that is None
+
+        Build profiles with the same languages have the same app strings,
+        so they are generated once for all of them.
+        """
+        build_profile_id = self._get_build_profile_id_for_langs(profile_langs)
+        return self.create_app_strings(lang, build_profile_id).encode('utf-8')
+
+    def _get_build_profile_id_for_langs(self, langs):
+        if langs is None:
+            return None
+        return next(
+            profile_id for profile_id, profile in self.build_profiles.items()
+            if tuple(profile.langs) == langs
+        )
+
+    def _get_form_build_profile_id(self, build_profile_id):
+        """
+        The build profile to render forms with in place of ``build_profile_id``
+
+        Forms depend on the build profile only through its languages, so
+        build profiles with the same languages as the app or as another
+        profile share rendered forms (``render_xform`` is memoized).
+        """
+        langs = self.get_build_langs(build_profile_id)
+        if langs == self.langs:
+            return None
+        return self._get_build_profile_id_for_langs(tuple(langs))
+
+    @memoized
+    def get_module_settings(self):
+        """The JSON of each module, without its forms"""
+        return [
+            {key: value for key, value in module.to_json().items() if key != 'forms'}
+            for module in self.get_modules()
+        ]
+
     @time_method()
     def _get_form_files(self, prefix, build_profile_id):
         files = {}
+        form_build_profile_id = self._get_form_build_profile_id(build_profile_id)
         for form_stuff in self.get_forms(bare=False):
             def exclude_form(form):
                 return isinstance(form, ShadowForm) or form.is_a_disabled_release_form()
@@ -5232,7 +5331,7 @@ class Application(ApplicationBase, ApplicationMediaMixin, ApplicationIntegration
                 filename = prefix + self.get_form_filename(**form_stuff)
                 form = form_stuff['form']
                 try:
-                    files[filename] = form.render_xform(build_profile_id=build_profile_id)
+                    files[filename] = form.render_xform(build_profile_id=form_build_profile_id)
                 except XFormException as e:
                     raise XFormException(_('Error in form "{}": {}').format(trans(form.name), e))
         return files
@@ -1,5 +1,6 @@
 import os
 from collections import OrderedDict
+from unittest.mock import patch
 
 from django.test import TestCase
 
@@ -153,6 +154,31 @@ class AppManagerTranslationsTest(TestCase, SuiteMixin):
         self.assertEqual(es_default_strings['modules.m0'], module.name['es'])
         self.assertEqual(es_default_strings['forms.m0f0'], form.name['es'])
 
+    def test_build_profiles_with_same_langs_share_build_files(self):
+        factory = AppFactory(build_version='2.40.0')
+        factory.app.langs = ['en', 'es']
+        factory.app.build_profiles = OrderedDict({
+            'en': BuildProfile(langs=['en'], name='en-profile'),
+            'en-copy': BuildProfile(langs=['en'], name='other-en-profile'),
+            'all': BuildProfile(langs=['en', 'es'], name='all-profile'),
+        })
+        factory.new_basic_module('my_module', 'cases')
+        app = factory.app
+
+        with patch.object(Application, 'create_app_strings', autospec=True,
+                          side_effect=Application.create_app_strings) as create_app_strings:
+            en_files = app._make_language_files('en/', 'en')
+            en_copy_files = app._make_language_files('en-copy/', 'en-copy')
+        self.assertEqual(en_files['en/default/app_strings.txt'], en_copy_files['en-copy/default/app_strings.txt'])
+        self.assertEqual(en_files['en/en/app_strings.txt'], en_copy_files['en-copy/en/app_strings.txt'])
+        self.assertEqual(
+            [call.args[1:] for call in create_app_strings.call_args_list],
+            [('default', 'en'), ('en', None)],
+        )
+
+        self.assertEqual(app._get_form_build_profile_id('en-copy'), 'en')
+        self.assertIsNone(app._get_form_build_profile_id('all'))
+
     def test_modules_case_search_app_strings(self):
         factory = AppFactory(build_version='2.40.0')
         factory.app.langs = ['en', 'es']
@@ -180,6 +180,24 @@ class FormPreparationV2Test(SimpleTestCase, TestXmlMixin):
             set(x_form.get_external_instances().keys())
         )
 
+    def test_render_key(self):
+        key = self.form.get_render_xform_key()
+        self.assertEqual(self.form.get_render_xform_key(), key)
+
+        self.form.actions.open_case = OpenCaseAction(
+            name_update=ConditionalCaseUpdate(question_path="/data/question1"),
+        )
+        self.form.actions.open_case.condition.type = 'always'
+        open_case_key = self.form.get_render_xform_key()
+        self.assertNotEqual(open_case_key, key)
+
+        self.form.version = 5
+        version_key = self.form.get_render_xform_key()
+        self.assertNotEqual(version_key, open_case_key)
+
+        self.app.case_sharing = True
+        self.assertNotEqual(self.form.get_render_xform_key(), version_key)
+
 
 class SubcaseRepeatTest(SimpleTestCase, TestXmlMixin):
     file_path = ('data', 'form_preparation_v2')
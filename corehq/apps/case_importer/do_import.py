@@ -1,6 +1,7 @@
 import time
 import uuid
 from collections import Counter, defaultdict, namedtuple
+from contextlib import contextmanager
 
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
@@ -10,6 +11,7 @@ from couchdbkit import NoResultFound
 from casexml.apps.case.const import CASE_TAG_DATE_OPENED
 from casexml.apps.case.mock import CaseBlock, CaseBlockError
 from couchexport.export import SCALAR_NEVER_WAS
+from dimagi.utils.chunked import chunked
 from dimagi.utils.logging import notify_exception
 from soil.progress import TaskProgressManager
 
@@ -38,7 +40,7 @@ from corehq.util.timer import TimingContext
 from . import exceptions
 from .const import LookupErrors
 from .extension_points import custom_case_import_operations
-from .util import EXTERNAL_ID, RESERVED_FIELDS, lookup_case
+from .util import EXTERNAL_ID, RESERVED_FIELDS, lookup_case, lookup_cases
 
 RowAndCase = namedtuple('RowAndCase', ['row', 'case'])
 ALL_LOCATIONS = 'ALL_LOCATIONS'
@@ -85,6 +87,7 @@ class _Importer(object):
         self.record_form_callback = record_form_callback
         self.results = import_results or _ImportResults()
         self.owner_accessor = _OwnerAccessor(domain, self.user)
+        self.case_lookups = _CaseLookups(domain)
         self.uncreated_external_ids = set()
         self._unsubmitted_caseblocks = []
         self.multi_domain = multi_domain
@@ -98,27 +101,47 @@ class _Importer(object):
         with TaskProgressManager(self.task, src="case_importer") as progress_manager:
             # context to be used by extensions to keep during import
             import_context = {}
-            for row_num, row in enumerate(spreadsheet.iter_row_dicts(), start=1):
-                progress_manager.set_progress(row_num - 1, spreadsheet.max_row)
-                if row_num == 1:
-                    continue  # skip first row (header row)
-
-                try:
-                    # check if there's a domain column, if true it's value should
-                    # match the current domain, else skip the row.
-                    if self.multi_domain:
-                        if self.domain != row.get('domain'):
-                            continue
-                    self.import_row(row_num, row, import_context)
-                except exceptions.CaseRowErrorList as errors:
-                    self.results.add_errors(row_num, errors)
-                except exceptions.CaseRowError as error:
-                    self.results.add_error(row_num, error)
+            # read ahead a chunk of rows at a time so that the cases they
+            # refer to can be looked up together
+            for chunk in chunked(self._iter_rows(spreadsheet, progress_manager), CASEBLOCK_CHUNKSIZE):
+                case_rows = []
+                for row_num, raw_row in chunk:
+                    with self._row_errors(row_num):
+                        row = self.parse_row(row_num, raw_row, import_context)
+                        if row is not None:
+                            case_rows.append((row_num, row))
+
+                self.case_lookups.prefetch(row for row_num, row in case_rows)
+                for row_num, row in case_rows:
+                    with self._row_errors(row_num):
+                        self.import_row(row_num, row)
 
             self.commit_caseblocks()
             return self.results.to_json()
 
-    def import_row(self, row_num, raw_row, import_context):
+    def _iter_rows(self, spreadsheet, progress_manager):
+        for row_num, row in enumerate(spreadsheet.iter_row_dicts(), start=1):
+            progress_manager.set_progress(row_num - 1, spreadsheet.max_row)
+            if row_num == 1:
+                continue  # skip first row (header row)
+
+            # check if there's a domain column, if true it's value should
+            # match the current domain, else skip the row.
+            if self.multi_domain and self.domain != row.get('domain'):
+                continue
+            yield row_num, row
+
+    @contextmanager
+    def _row_errors(self, row_num):
+        try:
+            yield
+        except exceptions.CaseRowErrorList as errors:
+            self.results.add_errors(row_num, errors)
+        except exceptions.CaseRowError as error:
+            self.results.add_error(row_num, error)
+
+    def parse_row(self, row_num, raw_row, import_context):
+        """Returns the `_CaseImportRow` of a spreadsheet row, or None if it is blank"""
         search_id = self._parse_search_id(raw_row)
         fields_to_update = self._populate_updated_fields(raw_row)
         if self._has_custom_case_import_operations():
@@ -126,16 +149,19 @@ class _Importer(object):
                                                                            import_context)
         if not any(fields_to_update.values()):
             # if the row was blank, just skip it, no errors
-            return
+            return None
 
-        row = _CaseImportRow(
+        return _CaseImportRow(
             search_id=search_id,
             fields_to_update=fields_to_update,
             config=self.config,
             domain=self.domain,
             user_id=self.user.user_id,
             owner_accessor=self.owner_accessor,
+            case_lookups=self.case_lookups,
         )
+
+    def import_row(self, row_num, row):
         if row.relies_on_uncreated_case(self.uncreated_external_ids):
             self.commit_caseblocks()
         if row.is_new_case and not self.config.create_new_cases:
@@ -186,6 +212,7 @@ class _Importer(object):
             self.submit_and_process_caseblocks(self._unsubmitted_caseblocks)
             self.results.num_chunks += 1
             self._unsubmitted_caseblocks = []
+            self.case_lookups.discard(self.uncreated_external_ids)
             self.uncreated_external_ids = set()
 
     def submit_and_process_caseblocks(self, caseblocks):
@@ -401,13 +428,14 @@ class _TimedAndThrottledImporter(_Importer):
 
 
 class _CaseImportRow(object):
-    def __init__(self, search_id, fields_to_update, config, domain, user_id, owner_accessor):
+    def __init__(self, search_id, fields_to_update, config, domain, user_id, owner_accessor, case_lookups):
         self.search_id = search_id
         self.fields_to_update = fields_to_update
         self.config = config
         self.domain = domain
         self.user_id = user_id
         self.owner_accessor = owner_accessor
+        self.case_lookups = case_lookups
 
         self.case_name = fields_to_update.pop('name', None)
         self._check_case_name()
@@ -454,12 +482,19 @@ class _CaseImportRow(object):
         return any(lookup_id and lookup_id in uncreated_external_ids
                    for lookup_id in [self.search_id, self.parent_id, self.parent_external_id])
 
+    def get_lookups(self):
+        """Returns the `(search_field, search_id, case_type)` of the cases the row looks up"""
+        return [
+            (self.config.search_field, self.search_id, self.config.case_type),
+            ('case_id', self.parent_id, self.parent_type),
+            (EXTERNAL_ID, self.parent_external_id, self.parent_type),
+        ]
+
     @cached_property
     def existing_case(self):
-        case, error = lookup_case(
+        case, error = self.case_lookups.lookup_case(
             self.config.search_field,
             self.search_id,
-            self.domain,
             self.config.case_type
         )
         _log_case_lookup(self.domain)
@@ -487,8 +522,8 @@ class _CaseImportRow(object):
                 ('parent_external_id', 'external_id', self.parent_external_id),
         ]:
             if search_id:
-                parent_case, error = lookup_case(
-                    search_field, search_id, self.domain, self.parent_type)
+                parent_case, error = self.case_lookups.lookup_case(
+                    search_field, search_id, self.parent_type)
                 _log_case_lookup(self.domain)
                 if parent_case:
                     self.validate_parent_column()
@@ -542,6 +577,47 @@ class _CaseImportRow(object):
         )
 
 
+class _CaseLookups(object):
+    """Results of case lookups made in bulk for a chunk of rows
+
+    Lookups that were not made ahead of time, or were discarded because
+    the case they look for may have been created since, are made one by
+    one with `lookup_case`.
+    """
+
+    def __init__(self, domain):
+        self.domain = domain
+        self._results = {}
+
+    def prefetch(self, rows):
+        """Look up the cases of all the rows, replacing earlier results"""
+        search_ids = defaultdict(set)
+        for row in rows:
+            for search_field, search_id, case_type in row.get_lookups():
+                if search_id:
+                    search_ids[search_field, case_type].add(search_id)
+        self._results = {}
+        for (search_field, case_type), ids in search_ids.items():
+            results = lookup_cases(search_field, ids, self.domain, case_type)
+            for search_id, result in results.items():
+                self._results[search_field, search_id, case_type] = result
+
+    def lookup_case(self, search_field, search_id, case_type):
+        """Returns a `(case, error)` tuple as `lookup_case` does"""
+        result = self._results.get((search_field, search_id, case_type))
+        if result is None:
+            result = lookup_case(search_field, search_id, self.domain, case_type)
+        return result
+
+    def discard(self, search_ids):
+        """Forget the results of lookups of the given ids"""
+        if search_ids:
+            self._results = {
+                key: result for key, result in self._results.items()
+                if key[1] not in search_ids
+            }
+
+
 def _log_case_lookup(domain):
     case_load_counter("case_importer", domain)
 
@@ -439,6 +439,27 @@ class ImporterTest(TestCase):
             }
         )
 
+    def test_case_lookups_made_in_bulk(self):
+        [parent_case] = self.factory.create_or_update_case(CaseStructure(attrs={
+            'create': True,
+            'external_id': 'parent-external-id',
+        }))
+        [case] = self.factory.create_or_update_case(CaseStructure(attrs={'create': True}))
+        headers = ['case_id', 'parent_external_id', 'age']
+        config = self._config(headers)
+        file = make_worksheet_wrapper(
+            headers,
+            [case.case_id, 'parent-external-id', 'age-0'],
+            [case.case_id, 'parent-external-id', 'age-1'],
+        )
+        with patch('corehq.apps.case_importer.do_import.lookup_case') as lookup_case:
+            res = do_import(file, config, self.domain)
+        lookup_case.assert_not_called()
+        self.assertEqual(2, res['match_count'])
+        self.assertFalse(res['errors'])
+        cases = CommCareCase.objects.get_reverse_indexed_cases(self.domain, [parent_case.case_id])
+        self.assertEqual([c.case_id for c in cases], [case.case_id])
+
     @flag_enabled('DOMAIN_PERMISSIONS_MIRROR')
     def test_multiple_domain_case_import(self):
         headers_with_domain = ['case_id', 'name', 'artist', 'domain']
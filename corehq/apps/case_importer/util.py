@@ -1,5 +1,5 @@
 import json
-from collections import OrderedDict, namedtuple
+from collections import OrderedDict, defaultdict, namedtuple
 from contextlib import contextmanager
 
 from celery import states
@@ -17,6 +17,10 @@ from corehq.apps.case_importer.exceptions import (
 )
 from corehq.form_processor.exceptions import CaseNotFound
 from corehq.form_processor.models import CommCareCase
+from corehq.sql_db.util import (
+    get_db_aliases_for_partitioned_query,
+    split_list_by_db_partition,
+)
 from corehq.util.workbook_reading import (
     SpreadsheetFileEncrypted,
     SpreadsheetFileInvalidError,
@@ -161,6 +165,40 @@ def lookup_case(search_field, search_id, domain, case_type):
     return (None, LookupErrors.NotFound)
 
 
+def lookup_cases(search_field, search_ids, domain, case_type):
+    """
+    Find the cases for many search ids at once, with one query for each
+    database shard.
+
+    Returns a dict of `search_id: (case, error)` with the result that
+    `lookup_case` gives for each search id.
+    """
+    search_ids = {search_id for search_id in search_ids if search_id}
+    results = {search_id: (None, LookupErrors.NotFound) for search_id in search_ids}
+    if not search_ids:
+        return results
+    if search_field == 'case_id':
+        for db_name, case_ids in split_list_by_db_partition(search_ids):
+            cases = CommCareCase.objects.using(db_name).filter(domain=domain, case_id__in=case_ids)
+            for case in cases:
+                if case.type == case_type:
+                    results[case.case_id] = (case, None)
+    elif search_field == EXTERNAL_ID:
+        query = {'domain': domain, 'external_id__in': list(search_ids), 'deleted': False}
+        if case_type:
+            query['type'] = case_type
+        cases_by_external_id = defaultdict(list)
+        for db_name in get_db_aliases_for_partitioned_query():
+            for case in CommCareCase.objects.using(db_name).filter(**query):
+                cases_by_external_id[case.external_id].append(case)
+        for external_id, cases in cases_by_external_id.items():
+            if len(cases) > 1:
+                results[external_id] = (None, LookupErrors.MultipleResults)
+            else:
+                results[external_id] = (cases[0], None)
+    return results
+
+
 def open_spreadsheet_download_ref(filename):
     """
     open a spreadsheet download ref just to test there are no errors opening it
@@ -172,7 +210,7 @@ def open_spreadsheet_download_ref(filename):
 @contextmanager
 def get_spreadsheet(filename):
     try:
-        with open_any_workbook(filename) as workbook:
+        with open_any_workbook(filename, streaming=True) as workbook:
             yield WorksheetWrapper.from_workbook(workbook)
     except SpreadsheetFileEncrypted as e:
         raise ImporterExcelFileEncrypted(str(e))
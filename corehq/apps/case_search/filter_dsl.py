@@ -3,7 +3,6 @@ from dataclasses import dataclass
 
 from django.utils.translation import gettext as _
 
-from eulxml.xpath import parse as parse_xpath
 from eulxml.xpath.ast import (
     BinaryExpression,
     FunctionCall,
@@ -12,18 +11,25 @@ from eulxml.xpath.ast import (
     serialize,
 )
 
+from dimagi.utils.chunked import chunked
+
 from corehq.apps.case_search.dsl_utils import unwrap_value
 from corehq.apps.case_search.exceptions import (
     CaseFilterError,
     TooManyRelatedCasesError,
     XPathFunctionException,
 )
+from corehq.apps.case_search.query_plans import query_plan_cache
+from corehq.apps.case_search.related_cases import (
+    RELATED_CASE_IDS_CHUNK_SIZE,
+    RelatedCaseResolver,
+    TooManyRelatedCases,
+)
 from corehq.apps.case_search.xpath_functions import (
     XPATH_QUERY_FUNCTIONS,
 )
 from corehq.apps.es import filters
 from corehq.apps.es.case_search import (
-    CaseSearchES,
     case_property_query,
     case_property_range_query,
     reverse_index_case_query,
@@ -34,6 +40,11 @@ from corehq.apps.es.case_search import (
 class SearchFilterContext:
     domain: str
     fuzzy: bool = False
+    related_cases: RelatedCaseResolver = None
+
+    def __post_init__(self):
+        if self.related_cases is None:
+            self.related_cases = RelatedCaseResolver(self.domain)
 
 
 def print_ast(node):
@@ -95,52 +106,69 @@ def build_filter_from_ast(node, context):
         2. Walk down the case hierarchy, finding all related cases with the right identifier to the ids
         found in (1).
         3. Return the lowest of these ids as an related case query filter
+
+        The lookups of all the related case filters being built are made together
+        by ``context.related_cases`` (see ``_prefetch_ancestor_cases``).
         """
+        final_identifier = _ancestor_case_lookup(node)[1]
+        ids, = _get_ancestor_case_ids([node])
 
-        # fetch the ids of the highest level cases that match the case_property
-        # i.e. all the cases which have `property = 'value'`
-        ids = _parent_property_lookup(node)
+        # keep each terms filter below Elasticsearch's limit on the number of terms
+        chunks = list(chunked(sorted(ids), RELATED_CASE_IDS_CHUNK_SIZE, list))
+        if len(chunks) <= 1:
+            return reverse_index_case_query(sorted(ids), final_identifier)
+        return filters.OR(*[reverse_index_case_query(chunk, final_identifier) for chunk in chunks])
+
+    def _ancestor_case_lookup(node):
+        """Return the related case lookup for a node of the form `parent/grandparent/property = 'value'`,
+        and the identifier of its final level, i.e. `parent`
+
+        The lookup finds all the cases which have `property = 'value'`, then walks down the path,
+        i.e. the cases that point at those as `grandparent`.
+        """
+        es_filter = _comparison_raw(node.left.right, node.op, node.right, node)
 
         # get the related case path we need to walk, i.e. `parent/grandparent/property`
+        identifiers = []
         n = node.left
         while _is_ancestor_case_lookup(n):
-            # This walks down the tree and finds case ids that match each identifier
-            # This is basically performing multiple "joins" to find related cases since ES
-            # doesn't have a way to relate models together
-
             # Get the path to the related case, e.g. `parent/grandparent`
             # On subsequent run throughs, it walks down the tree (e.g. n = [parent, /, grandparent])
             n = n.left
-            identifier = serialize(n.right)  # the identifier at this step, e.g. `grandparent`
-
-            # get the ids of the cases that point at the previous level's cases
-            # this has the potential of being a very large list
-            ids = _child_case_lookup(ids, identifier=identifier)
-            if not ids:
-                break
+            identifiers.append(serialize(n.right))  # the identifier at this step, e.g. `grandparent`
 
-        # after walking the full tree, get the final level we are interested in, i.e. `parent`
-        final_identifier = serialize(n.left)
-        return reverse_index_case_query(ids, final_identifier)
+        # after walking the full tree, the final level we are interested in, i.e. `parent`
+        return (es_filter, identifiers), serialize(n.left)
 
-    def _parent_property_lookup(node):
-        """given a node of the form `parent/foo = 'thing'`, return all case_ids where `foo = thing`
+    def _get_ancestor_case_ids(nodes):
+        """Look up the ids of the related cases of each node, raising ``TooManyRelatedCasesError``
+        before paging through the cases of any lookup that would find more than ``MAX_RELATED_CASES``
         """
-        es_filter = _comparison_raw(node.left.right, node.op, node.right, node)
-        es_query = CaseSearchES().domain(context.domain).filter(es_filter)
-        if es_query.count() > MAX_RELATED_CASES:
+        lookups = [_ancestor_case_lookup(n)[0] for n in nodes]
+        try:
+            return context.related_cases.get_ancestor_case_ids(lookups, max_case_ids=MAX_RELATED_CASES)
+        except TooManyRelatedCases as e:
+            node = nodes[e.lookup_index]
             new_query = '{} {} "{}"'.format(serialize(node.left.right), node.op, node.right)
             raise TooManyRelatedCasesError(
                 _("The related case lookup you are trying to perform would return too many cases"),
                 new_query
             )
 
-        return es_query.scroll_ids()
+    def _prefetch_ancestor_cases(node):
+        """Look up the related cases of all the related case filters in the expression at once"""
+        nodes = list(_iter_ancestor_case_lookups(node))
+        if nodes:
+            _get_ancestor_case_ids(nodes)
 
-    def _child_case_lookup(case_ids, identifier):
-        """returns a list of all case_ids who have parents `case_id` with the relationship `identifier`
-        """
-        return CaseSearchES().domain(context.domain).get_child_cases(case_ids, identifier).scroll_ids()
+    def _iter_ancestor_case_lookups(node):
+        if not hasattr(node, 'op') or isinstance(node, FunctionCall):
+            return
+        if _is_ancestor_case_lookup(node):
+            yield node
+        elif node.op in OPERATOR_MAPPING:
+            yield from _iter_ancestor_case_lookups(node.left)
+            yield from _iter_ancestor_case_lookups(node.right)
 
     def _is_ancestor_case_lookup(node):
         """Returns whether a particular AST node is an ancestory case lookup
@@ -226,21 +254,28 @@ def build_filter_from_ast(node, context):
             serialize(node)
         )
 
+    _prefetch_ancestor_cases(node)
     return visit(node)
 
 
-def build_filter_from_xpath(domain, xpath, fuzzy=False):
+def build_filter_from_xpath(domain, xpath, fuzzy=False, related_cases=None):
     """Given an xpath expression this function will generate an Elasticsearch
-    filter"""
+    filter
+
+    Filters are cached by ``query_plan_cache``, see ``query_plans``.
+
+    :param related_cases: ``RelatedCaseResolver`` to share related case lookups
+    with other filters for the same search
+    """
     error_message = _(
         "We didn't understand what you were trying to do with {}. "
         "Please try reformatting your query. "
         "The operators we accept are: {}"
     )
 
-    context = SearchFilterContext(domain, fuzzy)
+    context = SearchFilterContext(domain, fuzzy, related_cases)
     try:
-        return build_filter_from_ast(parse_xpath(xpath), context)
+        return query_plan_cache.get_filter(xpath, context, build_filter_from_ast)
     except TypeError as e:
         text_error = re.search(r"Unknown text '(.+)'", str(e))
         if text_error:
@@ -3,6 +3,8 @@ import re
 import attr
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from django.forms import model_to_dict
 from django.utils.translation import gettext as _
 
@@ -328,6 +330,43 @@ def case_search_synchronous_web_apps_for_domain(domain):
     return False
 
 
+@quickcache(['domain'], timeout=24 * 60 * 60, memoize_timeout=60)
+def get_case_search_query_config(domain):
+    """
+    Return the fuzzy properties and ignore patterns of the domain's case
+    search config used to build search queries, or None if the domain has
+    no config::
+
+        {
+            'fuzzy_properties': {case_type: [case_property, ...]},
+            'ignore_patterns': [(case_type, case_property, regex), ...],
+        }
+    """
+    try:
+        config = CaseSearchConfig.objects.get(pk=domain)
+    except CaseSearchConfig.DoesNotExist:
+        return None
+    return {
+        'fuzzy_properties': {
+            fuzzy_properties.case_type: list(fuzzy_properties.properties or [])
+            for fuzzy_properties in config.fuzzy_properties.filter(domain=domain)
+        },
+        'ignore_patterns': [
+            (pattern.case_type, pattern.case_property, pattern.regex)
+            for pattern in config.ignore_patterns.filter(domain=domain)
+        ],
+    }
+
+
+@receiver([post_save, post_delete], sender=CaseSearchConfig)
+@receiver([post_save, post_delete], sender=FuzzyProperties)
+@receiver([post_save, post_delete], sender=IgnorePatterns)
+@receiver(m2m_changed, sender=CaseSearchConfig.fuzzy_properties.through)
+@receiver(m2m_changed, sender=CaseSearchConfig.ignore_patterns.through)
+def _clear_case_search_query_config(sender, instance, **kwargs):
+    get_case_search_query_config.clear(instance.domain)
+
+
 def enable_case_search(domain):
     from corehq.apps.case_search.tasks import reindex_case_search_for_domain
     from corehq.pillows.case_search import domains_needing_search_index
@@ -0,0 +1,173 @@
+"""Cache of the filters built from case search XPath queries
+
+Apps make the same XPath queries over and over with different values, e.g.
+``name = 'Alice' and dob > '2020-01-01'``. Parsing the query and building
+its filter is done once for each query "template", the query with its
+string literals replaced by parameters, and the filter for each request is
+made by substituting the request's values into the cached filter.
+
+Only the values of ``property = 'value'`` and ``property != 'value'``
+comparisons are substituted, since they are used verbatim in the filter.
+Other literals, e.g. of range comparisons or function arguments, are part
+of the cache key. Filters that depend on more than the query, like related
+case lookups, subcase functions and ``today()``, are not cached.
+"""
+import re
+import threading
+
+from cachetools import LRUCache
+from eulxml.xpath import parse as parse_xpath
+from eulxml.xpath.ast import BinaryExpression, FunctionCall, Step, UnaryExpression
+
+from corehq.util.metrics import metrics_counter, metrics_histogram_timer
+
+XPATH_TEMPLATE_CACHE_SIZE = 1000
+XPATH_PLAN_CACHE_SIZE = 10000
+
+# XPath 1.0 string literals have no escape sequences
+STRING_LITERAL_RE = re.compile(r'"[^"]*"|\'[^\']*\'')
+PARAMETER = "__xpath_param_{}__"
+
+# functions whose filters only depend on their arguments
+CACHEABLE_FUNCTIONS = {
+    'not',
+    'selected',
+    'selected-any',
+    'selected-all',
+    'within-distance',
+    'fuzzy-match',
+    'phonetic-match',
+    'starts-with',
+    'date',
+    'date-add',
+}
+
+
+class XPathQueryPlanCache(object):
+
+    def __init__(self, template_cache_size=XPATH_TEMPLATE_CACHE_SIZE, plan_cache_size=XPATH_PLAN_CACHE_SIZE):
+        # template: set of parameters that can be substituted, or None if
+        # the template's filters can't be cached
+        self._templates = LRUCache(template_cache_size)
+        # (domain, fuzzy, template, values that aren't substituted): filter
+        self._plans = LRUCache(plan_cache_size)
+        self._lock = threading.Lock()
+
+    def get_filter(self, xpath, context, build_filter):
+        """
+        Return the filter for ``xpath``
+
+        :param build_filter: function that builds the filter of a parsed XPath
+        expression, ``build_filter(node, context)``
+        """
+        literals = STRING_LITERAL_RE.findall(xpath)
+        template = STRING_LITERAL_RE.sub(_ParameterNamer(), xpath)
+        parameters = self._get_template_parameters(template)
+        if parameters is None:
+            _record_plan_cache('uncacheable')
+            return build_filter(parse_xpath(xpath), context)
+
+        values = {}
+        plan_literals = []
+        for index, literal in enumerate(literals):
+            name = PARAMETER.format(index)
+            if name in parameters and literal[1:-1]:
+                values[name] = literal[1:-1]
+                plan_literals.append(None)
+            else:
+                plan_literals.append(literal)
+
+        domain = tuple(context.domain) if isinstance(context.domain, list) else context.domain
+        key = (domain, context.fuzzy, template, tuple(plan_literals))
+        with self._lock:
+            plan = self._plans.get(key)
+        if plan is None:
+            _record_plan_cache('miss')
+            plan_xpath = STRING_LITERAL_RE.sub(_ParameterNamer(plan_literals), xpath)
+            with metrics_histogram_timer('commcare.case_search.xpath_plan.compile_time',
+                                         timing_buckets=(.001, .01, .1, 1)):
+                plan = build_filter(parse_xpath(plan_xpath), context)
+            with self._lock:
+                self._plans[key] = plan
+        else:
+            _record_plan_cache('hit')
+        return _substitute(plan, values)
+
+    def _get_template_parameters(self, template):
+        with self._lock:
+            if template in self._templates:
+                return self._templates[template]
+        try:
+            parameters = _get_parameters(parse_xpath(template))
+        except _NotCacheable:
+            parameters = None
+        except Exception:
+            # let the filter be built from the query to raise a helpful error
+            return None
+        with self._lock:
+            self._templates[template] = parameters
+        return parameters
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self._plans.clear()
+
+
+class _ParameterNamer(object):
+    """Replaces string literals with parameters, or with the given literals"""
+
+    def __init__(self, literals=None):
+        self.literals = literals
+        self.index = -1
+
+    def __call__(self, match):
+        self.index += 1
+        if self.literals is not None and self.literals[self.index] is not None:
+            return self.literals[self.index]
+        return "'{}'".format(PARAMETER.format(self.index))
+
+
+class _NotCacheable(Exception):
+    pass
+
+
+def _get_parameters(node, in_function=False):
+    """Return the parameters of the expression that can be substituted"""
+    parameters = set()
+    if isinstance(node, BinaryExpression):
+        if node.op == '/':
+            # related case lookup
+            raise _NotCacheable()
+        if (
+            node.op in ('=', '!=') and not in_function
+            and isinstance(node.left, Step) and isinstance(node.right, str)
+        ):
+            parameters.add(node.right)
+        parameters.update(_get_parameters(node.left, in_function))
+        parameters.update(_get_parameters(node.right, in_function))
+    elif isinstance(node, FunctionCall):
+        if node.name not in CACHEABLE_FUNCTIONS:
+            raise _NotCacheable()
+        for arg in node.args:
+            parameters.update(_get_parameters(arg, in_function or node.name != 'not'))
+    elif isinstance(node, UnaryExpression):
+        parameters.update(_get_parameters(node.right, in_function))
+    return parameters
+
+
+def _substitute(value, values):
+    if isinstance(value, dict):
+        return {key: _substitute(item, values) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_substitute(item, values) for item in value)
+    if isinstance(value, str):
+        return values.get(value, value)
+    return value
+
+
+def _record_plan_cache(result):
+    metrics_counter('commcare.case_search.xpath_plan_cache', tags={'result': result})
+
+
+query_plan_cache = XPathQueryPlanCache()
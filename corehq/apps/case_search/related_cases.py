@@ -0,0 +1,165 @@
+"""Batched lookups of related cases
+
+Elasticsearch can't join cases to the cases they are related to, so related
+case lookups are made one relationship ("hop") at a time: the cases at each
+level of a path are found from the ids of the cases at the previous level.
+
+``RelatedCaseResolver`` makes the lookups of every path requested of it
+together, with a single multi-search for each level, and remembers the ids
+it finds so that paths that share a prefix, or are requested again for the
+same search, aren't looked up again. Each search is paged through until all
+its hits are returned, unless it matches more cases than the lookup allows.
+"""
+import json
+
+from django.utils.functional import cached_property
+
+from dimagi.utils.chunked import chunked
+
+from corehq.apps.es.case_search import CaseSearchES
+
+# hits returned by each search of a multi-search, before the rest are paged
+RELATED_CASE_PAGE_SIZE = 5000
+# case ids in the terms filter of each search
+RELATED_CASE_IDS_CHUNK_SIZE = 10000
+
+
+class TooManyRelatedCases(Exception):
+    """A lookup matched more cases than the maximum it was allowed"""
+
+    def __init__(self, lookup_index):
+        self.lookup_index = lookup_index
+        super(TooManyRelatedCases, self).__init__(lookup_index)
+
+
+class RelatedCaseResolver(object):
+
+    def __init__(self, domain=None, base_query=None):
+        """
+        :param domain: domain, or list of domains, of the related cases
+        :param base_query: ``CaseSearchES`` query that related cases are
+        looked up with, instead of one for ``domain``
+        """
+        self.base_query = base_query if base_query is not None else CaseSearchES().domain(domain)
+        self._case_ids = {}
+
+    def get_ancestor_case_ids(self, lookups, max_case_ids=None):
+        """
+        Return the ids of the cases found by each lookup, in order.
+
+        :param lookups: list of ``(case_filter, identifiers)``. Each finds the
+        cases matching ``case_filter``, then the cases that reference those
+        with the first of ``identifiers``, and so on down the list.
+        :param max_case_ids: the most cases any level of a lookup may match.
+        This is checked against the total hits of each level's searches
+        before they are paged through.
+        :raises: ``TooManyRelatedCases`` with the index of the first lookup
+        that matched too many cases
+        :returns: list of sets of case ids
+        """
+        paths = []
+        for case_filter, identifiers in lookups:
+            filter_key = json.dumps(case_filter, sort_keys=True, default=str)
+            paths.append((case_filter, [
+                (filter_key, tuple(identifiers[:level])) for level in range(len(identifiers) + 1)
+            ]))
+
+        for level in range(max((len(keys) for _, keys in paths), default=0)):
+            searches = {}
+            for case_filter, keys in paths:
+                if level >= len(keys) or keys[level] in self._case_ids or keys[level] in searches:
+                    continue
+                if level == 0:
+                    searches[keys[level]] = [self.base_query.filter(case_filter)]
+                else:
+                    identifier = keys[level][1][-1]
+                    searches[keys[level]] = [
+                        self.base_query.get_child_cases(case_ids, identifier)
+                        for case_ids in chunked(sorted(self._case_ids[keys[level - 1]]),
+                                                RELATED_CASE_IDS_CHUNK_SIZE, list)
+                    ]
+            try:
+                case_ids_by_key = self._search(searches, source=False, max_hits=max_case_ids)
+            except TooManyRelatedCases as e:
+                raise TooManyRelatedCases(next(
+                    index for index, (_, keys) in enumerate(paths) if e.lookup_index in keys
+                ))
+            for key, case_ids in case_ids_by_key.items():
+                self._case_ids[key] = set(case_ids)
+
+        return [self._case_ids[keys[-1]] for _, keys in paths]
+
+    def get_case_hits(self, case_ids):
+        """
+        Return the ``_source`` of each of the cases with the given ids.
+        """
+        searches = {
+            None: [
+                self.base_query.case_ids(chunk)
+                for chunk in chunked(sorted(case_ids), RELATED_CASE_IDS_CHUNK_SIZE, list)
+            ]
+        }
+        return self._search(searches, source=True)[None]
+
+    def _search(self, searches, source, max_hits=None):
+        """
+        Run all of the searches in one multi-search, and page through the
+        rest of the hits of searches with more than one page.
+
+        :param searches: dict of ``key: [query, ...]``
+        :param max_hits: the most hits the queries of any key may have
+        :raises: ``TooManyRelatedCases`` with the key that had too many hits
+        :returns: dict of ``key: [doc, ...]`` of all of the key's queries,
+        where docs are the ``_source`` of each hit, or its id if ``source``
+        is false
+        """
+        adapter = self._adapter
+        sort = adapter._get_search_after_sort(None)
+        bodies = []
+        for key, key_queries in searches.items():
+            for query in key_queries:
+                body = query.raw_query
+                body.update(size=RELATED_CASE_PAGE_SIZE, sort=sort)
+                if not source:
+                    body["_source"] = False
+                bodies.append((key, query, body))
+
+        docs_by_key = {key: [] for key in searches}
+        if not bodies:
+            return docs_by_key
+        results = adapter.msearch([body for key, query, body in bodies])
+        if max_hits is not None:
+            totals = {key: 0 for key in searches}
+            for (key, query, body), result in zip(bodies, results):
+                totals[key] += result["hits"]["total"]
+            for key, total in totals.items():
+                if total > max_hits:
+                    raise TooManyRelatedCases(key)
+
+        for (key, query, body), result in zip(bodies, results):
+            hits = result["hits"]["hits"]
+            if len(hits) < RELATED_CASE_PAGE_SIZE:
+                docs_by_key[key].extend(_get_doc(hit, source) for hit in hits)
+            elif adapter.elastic_major_version >= 5:
+                docs_by_key[key].extend(_get_doc(hit, source) for hit in hits)
+                body = body.copy()
+                del body["size"]
+                docs_by_key[key].extend(
+                    _get_doc(hit, source) for hit in
+                    adapter.search_after(body, size=RELATED_CASE_PAGE_SIZE, after=hits[-1]["sort"])
+                )
+            else:
+                # search_after isn't supported, so scroll all of the hits
+                # instead of continuing after the first page
+                query = query.size(RELATED_CASE_PAGE_SIZE)
+                docs_by_key[key].extend(query.scroll() if source else query.scroll_ids())
+        return docs_by_key
+
+    @cached_property
+    def _adapter(self):
+        from corehq.apps.es.transient_util import doc_adapter_from_cname
+        return doc_adapter_from_cname(self.base_query.index)
+
+
+def _get_doc(hit, source):
+    return hit["_source"] if source else hit["_id"]
@@ -3,7 +3,11 @@ from collections import OrderedDict
 from django.test import TestCase
 
 from corehq.apps.case_search.const import CASE_SEARCH_MAX_RESULTS
-from corehq.apps.case_search.models import CaseSearchConfig, IgnorePatterns
+from corehq.apps.case_search.models import (
+    CaseSearchConfig,
+    IgnorePatterns,
+    get_case_search_query_config,
+)
 from corehq.apps.case_search.tests.utils import get_case_search_query
 from corehq.apps.es.tests.utils import ElasticTestMixin, es_test
 
@@ -16,6 +20,11 @@ class CaseSearchTests(ElasticTestMixin, TestCase):
         super(CaseSearchTests, self).setUp()
         self.config, created = CaseSearchConfig.objects.get_or_create(pk=DOMAIN, enabled=True)
 
+    def tearDown(self):
+        # changes rolled back at the end of the test don't clear the cache
+        get_case_search_query_config.clear(DOMAIN)
+        super(CaseSearchTests, self).tearDown()
+
     def test_add_blacklisted_ids(self):
         criteria = {
             "commcare_blacklisted_owner_ids": "id1 id2 id3,id4"
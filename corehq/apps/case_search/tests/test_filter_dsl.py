@@ -1,3 +1,5 @@
+from unittest.mock import Mock, patch
+
 from django.test import SimpleTestCase, TestCase
 
 from eulxml.xpath import parse as parse_xpath
@@ -7,15 +9,20 @@ from casexml.apps.case.mock import CaseFactory, CaseIndex, CaseStructure
 from couchforms.geopoint import GeoPoint
 from pillowtop.es_utils import initialize_index_and_mapping
 
-from corehq.apps.case_search.exceptions import CaseFilterError
+from corehq.apps.case_search.exceptions import (
+    CaseFilterError,
+    TooManyRelatedCasesError,
+)
 from corehq.apps.case_search.filter_dsl import (
     SearchFilterContext,
     build_filter_from_ast,
 )
+from corehq.apps.case_search.related_cases import TooManyRelatedCases
 from corehq.apps.es.case_search import (
     CaseSearchES,
     case_property_geo_distance,
     case_property_query,
+    reverse_index_case_query,
 )
 from corehq.apps.es.tests.utils import ElasticTestMixin, es_test
 from corehq.elastic import get_es_new, send_to_elasticsearch
@@ -591,6 +598,37 @@ class TestFilterDsl(ElasticTestMixin, SimpleTestCase):
         with self.assertRaises(CaseFilterError):
             build_filter_from_ast(parse_xpath("parent/name > other_property"), SearchFilterContext("domain"))
 
+    @staticmethod
+    def _context_with_related_case_ids(case_ids):
+        related_cases = Mock()
+        related_cases.get_ancestor_case_ids.return_value = [set(case_ids)]
+        return SearchFilterContext("domain", related_cases=related_cases)
+
+    @patch('corehq.apps.case_search.filter_dsl.RELATED_CASE_IDS_CHUNK_SIZE', 2)
+    def test_parent_lookup_ids_chunked(self):
+        context = self._context_with_related_case_ids(['a', 'b', 'c', 'd', 'e'])
+        built_filter = build_filter_from_ast(parse_xpath("father/name = 'Mace'"), context)
+        expected_filter = {
+            "bool": {
+                "should": [
+                    reverse_index_case_query(['a', 'b'], 'father'),
+                    reverse_index_case_query(['c', 'd'], 'father'),
+                    reverse_index_case_query(['e'], 'father'),
+                ]
+            }
+        }
+        self.checkQuery(built_filter, expected_filter, is_raw_query=True)
+
+    @patch('corehq.apps.case_search.filter_dsl.MAX_RELATED_CASES', 3)
+    def test_too_many_related_cases(self):
+        related_cases = Mock()
+        related_cases.get_ancestor_case_ids.side_effect = TooManyRelatedCases(1)
+        context = SearchFilterContext("domain", related_cases=related_cases)
+        with self.assertRaises(TooManyRelatedCasesError) as cm:
+            build_filter_from_ast(parse_xpath("father/name = 'Mace' and mother/house = 'Tyrell'"), context)
+        self.assertEqual(cm.exception.filter_part, 'house = "Tyrell"')
+        self.assertEqual(related_cases.get_ancestor_case_ids.call_args.kwargs["max_case_ids"], 3)
+
     @freeze_time('2021-08-02')
     def test_filter_today(self):
         parsed = parse_xpath("age > today()")
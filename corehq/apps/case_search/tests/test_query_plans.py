@@ -0,0 +1,69 @@
+from unittest.mock import Mock
+
+from django.test import SimpleTestCase
+
+from eulxml.xpath import parse as parse_xpath
+
+from corehq.apps.case_search.filter_dsl import (
+    SearchFilterContext,
+    build_filter_from_ast,
+)
+from corehq.apps.case_search.query_plans import XPathQueryPlanCache
+
+
+class TestXPathQueryPlanCache(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = XPathQueryPlanCache()
+        self.build_filter = Mock(side_effect=build_filter_from_ast)
+
+    def _get_filter(self, xpath, context=None):
+        return self.cache.get_filter(xpath, context or SearchFilterContext("domain"), self.build_filter)
+
+    def _assert_filter(self, xpath, context=None):
+        self.assertEqual(
+            self._get_filter(xpath, context),
+            build_filter_from_ast(parse_xpath(xpath), context or SearchFilterContext("domain")),
+        )
+
+    def test_values_substituted(self):
+        self._assert_filter("name = 'farid' and not(age != '12')")
+        self._assert_filter("name = 'leila' and not(age != \"30\")")
+        self.assertEqual(self.build_filter.call_count, 1)
+
+    def test_fuzzy_values_substituted(self):
+        self._assert_filter("name = 'farid'", SearchFilterContext("domain", fuzzy=True))
+        self._assert_filter("name = 'leila'", SearchFilterContext("domain", fuzzy=True))
+        self._assert_filter("name = 'leila'")
+        self.assertEqual(self.build_filter.call_count, 2)
+
+    def test_empty_values_not_substituted(self):
+        # `name = ''` matches cases without the property
+        self._assert_filter("name = 'farid'")
+        self._assert_filter("name = ''")
+        self._assert_filter("name = 'leila'")
+        self.assertEqual(self.build_filter.call_count, 2)
+
+    def test_other_values_not_substituted(self):
+        self._assert_filter("dob > '2020-01-01' and selected(tags, 'a b')")
+        self._assert_filter("dob > '2020-01-02' and selected(tags, 'a b')")
+        self._assert_filter("dob > '2020-01-02' and selected(tags, 'a')")
+        self._assert_filter("dob > '2020-01-02' and selected(tags, 'a')")
+        self.assertEqual(self.build_filter.call_count, 3)
+
+    def test_domains_cached_separately(self):
+        self._assert_filter("name = 'farid'", SearchFilterContext("domain"))
+        self._assert_filter("name = 'farid'", SearchFilterContext("other"))
+        self.assertEqual(self.build_filter.call_count, 2)
+
+    def test_related_case_lookups_not_cached(self):
+        related_cases = Mock()
+        related_cases.get_ancestor_case_ids.return_value = [{'c1'}]
+        context = SearchFilterContext("domain", related_cases=related_cases)
+        self._get_filter("parent/name = 'farid'", context)
+        self._get_filter("parent/name = 'farid'", context)
+        self.assertEqual(self.build_filter.call_count, 2)
+
+    def test_cached_filter_not_shared(self):
+        self._get_filter("name = 'farid'")["nested"]["path"] = "changed"
+        self._assert_filter("name = 'farid'")
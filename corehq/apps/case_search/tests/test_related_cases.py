@@ -0,0 +1,112 @@
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase
+
+from corehq.apps.case_search.related_cases import (
+    RelatedCaseResolver,
+    TooManyRelatedCases,
+)
+from corehq.apps.es.case_search import case_property_query
+
+
+class TestRelatedCaseResolver(SimpleTestCase):
+
+    def setUp(self):
+        self.resolver = RelatedCaseResolver('domain')
+        self.adapter = self.resolver._adapter = Mock(elastic_major_version=5)
+        self.adapter._get_search_after_sort.return_value = [{"_uid": "asc"}]
+
+    def _responses(self, *levels, totals=None):
+        self.adapter.msearch.side_effect = [
+            [
+                {"hits": {
+                    "total": len(ids) if totals is None else totals.get(ids[0], len(ids)),
+                    "hits": [{"_id": id_, "sort": [id_]} for id_ in ids],
+                }}
+                for ids in level
+            ]
+            for level in levels
+        ]
+
+    def test_lookups_batched_by_level(self):
+        name_filter = case_property_query('name', 'Mace')
+        house_filter = case_property_query('house', 'Tyrell')
+        self._responses(
+            [['mace'], ['olenna', 'mace']],
+            [['margaery', 'loras'], ['mace']],
+            [['garlan']],
+        )
+        case_ids = self.resolver.get_ancestor_case_ids([
+            (name_filter, ['father']),
+            (house_filter, ['mother']),
+            (name_filter, ['father', 'brother']),
+        ])
+        self.assertEqual(case_ids, [{'margaery', 'loras'}, {'mace'}, {'garlan'}])
+        self.assertEqual(
+            [len(call.args[0]) for call in self.adapter.msearch.call_args_list],
+            [2, 2, 1],
+        )
+
+    def test_lookups_memoized(self):
+        name_filter = case_property_query('name', 'Mace')
+        self._responses([['mace']], [['margaery']])
+        self.resolver.get_ancestor_case_ids([(name_filter, ['father'])])
+        case_ids = self.resolver.get_ancestor_case_ids([(name_filter, ['father']), (name_filter, [])])
+        self.assertEqual(case_ids, [{'margaery'}, {'mace'}])
+        self.assertEqual(self.adapter.msearch.call_count, 2)
+
+    def test_no_lookup_without_related_cases(self):
+        self._responses([[]])
+        case_ids = self.resolver.get_ancestor_case_ids([(case_property_query('name', 'Mace'), ['father'])])
+        self.assertEqual(case_ids, [set()])
+        self.assertEqual(self.adapter.msearch.call_count, 1)
+
+    @patch('corehq.apps.case_search.related_cases.RELATED_CASE_PAGE_SIZE', 2)
+    def test_large_lookups_paged(self):
+        self._responses([['a', 'b']])
+        self.adapter.search_after.return_value = [{"_id": "c", "sort": ["c"]}]
+        case_ids = self.resolver.get_ancestor_case_ids([(case_property_query('name', 'Mace'), [])])
+        self.assertEqual(case_ids, [{'a', 'b', 'c'}])
+        body = self.adapter.msearch.call_args.args[0][0]
+        self.assertEqual(body["size"], 2)
+        self.assertEqual(body["_source"], False)
+        self.assertEqual(self.adapter.search_after.call_args.kwargs["after"], ["b"])
+
+    @patch('corehq.apps.case_search.related_cases.RELATED_CASE_PAGE_SIZE', 2)
+    def test_large_lookups_scrolled_before_search_after(self):
+        self.adapter.elastic_major_version = 2
+        self._responses([['a', 'b']])
+        with patch('corehq.apps.es.case_search.CaseSearchES.scroll_ids', return_value=iter(['a', 'b', 'c'])):
+            case_ids = self.resolver.get_ancestor_case_ids([(case_property_query('name', 'Mace'), [])])
+        self.assertEqual(case_ids, [{'a', 'b', 'c'}])
+        self.adapter.search_after.assert_not_called()
+
+    @patch('corehq.apps.case_search.related_cases.RELATED_CASE_PAGE_SIZE', 2)
+    def test_too_many_cases_not_paged(self):
+        name_filter = case_property_query('name', 'Mace')
+        house_filter = case_property_query('house', 'Tyrell')
+        self._responses([['mace'], ['olenna', 'mace']], totals={'olenna': 4})
+        with self.assertRaises(TooManyRelatedCases) as cm:
+            self.resolver.get_ancestor_case_ids(
+                [(name_filter, ['father']), (house_filter, [])],
+                max_case_ids=3,
+            )
+        self.assertEqual(cm.exception.lookup_index, 1)
+        self.assertEqual(self.adapter.msearch.call_count, 1)
+        self.adapter.search_after.assert_not_called()
+
+    def test_too_many_cases_of_related_cases(self):
+        self._responses([['mace', 'olenna']], [['margaery', 'loras'], ['garlan', 'willas']])
+        with patch('corehq.apps.case_search.related_cases.RELATED_CASE_IDS_CHUNK_SIZE', 1), \
+                self.assertRaises(TooManyRelatedCases):
+            self.resolver.get_ancestor_case_ids(
+                [(case_property_query('name', 'Mace'), ['father'])],
+                max_case_ids=3,
+            )
+
+    def test_get_case_hits(self):
+        self.adapter.msearch.return_value = [
+            {"hits": {"total": 1, "hits": [{"_id": "a", "sort": ["a"], "_source": {"_id": "a", "name": "A"}}]}},
+        ]
+        self.assertEqual(self.resolver.get_case_hits({'a'}), [{"_id": "a", "name": "A"}])
+        self.assertNotIn("_source", self.adapter.msearch.call_args.args[0][0])
@@ -20,9 +20,10 @@ from corehq.apps.case_search.models import (
     CASE_SEARCH_BLACKLISTED_OWNER_ID_KEY,
     CASE_SEARCH_XPATH_QUERY_KEY,
     UNSEARCHABLE_KEYS,
-    CaseSearchConfig,
     extract_search_request_config,
+    get_case_search_query_config,
 )
+from corehq.apps.case_search.related_cases import RelatedCaseResolver
 from corehq.apps.es import case_search, filters, queries
 from corehq.apps.es.case_search import (
     CaseSearchES,
@@ -132,12 +133,8 @@ class CaseSearchQueryBuilder:
 
     @cached_property
     def config(self):
-        try:
-            config = (CaseSearchConfig.objects
-                      .prefetch_related('fuzzy_properties')
-                      .prefetch_related('ignore_patterns')
-                      .get(domain=self.request_domain))
-        except CaseSearchConfig.DoesNotExist as e:
+        config = get_case_search_query_config(self.request_domain)
+        if config is None:
             from corehq.util.soft_assert import soft_assert
             _soft_assert = soft_assert(
                 to="{}@{}.com".format('frener', 'dimagi'),
@@ -146,11 +143,15 @@ class CaseSearchQueryBuilder:
             _soft_assert(
                 False,
                 "Someone in domain: {} tried accessing case search without a config".format(self.request_domain),
-                e
             )
-            config = CaseSearchConfig(domain=self.request_domain)
+            config = {'fuzzy_properties': {}, 'ignore_patterns': []}
         return config
 
+    @cached_property
+    def related_cases(self):
+        """Related case lookups shared by all the related case filters of the search"""
+        return RelatedCaseResolver(self.query_domains)
+
     def build_query(self, search_criteria):
         search_es = self._get_initial_search_es()
         for criteria in search_criteria:
@@ -170,10 +171,13 @@ class CaseSearchQueryBuilder:
             if not criteria.is_empty:
                 if criteria.has_multiple_terms:
                     for value in criteria.value:
-                        search_es = search_es.filter(build_filter_from_xpath(self.query_domains, value))
+                        search_es = search_es.filter(build_filter_from_xpath(
+                            self.query_domains, value, related_cases=self.related_cases
+                        ))
                     return search_es
                 else:
-                    return search_es.filter(build_filter_from_xpath(self.query_domains, criteria.value))
+                    return search_es.filter(build_filter_from_xpath(self.query_domains, criteria.value,
+                                                                    related_cases=self.related_cases))
         elif criteria.key == 'owner_id':
             if not criteria.is_empty:
                 return search_es.filter(case_search.owner(criteria.value))
@@ -203,7 +207,8 @@ class CaseSearchQueryBuilder:
             return case_property_missing(criteria.key)
 
         if criteria.is_ancestor_query:
-            missing_filter = build_filter_from_xpath(self.query_domains, f'{criteria.key} = ""')
+            missing_filter = build_filter_from_xpath(self.query_domains, f'{criteria.key} = ""',
+                                                     related_cases=self.related_cases)
         else:
             missing_filter = case_property_missing(criteria.key)
         return filters.OR(self._get_query(criteria), missing_filter)
@@ -216,7 +221,8 @@ class CaseSearchQueryBuilder:
         fuzzy = criteria.key in self._fuzzy_properties
         if criteria.is_ancestor_query:
             query = f'{criteria.key} = "{value}"'
-            return build_filter_from_xpath(self.query_domains, query, fuzzy=fuzzy)
+            return build_filter_from_xpath(self.query_domains, query, fuzzy=fuzzy,
+                                           related_cases=self.related_cases)
         elif criteria.is_index_query:
             return reverse_index_case_query(value, criteria.index_query_identifier)
         else:
@@ -233,20 +239,17 @@ class CaseSearchQueryBuilder:
     @cached_property
     def _patterns_to_remove(self):
         patterns_by_property = defaultdict(list)
-        for pattern in self.config.ignore_patterns.filter(
-                domain=self.request_domain,
-                case_type__in=self.case_types,
-        ):
-            patterns_by_property[pattern.case_property].append(re.escape(pattern.regex))
+        for case_type, case_property, regex in self.config['ignore_patterns']:
+            if case_type in self.case_types:
+                patterns_by_property[case_property].append(re.escape(regex))
         return patterns_by_property
 
     @cached_property
     def _fuzzy_properties(self):
         return [
-            prop for properties_config in
-            self.config.fuzzy_properties.filter(domain=self.request_domain,
-                                                case_type__in=self.case_types)
-            for prop in properties_config.properties
+            prop for case_type, properties in self.config['fuzzy_properties'].items()
+            if case_type in self.case_types
+            for prop in properties
         ]
 
 
@@ -311,23 +314,34 @@ def get_related_case_results(helper, cases, paths):
     """
     Given a set of cases and a set of case property paths,
     fetches ES documents for all cases referenced by those paths.
+
+    The cases at each level of all the paths are fetched together.
     """
     if not cases:
         return []
 
-    results_cache = {}
-    for path in paths:
-        current_cases = cases
-        parts = path.split("/")
-        for index, identifier in enumerate(parts):
-            fragment = "/".join(parts[:index + 1])
-            if fragment in results_cache:
-                current_cases = results_cache[fragment]
-            else:
-                indices = [case.get_index(identifier) for case in current_cases]
-                related_case_ids = {i.referenced_id for i in indices if i}
-                current_cases = _get_case_search_cases(helper, related_case_ids)
-                results_cache[fragment] = current_cases
+    resolver = RelatedCaseResolver(base_query=helper.get_base_queryset())
+    results_cache = {"": cases}
+    cases_by_id = {}
+    for depth in range(1, max((len(path.split("/")) for path in paths), default=0) + 1):
+        related_case_ids = {}
+        for path in paths:
+            parts = path.split("/")
+            if len(parts) >= depth:
+                fragment = "/".join(parts[:depth])
+                parent_fragment, _, identifier = fragment.rpartition("/")
+                indices = [case.get_index(identifier) for case in results_cache[parent_fragment]]
+                related_case_ids[fragment] = {i.referenced_id for i in indices if i}
+
+        case_ids = set().union(*related_case_ids.values()) - set(cases_by_id)
+        for hit in resolver.get_case_hits(case_ids):
+            case = helper.wrap_case(hit, is_related_case=True)
+            cases_by_id[case.case_id] = case
+
+        for fragment, fragment_case_ids in related_case_ids.items():
+            results_cache[fragment] = [
+                cases_by_id[case_id] for case_id in fragment_case_ids if case_id in cases_by_id
+            ]
 
     results = []
     for path in paths:
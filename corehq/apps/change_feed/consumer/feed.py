@@ -1,4 +1,5 @@
 import json
+from contextlib import contextmanager
 from copy import copy
 from typing import Dict, Iterator, Optional
 
@@ -15,10 +16,12 @@ from pillowtop.models import kafka_seq_to_str
 
 from corehq.apps.change_feed.data_sources import get_document_store
 from corehq.apps.change_feed.exceptions import UnknownDocumentStore
-from corehq.apps.change_feed.topics import validate_offsets
+from corehq.apps.change_feed.topics import get_multi_topic_offset, validate_offsets
 
 MIN_TIMEOUT = 500
-MAX_TIMEOUT = 1000 * 60 * 60 * 24  # 1 day in ms
+# when iterating forever, yield None after this long without new changes so that
+# the pillow can process any changes it is holding back
+IDLE_TIMEOUT = 1000 * 5
 
 
 class KafkaChangeFeed(ChangeFeed):
@@ -37,6 +40,7 @@ class KafkaChangeFeed(ChangeFeed):
         self._topics = topics
         self._client_id = client_id
         self._processed_topic_offsets = {}
+        self._pinned_offsets = None
         self.strict = strict
         self.num_processes = num_processes
         self.process_num = process_num
@@ -62,8 +66,11 @@ class KafkaChangeFeed(ChangeFeed):
     ) -> Iterator[Change]:
         """
         ``since`` must be a dictionary of topic partition offsets, or None
+
+        If ``forever`` is set, ``None`` is yielded whenever no changes arrive
+        for ``IDLE_TIMEOUT`` milliseconds.
         """
-        timeout = MAX_TIMEOUT if forever else MIN_TIMEOUT
+        timeout = IDLE_TIMEOUT if forever else MIN_TIMEOUT
         start_from_latest = since is None
         reset = 'largest' if start_from_latest else 'smallest'
         self._init_consumer(timeout, auto_offset_reset=reset)
@@ -90,15 +97,27 @@ class KafkaChangeFeed(ChangeFeed):
             for topic_partition, offset in since.items():
                 self.consumer.seek(TopicPartition(topic_partition[0], topic_partition[1]), int(offset))
 
-        try:
-            for message in self.consumer:
-                self._processed_topic_offsets[(message.topic, message.partition)] = message.offset
-                yield change_from_kafka_message(message)
-        except StopIteration:
-            # no need to do anything since this is just telling us we've reached the end of the feed
-            pass
+        while True:
+            try:
+                for message in self.consumer:
+                    self._processed_topic_offsets[(message.topic, message.partition)] = message.offset
+                    yield change_from_kafka_message(message)
+            except StopIteration:
+                # no need to do anything since this is just telling us we've reached the end of the feed
+                pass
+            if not forever:
+                break
+            yield None
 
     def get_current_checkpoint_offsets(self):
+        if self._pinned_offsets is not None:
+            # another thread is reading from the consumer so don't query it for the
+            # latest offsets. Adding 1 can't go past the end of a partition since
+            # these offsets have all been read.
+            return {
+                TopicPartition(topic_partition[0], topic_partition[1]): offset + 1
+                for topic_partition, offset in self._pinned_offsets.items()
+            }
         # the way kafka works, the checkpoint should increment by 1 because
         # querying the feed is inclusive of the value passed in.
         latest_offsets = self.get_latest_offsets()
@@ -118,7 +137,23 @@ class KafkaChangeFeed(ChangeFeed):
     def get_processed_offsets(self):
         return copy(self._processed_topic_offsets)
 
+    @contextmanager
+    def processed_offsets_pinned(self, offsets):
+        self._pinned_offsets = offsets
+        try:
+            yield
+        finally:
+            self._pinned_offsets = None
+
     def get_latest_offsets(self):
+        if self._pinned_offsets is not None:
+            # another thread is reading from the consumer, which isn't thread
+            # safe, so get the offsets of the partitions it reads separately
+            return {
+                TopicPartition(topic, partition): offset
+                for (topic, partition), offset in get_multi_topic_offset(self._topics).items()
+                if (topic, partition) in self._pinned_offsets
+            }
         return self.consumer.end_offsets(self.consumer.assignment())
 
     def get_latest_offsets_json(self):
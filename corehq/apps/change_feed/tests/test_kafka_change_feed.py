@@ -1,8 +1,11 @@
 import uuid
 from copy import deepcopy
+from unittest.mock import patch
 
 from django.test import SimpleTestCase, TestCase
 
+from kafka.common import TopicPartition
+
 from pillowtop.checkpoints.manager import PillowCheckpoint
 from pillowtop.feed.interface import ChangeMeta
 from pillowtop.pillow.interface import ConstructedPillow
@@ -50,6 +53,24 @@ class KafkaChangeFeedTest(SimpleTestCase):
         first_available_offsets = get_multi_topic_first_available_offsets([topics.FORM_SQL, topics.CASE_SQL])
         next(feed.iter_changes(since=first_available_offsets, forever=False))
 
+    def test_pinned_checkpoint_offsets(self):
+        feed = KafkaChangeFeed(topics=[topics.FORM_SQL], client_id='test-kafka-feed')
+        with feed.processed_offsets_pinned({(topics.FORM_SQL, 0): 9, (topics.FORM_SQL, 1): 4}):
+            self.assertEqual(
+                {TopicPartition(topics.FORM_SQL, 0): 10, TopicPartition(topics.FORM_SQL, 1): 5},
+                feed.get_current_checkpoint_offsets()
+            )
+        self.assertIsNone(feed._pinned_offsets)
+
+    @patch('corehq.apps.change_feed.consumer.feed.get_multi_topic_offset')
+    def test_pinned_latest_offsets(self, get_multi_topic_offset):
+        get_multi_topic_offset.return_value = {(topics.FORM_SQL, 0): 12, (topics.FORM_SQL, 1): 7}
+        feed = KafkaChangeFeed(topics=[topics.FORM_SQL], client_id='test-kafka-feed')
+        with feed.processed_offsets_pinned({(topics.FORM_SQL, 0): 9}):
+            self.assertEqual({TopicPartition(topics.FORM_SQL, 0): 12}, feed.get_latest_offsets())
+        # the consumer wasn't used while another thread could be reading from it
+        self.assertIsNone(feed._consumer)
+
 
 class KafkaCheckpointTest(TestCase):
 
@@ -44,6 +44,7 @@ PROPERTY_VALUE_EXACT = '{}.{}.exact'.format(CASE_PROPERTIES_PATH, VALUE)
 
 class CaseSearchES(CaseES):
     index = "case_search"
+    cache_results = False
 
     @property
     def builtin_filters(self):
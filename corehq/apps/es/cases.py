@@ -23,6 +23,7 @@ from .transient_util import get_adapter_mapping, from_dict_with_possible_id
 
 class CaseES(HQESQuery):
     index = 'cases'
+    cache_results = True
 
     @property
     def builtin_filters(self):
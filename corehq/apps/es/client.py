@@ -2,6 +2,10 @@
 import copy
 import json
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from enum import Enum
 from functools import cached_property
 
@@ -17,12 +21,17 @@ from corehq.util.es.elasticsearch import (
     Elasticsearch,
     ElasticsearchException,
     NotFoundError,
+    TransportError,
     bulk,
 )
 from corehq.util.metrics import metrics_counter
 
 from .app_config import register_document_adapter
 from .const import (
+    BULK_MAX_IN_FLIGHT,
+    BULK_MAX_REQUEST_BYTES,
+    BULK_MAX_RETRIES,
+    BULK_RETRY_DELAY,
     INDEX_CONF_REINDEX,
     INDEX_CONF_STANDARD,
     SCROLL_KEEPALIVE,
@@ -530,6 +539,33 @@ class ElasticDocumentAdapter(BaseAdapter):
         """
         return self._es.search(self.index_name, self.type, query, **kw)
 
+    def msearch(self, queries):
+        """Perform multiple searches in a single request and return their
+        results.
+
+        :param queries: iterable of ``dict`` search queries to execute
+        :returns: ``list`` of ``dict`` results, in the order of ``queries``
+        """
+        body = []
+        for query in queries:
+            body.extend([{}, query])
+        if not body:
+            return []
+        try:
+            results = self._msearch(body)["responses"]
+        except ElasticsearchException as exc:
+            raise ESError(exc)
+        for result in results:
+            if "error" in result:
+                raise ESError(result["error"])
+            self._fix_hits_in_result(result)
+            self._report_and_fail_on_shard_failures(result)
+        return results
+
+    def _msearch(self, body):
+        """Perform a "low-level" multi-search and return the raw result."""
+        return self._es.msearch(body, self.index_name, self.type)
+
     def scroll(self, query, scroll=SCROLL_KEEPALIVE, size=None):
         """Perfrom a scrolling search, yielding each doc until the entire context
         is exhausted.
@@ -619,6 +655,110 @@ class ElasticDocumentAdapter(BaseAdapter):
             if scroll_id:
                 self._es.clear_scroll(body={"scroll_id": [scroll_id]}, ignore=(404,))
 
+    def search_after(self, query, size=None, after=None):
+        """Perform a paged search using ``search_after``, yielding each hit
+        until all matching documents have been returned.
+
+        Unlike ``scroll()``, no search context is held open on the cluster
+        between pages, so the returned cursor can be iterated slowly and
+        resumed later from its ``after`` token. Requires Elasticsearch 5 or
+        later.
+
+        :param query: ``dict`` raw search query. Its ``sort`` is made stable
+                      by adding a unique tiebreaker field.
+        :param size: ``int`` number of documents per page. When set to
+                     ``None`` (the default), the query's ``size`` or the
+                     default scroll size is used.
+        :param after: the ``after`` token of a previous cursor for the same
+                      query, to resume after the last hit it yielded.
+        :returns: ``SearchAfterCursor``
+        """
+        return SearchAfterCursor(self, query, size, after)
+
+    def _get_search_after_sort(self, sort):
+        """Return ``sort`` as a list, ending with a unique tiebreaker field.
+
+        The ``_doc`` sort is dropped because it is only stable within a
+        shard.
+        """
+        if sort is None:
+            sort = []
+        elif not isinstance(sort, list):
+            sort = [sort]
+        sort = [field for field in sort if field != "_doc"]
+        # _uid (type#id) is used before _id is sortable in Elasticsearch 6
+        tiebreaker = "_uid" if self.elastic_major_version < 6 else "_id"
+        if not any(
+            field == tiebreaker or (isinstance(field, dict) and tiebreaker in field)
+            for field in sort
+        ):
+            sort.append({tiebreaker: "asc"})
+        return sort
+
+    def sliced_scroll(self, query, slices, scroll=SCROLL_KEEPALIVE, size=None):
+        """Perform a scrolling search split into ``slices`` independent scrolls
+        that are fetched concurrently in a thread pool, yielding each hit until
+        all slices are exhausted.
+
+        Hits are yielded in the order pages are returned by the slices, not in
+        the order of the query's ``sort``. Requires Elasticsearch 5 or later.
+
+        :param query: ``dict`` raw search query.
+        :param slices: ``int`` number of slices to scroll in parallel.
+        :param scroll: ``str`` time value specifying how long the Elastic
+                       cluster should keep each slice's search context alive.
+        :param size: ``int`` scroll size of each slice (see ``scroll()``)
+        :yields: ``dict`` documents
+        """
+        if slices < 2:
+            yield from self.scroll(query, scroll, size)
+            return
+
+        # pages of hits, or an exception, from the slices and None when a
+        # slice is done. Bounded so slices wait while the caller catches up.
+        pages = queue.Queue(maxsize=slices * 2)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def scroll_slice(slice_id):
+            try:
+                slice_query = dict(query, slice={"id": slice_id, "max": slices})
+                for result in self._scroll(slice_query, scroll, size):
+                    self._report_and_fail_on_shard_failures(result)
+                    self._fix_hits_in_result(result)
+                    if not put(result["hits"]["hits"]):
+                        break
+            except Exception as exc:
+                put(exc)
+            finally:
+                put(None)
+
+        with ThreadPoolExecutor(max_workers=slices) as pool:
+            for slice_id in range(slices):
+                pool.submit(scroll_slice, slice_id)
+            try:
+                running = slices
+                while running:
+                    page = pages.get()
+                    if page is None:
+                        running -= 1
+                    elif isinstance(page, ElasticsearchException):
+                        raise ESError(page)
+                    elif isinstance(page, Exception):
+                        raise page
+                    else:
+                        yield from page
+            finally:
+                stop.set()
+
     def index(self, doc, refresh=False, **kw):
         """Index (send) a new document in (to) Elasticsearch
 
@@ -767,6 +907,16 @@ class ElasticDocumentAdapter(BaseAdapter):
         action_gen = (BulkActionItem.delete_id(doc_id) for doc_id in doc_ids)
         return self.bulk(action_gen, refresh, **kw)
 
+    def bulk_writer(self, refresh=False, **kw):
+        """Return an ``ElasticBulkWriter`` for writing actions to this index in
+        concurrent, byte-sized bulk requests.
+
+        :param refresh: ``bool`` refresh the effected shards after each
+                        request
+        :param **kw: extra ``ElasticBulkWriter`` parameters
+        """
+        return ElasticBulkWriter(self, refresh, **kw)
+
     def _render_bulk_action(self, action):
         """Return a "raw" action object in the format required by the
         Elasticsearch ``bulk()`` helper function.
@@ -888,6 +1038,149 @@ class ElasticDocumentAdapter(BaseAdapter):
         return f"<{self.__class__.__name__} index={self.index_name!r}, type={self.type!r}>"
 
 
+class SearchAfterCursor:
+    """Iterates the hits of a search a page at a time using ``search_after``.
+
+    ``after`` is the sort values of the last hit yielded. It can be saved
+    and passed to a new cursor for the same query to resume after that hit.
+    See ``ElasticDocumentAdapter.search_after()``.
+    """
+
+    def __init__(self, adapter, query, size=None, after=None):
+        query = query.copy()
+        size_qy = query.pop("size", None)
+        if size_qy is not None and size is not None:
+            raise ValueError(f"ambiguous page size (specified in both query "
+                             f"and arguments): query={size_qy}, arg={size}")
+        if "from" in query:
+            raise ValueError("search_after queries cannot use 'from'")
+        query["sort"] = adapter._get_search_after_sort(query.get("sort"))
+        self.adapter = adapter
+        self.query = query
+        self.size = size or size_qy or SCROLL_SIZE
+        self.after = after
+
+    def __iter__(self):
+        try:
+            while True:
+                query = dict(self.query, size=self.size)
+                if self.after is not None:
+                    query["search_after"] = self.after
+                result = self.adapter._search(query)
+                self.adapter._report_and_fail_on_shard_failures(result)
+                self.adapter._fix_hits_in_result(result)
+                hits = result["hits"]["hits"]
+                for hit in hits:
+                    self.after = hit["sort"]
+                    yield hit
+                if len(hits) < self.size:
+                    break
+        except ElasticsearchException as e:
+            raise ESError(e)
+
+
+class ElasticBulkWriter:
+    """Writes bulk actions to an adapter's index.
+
+    Actions are grouped into bulk requests of up to ``max_bytes`` of
+    serialized payload rather than a fixed number of documents, and up to
+    ``max_in_flight`` requests are sent concurrently. Once that many are in
+    flight, rendering more actions waits for a request to finish.
+
+    Actions rejected with a 429 (Too Many Requests) status because the
+    cluster's write queue is full are retried on their own, with an
+    exponential backoff, as are whole requests rejected with a 429. Other
+    failed actions are returned like the ``raise_on_error=False`` result of
+    ``ElasticDocumentAdapter.bulk()``.
+    """
+
+    def __init__(self, adapter, refresh=False, max_bytes=BULK_MAX_REQUEST_BYTES,
+                 max_in_flight=BULK_MAX_IN_FLIGHT, max_retries=BULK_MAX_RETRIES,
+                 retry_delay=BULK_RETRY_DELAY):
+        self.adapter = adapter
+        self.refresh = adapter._refresh_value(refresh)
+        self.max_bytes = max_bytes
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    def write(self, actions):
+        """Write the actions, returning once they have all been processed.
+
+        :param actions: iterable of ``BulkActionItem`` instances
+        :returns: ``(success_count, errors)`` tuple, where ``errors`` is a
+                  list of ``{<op_type>: <item result>}`` dicts of the actions
+                  that failed.
+        :raises: ``ElasticsearchException`` if a request fails (after
+                 retries when it was rejected with a 429 status).
+        """
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            in_flight = set()
+            for request_items in self._iter_requests(actions):
+                if len(in_flight) >= self.max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    results.extend(future.result() for future in done)
+                in_flight.add(pool.submit(self._send, request_items))
+            results.extend(future.result() for future in in_flight)
+        success_count = sum(success for success, errors in results)
+        return success_count, [error for success, errors in results for error in errors]
+
+    def _iter_requests(self, actions):
+        """Render actions in the bulk API's newline delimited format, yielding
+        lists of rendered actions that add up to no more than ``max_bytes``
+        (unless a single action is larger).
+        """
+        dumps = self.adapter._es.transport.serializer.dumps
+        items = []
+        size = 0
+        for action in actions:
+            raw = self.adapter._render_bulk_action(action)
+            op_type = raw.pop("_op_type")
+            source = raw.pop("_source", None)
+            lines = [dumps({op_type: raw})]
+            if source is not None:
+                lines.append(dumps(source))
+            item = "".join(f"{line}\n" for line in lines)
+            item_size = len(item.encode("utf-8"))
+            if items and size + item_size > self.max_bytes:
+                yield items
+                items = []
+                size = 0
+            items.append(item)
+            size += item_size
+        if items:
+            yield items
+
+    def _send(self, items):
+        success_count = 0
+        errors = []
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                metrics_counter("commcare.es.bulk.retries", len(items))
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            try:
+                result = self.adapter._es.bulk("".join(items), refresh=self.refresh)
+            except TransportError as exc:
+                if exc.status_code == 429 and attempt < self.max_retries:
+                    continue
+                raise
+            retry_items = []
+            for item, item_result in zip(items, result["items"]):
+                (op_type, info), = item_result.items()
+                status = info.get("status", 500)
+                if 200 <= status < 300:
+                    success_count += 1
+                elif status == 429 and attempt < self.max_retries:
+                    retry_items.append(item)
+                else:
+                    errors.append(item_result)
+            if not retry_items:
+                break
+            items = retry_items
+        return success_count, errors
+
+
 class BulkActionItem:
     """A wrapper for documents to be processed via Elasticsearch's Bulk API.
     Collections of these objects can be passed to an ElasticDocumentAdapter's
@@ -1006,9 +1299,18 @@ class ElasticMultiplexAdapter(BaseAdapter):
     def iter_docs(self, *args, **kw):
         return self.primary.iter_docs(*args, **kw)
 
+    def msearch(self, *args, **kw):
+        return self.primary.msearch(*args, **kw)
+
     def scroll(self, *args, **kw):
         return self.primary.scroll(*args, **kw)
 
+    def search_after(self, *args, **kw):
+        return self.primary.search_after(*args, **kw)
+
+    def sliced_scroll(self, *args, **kw):
+        return self.primary.sliced_scroll(*args, **kw)
+
     def search(self, *args, **kw):
         return self.primary.search(*args, **kw)
 
@@ -1016,6 +1318,12 @@ class ElasticMultiplexAdapter(BaseAdapter):
     def bulk(self, actions, refresh=False, **kw):
         """Pass actions verbatim to primary. Convert delete actions to
         'index tombstone' actions and send to secondary."""
+        primary_actions, secondary_actions = self._split_bulk_actions(actions)
+        self.primary.bulk(primary_actions, refresh, **kw)
+        # don't refresh the secondary because we never read from it
+        self.secondary.bulk(secondary_actions, **kw)
+
+    def _split_bulk_actions(self, actions):
         primary_actions = []
         secondary_actions = []
         for action in actions:
@@ -1029,9 +1337,14 @@ class ElasticMultiplexAdapter(BaseAdapter):
                     doc_id = action.doc_id
                 action = BulkActionItem.index(Tombstone(doc_id))
             secondary_actions.append(action)
-        self.primary.bulk(primary_actions, refresh, **kw)
-        # don't refresh the secondary because we never read from it
-        self.secondary.bulk(secondary_actions, **kw)
+        return primary_actions, secondary_actions
+
+    def bulk_writer(self, refresh=False, **kw):
+        """Return a bulk writer that writes to the primary and secondary
+        adapters concurrently. Deletes are sent to the secondary as tombstones,
+        like ``bulk()``, and errors from both adapters are returned.
+        """
+        return _MultiplexBulkWriter(self, refresh, **kw)
 
     def delete(self, doc_id, refresh=False):
         """Delete on primary, index tombstone on secondary."""
@@ -1059,6 +1372,23 @@ class ElasticMultiplexAdapter(BaseAdapter):
         return None
 
 
+class _MultiplexBulkWriter:
+
+    def __init__(self, adapter, refresh=False, **kw):
+        self.adapter = adapter
+        self.primary = adapter.primary.bulk_writer(refresh, **kw)
+        # don't refresh the secondary because we never read from it
+        self.secondary = adapter.secondary.bulk_writer(**kw)
+
+    def write(self, actions):
+        primary_actions, secondary_actions = self.adapter._split_bulk_actions(actions)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            secondary = pool.submit(self.secondary.write, secondary_actions)
+            success_count, errors = self.primary.write(primary_actions)
+            secondary_errors = secondary.result()[1]
+        return success_count, errors + secondary_errors
+
+
 class Tombstone:
     """
     Used to create Tombstone documents in the secondary index when the document from primary index is deleted.
@@ -1106,6 +1436,14 @@ def _client_for_export():
     )
 
 
+def reset_export_client():
+    """Discard the export client so that a new one, with its own connections,
+    is created the next time it is used. Forked processes must do this before
+    querying if their parent has used the export client.
+    """
+    _client_for_export.reset_cache()
+
+
 def _client(**override_kw):
     """Configure an elasticsearch.Elasticsearch instance."""
     hosts = _elastic_hosts()
@@ -10,6 +10,12 @@ MAX_CLAUSE_COUNT = 1024
 SCROLL_KEEPALIVE = '5m'
 SCROLL_SIZE = 1000
 
+# Bulk write parameters (see `ElasticBulkWriter`)
+BULK_MAX_REQUEST_BYTES = 5 * 1024 * 1024
+BULK_MAX_IN_FLIGHT = 4
+BULK_MAX_RETRIES = 5
+BULK_RETRY_DELAY = 0.5  # seconds, doubled after each retry
+
 # index settings
 INDEX_CONF_REINDEX = {
     "index.refresh_interval": "1800s",
@@ -89,6 +89,8 @@ import json
 from collections import namedtuple
 from copy import deepcopy
 
+from django.conf import settings
+
 from memoized import memoized
 
 from corehq.elastic import (
@@ -96,10 +98,13 @@ from corehq.elastic import (
     run_query,
     count_query,
     scroll_query,
+    search_after_query,
+    sliced_scroll_query,
 )
 
 from . import aggregations, filters, queries
 from .const import SCROLL_SIZE, SIZE_LIMIT
+from .query_cache import get_cached_query_result
 from .utils import flatten_field_dict, values_list
 
 
@@ -134,6 +139,10 @@ class ESQuery(object):
     _size = None
     _aggregations = None
     _source = None
+    _search_after = False
+    _scroll_slices = None
+    # whether results may be cached, see corehq.apps.es.query_cache
+    cache_results = False
     default_filters = {
         "match_all": filters.match_all()
     }
@@ -198,31 +207,78 @@ class ESQuery(object):
 
     def run(self):
         """Actually run the query.  Returns an ESQuerySet object."""
-        raw = run_query(
+        raw_query = self.raw_query
+        raw = get_cached_query_result(self, raw_query, 'search', lambda: run_query(
             self.index,
-            self.raw_query,
+            raw_query,
             for_export=self.for_export,
-        )
+        ))
         return ESQuerySet(raw, deepcopy(self))
 
     def scroll(self):
         """
         Run the query against the scroll api. Returns an iterator yielding each
         document that matches the query.
+
+        See ``use_search_after`` and ``sliced`` for alternatives to a single
+        scroll context.
         """
         if self.uses_aggregations():
             raise InvalidQueryError(
                 "aggregation scroll queries will yield invalid hits if the "
                 "scroll requires more than one request."
             )
+        raw_query = self._get_scroll_query()
+        if self._scroll_slices and _supports_slices_and_search_after():
+            result = sliced_scroll_query(self.index, raw_query, self._scroll_slices,
+                                         for_export=self.for_export)
+        elif self._search_after and _supports_slices_and_search_after():
+            result = search_after_query(self.index, raw_query, for_export=self.for_export)
+        else:
+            result = scroll_query(self.index, raw_query, for_export=self.for_export)
+        for r in result:
+            yield ESQuerySet.normalize_result(self, r)
+
+    def _get_scroll_query(self):
         raw_query = self.raw_query
         raw_query["size"] = SCROLL_SIZE if self._size is None else self._size
         # The '_assemble()' method sets size=SIZE_LIMIT when no query size is
         # configured, and overrides that with size=0 for aggregation queries,
         # neither of which are acceptable for a scroll query.
-        result = scroll_query(self.index, raw_query, for_export=self.for_export)
-        for r in result:
-            yield ESQuerySet.normalize_result(self, r)
+        return raw_query
+
+    def use_search_after(self):
+        """
+        Make ``scroll()`` page through results with ``search_after`` rather
+        than holding a scroll context open on the cluster. Has no effect on
+        Elasticsearch versions before 5.
+        """
+        query = deepcopy(self)
+        query._search_after = True
+        return query
+
+    def sliced(self, slices):
+        """
+        Make ``scroll()`` split the scroll into ``slices`` that are fetched
+        in parallel. Results are then not returned in sort order. Has no
+        effect on Elasticsearch versions before 5.
+        """
+        query = deepcopy(self)
+        query._scroll_slices = slices
+        return query
+
+    def search_after(self, after=None):
+        """
+        Run the query with ``search_after`` paging. Returns an iterable
+        ``ESQueryCursor`` whose ``after`` token can be saved to resume the
+        iteration later, with the same query, after the last result seen.
+        Requires Elasticsearch 5 or later.
+        """
+        if self.uses_aggregations():
+            raise InvalidQueryError("aggregation queries cannot be paged with search_after")
+        cursor = search_after_query(self.index, self._get_scroll_query(), after=after,
+                                    for_export=self.for_export)
+        return ESQueryCursor(self, cursor)
 
     @property
     def _filters(self):
@@ -462,7 +518,14 @@ class ESQuery(object):
         return values_list(hits, *fields, **kwargs)
 
     def count(self):
-        return count_query(self.index, self.raw_query)
+        raw_query = self.raw_query
+        return get_cached_query_result(self, raw_query, 'count', lambda: count_query(self.index, raw_query))
+
+    def uncached(self):
+        """Don't use cached results for this query (see ``query_cache``)"""
+        query = deepcopy(self)
+        query.cache_results = False
+        return query
 
     def get_ids(self):
         """Performs a minimal query to get the ids of the matching documents
@@ -475,6 +538,30 @@ class ESQuery(object):
         return self.exclude_source().scroll()
 
 
+class ESQueryCursor(object):
+    """
+    The object returned from ``ESQuery.search_after``. Yields each document
+    that matches the query, like ``ESQuery.scroll``.
+    """
+
+    def __init__(self, query, cursor):
+        self.query = query
+        self._cursor = cursor
+
+    @property
+    def after(self):
+        """Token to resume after the last result yielded"""
+        return self._cursor.after
+
+    def __iter__(self):
+        for r in self._cursor:
+            yield ESQuerySet.normalize_result(self.query, r)
+
+
+def _supports_slices_and_search_after():
+    return settings.ELASTICSEARCH_MAJOR_VERSION >= 5
+
+
 class ESQuerySet(object):
     """
     The object returned from ``ESQuery.run``
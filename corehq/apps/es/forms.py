@@ -14,6 +14,7 @@ from .transient_util import get_adapter_mapping, from_dict_with_possible_id
 
 class FormES(HQESQuery):
     index = 'forms'
+    cache_results = True
     default_filters = {
         'is_xform_instance': filters.term("doc_type", "xforminstance"),
         'has_xmlns': filters.exists("xmlns"),
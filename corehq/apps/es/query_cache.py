@@ -0,0 +1,137 @@
+"""
+ESQuery result cache
+--------------------
+
+When ``settings.ES_QUERY_CACHE_TIMEOUT`` is set, the results of
+``ESQuery.run()`` and ``ESQuery.count()`` are cached for that many seconds
+for query builders with ``cache_results = True`` (e.g. ``FormES``,
+``CaseES`` and ``UserES``). A single query opts out with
+``query.uncached()``.
+
+Results are only cached for queries filtered by domain. They are keyed by
+the query JSON, the index, and the generation of each of the query's
+domains in that index. The pillows that write to an index bump the
+generation of the domains of the documents they write (see
+``invalidate_es_query_cache``), so cached results are not used after a
+write to one of their domains. Results are not cached for a short time
+after a write, until the index has been refreshed and the write is
+visible to searches.
+
+Writes that do not go through a pillow are not tracked, so cached results
+can be up to ``ES_QUERY_CACHE_TIMEOUT`` seconds out of date after them.
+Results larger than ``ES_QUERY_CACHE_MAX_RESULT_BYTES`` are not cached and
+other entries are evicted by the cache backend when it is full.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from corehq.util.metrics import metrics_counter
+
+ES_QUERY_CACHE_MAX_RESULT_BYTES = 256 * 1024
+# seconds after a write before results for its domain are cached again,
+# longer than the index refresh interval (see INDEX_CONF_STANDARD)
+ES_QUERY_CACHE_WRITE_DELAY = 10
+DOMAIN_FIELDS = {'domain', 'domain.exact', 'domain_memberships.domain.exact'}
+
+
+def get_cached_query_result(query, raw_query, kind, run):
+    """
+    Return the result of ``run()``, the ``kind`` of request ("search" or
+    "count") made for the ESQuery ``query``, from the cache if possible.
+    """
+    timeout = settings.ES_QUERY_CACHE_TIMEOUT
+    if not (timeout and query.cache_results):
+        return run()
+    domains = get_query_domains(query.filters)
+    if not domains:
+        return run()
+
+    alias = _get_index_alias(query.index)
+    generation_keys = [_generation_key(alias)] + [_generation_key(alias, domain) for domain in sorted(domains)]
+    generations = cache.get_many(generation_keys)
+    if any(time.time() - generation < ES_QUERY_CACHE_WRITE_DELAY for generation in generations.values()):
+        _record_query_cache(query, 'recent_write')
+        return run()
+
+    key = 'es-query:' + hashlib.sha1(json.dumps(
+        [alias, kind, raw_query, [generations.get(key) for key in generation_keys]],
+        sort_keys=True,
+        default=str,  # filters may hold dates, which the ES client serializes itself
+    ).encode('utf-8')).hexdigest()
+    result = cache.get(key)
+    if result is not None:
+        _record_query_cache(query, 'hit')
+        return result
+
+    _record_query_cache(query, 'miss')
+    result = run()
+    if len(json.dumps(result)) <= ES_QUERY_CACHE_MAX_RESULT_BYTES:
+        cache.set(key, result, timeout)
+    return result
+
+
+def invalidate_es_query_cache(index_alias, domains):
+    """
+    Stop using cached results for the given domains of the index.
+
+    :param domains: Domains of the documents written to the index. ``None``
+    invalidates the results for all domains.
+    """
+    timeout = settings.ES_QUERY_CACHE_TIMEOUT
+    if not timeout:
+        return
+    now = time.time()
+    # Generations outlive the results cached with them, so results cached
+    # before a write can't be used again after its generation expires.
+    cache.set_many({
+        _generation_key(index_alias, domain): now for domain in set(domains)
+    }, timeout * 2)
+
+
+def get_query_domains(filters):
+    """
+    Return the domains that the filters of a query limit it to, or None if
+    they don't limit the domain.
+    """
+    domains = set()
+    for filter_ in filters:
+        domains.update(_get_filter_domains(filter_) or [])
+    return domains or None
+
+
+def _get_filter_domains(filter_):
+    if not isinstance(filter_, dict) or len(filter_) != 1:
+        return None
+    (key, value), = filter_.items()
+    if key in ('term', 'terms') and isinstance(value, dict) and len(value) == 1:
+        (field, domains), = value.items()
+        if field in DOMAIN_FIELDS:
+            return set(domains) if isinstance(domains, (list, tuple)) else {domains}
+    elif key == 'bool' and set(value) == {'should'}:
+        # OR: all of the filters must be limited by domain
+        should_domains = [_get_filter_domains(should) for should in value['should']]
+        if should_domains and all(should_domains):
+            return set().union(*should_domains)
+    elif key == 'bool' and set(value) == {'filter'}:
+        # AND
+        return get_query_domains(value['filter'])
+    return None
+
+
+def _get_index_alias(index_cname):
+    from corehq.apps.es.transient_util import index_info_from_cname
+    return index_info_from_cname(index_cname).alias
+
+
+def _generation_key(index_alias, domain=None):
+    if domain is None:
+        return f'es-query-generation:{index_alias}'
+    return f'es-query-generation:{index_alias}:{domain}'
+
+
+def _record_query_cache(query, result):
+    metrics_counter('commcare.es.query_cache', tags={'index': query.index, 'result': result})
@@ -28,6 +28,7 @@ from .utils import (
 from ..client import (
     BaseAdapter,
     BulkActionItem,
+    ElasticBulkWriter,
     ElasticMultiplexAdapter,
     Tombstone,
     get_client,
@@ -1461,6 +1462,156 @@ class TestElasticDocumentAdapterWithoutRequests(SimpleTestCase):
         self.adapter._fix_hits_in_result(result)
         self.assertEqual(expected, result)
 
+    def test__get_search_after_sort(self):
+        with patch_elastic_version(self.adapter, "5.6.16"):
+            self.assertEqual(
+                self.adapter._get_search_after_sort([{"received_on": {"order": "asc"}}]),
+                [{"received_on": {"order": "asc"}}, {"_uid": "asc"}],
+            )
+            self.assertEqual(self.adapter._get_search_after_sort("_doc"), [{"_uid": "asc"}])
+            self.assertEqual(self.adapter._get_search_after_sort([{"_uid": "desc"}]), [{"_uid": "desc"}])
+        with patch_elastic_version(self.adapter, "6.8.23"):
+            self.assertEqual(self.adapter._get_search_after_sort(None), [{"_id": "asc"}])
+
+    def _search_pages(self, *pages):
+        results = [
+            {"_shards": {"failed": 0}, "hits": {"hits": [
+                {"_id": doc_id, "_source": {}, "sort": [doc_id]} for doc_id in page
+            ]}}
+            for page in pages
+        ]
+        return patch.object(self.adapter, "_search", side_effect=results)
+
+    def test_search_after(self):
+        with patch_elastic_version(self.adapter, "5.6.16"), \
+                self._search_pages(["a", "b"], ["c", "d"], []) as search:
+            cursor = self.adapter.search_after({"sort": "_doc"}, size=2)
+            self.assertEqual([hit["_id"] for hit in cursor], ["a", "b", "c", "d"])
+        self.assertEqual(cursor.after, ["d"])
+        queries = [call.args[0] for call in search.call_args_list]
+        self.assertEqual(queries[0], {"sort": [{"_uid": "asc"}], "size": 2})
+        self.assertEqual(queries[1]["search_after"], ["b"])
+        self.assertEqual(queries[2]["search_after"], ["d"])
+
+    def test_search_after_stops_on_short_page(self):
+        with patch_elastic_version(self.adapter, "5.6.16"), \
+                self._search_pages(["a", "b"], ["c"]) as search:
+            hits = list(self.adapter.search_after({}, size=2))
+        self.assertEqual([hit["_id"] for hit in hits], ["a", "b", "c"])
+        self.assertEqual(search.call_count, 2)
+
+    def test_search_after_resumes(self):
+        with patch_elastic_version(self.adapter, "5.6.16"), self._search_pages(["c"]) as search:
+            list(self.adapter.search_after({}, size=2, after=["b"]))
+        self.assertEqual(search.call_args.args[0]["search_after"], ["b"])
+
+    def test_search_after_ambiguous_size_raises(self):
+        with self.assertRaises(ValueError):
+            self.adapter.search_after({"size": 1}, size=1)
+
+    def test_msearch(self):
+        results = {"responses": [
+            {"_shards": {"failed": 0}, "hits": {"hits": [{"_id": "a", "_source": {}}]}},
+            {"_shards": {"failed": 0}, "hits": {"hits": []}},
+        ]}
+        with patch.object(self.adapter, "_msearch", return_value=results) as msearch:
+            first, second = self.adapter.msearch([{"size": 1}, {"size": 2}])
+        self.assertEqual(first["hits"]["hits"], [{"_id": "a", "_source": {"_id": "a"}}])
+        self.assertEqual(second["hits"]["hits"], [])
+        msearch.assert_called_once_with([{}, {"size": 1}, {}, {"size": 2}])
+
+    def test_msearch_raises_search_error(self):
+        results = {"responses": [{"error": "bad query"}]}
+        with patch.object(self.adapter, "_msearch", return_value=results), \
+                self.assertRaises(ESError):
+            self.adapter.msearch([{}])
+
+    def test_sliced_scroll(self):
+        def scroll(query, scroll, size):
+            slice_id = query["slice"]["id"]
+            for page in range(2):
+                yield {"_shards": {"failed": 0}, "hits": {"hits": [
+                    {"_id": f"{slice_id}-{page}-{i}", "_source": {}} for i in range(3)
+                ]}}
+
+        with patch.object(self.adapter, "_scroll", side_effect=scroll) as patched:
+            hits = list(self.adapter.sliced_scroll({}, slices=3, size=3))
+        self.assertEqual(
+            sorted(hit["_id"] for hit in hits),
+            sorted(f"{s}-{p}-{i}" for s in range(3) for p in range(2) for i in range(3)),
+        )
+        self.assertEqual(
+            sorted(call.args[0]["slice"]["id"] for call in patched.call_args_list),
+            [0, 1, 2],
+        )
+
+    def test_sliced_scroll_raises_slice_failure(self):
+        def scroll(query, scroll, size):
+            yield {"_shards": {"failed": query["slice"]["id"]}, "hits": {"hits": []}}
+
+        with patch.object(self.adapter, "_scroll", side_effect=scroll):
+            with self.assertRaises(ESShardFailure):
+                list(self.adapter.sliced_scroll({}, slices=2))
+
+
+class TestElasticBulkWriter(SimpleTestCase):
+
+    adapter = adapter_with_extras
+
+    def _bulk_results(self, *statuses):
+        return [
+            {"items": [{"index": {"_id": "x", "status": status}} for status in request]}
+            for request in statuses
+        ]
+
+    def _write(self, actions, results, **kw):
+        writer = self.adapter.bulk_writer(retry_delay=0, **kw)
+        with patch.object(self.adapter._es, "bulk", side_effect=results) as bulk:
+            return writer.write(actions), [call.args[0] for call in bulk.call_args_list]
+
+    def test_requests_sized_by_bytes(self):
+        docs = [TestDoc(str(i), "x" * 100) for i in range(5)]
+        actions = [BulkActionItem.index(doc) for doc in docs]
+        results = self._bulk_results([201, 201], [201, 201], [201])
+        request, = self.adapter.bulk_writer()._iter_requests(actions[:1])
+        max_bytes = len(request[0].encode("utf-8")) * 2 + 1
+        (success, errors), bodies = self._write(actions, results, max_bytes=max_bytes, max_in_flight=1)
+        self.assertEqual((success, errors), (5, []))
+        self.assertEqual([body.count("\n") for body in bodies], [4, 4, 2])
+        self.assertTrue(all(len(body.encode("utf-8")) <= max_bytes for body in bodies))
+        action, source = bodies[0].splitlines()[:2]
+        self.assertEqual(json.loads(action), {"index": {
+            "_index": self.adapter.index_name, "_type": self.adapter.type, "_id": "0",
+        }})
+        self.assertEqual(json.loads(source)["value"], "x" * 100)
+
+    def test_rejected_items_retried(self):
+        actions = [BulkActionItem.index(TestDoc(str(i), "test")) for i in range(3)]
+        results = self._bulk_results([201, 429, 400], [201])
+        (success, errors), bodies = self._write(actions, results)
+        self.assertEqual(success, 2)
+        self.assertEqual(errors, [{"index": {"_id": "x", "status": 400}}])
+        self.assertEqual(bodies[1].splitlines(), bodies[0].splitlines()[2:4])
+
+    def test_rejected_items_fail_after_retries(self):
+        actions = [BulkActionItem.index(TestDoc("1", "test"))]
+        results = self._bulk_results([429], [429])
+        (success, errors), bodies = self._write(actions, results, max_retries=1)
+        self.assertEqual((success, errors), (0, [{"index": {"_id": "x", "status": 429}}]))
+        self.assertEqual(len(bodies), 2)
+
+    def test_rejected_request_retried(self):
+        actions = [BulkActionItem.delete_id("1")]
+        results = [TransportError(429, "es_rejected_execution_exception")] + self._bulk_results([200])
+        (success, errors), bodies = self._write(actions, results)
+        self.assertEqual((success, errors), (1, []))
+        self.assertEqual(bodies[0], bodies[1])
+
+    def test_failed_request_raises(self):
+        actions = [BulkActionItem.delete_id("1")]
+        with self.assertRaises(TransportError):
+            self._write(actions, [TransportError(500, "error")])
+
 
 @es_test
 class TestBulkActionItem(SimpleTestCase):
@@ -1617,6 +1768,11 @@ class TestElasticMultiplexAdapter(SimpleTestCase, ESTestHelpers):
             self.adapter.iter_docs(self.ARG, keyword=self.VALUE)
         self.assert_passthru_primary_only(*mocks, self.ARG, keyword=self.VALUE)
 
+    def test_msearch(self):
+        with patch_adapters_method(self.adapter, "msearch") as mocks:
+            self.adapter.msearch(self.ARG, keyword=self.VALUE)
+        self.assert_passthru_primary_only(*mocks, self.ARG, keyword=self.VALUE)
+
     def test_scroll(self):
         with patch_adapters_method(self.adapter, "scroll") as mocks:
             self.adapter.scroll(self.ARG, keyword=self.VALUE)
@@ -1657,6 +1813,26 @@ class TestElasticMultiplexAdapter(SimpleTestCase, ESTestHelpers):
         tombstone_ids = [tombstone_obj.doc.id for tombstone_obj in s_mock.call_args.args[0]]
         self.assertEqual(doc_ids, tombstone_ids)
 
+    def test_bulk_writer(self):
+        docs = [self._make_doc() for x in range(2)]
+        bulk_actions = [BulkActionItem.index(docs[0]), BulkActionItem.delete(docs[1])]
+        p_error = {"index": {"_id": docs[0].id, "status": 400}}
+        s_error = {"index": {"_id": docs[1].id, "status": 400}}
+        with patch.object(ElasticBulkWriter, "write", autospec=True,
+                          side_effect=lambda writer, actions: (1, [
+                              p_error if writer.adapter is self.adapter.primary else s_error
+                          ])) as write:
+            result = self.adapter.bulk_writer().write(bulk_actions)
+
+        self.assertEqual(result, (1, [p_error, s_error]))
+        writes = {call.args[0].adapter: call.args[1] for call in write.call_args_list}
+        self.assertEqual(writes[self.adapter.primary], bulk_actions)
+        # Secondary index creates tombstones for deleted docs
+        s_actions = writes[self.adapter.secondary]
+        self.assertIs(s_actions[0], bulk_actions[0])
+        self.assertEqual(s_actions[1].doc.id, docs[1].id)
+        self.assertIsInstance(s_actions[1].doc, Tombstone)
+
     def test_delete(self):
         doc_id = self._make_doc().id
         with (
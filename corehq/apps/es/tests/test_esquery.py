@@ -1,6 +1,6 @@
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, override_settings
 
 from corehq.apps.es import filters, forms, users
 from corehq.apps.es.const import SCROLL_SIZE, SIZE_LIMIT
@@ -319,6 +319,38 @@ class TestESQuery(ElasticTestMixin, SimpleTestCase):
         with self.assertRaises(InvalidQueryError):
             list(query.scroll())
 
+    @override_settings(ELASTICSEARCH_MAJOR_VERSION=5)
+    def test_scroll_use_search_after(self):
+        query = HQESQuery('forms').size(10).use_search_after()
+        with patch("corehq.apps.es.es_query.search_after_query", return_value=[]) as search_after_query, \
+                patch("corehq.apps.es.es_query.scroll_query") as scroll_query:
+            list(query.scroll_ids())
+        self.assertEqual(search_after_query.call_args.args[1]["size"], 10)
+        scroll_query.assert_not_called()
+
+    @override_settings(ELASTICSEARCH_MAJOR_VERSION=5)
+    def test_scroll_sliced(self):
+        query = HQESQuery('forms').sliced(4)
+        with patch("corehq.apps.es.es_query.sliced_scroll_query", return_value=[]) as sliced_scroll_query:
+            list(query.scroll())
+        self.assertEqual(sliced_scroll_query.call_args.args[2], 4)
+
+    @override_settings(ELASTICSEARCH_MAJOR_VERSION=2)
+    def test_scroll_falls_back_before_es5(self):
+        query = HQESQuery('forms').use_search_after().sliced(4)
+        with patch("corehq.apps.es.es_query.scroll_query", return_value=[]) as scroll_query:
+            list(query.scroll())
+        scroll_query.assert_called_once()
+
+    def test_search_after_cursor(self):
+        cursor = MagicMock(after=['b'])
+        cursor.__iter__.return_value = iter([{'_id': 'a'}, {'_id': 'b'}])
+        with patch("corehq.apps.es.es_query.search_after_query", return_value=cursor) as search_after_query:
+            result = HQESQuery('forms').exclude_source().search_after(after=['a'])
+            self.assertEqual(list(result), ['a', 'b'])
+        self.assertEqual(result.after, ['b'])
+        self.assertEqual(search_after_query.call_args.kwargs['after'], ['a'])
+
     def _scroll_query_mock_assert(self, **raw_query_assertions):
         def scroll_query_tester(index, raw_query, **kw):
             for key, value in raw_query_assertions.items():
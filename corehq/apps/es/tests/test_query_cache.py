@@ -0,0 +1,96 @@
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from corehq.apps.es import filters
+from corehq.apps.es.forms import FormES
+from corehq.apps.es.query_cache import (
+    get_cached_query_result,
+    get_query_domains,
+    invalidate_es_query_cache,
+)
+from corehq.apps.es.users import UserES
+
+locmem_cache = caches['locmem']
+
+
+class TestGetQueryDomains(SimpleTestCase):
+
+    def test_domain(self):
+        self.assertEqual(get_query_domains(FormES().domain('test').filters), {'test'})
+
+    def test_domains(self):
+        query = FormES().domain(['test', 'other']).xmlns('xmlns')
+        self.assertEqual(get_query_domains(query.filters), {'test', 'other'})
+
+    def test_user_domains(self):
+        self.assertEqual(get_query_domains(UserES().domain('test').filters), {'test'})
+
+    def test_no_domain(self):
+        self.assertIsNone(get_query_domains(FormES().xmlns('xmlns').filters))
+
+    def test_or_without_domain(self):
+        query = FormES().filter(filters.OR(filters.term('domain.exact', 'test'), filters.term('xmlns', 'x')))
+        self.assertIsNone(get_query_domains(query.filters))
+
+
+@override_settings(ES_QUERY_CACHE_TIMEOUT=60)
+@patch('corehq.apps.es.query_cache.cache', locmem_cache)
+@patch('corehq.apps.es.query_cache._get_index_alias', lambda index: index)
+@patch('corehq.apps.es.query_cache.ES_QUERY_CACHE_WRITE_DELAY', 0)
+class TestGetCachedQueryResult(SimpleTestCase):
+
+    def setUp(self):
+        locmem_cache.clear()
+
+    def _run(self, query, result=None):
+        run = Mock(return_value=result or {'hits': {'total': 1}})
+        return get_cached_query_result(query, query.raw_query, 'search', run), run.call_count
+
+    def test_cached(self):
+        query = FormES().domain('test')
+        self.assertEqual(self._run(query), ({'hits': {'total': 1}}, 1))
+        self.assertEqual(self._run(query, {'hits': {'total': 2}}), ({'hits': {'total': 1}}, 0))
+
+    def test_query_with_dates(self):
+        query = FormES().domain('test').filter(filters.range_filter('received_on', gte=datetime(2020, 1, 1)))
+        self._run(query)
+        self.assertEqual(self._run(query), ({'hits': {'total': 1}}, 0))
+        later = FormES().domain('test').filter(filters.range_filter('received_on', gte=datetime(2020, 1, 2)))
+        self.assertEqual(self._run(later), ({'hits': {'total': 1}}, 1))
+
+    def test_invalidated_by_write(self):
+        query = FormES().domain('test')
+        self._run(query)
+        invalidate_es_query_cache(query.index, ['test'])
+        self.assertEqual(self._run(query, {'hits': {'total': 2}}), ({'hits': {'total': 2}}, 1))
+
+    def test_not_invalidated_by_write_to_other_domain(self):
+        query = FormES().domain('test')
+        self._run(query)
+        invalidate_es_query_cache(query.index, ['other'])
+        self.assertEqual(self._run(query), ({'hits': {'total': 1}}, 0))
+
+    def test_invalidated_for_all_domains(self):
+        query = FormES().domain('test')
+        self._run(query)
+        invalidate_es_query_cache(query.index, [None])
+        self.assertEqual(self._run(query), ({'hits': {'total': 1}}, 1))
+
+    def test_uncached(self):
+        query = FormES().domain('test').uncached()
+        self._run(query)
+        self.assertEqual(self._run(query), ({'hits': {'total': 1}}, 1))
+
+    def test_without_domain(self):
+        query = FormES().xmlns('xmlns')
+        self._run(query)
+        self.assertEqual(self._run(query), ({'hits': {'total': 1}}, 1))
+
+    @override_settings(ES_QUERY_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        query = FormES().domain('test')
+        self._run(query)
+        self.assertEqual(self._run(query), ({'hits': {'total': 1}}, 1))
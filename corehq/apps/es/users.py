@@ -32,6 +32,7 @@ from .transient_util import get_adapter_mapping, from_dict_with_possible_id
 
 class UserES(HQESQuery):
     index = 'users'
+    cache_results = True
     default_filters = {
         'not_deleted': filters.term("base_doc", "couchuser"),
         'active': filters.term("is_active", True),
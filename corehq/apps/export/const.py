@@ -2,6 +2,8 @@
 Some of these constants correspond to constants set in corehq/apps/export/static/export/js/const.js
 so if changing a value, ensure that both places reflect the change
 """
+from datetime import timedelta
+
 from couchexport.deid import deid_date, deid_ID
 
 from corehq.apps.export.transforms import (
@@ -99,6 +101,13 @@ FORM_EXPORT = 'form'
 CASE_EXPORT = 'case'
 SMS_EXPORT = 'sms'
 MAX_EXPORTABLE_ROWS = 100000
+# number of rows of a table that are written to an export at once
+EXPORT_WRITE_BLOCK_SIZE = 1000
+# documents indexed within this time before an incremental rebuild started
+# have their rows generated again by the next rebuild
+INCREMENTAL_EXPORT_CHECKPOINT_MARGIN = timedelta(hours=1)
+# how often incrementally rebuilt exports generate the rows of all documents
+INCREMENTAL_EXPORT_MAX_AGE = timedelta(days=7)
 CASE_SCROLL_SIZE = 10000
 
 # When a question is missing completely from a form/case this should be the value
@@ -1,5 +1,6 @@
 import contextlib
 import datetime
+import shutil
 import sys
 import time
 from collections import Counter
@@ -9,18 +10,33 @@ from couchdbkit import ResourceConflict
 from corehq.util.metrics import metrics_counter, metrics_track_errors
 from couchexport.export import FormattedRow, get_writer
 from couchexport.models import Format
+from dimagi.utils.chunked import chunked
 from dimagi.utils.logging import notify_exception
 from soil import DownloadBase
 
-from corehq.apps.export.const import MAX_EXPORTABLE_ROWS
+from corehq.apps.es.filters import date_range
+from corehq.apps.export.const import (
+    CASE_EXPORT,
+    EXPORT_WRITE_BLOCK_SIZE,
+    FORM_EXPORT,
+    INCREMENTAL_EXPORT_CHECKPOINT_MARGIN,
+    INCREMENTAL_EXPORT_MAX_AGE,
+    MAX_EXPORTABLE_ROWS,
+)
 from corehq.apps.export.dbaccessors import get_properly_wrapped_export_instance
 from corehq.apps.export.models.new import (
     CaseExportInstance,
+    ExportRow,
     FormExportInstance,
     SMSExportInstance,
 )
-from corehq.elastic import iter_es_docs_from_query
-from corehq.toggles import PAGINATED_EXPORTS
+from corehq.apps.export.row_index import (
+    ExportRowIndex,
+    get_row_index_config_hash,
+    renumber_row,
+)
+from corehq.elastic import doc_adapter_from_cname, iter_es_docs_from_query
+from corehq.toggles import INCREMENTAL_DAILY_SAVED_EXPORTS, PAGINATED_EXPORTS
 from corehq.util.metrics.load_counters import load_counter
 from corehq.util.files import TransientTempfile, safe_filename
 from soil.progress import TaskProgressManager
@@ -74,11 +90,16 @@ class _ExportWriter(object):
             # open the ExportWriter
             headers = []
             table_titles = {}
+            column_types = {}
             for instance_index, instance in enumerate(export_instances):
                 headers += [
                     (t, (t.get_headers(split_columns=instance.split_multiselects),))
                     for t in instance.selected_tables
                 ]
+                column_types.update(
+                    (t, t.get_datatypes(split_columns=instance.split_multiselects))
+                    for t in instance.selected_tables
+                )
                 for table_index, table in enumerate(instance.selected_tables):
                     sheet_name = table.label or "Sheet{}".format(table_index + 1)
                     # If it's a bulk export and the sheet has the same name as another sheet,
@@ -89,7 +110,8 @@ class _ExportWriter(object):
                             sheet_name
                         )
                     table_titles[table] = sheet_name
-            self.writer.open(headers, file, table_titles=table_titles, archive_basepath=name)
+            self.writer.open(headers, file, table_titles=table_titles, archive_basepath=name,
+                             column_types=column_types)
             try:
                 yield
             finally:
@@ -102,13 +124,25 @@ class _ExportWriter(object):
         :param table: A TableConfiguration
         :param row: An ExportRow
         """
+        return self.write_rows(table, [row])
+
+    def write_rows(self, table, rows):
+        """
+        Write the given rows to the given table of the export.
+        _Writer must be opened first.
+        :param table: A TableConfiguration
+        :param rows: A list of ExportRows
+        """
         return self.writer.write([
-            (table, [FormattedRow(
-                data=row.data,
-                hyperlink_column_indices=row.hyperlink_column_indices,
-                skip_excel_formatting=row.skip_excel_formatting
-                if hasattr(row, 'skip_excel_formatting') else ()
-            )])
+            (table, [
+                FormattedRow(
+                    data=row.data,
+                    hyperlink_column_indices=row.hyperlink_column_indices,
+                    skip_excel_formatting=row.skip_excel_formatting
+                    if hasattr(row, 'skip_excel_formatting') else ()
+                )
+                for row in rows
+            ])
         ])
 
     def get_preview(self):
@@ -135,6 +169,7 @@ class _PaginatedExportWriter(object):
 
         self.name = self._get_name(export_instances)
         self.headers = self._get_headers(export_instances)
+        self.column_types = self._get_column_types(export_instances)
         self.table_names = self._get_table_names(export_instances)
 
         with open(self.path, 'wb') as file_handle:
@@ -142,7 +177,8 @@ class _PaginatedExportWriter(object):
                 self._get_paginated_headers().items(),
                 file_handle,
                 table_titles=self._get_paginated_table_titles(),
-                archive_basepath=self.name
+                archive_basepath=self.name,
+                column_types=self._get_paginated_column_types(),
             )
             try:
                 yield
@@ -176,6 +212,19 @@ class _PaginatedExportWriter(object):
 
         return headers
 
+    def _get_column_types(self, export_instances):
+        """
+        Returns a dictionary that maps all TableConfigurations in the list of ExportInstances to an
+        array of column datatypes, like _get_headers
+        """
+        column_types = {}
+        for instance in export_instances:
+            for table in instance.selected_tables:
+                column_types[table] = table.get_datatypes(
+                    split_columns=instance.split_multiselects
+                )
+        return column_types
+
     def _get_table_names(self, export_instances):
         '''
         Returns a dictionary that maps all TableConfigurations in the list of ExportInstances to a
@@ -223,6 +272,9 @@ class _PaginatedExportWriter(object):
         '''
         return {self._paged_table_index(table): (headers,) for table, headers in self.headers.items()}
 
+    def _get_paginated_column_types(self):
+        return {self._paged_table_index(table): types for table, types in self.column_types.items()}
+
     def _get_paginated_table_titles(self):
         '''
         Maps the table titles to tables titles with their page count
@@ -251,16 +303,31 @@ class _PaginatedExportWriter(object):
         :param table: A TableConfiguration
         :param row: An ExportRow
         """
-        if self.rows_written[table] >= MAX_EXPORTABLE_ROWS * (self.pages[table] + 1):
-            self.pages[table] += 1
-            self.writer.add_table(
-                self._paged_table_index(table),
-                self._get_paginated_headers()[self._paged_table_index(table)][0],
-                table_title=self._get_paginated_table_titles()[self._paged_table_index(table)],
-            )
+        self.write_rows(table, [row])
 
-        self.writer.write([(self._paged_table_index(table), [FormattedRow(data=row.data)])])
-        self.rows_written[table] += 1
+    def write_rows(self, table, rows):
+        """
+        Write the given rows to the given table of the export, adding
+        tables as each one fills up.
+        :param table: A TableConfiguration
+        :param rows: A list of ExportRows
+        """
+        while rows:
+            if self.rows_written[table] >= MAX_EXPORTABLE_ROWS * (self.pages[table] + 1):
+                self.pages[table] += 1
+                self.writer.add_table(
+                    self._paged_table_index(table),
+                    self._get_paginated_headers()[self._paged_table_index(table)][0],
+                    table_title=self._get_paginated_table_titles()[self._paged_table_index(table)],
+                    column_types=self.column_types[table],
+                )
+
+            page_size = MAX_EXPORTABLE_ROWS * (self.pages[table] + 1) - self.rows_written[table]
+            page_rows, rows = rows[:page_size], rows[page_size:]
+            self.writer.write([
+                (self._paged_table_index(table), [FormattedRow(data=row.data) for row in page_rows])
+            ])
+            self.rows_written[table] += len(page_rows)
 
 
 def get_export_writer(export_instances, temp_path, allow_pagination=True):
@@ -353,47 +420,193 @@ def write_export_instance(writer, export_instance, documents, progress_tracker=N
             progress_manager.set_progress(0, documents.count)
 
         start = _time_in_milliseconds()
-        total_bytes = 0
-        total_rows = 0
         track_load = load_counter(export_instance.type, "export", export_instance.domain)
 
-        for row_number, doc in enumerate(documents):
-            total_bytes += sys.getsizeof(doc)
-            for table in export_instance.selected_tables:
-                try:
-                    rows = table.get_rows(
-                        doc,
-                        row_number,
-                        split_columns=export_instance.split_multiselects,
-                        transform_dates=export_instance.transform_dates,
-                    )
-                except Exception as e:
-                    notify_exception(None, "Error exporting doc", details={
-                        'domain': export_instance.domain,
-                        'export_instance_id': export_instance.get_id,
-                        'export_table': table.label,
-                        'doc_id': doc.get('_id'),
-                    })
-                    e.sentry_capture = False
-                    raise
-
-                for row in rows:
-                    # It might be bad to write one row at a time from a performance perspective.
-                    # Regardless, we should handle the batching of rows in the _Writer class, not here.
-                    writer.write(table, row)
-
-                total_rows += len(rows)
-
+        def document_written(row_number):
             track_load()
             if progress_tracker:
                 progress_manager.set_progress(row_number + 1, documents.count)
 
+        total_bytes, total_rows = write_export_documents(writer, export_instance, documents, document_written)
+
     end = _time_in_milliseconds()
     tags = {'format': writer.format}
     _record_datadog_export_duration(end - start, total_bytes, total_rows, tags)
     _record_export_duration(end - start, export_instance)
 
 
+def write_export_documents(writer, export_instance, documents, document_written=None):
+    """
+    Write the rows of each table of the export instance for the given
+    documents to the given open _Writer.
+
+    The tables' column paths are worked out once for all documents and
+    rows are handed to the writer in blocks of EXPORT_WRITE_BLOCK_SIZE.
+
+    :param document_written: Called with the row number of each document
+    after its rows are generated.
+    :returns: Tuple ``(total_bytes, total_rows)``
+    """
+    total_bytes = 0
+    total_rows = 0
+    extractors = _get_export_row_extractors(export_instance)
+    pending_rows = [[] for table in extractors]
+
+    for row_number, doc in enumerate(documents):
+        total_bytes += sys.getsizeof(doc)
+        for table_index, (table, extractor) in enumerate(extractors):
+            rows = _get_document_rows(export_instance, table, extractor, doc, row_number)
+            pending = pending_rows[table_index]
+            pending.extend(rows)
+            if len(pending) >= EXPORT_WRITE_BLOCK_SIZE:
+                writer.write_rows(table, pending)
+                pending_rows[table_index] = []
+
+            total_rows += len(rows)
+
+        if document_written is not None:
+            document_written(row_number)
+
+    for (table, extractor), pending in zip(extractors, pending_rows):
+        if pending:
+            writer.write_rows(table, pending)
+    return total_bytes, total_rows
+
+
+def _get_export_row_extractors(export_instance):
+    return [
+        (table, table.get_row_extractor(
+            split_columns=export_instance.split_multiselects,
+            transform_dates=export_instance.transform_dates,
+        ))
+        for table in export_instance.selected_tables
+    ]
+
+
+def _get_document_rows(export_instance, table, extractor, doc, row_number):
+    try:
+        return extractor.get_rows(doc, row_number)
+    except Exception as e:
+        notify_exception(None, "Error exporting doc", details={
+            'domain': export_instance.domain,
+            'export_instance_id': export_instance.get_id,
+            'export_table': table.label,
+            'doc_id': doc.get('_id'),
+        })
+        e.sentry_capture = False
+        raise
+
+
+def write_export_instance_from_row_index(writer, export_instance, filters, row_index,
+                                         previous_index=None, progress_tracker=None):
+    """
+    Write rows to the given open _Writer like ``write_export_instance``,
+    only generating the rows of documents that were indexed in
+    elasticsearch since the checkpoint of the previous row index and
+    copying the rows of all other documents from it.
+
+    The rows of every document in the export are saved to ``row_index``.
+    Documents that were deleted or no longer match the filters are left out
+    because the export's document ids are always queried in full.
+
+    :param filters: A list of json serializable ES filters
+    :param row_index: An empty ExportRowIndex
+    :param previous_index: The ExportRowIndex saved by the previous build
+    """
+    start = _time_in_milliseconds()
+    checkpoint = datetime.datetime.utcnow() - INCREMENTAL_EXPORT_CHECKPOINT_MARGIN
+    query = get_export_query(export_instance, filters, are_filters_es_formatted=True)
+    if previous_index is not None:
+        changed_query = query.filter(date_range('inserted_at', gte=previous_index.checkpoint))
+        changed_ids = set(changed_query.scroll_ids())
+    else:
+        changed_ids = set()
+    adapter = doc_adapter_from_cname(query.index)
+    extractors = _get_export_row_extractors(export_instance)
+    pending_rows = [[] for table in extractors]
+    docs_generated = docs_reused = 0
+
+    with TaskProgressManager(progress_tracker, src="export") as progress_manager, \
+            TransientTempfile() as ids_path:
+        total_docs = 0
+        with open(ids_path, 'w', encoding='utf-8') as f:
+            for doc_id in query.scroll_ids():
+                f.write(doc_id + '\n')
+                total_docs += 1
+        progress_manager.set_progress(0, total_docs)
+
+        row_number = 0
+        with open(ids_path, 'r', encoding='utf-8') as f:
+            doc_ids = (doc_id.strip() for doc_id in f)
+            for chunk in chunked(doc_ids, EXPORT_WRITE_BLOCK_SIZE, list):
+                previous_rows = previous_index.get_rows(chunk) if previous_index is not None else {}
+                fetch_ids = [
+                    doc_id for doc_id in chunk
+                    if doc_id in changed_ids or doc_id not in previous_rows
+                ]
+                docs = {doc['_id']: doc for doc in adapter.iter_docs(fetch_ids)} if fetch_ids else {}
+                for doc_id in chunk:
+                    if doc_id in docs:
+                        tables = [
+                            _get_document_rows(export_instance, table, extractor, docs[doc_id], row_number)
+                            for table, extractor in extractors
+                        ]
+                        docs_generated += 1
+                    elif doc_id in previous_rows and doc_id not in changed_ids:
+                        tables = _get_previous_document_rows(extractors, previous_rows[doc_id], row_number)
+                        docs_reused += 1
+                    else:
+                        # deleted since its id was queried
+                        continue
+
+                    row_index.add_rows(doc_id, row_number, [
+                        [(row.data, row.skip_excel_formatting) for row in rows] for rows in tables
+                    ])
+                    for table_index, ((table, extractor), rows) in enumerate(zip(extractors, tables)):
+                        pending = pending_rows[table_index]
+                        pending.extend(rows)
+                        if len(pending) >= EXPORT_WRITE_BLOCK_SIZE:
+                            writer.write_rows(table, pending)
+                            pending_rows[table_index] = []
+                    row_number += 1
+                progress_manager.set_progress(row_number, total_docs)
+
+        for (table, extractor), pending in zip(extractors, pending_rows):
+            if pending:
+                writer.write_rows(table, pending)
+
+    row_index.checkpoint = checkpoint
+    row_index.config_hash = get_row_index_config_hash(export_instance)
+    row_index.created_on = (
+        previous_index.created_on if previous_index is not None
+        else checkpoint + INCREMENTAL_EXPORT_CHECKPOINT_MARGIN
+    )
+
+    end = _time_in_milliseconds()
+    tags = {'format': writer.format}
+    metrics_counter('commcare.export.incremental.docs_generated', docs_generated, tags=tags)
+    metrics_counter('commcare.export.incremental.docs_reused', docs_reused, tags=tags)
+    _record_export_duration(end - start, export_instance)
+
+
+def _get_previous_document_rows(extractors, previous_rows, row_number):
+    previous_row_number, previous_tables = previous_rows
+    return [
+        [
+            ExportRow(
+                data=(
+                    data if row_number == previous_row_number
+                    else renumber_row(data, skip_excel_formatting, row_number)
+                ),
+                hyperlink_column_indices=extractor.hyperlink_column_indices,
+                skip_excel_formatting=skip_excel_formatting,
+            )
+            for data, skip_excel_formatting in rows
+        ]
+        for (table, extractor), rows in zip(extractors, previous_tables)
+    ]
+
+
 def _time_in_milliseconds():
     return int(time.time() * 1000)
 
@@ -437,14 +650,62 @@ def rebuild_export(export_instance, progress_tracker):
     filters = export_instance.get_filters() or []
     es_filters = [f.to_es_filter() for f in filters]
     with TransientTempfile() as temp_path:
+        if INCREMENTAL_DAILY_SAVED_EXPORTS.enabled(export_instance.domain) and export_instance.type in (
+            FORM_EXPORT, CASE_EXPORT
+        ):
+            _rebuild_export_incrementally(export_instance, es_filters, temp_path, progress_tracker)
+            return
         export_file = get_export_file([export_instance], es_filters, temp_path, progress_tracker)
         with export_file as payload:
             save_export_payload(export_instance, payload)
 
 
-def save_export_payload(export, payload):
+def _rebuild_export_incrementally(export_instance, es_filters, temp_path, progress_tracker):
+    """
+    Rebuild the daily saved export, reusing the rows of documents that have
+    not changed since it was last built. All rows are generated again when
+    there is no usable row index from the previous build, or once it is
+    INCREMENTAL_EXPORT_MAX_AGE old so that values that depend on other data,
+    like usernames, do not stay out of date.
+    """
+    with TransientTempfile() as previous_index_path, TransientTempfile() as row_index_path:
+        previous_index = _get_previous_row_index(export_instance, previous_index_path)
+        writer = get_export_writer([export_instance], temp_path)
+        try:
+            with writer.open([export_instance]), ExportRowIndex(row_index_path) as row_index:
+                write_export_instance_from_row_index(
+                    writer, export_instance, es_filters, row_index, previous_index, progress_tracker
+                )
+        finally:
+            if previous_index is not None:
+                previous_index.close()
+
+        with ExportFile(writer.path, writer.format) as payload, open(row_index_path, 'rb') as row_index:
+            save_export_payload(export_instance, payload, row_index)
+
+
+def _get_previous_row_index(export_instance, path):
+    if not (export_instance.has_file() and export_instance.has_row_index()):
+        return None
+    with open(path, 'wb') as f, export_instance.get_row_index(stream=True) as row_index:
+        shutil.copyfileobj(row_index, f)
+    previous_index = ExportRowIndex(path)
+    if (
+        previous_index.config_hash != get_row_index_config_hash(export_instance)
+        or previous_index.created_on is None
+        or previous_index.created_on < datetime.datetime.utcnow() - INCREMENTAL_EXPORT_MAX_AGE
+    ):
+        previous_index.close()
+        return None
+    return previous_index
+
+
+def save_export_payload(export, payload, row_index=None):
     """
     Save the contents of an export file to disk for later retrieval.
+
+    :param row_index: The export's ExportRowIndex file, when it was
+    rebuilt incrementally.
     """
     if export.last_accessed is None:
         export.last_accessed = datetime.datetime.utcnow()
@@ -453,6 +714,8 @@ def save_export_payload(export, payload):
     try:
         with export.atomic_blobs():
             export.set_payload(payload)
+            if row_index is not None:
+                export.set_row_index(row_index)
     except ResourceConflict:
         # task was executed concurrently, so let first to finish win and abort the rest
         pass
@@ -0,0 +1,167 @@
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from couchexport.export import get_writer
+from couchexport.models import Format
+
+from corehq.apps.export.export import _ExportWriter, write_export_documents
+from corehq.apps.export.models import (
+    ExportColumn,
+    ExportRow,
+    FormExportInstance,
+    PathNode,
+    RowNumberColumn,
+    ScalarItem,
+    TableConfiguration,
+)
+
+DOMAIN = 'export-benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of writing an export of synthetic forms one row at "
+        "a time with the block writer used by write_export_instance"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forms', type=int, default=1000000)
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--repeats', type=int, default=2,
+                            help='Number of iterations of the repeat group in each form')
+        parser.add_argument('--format', default=Format.UNZIPPED_CSV,
+                            choices=[Format.UNZIPPED_CSV, Format.CSV, Format.XLS_2007, Format.JSON,
+                                     Format.PARQUET])
+
+    def handle(self, forms, questions, repeats, format, **options):
+        export_instance = _get_export_instance(questions, format)
+        print(f"{forms} forms, {questions} questions, {repeats} repeat iterations, {format}")
+
+        one_at_a_time = _benchmark(_write_one_row_at_a_time, export_instance, forms, questions, repeats)
+        blocks = _benchmark(write_export_documents, export_instance, forms, questions, repeats)
+        print(f"one row at a time: {one_at_a_time:.1f} rows/sec")
+        print(f"blocks:            {blocks:.1f} rows/sec ({blocks / one_at_a_time:.2f}x)")
+
+
+def _benchmark(write, export_instance, forms, questions, repeats):
+    docs = _iter_forms(forms, questions, repeats)
+    with tempfile.NamedTemporaryFile() as temp:
+        writer = _ExportWriter(get_writer(export_instance.export_format), temp.name)
+        start = time.perf_counter()
+        with writer.open([export_instance]):
+            total_bytes, total_rows = write(writer, export_instance, docs)
+        return total_rows / (time.perf_counter() - start)
+
+
+def _write_one_row_at_a_time(writer, export_instance, documents):
+    """How write_export_instance wrote rows before it used blocks"""
+    total_rows = 0
+    for row_number, doc in enumerate(documents):
+        for table in export_instance.selected_tables:
+            rows = _get_rows(
+                table,
+                doc,
+                row_number,
+                split_columns=export_instance.split_multiselects,
+                transform_dates=export_instance.transform_dates,
+            )
+            for row in rows:
+                writer.write(table, row)
+            total_rows += len(rows)
+    return 0, total_rows
+
+
+def _get_rows(table, document, row_number, split_columns, transform_dates):
+    """
+    How TableConfiguration.get_rows got the rows of a document before it used
+    a TableRowExtractor: the selected columns, their paths and the hyperlink
+    column indices are looked up again for every document.
+    """
+    document_id = document.get('_id')
+    domain = document.get('domain')
+    rows = []
+    for doc_row in table._get_sub_documents(document, row_number, document_id=document_id):
+        row_data = []
+        skip_excel_formatting = []
+        for col in table.selected_columns:
+            val = col.get_value(
+                domain,
+                document_id,
+                doc_row.doc,
+                table.path,
+                row_index=doc_row.row,
+                split_column=split_columns,
+                transform_dates=transform_dates,
+            )
+            values = val if isinstance(val, list) else [val]
+            if isinstance(col, RowNumberColumn):
+                skip_excel_formatting.extend(range(len(row_data), len(row_data) + len(values)))
+            row_data.extend(values)
+        rows.append(ExportRow(
+            data=row_data,
+            hyperlink_column_indices=table.get_hyperlink_column_indices(split_columns),
+            skip_excel_formatting=skip_excel_formatting,
+        ))
+    return rows
+
+
+def _get_export_instance(questions, format):
+    main_table = TableConfiguration(
+        label='Forms',
+        path=[],
+        selected=True,
+        columns=[RowNumberColumn(label='number', selected=True)] + [
+            ExportColumn(
+                label=f'q{i}',
+                item=ScalarItem(path=[PathNode(name='form'), PathNode(name=f'q{i}')]),
+                selected=True,
+            )
+            for i in range(questions)
+        ] + [
+            ExportColumn(
+                label='received_on',
+                item=ScalarItem(path=[PathNode(name='received_on')]),
+                selected=True,
+            ),
+        ],
+    )
+    repeat_path = [PathNode(name='form'), PathNode(name='visit', is_repeat=True)]
+    repeat_table = TableConfiguration(
+        label='Visits',
+        path=repeat_path,
+        selected=True,
+        columns=[RowNumberColumn(label='number', selected=True, repeat=1)] + [
+            ExportColumn(
+                label=f'visit_q{i}',
+                item=ScalarItem(path=repeat_path + [PathNode(name=f'q{i}')]),
+                selected=True,
+            )
+            for i in range(questions // 2)
+        ],
+    )
+    return FormExportInstance(
+        domain=DOMAIN,
+        export_format=format,
+        transform_dates=True,
+        tables=[main_table, repeat_table],
+    )
+
+
+def _iter_forms(count, questions, repeats):
+    rand = random.Random(0)
+    for i in range(count):
+        yield {
+            '_id': f'form{i}',
+            'domain': DOMAIN,
+            'received_on': '2021-03-{:02d}T10:{:02d}:00.000000Z'.format(i % 28 + 1, i % 60),
+            'form': {
+                **{f'q{q}': str(rand.randint(0, 1000)) for q in range(questions)},
+                'visit': [
+                    {f'q{q}': f'visit {r} answer {q}' for q in range(questions // 2)}
+                    for r in range(repeats)
+                ],
+            },
+        }
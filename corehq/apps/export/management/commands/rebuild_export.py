@@ -26,6 +26,12 @@ class Command(BaseCommand):
             default=multiprocessing.cpu_count() - 1,
             help='Number of parallel processes to run.'
         )
+        parser.add_argument(
+            '--partitioned',
+            action='store_true',
+            help='Have each process query its own date range of docs instead of dumping all docs to disk '
+                 'first. Each range has about chunksize docs.'
+        )
 
     def handle(self, **options):
         if __debug__:
@@ -34,7 +40,8 @@ class Command(BaseCommand):
         export_id = options.pop('export_id')
         page_size = options.pop('page_size')
         processes = options.pop('processes')
+        partitioned = options.pop('partitioned')
 
-        rebuild_export_mutiprocess(export_id, processes, page_size)
+        rebuild_export_mutiprocess(export_id, processes, page_size, partitioned=partitioned)
 
         self.stdout.write(self.style.SUCCESS('Rebuild Complete'))
@@ -103,6 +103,11 @@ from corehq.apps.reports.models import HQUserType
 from corehq.apps.userreports.app_manager.data_source_meta import (
     get_form_indicator_data_type,
 )
+from corehq.apps.userreports.datatypes import (
+    DATA_TYPE_DECIMAL,
+    DATA_TYPE_INTEGER,
+    DATA_TYPE_STRING,
+)
 from corehq.apps.userreports.expressions.getters import NestedDictGetter
 from corehq.blobs import CODES, get_blob_db
 from corehq.blobs.exceptions import NotFound
@@ -117,6 +122,7 @@ from corehq.util.html_utils import strip_tags
 
 
 DAILY_SAVED_EXPORT_ATTACHMENT_NAME = "payload"
+EXPORT_ROW_INDEX_ATTACHMENT_NAME = "row_index"
 
 
 ExcelFormatValue = namedtuple('ExcelFormatValue', 'format value')
@@ -247,6 +253,52 @@ class ExportItem(DocumentSchema, ReadablePathMixin):
         return item
 
 
+def _transform_value(value, doc, transform_dates, transform, deid_transform):
+    # When XML elements have additional attributes in them, the text node is
+    # put inside of the #text key. For example:
+    #
+    # <element id="123">value</element>  -> {'#text': 'value', 'id':'123'}
+    #
+    # Whereas elements without additional attributes just take on the string value:
+    #
+    # <element>value</element>  -> 'value'
+    #
+    # This line ensures that we grab the actual value instead of the dictionary
+    if isinstance(value, dict):
+        if '#text' in value:
+            value = value.get('#text')
+        else:
+            return EMPTY_VALUE
+
+    if transform_dates:
+        value = couch_to_excel_datetime(value, doc)
+    if transform:
+        value = transform(value, doc)
+    if deid_transform:
+        try:
+            value = deid_transform(value, doc)
+        except ValueError:
+            # Unable to convert the string to a date
+            pass
+    if value is None:
+        value = MISSING_VALUE
+
+    if isinstance(value, list):
+        def _serialize(str_or_dict):
+            """
+            Serialize old data for scalar questions that were previously a repeat
+
+            This is a total edge case. See https://manage.dimagi.com/default.asp?280549.
+            """
+            if isinstance(str_or_dict, dict):
+                return ','.join('{}={}'.format(k, v) for k, v in str_or_dict.items())
+            else:
+                return str_or_dict
+
+        value = ' '.join(_serialize(elem) for elem in value)
+    return value
+
+
 class ExportColumn(DocumentSchema):
     """
     The model that represents a column in an export. Each column has a one-to-one
@@ -285,55 +337,49 @@ class ExportColumn(DocumentSchema):
         path = [x.name for x in self.item.path[len(base_path):]]
         return self._transform(NestedDictGetter(path)(doc), doc, transform_dates)
 
-    def _transform(self, value, doc, transform_dates):
-        """
-        Transform the given value with the transform specified in self.item.transform.
-        Also transform dates if the transform_dates flag is true.
+    def get_value_function(self, base_path, transform_dates=False, split_column=False):
         """
+        Return a function ``get_value(domain, doc_id, doc, row_index)`` that
+        gives the same values as ``self.get_value`` with the other arguments
+        given here. The path to the item and its transforms are looked up once
+        instead of for every document.
 
-        # When XML elements have additional attributes in them, the text node is
-        # put inside of the #text key. For example:
-        #
-        # <element id="123">value</element>  -> {'#text': 'value', 'id':'123'}
-        #
-        # Whereas elements without additional attributes just take on the string value:
-        #
-        # <element>value</element>  -> 'value'
-        #
-        # This line ensures that we grab the actual value instead of the dictionary
-        if isinstance(value, dict):
-            if '#text' in value:
-                value = value.get('#text')
-            else:
-                return EMPTY_VALUE
+        Columns that override ``get_value`` get a function that calls it.
+        """
+        if type(self).get_value is not ExportColumn.get_value:
+            def get_value(domain, doc_id, doc, row_index):
+                return self.get_value(
+                    domain,
+                    doc_id,
+                    doc,
+                    base_path,
+                    row_index=row_index,
+                    split_column=split_column,
+                    transform_dates=transform_dates,
+                )
+            return get_value
 
-        if transform_dates:
-            value = couch_to_excel_datetime(value, doc)
-        if self.item.transform:
-            value = TRANSFORM_FUNCTIONS[self.item.transform](value, doc)
-        if self.deid_transform:
-            try:
-                value = DEID_TRANSFORM_FUNCTIONS[self.deid_transform](value, doc)
-            except ValueError:
-                # Unable to convert the string to a date
-                pass
-        if value is None:
-            value = MISSING_VALUE
+        assert base_path == self.item.path[:len(base_path)], "ExportItem's path doesn't start with the base_path"
+        getter = NestedDictGetter([x.name for x in self.item.path[len(base_path):]])
+        transform = TRANSFORM_FUNCTIONS[self.item.transform] if self.item.transform else None
+        deid_transform = DEID_TRANSFORM_FUNCTIONS[self.deid_transform] if self.deid_transform else None
 
-        if isinstance(value, list):
-            def _serialize(str_or_dict):
-                """
-                Serialize old data for scalar questions that were previously a repeat
-
-                This is a total edge case. See https://manage.dimagi.com/default.asp?280549.
-                """
-                if isinstance(str_or_dict, dict):
-                    return ','.join('{}={}'.format(k, v) for k, v in str_or_dict.items())
-                else:
-                    return str_or_dict
+        def get_value(domain, doc_id, doc, row_index):
+            return _transform_value(getter(doc), doc, transform_dates, transform, deid_transform)
+        return get_value
 
-            value = ' '.join(_serialize(elem) for elem in value)
-        return value
+    def _transform(self, value, doc, transform_dates):
+        """
+        Transform the given value with the transform specified in self.item.transform.
+        Also transform dates if the transform_dates flag is true.
+        """
+        return _transform_value(
+            value,
+            doc,
+            transform_dates,
+            TRANSFORM_FUNCTIONS[self.item.transform] if self.item.transform else None,
+            DEID_TRANSFORM_FUNCTIONS[self.deid_transform] if self.deid_transform else None,
+        )
 
     @staticmethod
     def create_default_from_export_item(table_path, item, app_ids_and_versions, auto_select=True):
@@ -417,6 +463,17 @@ class ExportColumn(DocumentSchema):
         else:
             return [self.label]
 
+    def get_datatypes(self, split_column=False):
+        """
+        Return the datatype of each of the column's headers, for export
+        formats that keep the type of each column, like Parquet.
+        Columns of transformed or deidentified values are strings.
+        """
+        headers = self.get_headers(split_column=split_column)
+        if len(headers) == 1 and self.item.datatype and not (self.item.transform or self.deid_transform):
+            return [self.item.datatype]
+        return [DATA_TYPE_STRING] * len(headers)
+
     @classmethod
     def wrap(cls, data):
         if cls is ExportColumn:
@@ -489,6 +546,15 @@ class TableConfiguration(DocumentSchema, ReadablePathMixin):
             headers.extend(column.get_headers(split_column=split_columns))
         return headers
 
+    def get_datatypes(self, split_columns=False):
+        """
+        Return a list of column datatypes, matching the headers
+        """
+        datatypes = []
+        for column in self.selected_columns:
+            datatypes.extend(column.get_datatypes(split_column=split_columns))
+        return datatypes
+
     def get_rows(self, document, row_number, split_columns=False,
                  transform_dates=False, as_json=False):
         """
@@ -499,66 +565,16 @@ class TableConfiguration(DocumentSchema, ReadablePathMixin):
                         the data as a json-ready dict
         :return: List of ExportRows
         """
-        document_id = document.get('_id')
-
-        sub_documents = self._get_sub_documents(document, row_number, document_id=document_id)
-
-        domain = document.get('domain')
-
-        assert domain is not None, 'Form or Case must be associated with domain'
-        assert document_id is not None, 'Form or Case must have an id'
-
-        rows = []
-        for doc_row in sub_documents:
-            doc, row_index = doc_row.doc, doc_row.row
-
-            row_data = {} if as_json else []
-            col_index = 0
-            skip_excel_formatting = []
-            for col in self.selected_columns:
-                val = col.get_value(
-                    domain,
-                    document_id,
-                    doc,
-                    self.path,
-                    row_index=row_index,
-                    split_column=split_columns,
-                    transform_dates=transform_dates,
-                )
-                if as_json:
-                    for index, header in enumerate(col.get_headers(split_column=split_columns)):
-                        if isinstance(val, list):
-                            row_data[header] = "{}".format(val[index])
-                        else:
-                            row_data[header] = "{}".format(val)
-                elif isinstance(val, list):
-                    row_data.extend(val)
-
-                    # we never want to auto-format RowNumberColumn
-                    # (always treat as text)
-                    next_col_index = col_index + len(val)
-                    if isinstance(col, RowNumberColumn):
-                        skip_excel_formatting.extend(
-                            list(range(col_index, next_col_index))
-                        )
-                    col_index = next_col_index
-                else:
-                    row_data.append(val)
+        return self.get_row_extractor(split_columns, transform_dates).get_rows(
+            document, row_number, as_json=as_json
+        )
 
-                    # we never want to auto-format RowNumberColumn
-                    # (always treat as text)
-                    if isinstance(col, RowNumberColumn):
-                        skip_excel_formatting.append(col_index)
-                    col_index += 1
-            if as_json:
-                rows.append(row_data)
-            else:
-                rows.append(ExportRow(
-                    data=row_data,
-                    hyperlink_column_indices=self.get_hyperlink_column_indices(split_columns),
-                    skip_excel_formatting=skip_excel_formatting
-                ))
-        return rows
+    def get_row_extractor(self, split_columns=False, transform_dates=False):
+        """
+        Return a ``TableRowExtractor`` to get the rows of many documents.
+        It gives the same rows as ``get_rows``.
+        """
+        return TableRowExtractor(self, split_columns, transform_dates)
 
     @staticmethod
     def _create_index(_path, _transform):
@@ -677,6 +693,95 @@ class TableConfiguration(DocumentSchema, ReadablePathMixin):
         return TableConfiguration._get_sub_documents_helper(document_id, path[1:], new_docs)
 
 
+class TableRowExtractor(object):
+    """
+    Gets the rows of a TableConfiguration for documents.
+
+    The selected columns, the paths to their values and the hyperlink column
+    indices are worked out once when it is created rather than for every
+    document, so one extractor should be used for all the documents of an
+    export.
+    """
+
+    def __init__(self, table, split_columns=False, transform_dates=False):
+        self.table = table
+        self.split_columns = split_columns
+        self.columns = [
+            (
+                column,
+                column.get_value_function(
+                    table.path, transform_dates=transform_dates, split_column=split_columns
+                ),
+                isinstance(column, RowNumberColumn),
+            )
+            for column in table.selected_columns
+        ]
+        self.hyperlink_column_indices = table.get_hyperlink_column_indices(split_columns)
+
+    @property
+    @memoized
+    def _headers(self):
+        return [column.get_headers(split_column=self.split_columns) for column, _, _ in self.columns]
+
+    def get_rows(self, document, row_number, as_json=False):
+        """
+        Return a list of ExportRows generated for the given document.
+        See ``TableConfiguration.get_rows``
+        """
+        document_id = document.get('_id')
+
+        sub_documents = self.table._get_sub_documents(document, row_number, document_id=document_id)
+
+        domain = document.get('domain')
+
+        assert domain is not None, 'Form or Case must be associated with domain'
+        assert document_id is not None, 'Form or Case must have an id'
+
+        rows = []
+        for doc_row in sub_documents:
+            doc, row_index = doc_row.doc, doc_row.row
+
+            row_data = {} if as_json else []
+            col_index = 0
+            skip_excel_formatting = []
+            for column_index, (col, get_value, is_row_number) in enumerate(self.columns):
+                val = get_value(domain, document_id, doc, row_index)
+                if as_json:
+                    for index, header in enumerate(self._headers[column_index]):
+                        if isinstance(val, list):
+                            row_data[header] = "{}".format(val[index])
+                        else:
+                            row_data[header] = "{}".format(val)
+                elif isinstance(val, list):
+                    row_data.extend(val)
+
+                    # we never want to auto-format RowNumberColumn
+                    # (always treat as text)
+                    next_col_index = col_index + len(val)
+                    if is_row_number:
+                        skip_excel_formatting.extend(
+                            list(range(col_index, next_col_index))
+                        )
+                    col_index = next_col_index
+                else:
+                    row_data.append(val)
+
+                    # we never want to auto-format RowNumberColumn
+                    # (always treat as text)
+                    if is_row_number:
+                        skip_excel_formatting.append(col_index)
+                    col_index += 1
+            if as_json:
+                rows.append(row_data)
+            else:
+                rows.append(ExportRow(
+                    data=row_data,
+                    hyperlink_column_indices=self.hyperlink_column_indices,
+                    skip_excel_formatting=skip_excel_formatting
+                ))
+        return rows
+
+
 class DatePeriod(DocumentSchema):
     period_type = StringProperty(required=True)
     days = IntegerProperty()
@@ -1091,6 +1196,19 @@ class ExportInstance(BlobMixin, Document):
         """
         return self.fetch_attachment(DAILY_SAVED_EXPORT_ATTACHMENT_NAME, stream=stream)
 
+    def has_row_index(self):
+        """
+        Return True if the rows of the pre-computed export are saved for
+        incremental rebuilds. See ``corehq.apps.export.row_index``
+        """
+        return EXPORT_ROW_INDEX_ATTACHMENT_NAME in self.blobs
+
+    def set_row_index(self, row_index):
+        self.put_attachment(row_index, EXPORT_ROW_INDEX_ATTACHMENT_NAME)
+
+    def get_row_index(self, stream=False):
+        return self.fetch_attachment(EXPORT_ROW_INDEX_ATTACHMENT_NAME, stream=stream)
+
     def copy_export(self):
         export_json = self.to_json()
         del export_json['_id']
@@ -2558,6 +2676,11 @@ class SplitGPSExportColumn(ExportColumn):
         ]
         return [header_template.format(header) for header_template in header_templates]
 
+    def get_datatypes(self, split_column=False):
+        if not split_column:
+            return super(SplitGPSExportColumn, self).get_datatypes()
+        return [DATA_TYPE_DECIMAL] * 4
+
     def get_value(self, domain, doc_id, doc, base_path, split_column=False, **kwargs):
         value = super(SplitGPSExportColumn, self).get_value(
             domain,
@@ -2671,6 +2794,12 @@ class RowNumberColumn(ExportColumn):
             headers += ["{}__{}".format(self.label, i) for i in range(self.repeat + 1)]
         return headers
 
+    def get_datatypes(self, **kwargs):
+        datatypes = [DATA_TYPE_STRING]
+        if self.repeat > 0:
+            datatypes += [DATA_TYPE_INTEGER] * (self.repeat + 1)
+        return datatypes
+
     def get_value(self, domain, doc_id, doc, base_path, transform_dates=False, row_index=None, **kwargs):
         assert row_index, 'There must be a row_index for number column'
         return (
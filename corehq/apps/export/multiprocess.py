@@ -9,6 +9,14 @@ To rebuild an export run the following:
 You can also use the MultiprocessExporter class to have more control over the process.
 See the 'process_skipped_pages' management command for an example.
 
+To rebuild an export without dumping docs to disk first, partition it by date:
+
+    rebuild_export_mutiprocess(export_instance_id, num_processes, page_size, partitioned=True)
+
+Each partition is a range of days with about N docs (page_size) which a
+worker process queries from ES and exports directly. Partitions are retried
+and reported on like pages.
+
 The export works as follows:
   * Dump raw docs from ES into files of size N docs
   * Once each file is complete add it to a multiprocessing Queue
@@ -16,6 +24,7 @@ The export works as follows:
   * Results returned back to the main process
     * Unsuccessful results can be retried
   * Add successful pages to final ZIP archive
+    * Parquet pages are merged into one Parquet file per table
   * Add raw data dumps for unsuccessful pages to final ZIP archive
 """
 import gzip
@@ -23,25 +32,36 @@ import json
 import logging
 import multiprocessing
 import os
+import shutil
 import tempfile
 import time
 import zipfile
 from collections import namedtuple
 from datetime import timedelta
 
+import pyarrow.parquet
 from six.moves.queue import Empty
 
 from couchexport.export import get_writer
-from couchexport.writers import ZippedExportWriter
+from couchexport.writers import ParquetExportWriter, ZippedExportWriter
 
+from corehq.apps.es.aggregations import DateHistogram
+from corehq.apps.es.client import reset_export_client
+from corehq.apps.export.const import CASE_EXPORT, FORM_EXPORT, SMS_EXPORT
 from corehq.apps.export.dbaccessors import get_properly_wrapped_export_instance
 from corehq.apps.export.export import (
     get_export_documents,
+    get_export_query,
     get_export_size,
     get_export_writer,
     save_export_payload,
     write_export_instance,
 )
+from corehq.apps.export.filters import (
+    ReceivedOnRangeFilter,
+    ServerModifiedOnRangeFilter,
+    SmsReceivedRangeFilter,
+)
 from corehq.elastic import ScanResult
 from corehq.util.files import safe_filename
 
@@ -49,6 +69,13 @@ TEMP_FILE_PREFIX = 'cchq_export_dump_'
 
 UNPROCESSED_PAGES_DIR = 'unprocessed'
 
+# export type: (ES date field, filter class) to partition exports by
+PARTITION_DATE_FIELDS = {
+    FORM_EXPORT: ('received_on', ReceivedOnRangeFilter),
+    CASE_EXPORT: ('server_modified_on', ServerModifiedOnRangeFilter),
+    SMS_EXPORT: ('date', SmsReceivedRangeFilter),
+}
+
 logger = logging.getLogger(__name__)
 
 
@@ -119,11 +146,52 @@ class OutputPaginator(object):
         return RetryResult(self.page, self.path, self.page_size, 0)
 
 
-def rebuild_export_mutiprocess(export_id, num_processes, page_size=100000):
+ExportPartition = namedtuple('ExportPartition', 'doc_count range_filter')
+
+
+def get_export_partitions(export_instance, filters, page_size):
+    """Split the docs of an export into ranges of days with about ``page_size``
+    docs each, by the date they were received (forms), last modified on the
+    server (cases) or sent (SMS). A day is never split so partitions of busy
+    days can be larger. The first and last partitions are open ended so that
+    docs received while the export runs are included.
+
+    :returns: list of ``ExportPartition``
+    """
+    date_field, range_filter_class = PARTITION_DATE_FIELDS[export_instance.type]
+    query = get_export_query(export_instance, filters).size(0).aggregation(
+        DateHistogram('days', date_field, DateHistogram.Interval.DAY)
+    )
+    days = query.run().aggregations.days.normalized_buckets
+
+    ranges = []  # [first day, doc count]
+    for day in days:
+        if not ranges or ranges[-1][1] >= page_size:
+            ranges.append([day['key'], 0])
+        ranges[-1][1] += day['doc_count']
+
+    partitions = []
+    for index, (first_day, doc_count) in enumerate(ranges):
+        range_filter = range_filter_class(
+            gte=first_day if index > 0 else None,
+            lt=ranges[index + 1][0] if index + 1 < len(ranges) else None,
+        )
+        partitions.append(ExportPartition(doc_count, range_filter))
+    return partitions
+
+
+def rebuild_export_mutiprocess(export_id, num_processes, page_size=100000, partitioned=False):
     assert num_processes > 0
 
     export_instance = get_properly_wrapped_export_instance(export_id)
     filters = export_instance.get_filters()
+    if partitioned:
+        partitions = get_export_partitions(export_instance, filters, page_size)
+        exporter = PartitionedMultiprocessExporter(export_instance, filters, partitions, num_processes)
+        logger.info('Starting export of {} docs in {} partitions'.format(exporter.total_docs, len(partitions)))
+        run_partitioned_exporter(exporter)
+        return
+
     total_docs = get_export_size(export_instance, filters)
     exporter = MultiprocessExporter(export_instance, total_docs, num_processes)
     paginator = OutputPaginator(export_id)
@@ -150,16 +218,37 @@ def run_multiprocess_exporter(exporter, filters, paginator, page_size):
     exporter.wait_till_completion()
 
 
+def run_partitioned_exporter(exporter):
+    with exporter:
+        for page in exporter.partitions:
+            exporter.process_page(exporter.get_partition_page(page))
+
+    exporter.wait_till_completion()
+
+
 def run_export_with_logging(export_instance, page_number, dump_path, doc_count, attempts):
+    progress_queue = getattr(run_export_with_logging, 'queue', None)
+    return _run_page_with_logging(
+        run_export, progress_queue, export_instance, page_number, dump_path, doc_count, attempts
+    )
+
+
+def run_partition_export_with_logging(export_instance, page_number, filters, doc_count, attempts):
+    progress_queue = getattr(run_partition_export_with_logging, 'queue', None)
+    return _run_page_with_logging(
+        run_partition_export, progress_queue, export_instance, page_number, filters, doc_count, attempts
+    )
+
+
+def _run_page_with_logging(run, progress_queue, export_instance, page_number, source, doc_count, attempts):
     """Log any exceptions here since logging on the other side of the process queue
     won't show the traceback
     """
     logger.info('    Processing page {} started (attempt {})'.format(page_number, attempts))
-    progress_queue = getattr(run_export_with_logging, 'queue', None)
     update_frequency = min(1000, int(doc_count // 10) or 1)
     progress_tracker = LoggingProgressTracker(page_number, progress_queue, update_frequency)
     try:
-        result = run_export(export_instance, page_number, dump_path, doc_count, progress_tracker)
+        result = run(export_instance, page_number, source, doc_count, progress_tracker)
         if progress_queue:
             # just to make sure we set progress to 100%
             progress_queue.put(ProgressValue(page_number, doc_count, doc_count))
@@ -176,6 +265,14 @@ def run_export(export_instance, page_number, dump_path, doc_count, progress_trac
     return SuccessResult(page_number, export_file_path, doc_count)
 
 
+def run_partition_export(export_instance, page_number, filters, doc_count, progress_tracker=None):
+    """Export the docs matching the filters, scrolling them straight from ES"""
+    query = get_export_query(export_instance, filters)
+    docs = ScanResult(doc_count, query.scroll())
+    export_file_path = _get_export_file_path(export_instance, docs, progress_tracker)
+    return SuccessResult(page_number, export_file_path, doc_count)
+
+
 def _get_export_documents_from_file(dump_path, doc_count):
     """Mimic the results of an ES scroll query but get results from jsonlines file"""
     def _doc_iter():
@@ -227,28 +324,26 @@ class LoggingProgressTracker(object):
 class MultiprocessExporter(object):
     """Helper class to manage multi-process exporting"""
 
+    export_function = staticmethod(run_export_with_logging)
+
     def __init__(self, export_instance, total_docs, num_processes, existing_archive_path=None, keep_file=False):
         self.keep_file = keep_file
         self.export_instance = export_instance
         self.existing_archive_path = existing_archive_path
+        self.total_docs = total_docs
         self.results = []
         self.progress_queue = multiprocessing.Queue()
         self.progress = multiprocessing.Process(target=_output_progress, args=(self.progress_queue, total_docs))
 
-        self.export_function = run_export_with_logging
-
-        def _set_queue(queue):
-            """Set the progress queue as an attribute on the function
-            You can't pass this as an arg"""
-            self.export_function.queue = queue
-
         self.pool = multiprocessing.Pool(
             processes=num_processes,
-            initializer=_set_queue,
+            initializer=self._init_worker,
             initargs=[self.progress_queue]
         )
 
-        self.is_zip = isinstance(get_writer(export_instance.export_format), ZippedExportWriter)
+        writer = get_writer(export_instance.export_format)
+        self.is_zip = isinstance(writer, ZippedExportWriter)
+        self.is_parquet = isinstance(writer, ParquetExportWriter)
         self.premature_exit = False
 
     def __enter__(self):
@@ -259,6 +354,11 @@ class MultiprocessExporter(object):
         if exc_type and exc_val:
             self.stop()
 
+    def _init_worker(self, progress_queue):
+        """Set the progress queue as an attribute on the function
+        You can't pass this as an arg"""
+        self.export_function.queue = progress_queue
+
     def start(self):
         self.progress.start()
 
@@ -271,10 +371,13 @@ class MultiprocessExporter(object):
         """
         attempts = page_info.retry_count + 1
         self.progress_queue.put(ProgressValue(page_info.page, 0, page_info.page_size))
-        args = self.export_instance, page_info.page, page_info.path, page_info.page_size, attempts
+        args = self._get_export_args(page_info, attempts)
         result = self.pool.apply_async(self.export_function, args=args)
         self.results.append(QueuedResult(result, page_info.page, page_info.path, page_info.page_size, attempts))
 
+    def _get_export_args(self, page_info, attempts):
+        return self.export_instance, page_info.page, page_info.path, page_info.page_size, attempts
+
     def wait_till_completion(self):
         results = self.get_results()
         final_path = self.build_final_export(results)
@@ -344,12 +447,15 @@ class MultiprocessExporter(object):
     def build_final_export(self, export_results):
         base_name = safe_filename(self.export_instance.name or 'Export')
         final_zip = self._get_zipfile_for_final_archive()
+        # pages can't be merged into the tables of an existing archive
+        merge_parquet = self.is_parquet and not self.existing_archive_path
+        parquet_pages = []
         with final_zip:
             pages = len(export_results)
             for result in export_results:
                 if not result.success:
                     logger.error('  Error in page %s so not added to final output', result.page)
-                    if os.path.exists(result.path):
+                    if result.path and os.path.exists(result.path):
                         raw_dump_path = result.path
                         logger.info('    Adding raw dump of page %s to final output', result.page)
                         destination = '{}/page_{}.json.gz'.format(UNPROCESSED_PAGES_DIR, result.page)
@@ -358,11 +464,18 @@ class MultiprocessExporter(object):
                     continue
 
                 logger.info('  Adding page {} of {} to final file'.format(result.page, pages))
-                if self.is_zip:
+                if merge_parquet:
+                    parquet_pages.append(result)
+                elif self.is_zip:
                     _add_compressed_page_to_zip(final_zip, result.page, result.path)
                 else:
                     final_zip.write(result.path, '{}_{}'.format(base_name, result.page))
 
+            if parquet_pages:
+                logger.info('  Merging Parquet tables of {} pages'.format(len(parquet_pages)))
+                parquet_pages.sort(key=lambda result: result.page)
+                _add_merged_parquet_pages_to_zip(final_zip, [result.path for result in parquet_pages])
+
         return final_zip.filename
 
     def upload(self, final_path):
@@ -373,6 +486,44 @@ class MultiprocessExporter(object):
             os.remove(final_path)
 
 
+class PartitionedMultiprocessExporter(MultiprocessExporter):
+    """Exports each partition of an export in a worker process which queries
+    ES for the partition's docs itself, so docs aren't dumped to disk first.
+    Partitions take the place of pages: their progress is reported and they
+    are retried in the same way.
+    """
+
+    export_function = staticmethod(run_partition_export_with_logging)
+
+    def __init__(self, export_instance, filters, partitions, num_processes, **kwargs):
+        self.filters = filters
+        # page number: ExportPartition
+        self.partitions = dict(enumerate(partitions))
+        total_docs = sum(partition.doc_count for partition in partitions)
+        super(PartitionedMultiprocessExporter, self).__init__(
+            export_instance, total_docs, num_processes, **kwargs
+        )
+
+    def _init_worker(self, progress_queue):
+        super(PartitionedMultiprocessExporter, self)._init_worker(progress_queue)
+        # workers query ES, so they can't share the parent's connections
+        reset_export_client()
+
+    def get_partition_page(self, page):
+        return RetryResult(page, None, self.partitions[page].doc_count, 0)
+
+    def _get_export_args(self, page_info, attempts):
+        filters = self.filters + [self.partitions[page_info.page].range_filter]
+        return self.export_instance, page_info.page, filters, page_info.page_size, attempts
+
+    def build_final_export(self, export_results):
+        for result in export_results:
+            if not result.success:
+                range_filter = self.partitions[result.page].range_filter
+                logger.error('  Page %s covers %s to %s', result.page, range_filter.gte, range_filter.lt)
+        return super(PartitionedMultiprocessExporter, self).build_final_export(export_results)
+
+
 def _add_compressed_page_to_zip(zip_file, page_number, zip_path_to_add):
     with zipfile.ZipFile(zip_path_to_add, 'r') as page_file:
         for path in page_file.namelist():
@@ -382,6 +533,64 @@ def _add_compressed_page_to_zip(zip_file, page_number, zip_path_to_add):
             )
 
 
+def _add_merged_parquet_pages_to_zip(zip_file, zip_paths_to_merge):
+    """Add one Parquet file per table to the zip file, made up of the row groups
+    of that table in each of the page archives, in order. Row groups are copied
+    one at a time so memory use doesn't grow with the number of pages.
+
+    Each page picks the types of its columns from its own values, so columns
+    that don't have the same type in every page are written as strings.
+    """
+    table_paths = []
+    for zip_path in zip_paths_to_merge:
+        with zipfile.ZipFile(zip_path, 'r') as page_file:
+            table_paths.extend(path for path in page_file.namelist() if path not in table_paths)
+
+    for path in table_paths:
+        schema = _get_merged_parquet_schema(zip_paths_to_merge, path)
+        with tempfile.NamedTemporaryFile(prefix=TEMP_FILE_PREFIX) as merged_file:
+            writer = pyarrow.parquet.ParquetWriter(merged_file, schema)
+            for parquet_file in _iter_page_parquet_files(zip_paths_to_merge, path):
+                for index in range(parquet_file.num_row_groups):
+                    row_group = parquet_file.read_row_group(index)
+                    if row_group.schema != schema:
+                        row_group = row_group.cast(schema)
+                    writer.write_table(row_group)
+            writer.close()
+            merged_file.flush()
+            zip_file.write(merged_file.name, path, zipfile.ZIP_STORED)
+
+
+def _get_merged_parquet_schema(zip_paths_to_merge, path):
+    """Get the schema of the pages of a Parquet table, with the columns that
+    have different types in different pages as strings
+    """
+    schemas = []
+    for zip_path in zip_paths_to_merge:
+        with zipfile.ZipFile(zip_path, 'r') as page_file:
+            if path in page_file.namelist():
+                # tables are stored uncompressed, so only their footers are read
+                with page_file.open(path) as page_table_file:
+                    schemas.append(pyarrow.parquet.read_schema(page_table_file))
+    fields = []
+    for index, field in enumerate(schemas[0]):
+        if any(schema.field(index).type != field.type for schema in schemas):
+            field = field.with_type(pyarrow.string())
+        fields.append(field)
+    return pyarrow.schema(fields)
+
+
+def _iter_page_parquet_files(zip_paths_to_merge, path):
+    for zip_path in zip_paths_to_merge:
+        with zipfile.ZipFile(zip_path, 'r') as page_file:
+            if path not in page_file.namelist():
+                continue
+            with tempfile.TemporaryFile(prefix=TEMP_FILE_PREFIX) as table_file:
+                with page_file.open(path) as page_table_file:
+                    shutil.copyfileobj(page_table_file, table_file)
+                yield pyarrow.parquet.ParquetFile(table_file)
+
+
 def _output_progress(queue, total_docs):
     """Poll the queue for ProgressValue objects and log progress to logger"""
     logger.debug('Starting progress reporting process')
@@ -0,0 +1,142 @@
+"""Row index of incrementally rebuilt daily saved exports
+
+The row index of a daily saved export is a SQLite file, saved alongside the
+export's payload, with the rows that each document exported to the tables
+of the export when it was last built. It also records when the build
+started, so that the next build only has to generate rows for documents
+that were indexed in elasticsearch since then and can copy the rows of all
+other documents from the index.
+
+Rows depend on the export's table configuration so an index is only used
+while ``get_row_index_config_hash`` of the export is unchanged.
+"""
+import datetime
+import hashlib
+import json
+import pickle
+import sqlite3
+
+from dimagi.utils.chunked import chunked
+
+ROW_INDEX_VERSION = 1
+# number of documents looked up in the index at once, below SQLite's
+# limit on the number of query parameters
+ROW_INDEX_LOOKUP_SIZE = 500
+
+
+def get_row_index_config_hash(export_instance):
+    """Hash of the export's configuration that the exported rows depend on"""
+    config = {
+        'version': ROW_INDEX_VERSION,
+        'split_multiselects': export_instance.split_multiselects,
+        'transform_dates': export_instance.transform_dates,
+        'tables': [table.to_json() for table in export_instance.selected_tables],
+    }
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ExportRowIndex(object):
+    """
+    Rows of an export by document id, stored in a SQLite file
+
+    Rows are stored as ``(data, skip_excel_formatting)`` tuples for each
+    table, along with the row number they were generated with.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, row_number INTEGER, tables BLOB)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _get_meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def config_hash(self):
+        return self._get_meta('config_hash')
+
+    @config_hash.setter
+    def config_hash(self, value):
+        self._set_meta('config_hash', value)
+
+    @property
+    def checkpoint(self):
+        """Time from which documents must have their rows regenerated"""
+        value = self._get_meta('checkpoint')
+        return datetime.datetime.fromisoformat(value) if value else None
+
+    @checkpoint.setter
+    def checkpoint(self, value):
+        self._set_meta('checkpoint', value.isoformat())
+
+    @property
+    def created_on(self):
+        """When the rows of all the documents in the index were last generated"""
+        value = self._get_meta('created_on')
+        return datetime.datetime.fromisoformat(value) if value else None
+
+    @created_on.setter
+    def created_on(self, value):
+        self._set_meta('created_on', value.isoformat())
+
+    def get_rows(self, doc_ids):
+        """
+        :returns: dict of ``doc_id: (row_number, tables)`` for the given
+        documents that are in the index, where ``tables`` is a list of
+        rows for each table.
+        """
+        rows = {}
+        for chunk in chunked(doc_ids, ROW_INDEX_LOOKUP_SIZE, list):
+            result = self.db.execute(
+                "SELECT doc_id, row_number, tables FROM docs WHERE doc_id IN ({})".format(
+                    ", ".join("?" * len(chunk))
+                ),
+                chunk,
+            )
+            for doc_id, row_number, tables in result:
+                rows[doc_id] = (row_number, pickle.loads(tables))
+        return rows
+
+    def add_rows(self, doc_id, row_number, tables):
+        self.db.execute(
+            "INSERT OR REPLACE INTO docs (doc_id, row_number, tables) VALUES (?, ?, ?)",
+            (doc_id, row_number, pickle.dumps(tables, pickle.HIGHEST_PROTOCOL)),
+        )
+
+
+def renumber_row(data, skip_excel_formatting, row_number):
+    """
+    Return the data of a row with the document's row number changed
+
+    The values of ``RowNumberColumn``s are the only ones not formatted in
+    Excel, and are made up of the dotted row index, e.g. "3.1.0", followed
+    by each part of the index when the table is a repeat group.
+    """
+    data = list(data)
+    number_index = None
+    for index in skip_excel_formatting:
+        value = data[index]
+        if isinstance(value, str):
+            _, dot, repeat_index = value.partition('.')
+            data[index] = f'{row_number}{dot}{repeat_index}'
+            number_index = index + 1
+        elif index == number_index:
+            data[index] = row_number
+    return data
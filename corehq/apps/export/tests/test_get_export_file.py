@@ -178,6 +178,45 @@ class WriterTest(SimpleTestCase):
         })
         self.assertTrue(export_save.called)
 
+    @patch('corehq.apps.export.models.FormExportInstance.save')
+    @patch('corehq.apps.export.export.MAX_EXPORTABLE_ROWS', 2)
+    @patch('corehq.apps.export.export.EXPORT_WRITE_BLOCK_SIZE', 3)
+    @flag_enabled('PAGINATED_EXPORTS')
+    def test_paginated_table_blocks_across_pages(self, export_save):
+        export_instance = FormExportInstance(
+            export_format=Format.JSON,
+            tables=[
+                TableConfiguration(
+                    label="My table",
+                    selected=True,
+                    columns=[
+                        ExportColumn(
+                            label="Q1",
+                            item=ScalarItem(
+                                path=[PathNode(name='form'), PathNode(name='q1')],
+                            ),
+                            selected=True
+                        ),
+                    ]
+                )
+            ]
+        )
+
+        assert_instance_gives_results(self.docs * 3, export_instance, {
+            'My table_000': {
+                'headers': ['Q1'],
+                'rows': [['foo'], ['bip']],
+            },
+            'My table_001': {
+                'headers': ['Q1'],
+                'rows': [['foo'], ['bip']],
+            },
+            'My table_002': {
+                'headers': ['Q1'],
+                'rows': [['foo'], ['bip']],
+            },
+        })
+
     @patch('corehq.apps.export.models.FormExportInstance.save')
     def test_split_questions(self, export_save):
         """Ensure columns are split when `split_multiselects` is set to True"""
@@ -0,0 +1,89 @@
+import io
+import tempfile
+import zipfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+import pyarrow
+import pyarrow.parquet
+
+from corehq.apps.export.filters import ReceivedOnRangeFilter
+from corehq.apps.export.models import FormExportInstance
+from corehq.apps.export.multiprocess import (
+    _add_merged_parquet_pages_to_zip,
+    get_export_partitions,
+)
+
+
+class GetExportPartitionsTest(SimpleTestCase):
+
+    def _get_partitions(self, days, page_size):
+        with patch('corehq.apps.export.multiprocess.get_export_query') as get_export_query:
+            query = get_export_query.return_value.size.return_value.aggregation.return_value
+            query.run.return_value.aggregations.days.normalized_buckets = [
+                {'key': key, 'doc_count': doc_count} for key, doc_count in days
+            ]
+            partitions = get_export_partitions(FormExportInstance(domain='test'), [], page_size)
+        return [
+            (partition.doc_count, partition.range_filter.gte, partition.range_filter.lt)
+            for partition in partitions
+        ]
+
+    def test_days_grouped(self):
+        partitions = self._get_partitions([
+            ('2021-03-01', 40),
+            ('2021-03-02', 70),
+            ('2021-03-05', 250),
+            ('2021-03-06', 10),
+            ('2021-03-08', 30),
+        ], page_size=100)
+        self.assertEqual(partitions, [
+            (110, None, '2021-03-05'),
+            (250, '2021-03-05', '2021-03-06'),
+            (40, '2021-03-06', None),
+        ])
+
+    def test_one_partition(self):
+        self.assertEqual(
+            self._get_partitions([('2021-03-01', 40), ('2021-03-02', 10)], page_size=100),
+            [(50, None, None)],
+        )
+
+    def test_no_docs(self):
+        self.assertEqual(self._get_partitions([], page_size=100), [])
+
+    def test_range_filter(self):
+        with patch('corehq.apps.export.multiprocess.get_export_query') as get_export_query:
+            query = get_export_query.return_value.size.return_value.aggregation.return_value
+            query.run.return_value.aggregations.days.normalized_buckets = [{'key': '2021-03-01', 'doc_count': 1}]
+            partition, = get_export_partitions(FormExportInstance(domain='test'), [], 100)
+        self.assertIsInstance(partition.range_filter, ReceivedOnRangeFilter)
+
+
+class MergeParquetPagesTest(SimpleTestCase):
+
+    def _write_page(self, table):
+        page_file = tempfile.NamedTemporaryFile(suffix='.zip')
+        self.addCleanup(page_file.close)
+        table_file = io.BytesIO()
+        pyarrow.parquet.write_table(table, table_file)
+        with zipfile.ZipFile(page_file.name, 'w') as page_zip:
+            page_zip.writestr('Forms/forms.parquet', table_file.getvalue(), zipfile.ZIP_STORED)
+        return page_file.name
+
+    def test_mismatched_columns_written_as_strings(self):
+        pages = [
+            self._write_page(pyarrow.table({'count': [1, 2], 'name': ['a', 'b']})),
+            self._write_page(pyarrow.table({'count': ['many', '3'], 'name': ['c', 'd']})),
+        ]
+        with tempfile.TemporaryFile() as final_file:
+            with zipfile.ZipFile(final_file, 'w') as final_zip:
+                _add_merged_parquet_pages_to_zip(final_zip, pages)
+            with zipfile.ZipFile(final_file, 'r') as final_zip:
+                table = pyarrow.parquet.read_table(io.BytesIO(final_zip.read('Forms/forms.parquet')))
+        self.assertEqual(table.schema.field('count').type, pyarrow.string())
+        self.assertEqual(table.to_pydict(), {
+            'count': ['1', '2', 'many', '3'],
+            'name': ['a', 'b', 'c', 'd'],
+        })
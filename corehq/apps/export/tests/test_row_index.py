@@ -0,0 +1,129 @@
+import datetime
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from corehq.apps.export.export import write_export_instance_from_row_index
+from corehq.apps.export.models import (
+    ExportColumn,
+    FormExportInstance,
+    PathNode,
+    RowNumberColumn,
+    ScalarItem,
+    TableConfiguration,
+)
+from corehq.apps.export.row_index import (
+    ExportRowIndex,
+    get_row_index_config_hash,
+    renumber_row,
+)
+from corehq.util.files import TransientTempfile
+
+DOMAIN = 'row-index-test'
+
+
+class RenumberRowTest(SimpleTestCase):
+
+    def test_main_table(self):
+        self.assertEqual(renumber_row(['3', 'a', 'b'], [0], 7), ['7', 'a', 'b'])
+
+    def test_repeat_table(self):
+        self.assertEqual(
+            renumber_row(['a', '3.1.0', 3, 1, 0], [1, 2, 3, 4], 12),
+            ['a', '12.1.0', 12, 1, 0],
+        )
+
+
+class ExportRowIndexTest(SimpleTestCase):
+
+    def test_rows(self):
+        with TransientTempfile() as path:
+            with ExportRowIndex(path) as row_index:
+                row_index.add_rows('doc1', 0, [[(['0', 'a'], [0])], []])
+                row_index.add_rows('doc2', 1, [[(['1', 'b'], [0])], [(['1.0', 1, 0], [0, 1, 2])]])
+                row_index.checkpoint = datetime.datetime(2021, 3, 1, 10)
+
+            with ExportRowIndex(path) as row_index:
+                self.assertEqual(row_index.get_rows(['doc2', 'missing']), {
+                    'doc2': (1, [[(['1', 'b'], [0])], [(['1.0', 1, 0], [0, 1, 2])]]),
+                })
+                self.assertEqual(row_index.checkpoint, datetime.datetime(2021, 3, 1, 10))
+                self.assertIsNone(row_index.config_hash)
+
+    def test_config_hash(self):
+        export_instance = _get_export_instance()
+        config_hash = get_row_index_config_hash(export_instance)
+        self.assertEqual(config_hash, get_row_index_config_hash(_get_export_instance()))
+        export_instance.split_multiselects = True
+        self.assertNotEqual(config_hash, get_row_index_config_hash(export_instance))
+
+
+class WriteExportInstanceFromRowIndexTest(SimpleTestCase):
+
+    def _write(self, doc_ids, changed_ids, docs, row_index_path, previous_index=None):
+        writer = _RowCollector()
+        with patch('corehq.apps.export.export.get_export_query') as get_export_query, \
+                patch('corehq.apps.export.export.doc_adapter_from_cname') as doc_adapter, \
+                patch('corehq.apps.export.export._record_export_duration'):
+            query = get_export_query.return_value
+            query.scroll_ids.return_value = doc_ids
+            query.filter.return_value.scroll_ids.return_value = changed_ids
+            doc_adapter.return_value.iter_docs.side_effect = lambda ids: [docs[id_] for id_ in ids]
+            with ExportRowIndex(row_index_path) as row_index:
+                write_export_instance_from_row_index(
+                    writer, _get_export_instance(), [], row_index, previous_index
+                )
+        return writer.rows
+
+    def test_unchanged_rows_reused(self):
+        docs = {doc_id: _get_form(doc_id, doc_id) for doc_id in ['doc1', 'doc2', 'doc3']}
+        with TransientTempfile() as first_path, TransientTempfile() as second_path:
+            rows = self._write(['doc1', 'doc2', 'doc3'], [], docs, first_path)
+            self.assertEqual(rows, [['0', 'doc1'], ['1', 'doc2'], ['2', 'doc3']])
+
+            # doc1 is deleted, doc3 is edited and doc4 is submitted
+            docs = {
+                'doc3': _get_form('doc3', 'edited'),
+                'doc4': _get_form('doc4', 'doc4'),
+            }
+            with ExportRowIndex(first_path) as previous_index:
+                rows = self._write(['doc2', 'doc3', 'doc4'], ['doc3', 'doc4'], docs, second_path, previous_index)
+            self.assertEqual(rows, [['0', 'doc2'], ['1', 'edited'], ['2', 'doc4']])
+
+            with ExportRowIndex(second_path) as row_index:
+                self.assertEqual(set(row_index.get_rows(['doc1', 'doc2', 'doc3', 'doc4'])),
+                                 {'doc2', 'doc3', 'doc4'})
+                self.assertEqual(row_index.config_hash, get_row_index_config_hash(_get_export_instance()))
+
+
+class _RowCollector(object):
+    format = 'csv'
+
+    def __init__(self):
+        self.rows = []
+
+    def write_rows(self, table, rows):
+        self.rows.extend(row.data for row in rows)
+
+
+def _get_export_instance():
+    return FormExportInstance(
+        domain=DOMAIN,
+        tables=[TableConfiguration(
+            label='Forms',
+            path=[],
+            selected=True,
+            columns=[
+                RowNumberColumn(label='number', selected=True),
+                ExportColumn(
+                    label='q1',
+                    item=ScalarItem(path=[PathNode(name='form'), PathNode(name='q1')]),
+                    selected=True,
+                ),
+            ],
+        )],
+    )
+
+
+def _get_form(doc_id, answer):
+    return {'_id': doc_id, 'domain': DOMAIN, 'form': {'q1': answer}}
@@ -1,14 +1,16 @@
 from django.test import SimpleTestCase
 
-from corehq.apps.export.const import USERNAME_TRANSFORM
+from corehq.apps.export.const import EMPTY_VALUE, MISSING_VALUE, USERNAME_TRANSFORM
 from corehq.apps.export.models import (
     DocRow,
     ExportColumn,
     ExportItem,
     ExportRow,
+    GeopointItem,
     PathNode,
     RowNumberColumn,
     ScalarItem,
+    SplitGPSExportColumn,
     TableConfiguration,
 )
 
@@ -355,3 +357,123 @@ class TableConfigurationGetRowsTest(SimpleTestCase):
         self.assertEqual(
             [row.data for row in table_configuration.get_rows(submission, 0)], []
         )
+
+
+class TableConfigurationGetDatatypesTest(SimpleTestCase):
+
+    def test_datatypes(self):
+        table_configuration = TableConfiguration(
+            path=[PathNode(name='form'), PathNode(name='repeat1', is_repeat=True)],
+            columns=[
+                RowNumberColumn(selected=True, repeat=1),
+                ExportColumn(
+                    item=ScalarItem(path=[PathNode(name='form'), PathNode(name='q1')], datatype='integer'),
+                    selected=True,
+                ),
+                ExportColumn(
+                    item=ScalarItem(path=[PathNode(name='form'), PathNode(name='q2')]),
+                    selected=True,
+                ),
+                ExportColumn(
+                    item=ScalarItem(
+                        path=[PathNode(name='form'), PathNode(name='user_id')],
+                        datatype='string',
+                        transform=USERNAME_TRANSFORM,
+                    ),
+                    selected=True,
+                ),
+                ExportColumn(
+                    item=ScalarItem(path=[PathNode(name='form'), PathNode(name='dob')], datatype='date'),
+                    deid_transform='deid_date',
+                    selected=True,
+                ),
+                SplitGPSExportColumn(
+                    item=GeopointItem(path=[PathNode(name='form'), PathNode(name='where')]),
+                    selected=True,
+                ),
+            ]
+        )
+        self.assertEqual(
+            table_configuration.get_datatypes(),
+            ['string', 'integer', 'integer', 'integer', 'string', 'string', 'string', 'string'],
+        )
+        self.assertEqual(
+            table_configuration.get_datatypes(split_columns=True),
+            ['string', 'integer', 'integer', 'integer', 'string', 'string', 'string',
+             'decimal', 'decimal', 'decimal', 'decimal'],
+        )
+        self.assertEqual(
+            len(table_configuration.get_datatypes(split_columns=True)),
+            len(table_configuration.get_headers(split_columns=True)),
+        )
+
+
+class TableRowExtractorTest(SimpleTestCase):
+
+    def test_reused_for_documents(self):
+        table_configuration = TableConfiguration(
+            path=[PathNode(name="form", is_repeat=False), PathNode(name="repeat1", is_repeat=True)],
+            columns=[
+                RowNumberColumn(
+                    selected=True
+                ),
+                ExportColumn(
+                    item=ScalarItem(
+                        path=[
+                            PathNode(name="form"),
+                            PathNode(name="repeat1", is_repeat=True),
+                            PathNode(name="q1")
+                        ],
+                    ),
+                    selected=True,
+                ),
+                ExportColumn(
+                    item=ScalarItem(
+                        path=[
+                            PathNode(name="form"),
+                            PathNode(name="repeat1", is_repeat=True),
+                            PathNode(name="q2")
+                        ],
+                    ),
+                    selected=True,
+                ),
+            ]
+        )
+        submissions = [
+            {
+                'domain': 'my-domain',
+                '_id': '1234',
+                'form': {'repeat1': [{'q1': 'foo'}, {'q1': {'#text': 'bar', '@id': '1'}, 'q2': 'baz'}]},
+            },
+            {
+                'domain': 'my-domain',
+                '_id': '5678',
+                'form': {'repeat1': {'q1': 'beep', 'q2': {'@id': '2'}}},
+            },
+        ]
+        extractor = table_configuration.get_row_extractor()
+        rows = [
+            (row.data, row.skip_excel_formatting)
+            for row_number, submission in enumerate(submissions)
+            for row in extractor.get_rows(submission, row_number)
+        ]
+        self.assertEqual(rows, [
+            (['0.0', 0, 0, 'foo', MISSING_VALUE], [0, 1, 2]),
+            (['0.1', 0, 1, 'bar', 'baz'], [0, 1, 2]),
+            (['1.0', 1, 0, 'beep', EMPTY_VALUE], [0, 1, 2]),
+        ])
+
+    def test_as_json(self):
+        table_configuration = TableConfiguration(
+            path=[],
+            columns=[
+                ExportColumn(
+                    label='Q1',
+                    item=ScalarItem(path=[PathNode(name='form'), PathNode(name='q1')]),
+                    selected=True,
+                ),
+            ]
+        )
+        submission = {'domain': 'my-domain', '_id': '1234', 'form': {'q1': 'foo'}}
+        extractor = table_configuration.get_row_extractor()
+        self.assertEqual(extractor.get_rows(submission, 0, as_json=True), [{'Q1': 'foo'}])
@@ -131,12 +131,19 @@ class BaseExportView(BaseProjectDataView):
             'can_edit': self.export_instance.can_edit(self.request.couch_user),
             'has_other_owner': owner_id and owner_id != self.request.couch_user.user_id,
             'owner_name': WebUser.get_by_user_id(owner_id).username if owner_id else None,
-            'format_options': ["xls", "xlsx", "csv"],
+            'format_options': self.format_options,
             'number_of_apps_to_process': schema.get_number_of_apps_to_process(),
             'sharing_options': sharing_options,
             'terminology': self.terminology,
         }
 
+    @property
+    def format_options(self):
+        format_options = ["xls", "xlsx", "csv"]
+        if toggles.PARQUET_EXPORTS.enabled(self.domain):
+            format_options.append("parquet")
+        return format_options
+
     @property
     def parent_pages(self):
         return [{
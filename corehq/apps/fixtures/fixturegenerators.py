@@ -1,24 +1,35 @@
+import gzip
 from collections import defaultdict
-from functools import partial
+from io import BytesIO
 from operator import attrgetter
 from xml.etree import cElementTree as ElementTree
 
+from django.core.cache import cache
+
 from casexml.apps.phone.fixtures import FixtureProvider
-from casexml.apps.phone.utils import (
-    GLOBAL_USER_ID,
-    get_or_cache_global_fixture,
-)
+from casexml.apps.phone.utils import GLOBAL_USER_ID
+from dimagi.utils.chunked import chunked
+from dimagi.utils.couch import CriticalSection
+
 from corehq.apps.fixtures.exceptions import FixtureTypeCheckError
-from corehq.apps.fixtures.models import FIXTURE_BUCKET, LookupTable, LookupTableRow
+from corehq.apps.fixtures.models import LookupTable, LookupTableRow
 from corehq.apps.products.fixtures import product_fixture_generator_json
 from corehq.apps.programs.fixtures import program_fixture_generator_json
-from corehq.util.metrics import metrics_histogram
+from corehq.blobs import CODES, NotFound, get_blob_db
+from corehq.util.metrics import metrics_counter, metrics_histogram
 from corehq.util.xml_utils import serialize
-from .utils import clean_fixture_field_name, get_index_schema_node
+from .utils import clean_fixture_field_name, get_fixture_blob_parent_id, get_index_schema_node
 
 LOOKUP_TABLE_FIXTURE = 'lookup_table_fixture'
 REPORT_FIXTURE = 'report_fixture'
 
+# serialized rows of tables that aren't global are cached for this many
+# seconds, under the version of their table
+ROW_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+ROW_FRAGMENT_CHUNK_SIZE = 1000
+# stands in for the rows of a fixture while its start and end are serialized
+ROWS_PLACEHOLDER = '{rows}'
+
 
 def item_lists_by_domain(domain, namespace_ids=False):
     ret = list()
@@ -98,8 +109,7 @@ def get_global_items_by_domain(domain, case_id):
         if data_type.is_global:
             global_types[data_type.id] = data_type
     if global_types:
-        data_fn = partial(ItemListsProvider()._get_global_items, global_types, domain)
-        return get_or_cache_global_fixture(domain, case_id, FIXTURE_BUCKET, '', data_fn)
+        return ItemListsProvider()._get_global_items(global_types, case_id)
 
 
 class ItemListsProvider(FixtureProvider):
@@ -136,20 +146,60 @@ class ItemListsProvider(FixtureProvider):
         return items
 
     def get_global_items(self, global_types, restore_state):
-        domain = restore_state.restore_user.domain
-        data_fn = partial(self._get_global_items, global_types, domain)
-        return get_or_cache_global_fixture(restore_state.restore_user.domain,
-                                           restore_state.restore_user.user_id,
-                                           FIXTURE_BUCKET,
-                                           '',
-                                           data_fn,
-                                           restore_state.overwrite_cache)
+        return self._get_global_items(
+            global_types,
+            restore_state.restore_user.user_id,
+            restore_state.overwrite_cache,
+        )
+
+    def _get_global_items(self, global_types, user_id, overwrite_cache=False):
+        global_id = GLOBAL_USER_ID.encode('utf-8')
+        b_user_id = user_id.encode('utf-8')
+
+        def get_fixture(data_type):
+            fixture = self._get_cached_global_fixture(data_type, overwrite_cache)
+            return fixture.replace(global_id, b_user_id)
+
+        return self._get_fixtures(global_types, get_fixture)
+
+    def _get_cached_global_fixture(self, data_type, overwrite_cache):
+        """Get the serialized fixture of the version of a global table
 
-    def _get_global_items(self, global_types, domain):
-        def get_items_by_type(data_type):
-            return LookupTableRow.objects.iter_rows(domain, table_id=data_type.id)
+        It is generated the first time the version of the table is
+        requested, and cached compressed in the blob db.
+        """
+        db = get_blob_db()
+        key = data_type.fixture_blob_key
+        if not overwrite_cache:
+            fixture = _get_cached_fixture(db, key)
+            if fixture is not None:
+                _record_fixture_cache('hit')
+                return fixture
 
-        return self._get_fixtures(global_types, get_items_by_type, GLOBAL_USER_ID)
+        with CriticalSection([key]):
+            if not overwrite_cache:
+                # it may have been cached while waiting for the lock
+                fixture = _get_cached_fixture(db, key)
+                if fixture is not None:
+                    _record_fixture_cache('hit')
+                    return fixture
+            _record_fixture_cache('miss')
+            rows = LookupTableRow.objects.iter_rows(data_type.domain, table_id=data_type.id)
+            fixture = self._get_fixture_bytes(
+                data_type,
+                GLOBAL_USER_ID,
+                (self._serialize_row(row, data_type) for row in rows),
+            )
+            db.delete(key=key)
+            db.put(
+                BytesIO(gzip.compress(fixture)),
+                domain=data_type.domain,
+                parent_id=get_fixture_blob_parent_id(data_type.domain),
+                type_code=CODES.fixture,
+                name=data_type.tag,
+                key=key,
+            )
+        return fixture
 
     def get_user_items_and_count(self, user_types, restore_user):
         user_items_count = 0
@@ -160,20 +210,48 @@ class ItemListsProvider(FixtureProvider):
                 items_by_type[data_type].append(item)
                 user_items_count += 1
 
-        def get_items_by_type(data_type):
-            return items_by_type.get(data_type, [])
+        def get_fixture(data_type):
+            items = items_by_type.get(data_type, [])
+            return self._get_fixture_bytes(
+                data_type,
+                restore_user.user_id,
+                self._get_row_fragments(data_type, items),
+            )
 
-        return self._get_fixtures(user_types, get_items_by_type, restore_user.user_id), user_items_count
+        return self._get_fixtures(user_types, get_fixture), user_items_count
 
-    def _get_fixtures(self, data_types, get_items_by_type, user_id):
+    def _get_fixtures(self, data_types, get_fixture):
         fixtures = []
         for data_type in sorted(data_types.values(), key=attrgetter('tag')):
             if data_type.is_indexed:
                 fixtures.append(self._get_schema_element(data_type))
-            items = get_items_by_type(data_type)
-            fixtures.append(self._get_fixture_element(data_type, user_id, items))
+            fixtures.append(get_fixture(data_type))
         return fixtures
 
+    def _get_row_fragments(self, data_type, items):
+        """Yield the serialized rows, using the rows cached for this version
+        of the table"""
+        key_prefix = f'lookup-table-row:{data_type.id.hex}:{data_type.version.hex}:'
+        for chunk in chunked(items, ROW_FRAGMENT_CHUNK_SIZE, list):
+            keys = [key_prefix + item.id.hex for item in chunk]
+            cached = cache.get_many(keys)
+            missing = {}
+            for item, key in zip(chunk, keys):
+                fragment = cached.get(key)
+                if fragment is None:
+                    fragment = missing[key] = self._serialize_row(item, data_type)
+                yield fragment
+            if missing:
+                cache.set_many(missing, ROW_FRAGMENT_CACHE_TIMEOUT)
+
+    def _get_fixture_bytes(self, data_type, user_id, fragments):
+        """Serialize a fixture with the given serialized rows"""
+        fixture_element = self._get_fixture_element(data_type, user_id, [])
+        fixture_element[0].text = ROWS_PLACEHOLDER
+        start, end = ElementTree.tostring(fixture_element, encoding='utf-8').split(
+            ROWS_PLACEHOLDER.encode('utf-8'))
+        return b''.join([start, *fragments, end])
+
     def _get_fixture_element(self, data_type, user_id, items):
         attrib = {
             'id': ':'.join((self.id, data_type.tag)),
@@ -189,6 +267,9 @@ class ItemListsProvider(FixtureProvider):
             item_list_element.append(xml)
         return fixture_element
 
+    def _serialize_row(self, item, data_type):
+        return ElementTree.tostring(self.to_xml(item, data_type), encoding='utf-8')
+
     def _get_schema_element(self, data_type):
         attrs_to_index = [field.field_name for field in data_type.fields if field.is_indexed]
         fixture_id = ':'.join((self.id, data_type.tag))
@@ -223,4 +304,16 @@ class ItemListsProvider(FixtureProvider):
         return xData
 
 
+def _get_cached_fixture(db, key):
+    try:
+        with db.get(key=key, type_code=CODES.fixture) as fileobj:
+            return gzip.decompress(fileobj.read())
+    except NotFound:
+        return None
+
+
+def _record_fixture_cache(result):
+    metrics_counter('commcare.fixtures.item_lists.cache', tags={'result': result})
+
+
 item_lists = ItemListsProvider()
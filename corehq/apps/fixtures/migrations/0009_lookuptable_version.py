@@ -0,0 +1,18 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fixtures', '0008_sqllookuptables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lookuptable',
+            name='version',
+            field=models.UUIDField(default=uuid.uuid4),
+        ),
+    ]
@@ -83,6 +83,8 @@ class LookupTable(models.Model):
     fields = AttrsList(TypeField, default=list)
     item_attributes = models.JSONField(default=list)
     description = models.CharField(max_length=255, default="")
+    # changed when the table or its rows change, see clear_fixture_cache
+    version = models.UUIDField(default=uuid4)
 
     class Meta:
         app_label = 'fixtures'
@@ -92,6 +94,11 @@ class LookupTable(models.Model):
     def is_indexed(self):
         return any(f.is_indexed for f in self.fields)
 
+    @property
+    def fixture_blob_key(self):
+        """Blob db key of the serialized fixture of this version of the table"""
+        return f"{FIXTURE_BUCKET}/{self.domain}/{self.id.hex}/{self.version.hex}"
+
 
 class LookupTableRowManager(models.Manager):
 
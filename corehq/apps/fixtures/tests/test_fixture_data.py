@@ -1,3 +1,4 @@
+from unittest.mock import patch
 from xml.etree import cElementTree as ElementTree
 
 from django.test import TestCase
@@ -8,7 +9,6 @@ from casexml.apps.phone.tests.utils import \
 
 from corehq.apps.fixtures import fixturegenerators
 from corehq.apps.fixtures.models import (
-    FIXTURE_BUCKET,
     Field,
     LookupTable,
     LookupTableRow,
@@ -16,6 +16,7 @@ from corehq.apps.fixtures.models import (
     OwnerType,
     TypeField,
 )
+from corehq.apps.fixtures.utils import clear_fixture_cache
 from corehq.apps.users.models import CommCareUser
 from corehq.blobs import get_blob_db
 
@@ -75,7 +76,7 @@ class FixtureDataTest(TestCase):
             row_id=self.data_item.id,
         )
         self.ownership.save()
-        self.addCleanup(get_blob_db().delete, key=FIXTURE_BUCKET + '/' + self.domain)
+        self.addCleanup(clear_fixture_cache, self.domain)
 
     def test_xml(self):
         check_xml_line_by_line(self, """
@@ -246,11 +247,41 @@ class FixtureDataTest(TestCase):
 
         fixtures = call_fixture_generator(frank)
         self.assertEqual({item.attrib['user_id'] for item in fixtures}, {frank.user_id})
-        self.assertTrue(get_blob_db().exists(key=FIXTURE_BUCKET + '/' + self.domain))
+        self.assertTrue(get_blob_db().exists(key=sandwich.fixture_blob_key))
 
         fixtures = call_fixture_generator(sammy)
         self.assertEqual({item.attrib['user_id'] for item in fixtures}, {sammy.user_id})
 
+    def test_global_fixture_cached_until_table_changes(self):
+        sandwich = self.make_data_type("sandwich", is_global=True)
+        item = self.make_data_item(sandwich, "7.39")
+        restore_user = self.user.to_ota_restore_user(self.domain)
+
+        def get_cost():
+            fixture = call_fixture_generator(restore_user)[0]
+            return fixture.find('sandwich-index_list/sandwich-index/cost').text
+
+        self.assertEqual(get_cost(), "7.39")
+        item.fields = {"cost": [Field(value="8.50")]}
+        item.save()
+        self.assertEqual(get_cost(), "7.39")
+        clear_fixture_cache(self.domain, [sandwich.id])
+        self.assertEqual(get_cost(), "8.50")
+
+    def test_user_rows_serialized_once_per_table_version(self):
+        restore_user = self.user.to_ota_restore_user(self.domain)
+        expected = ElementTree.tostring(call_fixture_generator(restore_user)[0], encoding='utf-8')
+
+        to_xml = fixturegenerators.ItemListsProvider.to_xml
+        with patch.object(fixturegenerators.ItemListsProvider, 'to_xml', side_effect=to_xml) as mock:
+            fixture, = call_fixture_generator(restore_user)
+            mock.assert_not_called()
+            self.assertEqual(ElementTree.tostring(fixture, encoding='utf-8'), expected)
+
+            clear_fixture_cache(self.domain)
+            call_fixture_generator(restore_user)
+            self.assertEqual(mock.call_count, 1)
+
     def make_data_type(self, name, is_global):
         data_type = LookupTable(
             domain=self.domain,
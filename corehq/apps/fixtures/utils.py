@@ -1,4 +1,5 @@
 import re
+from uuid import uuid4
 from xml.etree import cElementTree as ElementTree
 
 from corehq.blobs import get_blob_db
@@ -54,6 +55,38 @@ def get_index_schema_node(fixture_id, attrs_to_index):
     return node
 
 
-def clear_fixture_cache(domain):
+def get_fixture_blob_parent_id(domain):
+    """Blob db parent id of the serialized fixtures of a domain's lookup tables"""
     from corehq.apps.fixtures.models import FIXTURE_BUCKET
-    get_blob_db().delete(key=FIXTURE_BUCKET + '/' + domain)
+    return FIXTURE_BUCKET + '/' + domain
+
+
+def clear_fixture_cache(domain, table_ids=None):
+    """Stop using the cached fixtures of a domain's lookup tables
+
+    Gives the tables new versions, so fixtures being generated from their
+    old rows are cached under keys that won't be used, and deletes the
+    cached fixtures of their old versions.
+
+    :param table_ids: ids of the tables that changed. All of the domain's
+    tables if not given, which also clears the fixtures of deleted tables.
+    """
+    from corehq.apps.fixtures.models import FIXTURE_BUCKET, LookupTable
+    from corehq.blobs import CODES
+    tables = LookupTable.objects.by_domain(domain)
+    if table_ids is not None:
+        tables = tables.filter(id__in=table_ids)
+    old_keys = [table.fixture_blob_key for table in tables.only('id', 'domain', 'version')]
+    tables.update(version=uuid4())
+
+    db = get_blob_db()
+    if table_ids is None:
+        metas = db.metadb.get_for_parent(get_fixture_blob_parent_id(domain), CODES.fixture)
+        if metas:
+            db.bulk_delete(metas=metas)
+    else:
+        for key in old_keys:
+            db.delete(key=key)
+    # fixture of all of the domain's global tables, cached before tables
+    # were cached separately
+    db.delete(key=FIXTURE_BUCKET + '/' + domain)
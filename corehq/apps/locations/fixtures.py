@@ -1,14 +1,17 @@
-from collections import defaultdict
+import hashlib
+from collections import defaultdict, namedtuple
 from itertools import groupby
-from xml.etree.cElementTree import Element, SubElement
+from xml.etree.cElementTree import Element, SubElement, tostring
 
 from django.contrib.postgres.fields.array import ArrayField
+from django.core.cache import cache
 from django.db.models import IntegerField, Q
 
 from django_cte import With
 from django_cte.raw import raw_cte_sql
 
 from casexml.apps.phone.fixtures import FixtureProvider
+from dimagi.utils.chunked import chunked
 
 from corehq import toggles
 from corehq.apps.app_manager.const import (
@@ -24,6 +27,16 @@ from corehq.apps.locations.models import (
     SQLLocation,
     get_domain_locations,
 )
+from corehq.util.metrics import metrics_counter
+
+# serialized subtrees are cached for this many seconds, under a digest of
+# the subtree
+SUBTREE_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+# smaller subtrees are only cached as part of their ancestors' subtrees
+SUBTREE_FRAGMENT_MIN_SIZE = 20
+SUBTREE_FRAGMENT_CHUNK_SIZE = 1000
+# stands in for the children of an element while it is serialized
+CHILDREN_PLACEHOLDER = '{children}'
 
 
 class LocationSet(object):
@@ -124,22 +137,142 @@ class HierarchicalLocationSerializer(object):
         return should_sync_hierarchical_fixture(restore_user.project, app)
 
     def get_xml_nodes(self, domain, fixture_id, user_id, locations_queryset):
-        locations_db = LocationSet(locations_queryset)
+        subtrees = _LocationSubtrees(locations_queryset)
 
         root_node = Element('fixture', {'id': fixture_id, 'user_id': user_id})
-        root_locations = locations_db.root_locations
-
-        if root_locations:
-            data_fields = get_location_data_fields(domain)
-            _append_children(root_node, locations_db, root_locations, data_fields)
-        else:
+        if not subtrees.root_ids:
             # There is a bug on mobile versions prior to 2.27 where
             # a parsing error will cause mobile to ignore the element
             # after this one if this element is empty.
             # So we have to add a dummy empty_element child to prevent
             # this element from being empty.
             root_node.append(Element("empty_element"))
-        return [root_node]
+            return [tostring(root_node, encoding='utf-8')]
+
+        start, end = _serialize_around_children(root_node)
+        children = subtrees.serialize(get_location_data_fields(domain))
+        return [b''.join([start, *children, end])]
+
+
+_SubtreeLocation = namedtuple('_SubtreeLocation', 'name type_code type_name last_modified')
+
+
+class _LocationSubtrees(object):
+    """
+    The locations of a hierarchical fixture, serialized by subtree
+
+    Only the fields that place the locations in the tree are queried up
+    front. Each subtree gets a digest of the ids, types and last modified
+    dates of its locations, and subtrees of at least
+    SUBTREE_FRAGMENT_MIN_SIZE locations are cached serialized under their
+    root and digest. Saving a location changes the digests of the subtrees
+    of the location and its ancestors only, so the rest are reused, by any
+    user whose fixture includes the same subtree. Full locations are only
+    queried for the subtrees that have to be serialized again.
+    """
+
+    def __init__(self, locations_queryset):
+        self.locations = {}
+        self.children = defaultdict(list)
+        rows = locations_queryset.order_by().values_list(
+            'id', 'parent_id', 'name', 'location_type__code', 'location_type__name', 'last_modified')
+        for pk, parent_id, *location in rows:
+            self.locations[pk] = _SubtreeLocation(*location)
+            self.children[parent_id].append(pk)
+        for pks in self.children.values():
+            pks.sort(key=lambda pk: (self.locations[pk].type_code, self.locations[pk].name, pk))
+        self.data_fields = None
+        self.sizes = {}
+        self.digests = {}
+
+    @property
+    def root_ids(self):
+        return self.children[None]
+
+    def serialize(self, data_fields):
+        """Serialized elements of the locations at the root of the tree,
+        grouped by location type"""
+        self.data_fields = data_fields
+        fields_key = ','.join(field.slug for field in data_fields)
+        for pk in self.root_ids:
+            self._set_digests(pk, fields_key)
+        return self._serialize_children(self.root_ids, self._get_fragments(self.root_ids))
+
+    def _set_digests(self, pk, fields_key):
+        location = self.locations[pk]
+        digest = hashlib.md5(':'.join([
+            str(pk), location.last_modified.isoformat(), location.type_code, location.type_name, fields_key,
+        ]).encode('utf-8'))
+        size = 1
+        for child_id in self.children[pk]:
+            self._set_digests(child_id, fields_key)
+            digest.update(self.digests[child_id].encode('utf-8'))
+            size += self.sizes[child_id]
+        self.digests[pk] = digest.hexdigest()
+        self.sizes[pk] = size
+
+    def _get_fragments(self, pks):
+        """Get the serialized subtrees of the given locations by id,
+        serializing those that aren't cached"""
+        keys = {
+            f'location-fixture-subtree:{pk}:{self.digests[pk]}': pk
+            for pk in pks if self.sizes[pk] >= SUBTREE_FRAGMENT_MIN_SIZE
+        }
+        fragments = {}
+        for chunk in chunked(keys, SUBTREE_FRAGMENT_CHUNK_SIZE, list):
+            for key, fragment in cache.get_many(chunk).items():
+                fragments[keys[key]] = fragment
+        _record_subtree_cache('hit', len(fragments))
+        _record_subtree_cache('miss', len(keys) - len(fragments))
+
+        missing = [pk for pk in pks if pk not in fragments]
+        if not missing:
+            return fragments
+        child_fragments = self._get_fragments([
+            child_id for pk in missing for child_id in self.children[pk]
+        ])
+        keys_by_id = {pk: key for key, pk in keys.items()}
+        for chunk in chunked(missing, SUBTREE_FRAGMENT_CHUNK_SIZE, list):
+            to_cache = {}
+            for location in SQLLocation.objects.filter(id__in=chunk).select_related('location_type'):
+                fragment = fragments[location.id] = self._serialize_location(location, child_fragments)
+                if location.id in keys_by_id:
+                    to_cache[keys_by_id[location.id]] = fragment
+            if to_cache:
+                cache.set_many(to_cache, SUBTREE_FRAGMENT_CACHE_TIMEOUT)
+        return fragments
+
+    def _serialize_location(self, location, child_fragments):
+        element = _get_location_element(location, self.data_fields)
+        start, end = _serialize_around_children(element)
+        children = self._serialize_children(self.children[location.id], child_fragments)
+        return b''.join([start, *children, end])
+
+    def _serialize_children(self, pks, fragments):
+        for type_code, pks_of_type in groupby(pks, key=lambda pk: self.locations[pk].type_code):
+            start, end = _serialize_around_children(Element('%ss' % type_code))  # hacky pluralization
+            yield start
+            for pk in pks_of_type:
+                # the location may have been deleted since the tree was queried
+                if pk in fragments:
+                    yield fragments[pk]
+            yield end
+
+
+def _serialize_around_children(element):
+    """Serialize an element into the bytes that come before and after the
+    children that are to be appended to it"""
+    if len(element):
+        element[-1].tail = CHILDREN_PLACEHOLDER
+    else:
+        element.text = CHILDREN_PLACEHOLDER
+    start, end = tostring(element, encoding='utf-8').rsplit(CHILDREN_PLACEHOLDER.encode('utf-8'), 1)
+    return start, end
+
+
+def _record_subtree_cache(result, count):
+    if count:
+        metrics_counter('commcare.fixtures.locations.subtree_cache', value=count, tags={'result': result})
 
 
 class FlatLocationSerializer(object):
@@ -278,25 +411,6 @@ def _location_queryset_helper(domain, location_pks):
     ).with_cte(fixture_ids).prefetch_related('location_type', 'parent')
 
 
-def _append_children(node, location_db, locations, data_fields):
-    for type, locs in _group_by_type(locations):
-        locs = sorted(locs, key=lambda loc: loc.name)
-        node.append(_types_to_fixture(location_db, type, locs, data_fields))
-
-
-def _group_by_type(locations):
-    key = lambda loc: (loc.location_type.code, loc.location_type)
-    for (code, type), locs in groupby(sorted(locations, key=key), key=key):
-        yield type, list(locs)
-
-
-def _types_to_fixture(location_db, type, locs, data_fields):
-    type_node = Element('%ss' % type.code)  # hacky pluralization
-    for loc in locs:
-        type_node.append(_location_to_fixture(location_db, loc, type, data_fields))
-    return type_node
-
-
 def _get_metadata_node(location, data_fields):
     node = Element('location_data')
     # add default empty nodes for all known fields: http://manage.dimagi.com/default.asp?247786
@@ -307,10 +421,11 @@ def _get_metadata_node(location, data_fields):
     return node
 
 
-def _location_to_fixture(location_db, location, type, data_fields):
-    root = Element(type.code, {'id': location.location_id})
+def _get_location_element(location, data_fields):
+    """The element of a location in the hierarchical fixture, without its
+    children"""
+    root = Element(location.location_type.code, {'id': location.location_id})
     _fill_in_location_element(root, location, data_fields)
-    _append_children(root, location_db, location_db.by_parent[location.location_id], data_fields)
     return root
 
 
@@ -31,8 +31,7 @@ from corehq.apps.users.models import CommCareUser
 from corehq.util.test_utils import flag_enabled, generate_cases
 
 from ..fixtures import (
-    LocationSet,
-    _location_to_fixture,
+    _get_location_element,
     get_location_data_fields,
     flat_location_fixture_generator,
     get_location_fixture_queryset,
@@ -104,10 +103,10 @@ class FixtureHasLocationsMixin(TestXmlMixin):
     @flag_enabled('HIERARCHICAL_LOCATION_FIXTURE')
     def _assert_fixture_matches_file(self, xml_name, desired_locations, flat=False):
         if flat:
-            generator = flat_location_fixture_generator
+            fixture = ElementTree.tostring(
+                call_fixture_generator(flat_location_fixture_generator, self.user)[-1], encoding='utf-8')
         else:
-            generator = location_fixture_generator
-        fixture = ElementTree.tostring(call_fixture_generator(generator, self.user)[-1], encoding='utf-8')
+            fixture = call_fixture_generator(location_fixture_generator, self.user)[-1]
         desired_fixture = self._assemble_expected_fixture(xml_name, desired_locations)
         self.assertXmlEqual(desired_fixture, fixture)
 
@@ -141,7 +140,7 @@ class LocationFixturesTest(LocationHierarchyTestCase, FixtureHasLocationsMixin):
     @flag_enabled('HIERARCHICAL_LOCATION_FIXTURE')
     def test_no_user_locations_returns_empty(self):
         empty_fixture = EMPTY_LOCATION_FIXTURE_TEMPLATE.format(self.user.user_id)
-        fixture = ElementTree.tostring(call_fixture_generator(location_fixture_generator, self.user)[0], encoding='utf-8')
+        fixture = call_fixture_generator(location_fixture_generator, self.user)[0]
         self.assertXmlEqual(empty_fixture, fixture)
 
     def test_metadata(self):
@@ -157,13 +156,12 @@ class LocationFixturesTest(LocationHierarchyTestCase, FixtureHasLocationsMixin):
                 'appeared_in_num_episodes': 3,
             },
         )
-        location_db = LocationSet([location])
         data_fields = [
             Field(slug='best_swordsman'),
             Field(slug='in_westeros'),
             Field(slug='appeared_in_num_episodes'),
         ]
-        fixture = _location_to_fixture(location_db, location, location_type, data_fields)
+        fixture = _get_location_element(location, data_fields)
         location_data = {
             e.tag: e.text for e in fixture.find('location_data')
         }
@@ -331,6 +329,37 @@ class LocationFixturesTest(LocationHierarchyTestCase, FixtureHasLocationsMixin):
         )
 
 
+@mock.patch.object(Domain, 'uses_locations', lambda: True)  # removes dependency on accounting
+@mock.patch('corehq.apps.locations.fixtures.SUBTREE_FRAGMENT_MIN_SIZE', 1)
+class LocationFixtureSubtreeCacheTest(LocationHierarchyTestCase, FixtureHasLocationsMixin):
+    location_type_names = ['state', 'county', 'city']
+    location_structure = TEST_LOCATION_STRUCTURE
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_restore_user(self.domain, 'user', '123')
+        self.addCleanup(self.user._couch_user.delete, self.domain, deleted_by=None)
+        self.user._couch_user.set_location(self.locations['Suffolk'])
+
+    def _get_serialized_names(self):
+        with mock.patch('corehq.apps.locations.fixtures._get_location_element',
+                        wraps=_get_location_element) as get_location_element:
+            self._assert_fixture_matches_file(
+                'simple_fixture',
+                ['Massachusetts', 'Suffolk', 'Boston', 'Revere']
+            )
+        return {call.args[0].name for call in get_location_element.call_args_list}
+
+    def test_cached_subtrees_not_serialized_again(self):
+        self._get_serialized_names()
+        self.assertEqual(self._get_serialized_names(), set())
+
+    def test_saving_location_serializes_it_and_its_ancestors(self):
+        self._get_serialized_names()
+        self.locations['Boston'].save()
+        self.assertEqual(self._get_serialized_names(), {'Massachusetts', 'Suffolk', 'Boston'})
+
+
 @mock.patch.object(Domain, 'uses_locations', lambda: True)  # removes dependency on accounting
 class ForkedHierarchiesTest(TestCase, FixtureHasLocationsMixin):
     def setUp(self):
@@ -518,7 +547,7 @@ class WebUserLocationFixturesTest(LocationHierarchyTestCase, FixtureHasLocations
     @flag_enabled('HIERARCHICAL_LOCATION_FIXTURE')
     def test_no_user_locations_returns_empty(self):
         empty_fixture = EMPTY_LOCATION_FIXTURE_TEMPLATE.format(self.user.user_id)
-        fixture = ElementTree.tostring(call_fixture_generator(location_fixture_generator, self.user)[0], encoding='utf-8')
+        fixture = call_fixture_generator(location_fixture_generator, self.user)[0]
         self.assertXmlEqual(empty_fixture, fixture)
 
     def test_simple_location_fixture(self):
@@ -1,3 +1,5 @@
+from xml.etree import cElementTree as ElementTree
+
 from django.test import TestCase
 
 from unittest.mock import patch
@@ -178,7 +180,7 @@ class UnsetLocationGroupTest(LocationGroupBase):
         restore_user = self.user.to_ota_restore_user(self.domain.name)
         fixture = call_fixture_generator(location_fixture_generator, restore_user)
         self.assertEqual(len(fixture), 1)
-        self.assertEqual(len(fixture[0].findall('.//state')), 0)
+        self.assertEqual(len(ElementTree.fromstring(fixture[0]).findall('.//state')), 0)
 
     def test_location_fixture_generator_domain_no_locations(self):
         """
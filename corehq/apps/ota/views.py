@@ -206,6 +206,8 @@ def get_restore_params(request, domain):
         'user_id': request.GET.get('user_id'),
         'skip_fixtures': skip_fixtures,
         'auth_type': getattr(request, 'auth_type', None),
+        'accept_gzip': 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''),
+        'profile': request.GET.get('profile') == 'true',
     }
 
 
@@ -215,7 +217,7 @@ def get_restore_response(domain, couch_user, app_id=None, since=None, version='1
                          cache_timeout=None, overwrite_cache=False,
                          as_user=None, device_id=None, user_id=None,
                          openrosa_version=None,
-                         skip_fixtures=False, auth_type=None):
+                         skip_fixtures=False, auth_type=None, accept_gzip=False, profile=False):
     """
     :param domain: Domain being restored from
     :param couch_user: User performing restore
@@ -234,6 +236,9 @@ def get_restore_response(domain, couch_user, app_id=None, since=None, version='1
     :param skip_fixtures: Do not include fixtures in sync payload
     :param auth_type: The type of auth that was used to authenticate the request.
         Used to determine if the request is coming from an actual user or as part of some automation.
+    :param accept_gzip: The client accepts a gzip encoded response
+    :param profile: Store a profile of the restore on the sync log if profiling
+        is enabled for the domain
     :return: Tuple of (http response, timing context or None)
     """
 
@@ -297,6 +302,11 @@ def get_restore_response(domain, couch_user, app_id=None, since=None, version='1
             app=app,
             device_id=device_id,
             openrosa_version=openrosa_version,
+            accept_gzip=accept_gzip and toggles.GZIP_RESTORE.enabled(domain),
+            profile=(
+                (profile and toggles.PROFILE_RESTORES.enabled(domain, namespace=toggles.NAMESPACE_DOMAIN))
+                or toggles.PROFILE_RESTORES.enabled(restore_user.username, namespace=toggles.NAMESPACE_USER)
+            ),
         ),
         cache_settings=RestoreCacheSettings(
             force_cache=force_cache or async_restore_enabled,
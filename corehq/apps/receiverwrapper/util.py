@@ -246,16 +246,19 @@ def _notify_ignored_form_submission(request, form_meta):
     })
 
 
-def should_ignore_submission(request):
+def should_ignore_submission(request, instance=None):
     """
     If IGNORE_ALL_DEMO_USER_SUBMISSIONS is True then ignore submission if from demo user.
     Else
     If submission request.GET has `submit_mode=demo` and submitting user is not demo_user,
     the submissions should be ignored
+
+    :param instance: XML of the form to check, if the request has more than one
     """
     form_json = None
     if settings.IGNORE_ALL_DEMO_USER_SUBMISSIONS:
-        instance, _ = couchforms.get_instance_and_attachment(request)
+        if instance is None:
+            instance, _ = couchforms.get_instance_and_attachment(request)
         try:
             form_json = convert_xform_to_json(instance)
         except couchforms.XMLSyntaxError:
@@ -271,7 +274,8 @@ def should_ignore_submission(request):
         return False
 
     if form_json is None:
-        instance, _ = couchforms.get_instance_and_attachment(request)
+        if instance is None:
+            instance, _ = couchforms.get_instance_and_attachment(request)
         form_json = convert_xform_to_json(instance)
     return False if from_demo_user(form_json) else True
 
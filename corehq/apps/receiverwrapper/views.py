@@ -49,7 +49,7 @@ from corehq.apps.receiverwrapper.util import (
 )
 from corehq.form_processor.exceptions import XFormLockError
 from corehq.form_processor.models import CommCareCase
-from corehq.form_processor.submission_post import SubmissionPost
+from corehq.form_processor.submission_post import BulkSubmissionPost, SubmissionPost
 from corehq.form_processor.utils import convert_xform_to_json
 from corehq.util.metrics import metrics_counter, metrics_histogram
 from corehq.util.timer import TimingContext, set_request_duration_reporting_threshold
@@ -60,6 +60,9 @@ PROFILE_PROBABILITY = float(os.getenv('COMMCARE_PROFILE_SUBMISSION_PROBABILITY',
 PROFILE_LIMIT = os.getenv('COMMCARE_PROFILE_SUBMISSION_LIMIT')
 PROFILE_LIMIT = int(PROFILE_LIMIT) if PROFILE_LIMIT is not None else 1
 
+# the cases for a group of forms stay locked while the group is processed
+MAX_BULK_SUBMISSION_FORMS = 100
+
 
 @profile_dump('commcare_receiverwapper_process_form.prof', probability=PROFILE_PROBABILITY, limit=PROFILE_LIMIT)
 def _process_form(request, domain, app_id, user_id, authenticated,
@@ -224,6 +227,85 @@ def post_api(request, domain):
     )
 
 
+@waf_allow('XSS_BODY')
+@csrf_exempt
+@api_auth
+@require_permission(HqPermissions.edit_data)
+@require_permission(HqPermissions.access_api)
+@require_POST
+@check_domain_migration
+@toggles.BULK_FORM_SUBMISSION_API.required_decorator()
+@set_request_duration_reporting_threshold(60)
+def post_bulk_api(request, domain):
+    """Submit a batch of forms in one request
+
+    Each form is a separate ``xml_submission_file`` part of a multipart
+    request and the forms are processed in the order of the parts.
+    Attachments are not supported. See ``BulkSubmissionPost``.
+    """
+    if rate_limit_submission(domain):
+        return HttpTooManyRequests()
+
+    if toggles.FORM_SUBMISSION_BLACKLIST.enabled(domain):
+        return openrosa_response.BLACKLISTED_RESPONSE
+
+    files = request.FILES.getlist(MAGIC_PROPERTY)
+    if not files:
+        return HttpResponseBadRequest("No forms found. Submit each form as a '{}' part.".format(MAGIC_PROPERTY))
+    if len(files) > MAX_BULK_SUBMISSION_FORMS:
+        return HttpResponseBadRequest(
+            "Too many forms. Submit at most {} forms per request.".format(MAX_BULK_SUBMISSION_FORMS))
+    if set(request.FILES) - {MAGIC_PROPERTY}:
+        return HttpResponseBadRequest("Attachments are not supported for bulk submissions.")
+
+    instances = [f.read() for f in files]
+    with TimingContext() as timer:
+        app_id, build_id = get_app_and_build_ids(domain, None)
+        bulk_post = BulkSubmissionPost(
+            instances=instances,
+            domain=domain,
+            ignored=[
+                index for index, instance in enumerate(instances)
+                if _should_ignore_bulk_submission(request, instance)
+            ],
+            app_id=app_id,
+            build_id=build_id,
+            auth_context=AuthContext(
+                domain=domain,
+                user_id=request.couch_user.get_id,
+                authenticated=True,
+            ),
+            location=couchforms.get_location(request),
+            received_on=couchforms.get_received_on(request),
+            date_header=couchforms.get_date_header(request),
+            path=couchforms.get_path(request),
+            submit_ip=couchforms.get_submit_ip(request),
+            last_sync_token=couchforms.get_last_sync_token(request),
+            openrosa_headers=couchforms.get_openrosa_headers(request),
+        )
+        results = bulk_post.run()
+
+    for result in results:
+        _record_metrics({'backend': 'sql', 'domain': domain}, result.submission_type, result.response,
+                        xform=result.xform)
+    metrics_histogram(
+        'commcare.xform_submissions.bulk.duration.seconds', timer.duration,
+        bucket_tag='duration', buckets=(1, 5, 20, 60, 120, 300, 600), bucket_unit='s',
+        tags={'domain': domain},
+    )
+    response = bulk_post.get_response(results)
+    response.request_timer = timer  # logged as Sentry breadcrumbs in LogLongRequestMiddleware
+    return response
+
+
+def _should_ignore_bulk_submission(request, instance):
+    try:
+        return should_ignore_submission(request, instance)
+    except couchforms.XMLSyntaxError:
+        # leave it for BulkSubmissionPost to report this form's error
+        return False
+
+
 @waf_allow('XSS_BODY')
 @location_safe
 @csrf_exempt
@@ -0,0 +1,222 @@
+"""
+Compiled evaluation of UCR data sources.
+
+Each data source builds its own filter and indicator trees, so expressions that
+appear in several data sources for the same domain (the domain and doc type
+filters, ``root_doc`` and ``related_doc`` lookups, common properties) are built
+and evaluated once per data source.
+
+``DataSourceCompiler`` builds the trees for a set of data sources through a
+shared node table: identical sub-expressions (after resolving named
+expressions and filters) become a single node, and the result of evaluating a
+shared node against the root document is stored in the ``EvaluationContext`` so
+that every other data source gets it for free. Simple property getters are
+replaced with plain accessors that skip the spec machinery.
+
+Usage::
+
+    compiled_configs = compile_data_sources(configs)
+    eval_context = EvaluationContext(doc)
+    for config in compiled_configs:
+        if config.filter(doc, eval_context):
+            rows = config.get_all_values(doc, eval_context)
+            eval_context.reset_iteration()
+"""
+import json
+
+from dimagi.utils.web import json_handler
+
+from corehq.apps.userreports.expressions.getters import (
+    safe_recursive_lookup,
+    transform_for_datatype,
+)
+from corehq.apps.userreports.models import DataSourceConfiguration
+from corehq.apps.userreports.specs import FactoryContext
+
+SHARED_NODE_CACHE_PREFIX = 'compiled_node'
+
+# these are cheaper to evaluate than to look up in the evaluation context cache
+_UNCACHED_EXPRESSION_TYPES = {
+    'base_iteration_number',
+    'constant',
+    'identity',
+    'property_name',
+    'property_path',
+}
+
+
+def compile_data_sources(configs):
+    """Return a ``CompiledDataSource`` for each config, all sharing one node table"""
+    compiler = DataSourceCompiler()
+    return [compiler.compile(config) for config in configs]
+
+
+class DataSourceCompiler(object):
+
+    def __init__(self):
+        self._nodes = {}
+
+    def compile(self, config):
+        return CompiledDataSource(config, _DataSourceScope(self, config))
+
+    @property
+    def node_count(self):
+        return len(self._nodes)
+
+    def _get_node(self, key, spec, factory_context, build, cacheable):
+        if key not in self._nodes:
+            node = build(spec, factory_context)
+            if cacheable:
+                node = SharedNode(len(self._nodes), node)
+            else:
+                node = _get_accessor(spec, node) or node
+            self._nodes[key] = node
+        return self._nodes[key]
+
+
+class _DataSourceScope(object):
+    """The compiler as seen from a single data source.
+
+    Named expressions and filters are resolved against this data source's
+    definitions so that two references to the same name are only shared if
+    they also share a definition.
+    """
+
+    def __init__(self, compiler, config):
+        self.compiler = compiler
+        self.config = config
+
+    def get_expression(self, spec, factory_context, build):
+        key = ('expression', self._get_spec_key(spec))
+        cacheable = spec.get('type') not in _UNCACHED_EXPRESSION_TYPES
+        return self.compiler._get_node(key, spec, factory_context, build, cacheable)
+
+    def get_filter(self, spec, factory_context, build):
+        key = ('filter', self._get_spec_key(spec))
+        return self.compiler._get_node(key, spec, factory_context, build, cacheable=True)
+
+    def _get_spec_key(self, spec):
+        return json.dumps(self._resolve_names(spec), sort_keys=True, default=json_handler)
+
+    def _resolve_names(self, spec):
+        if isinstance(spec, dict):
+            if spec.get('type') == 'named' and 'name' in spec:
+                name = spec['name']
+                return {
+                    'type': 'named',
+                    'name': name,
+                    'expression': self._resolve_named(self.config.named_expressions, name),
+                    'filter': self._resolve_named(self.config.named_filters, name),
+                }
+            return {key: self._resolve_names(value) for key, value in spec.items()}
+        if isinstance(spec, list):
+            return [self._resolve_names(value) for value in spec]
+        return spec
+
+    def _resolve_named(self, named_specs, name):
+        if name in named_specs:
+            return self._resolve_names(named_specs[name])
+        # not defined on the data source so it comes from the domain's expression registry
+        return {'domain': self.config.domain}
+
+
+class SharedNode(object):
+    """Wraps an expression or filter that may be used by several data sources.
+
+    Results for the root document are stored in the evaluation context, which
+    is shared by all data sources that process the document.
+    """
+
+    def __init__(self, node_id, node):
+        self._node_id = node_id
+        self._node = node
+
+    def __call__(self, item, evaluation_context=None):
+        if evaluation_context is None or item is not evaluation_context.root_doc:
+            return self._node(item, evaluation_context)
+
+        cache_key = (SHARED_NODE_CACHE_PREFIX, self._node_id, evaluation_context.iteration)
+        if evaluation_context.exists_in_cache(cache_key):
+            return evaluation_context.get_cache_value(cache_key)
+        result = self._node(item, evaluation_context)
+        evaluation_context.set_cache_value(cache_key, result)
+        return result
+
+    def __getattr__(self, attr):
+        return getattr(self._node, attr)
+
+    def __str__(self):
+        return str(self._node)
+
+
+class PropertyNameAccessor(object):
+
+    def __init__(self, property_name, datatype):
+        self.property_name = property_name
+        self.datatype = datatype
+        self._transform = transform_for_datatype(datatype)
+
+    def __call__(self, item, evaluation_context=None):
+        raw_value = item.get(self.property_name) if isinstance(item, dict) else None
+        return self._transform(raw_value)
+
+    def __str__(self):
+        return self.property_name
+
+
+class PropertyPathAccessor(object):
+
+    def __init__(self, property_path, datatype):
+        self.property_path = property_path
+        self.datatype = datatype
+        self._transform = transform_for_datatype(datatype)
+
+    def __call__(self, item, evaluation_context=None):
+        return self._transform(safe_recursive_lookup(item, self.property_path))
+
+    def __str__(self):
+        return "/".join(self.property_path)
+
+
+def _get_accessor(spec, expression):
+    """Replace property getters with a pre-resolved accessor where possible"""
+    if spec.get('type') == 'property_path':
+        return PropertyPathAccessor(list(expression.property_path), expression.datatype)
+    if spec.get('type') == 'property_name' and isinstance(expression.property_name, str):
+        return PropertyNameAccessor(expression.property_name, expression.datatype)
+    return None
+
+
+class CompiledDataSource(object):
+    """Evaluates a data source using trees built by a ``DataSourceCompiler``.
+
+    Attributes not related to evaluation are read from the underlying config,
+    so this can be used in place of the config when processing documents.
+    """
+
+    def __init__(self, config, scope):
+        self.config = config
+        factory_context = FactoryContext(
+            config.named_expression_objects,
+            config.named_filter_objects,
+            config.domain,
+            compiler=scope,
+        )
+        self._main_filter = config._get_filter([config.referenced_doc_type], factory_context=factory_context)
+        self._compiled_validations = config._build_validations(factory_context)
+        self.indicators = config._build_indicators(factory_context)
+        self.parsed_expression = config._build_parsed_expression(factory_context)
+
+    def __getattr__(self, attr):
+        return getattr(self.config, attr)
+
+    def _get_main_filter(self):
+        return self._main_filter
+
+    def _validations(self):
+        return self._compiled_validations
+
+    filter = DataSourceConfiguration.filter
+    validate_document = DataSourceConfiguration.validate_document
+    get_items = DataSourceConfiguration.get_items
+    get_all_values = DataSourceConfiguration.get_all_values
@@ -391,6 +391,12 @@ class ExpressionFactory(object):
         factory_context = factory_context or FactoryContext.empty()
         if _is_literal(spec):
             return cls.from_spec(_convert_constant_to_expression_spec(spec), factory_context)
+        if factory_context.compiler is not None:
+            return factory_context.compiler.get_expression(spec, factory_context, cls._from_spec)
+        return cls._from_spec(spec, factory_context)
+
+    @classmethod
+    def _from_spec(cls, spec, factory_context):
         try:
             return cls.spec_map[spec['type']](spec, factory_context)
         except KeyError:
@@ -91,6 +91,12 @@ class FilterFactory(object):
     def from_spec(cls, spec, factory_context=None):
         factory_context = factory_context or FactoryContext.empty()
         cls.validate_spec(spec)
+        if factory_context.compiler is not None:
+            return factory_context.compiler.get_filter(spec, factory_context, cls._from_spec)
+        return cls._from_spec(spec, factory_context)
+
+    @classmethod
+    def _from_spec(cls, spec, factory_context):
         try:
             return cls.constructor_map[spec['type']](spec, factory_context)
         except (AssertionError, BadValueError, WrappingAttributeError) as e:
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from corehq.apps.change_feed.data_sources import (
+    get_document_store_for_doc_type,
+)
+from corehq.apps.userreports.compiler import compile_data_sources
+from corehq.apps.userreports.dbaccessors import get_datasources_for_domain
+from corehq.apps.userreports.specs import EvaluationContext
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the compiled and interpreted UCR evaluators "
+        "for all of a domain's data sources over a set of documents"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('domain')
+        parser.add_argument('doc_type', help='Referenced doc type, e.g. CommCareCase or XFormInstance')
+        parser.add_argument('doc_ids', nargs='+')
+        parser.add_argument('--iterations', type=int, default=10)
+
+    def handle(self, domain, doc_type, doc_ids, iterations, **options):
+        configs = [
+            config for config in get_datasources_for_domain(domain, doc_type, include_static=True)
+            if not config.is_deactivated
+        ]
+        doc_store = get_document_store_for_doc_type(domain, doc_type, load_source="benchmark_compiled_ucr")
+        docs = list(doc_store.iter_documents(doc_ids))
+        print(f"{len(configs)} data sources, {len(docs)} documents, {iterations} iterations")
+
+        compiled_configs = compile_data_sources(configs)
+        interpreted_rows = _evaluate(configs, docs)
+        compiled_rows = _evaluate(compiled_configs, docs)
+        if _comparable(interpreted_rows) != _comparable(compiled_rows):
+            print("WARNING: compiled evaluator produced different rows")
+
+        interpreted = _benchmark(configs, docs, iterations)
+        compiled = _benchmark(compiled_configs, docs, iterations)
+        print(f"interpreted: {interpreted:.1f} docs/sec")
+        print(f"compiled:    {compiled:.1f} docs/sec ({compiled / interpreted:.2f}x)")
+
+
+def _benchmark(configs, docs, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        _evaluate(configs, docs)
+    return len(docs) * iterations / (time.perf_counter() - start)
+
+
+def _evaluate(configs, docs):
+    rows = []
+    for doc in docs:
+        eval_context = EvaluationContext(doc)
+        for config in configs:
+            if config.filter(doc, eval_context):
+                rows.append(config.get_all_values(doc, eval_context))
+                eval_context.reset_iteration()
+    return rows
+
+
+def _comparable(rows_by_config):
+    return [
+        [
+            [(value.column.id, value.value) for value in row if value.column.id != 'inserted_at']
+            for row in rows
+        ]
+        for rows in rows_by_config
+    ]
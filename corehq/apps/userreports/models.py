@@ -332,11 +332,14 @@ class DataSourceConfiguration(CachedCouchDocumentMixin, Document, AbstractUCRDat
 
     @memoized
     def _validations(self):
+        return self._build_validations(self.get_factory_context())
+
+    def _build_validations(self, factory_context):
         return [
             _Validation(
                 validation.name,
                 validation.error_message,
-                FilterFactory.from_spec(validation.expression, self.get_factory_context())
+                FilterFactory.from_spec(validation.expression, factory_context)
             )
             for validation in self.validations
         ]
@@ -349,7 +352,7 @@ class DataSourceConfiguration(CachedCouchDocumentMixin, Document, AbstractUCRDat
     def _get_deleted_filter(self):
         return self._get_filter(get_deleted_doc_types(self.referenced_doc_type), include_configured=False)
 
-    def _get_filter(self, doc_types, include_configured=True):
+    def _get_filter(self, doc_types, include_configured=True, factory_context=None):
         if not doc_types:
             return None
 
@@ -380,7 +383,7 @@ class DataSourceConfiguration(CachedCouchDocumentMixin, Document, AbstractUCRDat
                 'type': 'and',
                 'filters': built_in_filters + extras,
             },
-            self.get_factory_context(),
+            factory_context or self.get_factory_context(),
         )
 
     def _get_domain_filter_spec(self):
@@ -434,6 +437,9 @@ class DataSourceConfiguration(CachedCouchDocumentMixin, Document, AbstractUCRDat
     @property
     @memoized
     def default_indicators(self):
+        return self._build_default_indicators(self.get_factory_context())
+
+    def _build_default_indicators(self, factory_context):
         default_indicators = [IndicatorFactory.from_spec({
             "column_id": "doc_id",
             "type": "expression",
@@ -448,26 +454,29 @@ class DataSourceConfiguration(CachedCouchDocumentMixin, Document, AbstractUCRDat
                     "property_name": "_id"
                 }
             }
-        }, self.get_factory_context())]
+        }, factory_context)]
 
         default_indicators.append(IndicatorFactory.from_spec({
             "type": "inserted_at",
-        }, self.get_factory_context()))
+        }, factory_context))
 
         if self.base_item_expression:
             default_indicators.append(IndicatorFactory.from_spec({
                 "type": "repeat_iteration",
-            }, self.get_factory_context()))
+            }, factory_context))
 
         return default_indicators
 
     @property
     @memoized
     def indicators(self):
+        return self._build_indicators(self.get_factory_context())
+
+    def _build_indicators(self, factory_context):
         return CompoundIndicator(
             self.display_name,
-            self.default_indicators + [
-                IndicatorFactory.from_spec(indicator, self.get_factory_context())
+            self._build_default_indicators(factory_context) + [
+                IndicatorFactory.from_spec(indicator, factory_context)
                 for indicator in self.configured_indicators
             ],
             None,
@@ -476,8 +485,11 @@ class DataSourceConfiguration(CachedCouchDocumentMixin, Document, AbstractUCRDat
     @property
     @memoized
     def parsed_expression(self):
+        return self._build_parsed_expression(self.get_factory_context())
+
+    def _build_parsed_expression(self, factory_context):
         if self.base_item_expression:
-            return ExpressionFactory.from_spec(self.base_item_expression, self.get_factory_context())
+            return ExpressionFactory.from_spec(self.base_item_expression, factory_context)
         return None
 
     @memoized
@@ -716,10 +728,8 @@ class RegistryDataSourceConfiguration(DataSourceConfiguration):
             "property_value": self.data_domains,
         }
 
-    @property
-    @memoized
-    def default_indicators(self):
-        default_indicators = super().default_indicators
+    def _build_default_indicators(self, factory_context):
+        default_indicators = super()._build_default_indicators(factory_context)
         default_indicators.append(IndicatorFactory.from_spec({
             "column_id": "commcare_project",
             "type": "expression",
@@ -734,7 +744,7 @@ class RegistryDataSourceConfiguration(DataSourceConfiguration):
                     "property_name": "domain"
                 }
             }
-        }, self.get_factory_context()))
+        }, factory_context))
         return default_indicators
 
     @classmethod
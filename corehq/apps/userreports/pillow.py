@@ -1,7 +1,12 @@
 import hashlib
+import multiprocessing
+import pickle
 import signal
+import time
 from abc import ABC, abstractmethod
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 
 from django.conf import settings
@@ -13,6 +18,7 @@ from corehq.apps.change_feed.consumer.feed import (
 from corehq.apps.change_feed.topics import LOCATION as LOCATION_TOPIC, CASE_TOPICS
 from corehq.apps.domain.dbaccessors import get_domain_ids_by_names
 from corehq.apps.domain_migration_flags.api import all_domains_with_migrations_in_progress
+from corehq.apps.userreports.compiler import compile_data_sources
 from corehq.apps.userreports.const import KAFKA_TOPICS
 from corehq.apps.userreports.data_source_providers import (
     DynamicDataSourceProvider,
@@ -21,12 +27,17 @@ from corehq.apps.userreports.data_source_providers import (
 from corehq.apps.userreports.exceptions import (
     UserReportsWarning,
 )
-from corehq.apps.userreports.models import AsyncIndicator
+from corehq.apps.userreports.models import (
+    AsyncIndicator,
+    DataSourceConfiguration,
+    RegistryDataSourceConfiguration,
+)
 from corehq.apps.userreports.pillow_utils import rebuild_sql_tables
 from corehq.apps.userreports.specs import EvaluationContext
+from corehq.apps.userreports.transform_worker import init_transform_worker
 from corehq.apps.userreports.util import get_indicator_adapter
 from corehq.pillows.base import is_couch_change_for_sql_domain
-from corehq.util.metrics import metrics_counter, metrics_histogram_timer
+from corehq.util.metrics import metrics_counter, metrics_histogram, metrics_histogram_timer
 from corehq.util.timer import TimingContext
 from pillowtop.checkpoints.manager import KafkaPillowCheckpoint
 from pillowtop.const import DEFAULT_PROCESSOR_CHUNK_SIZE
@@ -38,6 +49,7 @@ from pillowtop.utils import ensure_document_exists, ensure_matched_revisions, bu
 
 REBUILD_CHECK_INTERVAL = 3 * 60 * 60  # in seconds
 LONG_UCR_LOGGING_THRESHOLD = 0.5
+UCR_TIMING_BUCKETS = (.03, .1, .3, 1, 3, 10)
 
 
 class WarmShutdown(object):
@@ -384,6 +396,119 @@ class RegistryDataSourceTableManager(UcrTableManager):
             self._add_adapter_for_data_source(config)
 
 
+class _TransformResult(object):
+    """Output of the UCR transform step for a batch of documents.
+
+    Everything is keyed by config ID rather than by adapter so that results can be
+    returned from a transform pool worker.
+    """
+
+    def __init__(self):
+        self.rows_by_config = defaultdict(list)
+        self.to_delete_by_config = defaultdict(list)
+        self.async_configs_by_doc_id = defaultdict(list)
+        self.exceptions = []
+        self.doc_durations = []
+        self.durations_by_config = defaultdict(list)
+
+    def merge(self, other):
+        for config_id, rows in other.rows_by_config.items():
+            self.rows_by_config[config_id].extend(rows)
+        for config_id, docs in other.to_delete_by_config.items():
+            self.to_delete_by_config[config_id].extend(docs)
+        for doc_id, config_ids in other.async_configs_by_doc_id.items():
+            self.async_configs_by_doc_id[doc_id].extend(config_ids)
+        self.exceptions.extend(other.exceptions)
+        self.doc_durations.extend(other.doc_durations)
+        for config_id, durations in other.durations_by_config.items():
+            self.durations_by_config[config_id].extend(durations)
+
+
+def _transform_docs(configs, docs, subtypes_by_doc_id):
+    """Evaluate the filters and indicators of each config against each doc.
+
+    This is called in-process for the serial path and in a pool worker when
+    ``transform_processes`` is set, so it must not depend on the adapters.
+    """
+    result = _TransformResult()
+    for doc in docs:
+        doc_subtype = subtypes_by_doc_id.get(doc['_id'])
+        eval_context = EvaluationContext(doc)
+        doc_start = time.monotonic()
+        for config in configs:
+            config_start = time.monotonic()
+            if config.filter(doc, eval_context):
+                if config.asynchronous:
+                    result.async_configs_by_doc_id[doc['_id']].append(config._id)
+                else:
+                    try:
+                        result.rows_by_config[config._id].extend(config.get_all_values(doc, eval_context))
+                    except Exception as e:
+                        result.exceptions.append((doc['_id'], e))
+                    eval_context.reset_iteration()
+            elif not doc_subtype or doc_subtype in config.get_case_type_or_xmlns_filter():
+                # Delete if the subtype is unknown or
+                # if the subtype matches our filters, but the full filter no longer applies
+                result.to_delete_by_config[config._id].append(doc)
+            result.durations_by_config[config._id].append(time.monotonic() - config_start)
+        result.doc_durations.append(time.monotonic() - doc_start)
+    return result
+
+
+# data sources wrapped by this transform pool worker, keyed by (_id, _rev)
+_worker_configs = {}
+# compiled data sources in this transform pool worker, keyed by their configs
+_worker_compiled_configs = {}
+
+
+def _transform_docs_in_worker(config_jsons, docs, subtypes_by_doc_id, compile_expressions=False):
+    configs = [_get_worker_config(config_json) for config_json in config_jsons]
+    if compile_expressions:
+        key = tuple(id(config) for config in configs)
+        if key not in _worker_compiled_configs:
+            if len(_worker_compiled_configs) >= 100:
+                _worker_compiled_configs.clear()
+            _worker_compiled_configs[key] = compile_data_sources(configs)
+        configs = _worker_compiled_configs[key]
+    result = _transform_docs(configs, docs, subtypes_by_doc_id)
+    result.exceptions = [
+        (doc_id, _picklable_exception(exception))
+        for doc_id, exception in result.exceptions
+    ]
+    return result
+
+
+def _get_worker_config(config_json):
+    # configs are sent as JSON since their built expressions can't be pickled
+    key = (config_json['_id'], config_json.get('_rev'))
+    if key not in _worker_configs:
+        for stale_key in [k for k in _worker_configs if k[0] == key[0]]:
+            del _worker_configs[stale_key]
+        if config_json['doc_type'] == "RegistryDataSourceConfiguration":
+            _worker_configs[key] = RegistryDataSourceConfiguration.wrap(config_json)
+        else:
+            _worker_configs[key] = DataSourceConfiguration.wrap(config_json)
+    return _worker_configs[key]
+
+
+def _picklable_exception(exception):
+    try:
+        pickle.dumps(exception)
+    except Exception:
+        return Exception(repr(exception))
+    return exception
+
+
+def _get_subtypes_by_doc_id(changes):
+    return {change.id: change.metadata.document_subtype for change in changes}
+
+
+def _split_docs(docs, num_batches):
+    batch_size = max(1, -(-len(docs) // num_batches))
+    for start in range(0, len(docs), batch_size):
+        yield docs[start:start + batch_size]
+
+
 class ConfigurableReportPillowProcessor(BulkPillowProcessor):
     """Generic processor for UCR.
 
@@ -396,8 +521,19 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
       - UCR database
     """
 
-    def __init__(self, table_manager):
+    def __init__(self, table_manager, transform_processes=0, compile_expressions=False):
+        """
+        :param transform_processes: if set, the filter and indicator evaluation for each
+            chunk of changes is spread over a pool of this many worker processes.
+        :param compile_expressions: if set, chunks are evaluated with all the domain's data
+            sources compiled together so that shared sub-expressions are only evaluated once
+            per document. See ``corehq.apps.userreports.compiler``.
+        """
         self.table_manager = table_manager
+        self.transform_processes = transform_processes
+        self.compile_expressions = compile_expressions
+        self._transform_pool = None
+        self._compiled_configs_by_domain = {}
 
     domain_timing_context = Counter()
 
@@ -426,6 +562,9 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
             if change.metadata.domain and change.metadata.domain in self.table_manager.relevant_domains:
                 changes_by_domain[change.metadata.domain].append(change)
 
+        if self.transform_processes:
+            return self._process_chunk_in_pool(changes_by_domain)
+
         retry_changes = set()
         change_exceptions = []
         for domain, changes_chunk in changes_by_domain.items():
@@ -439,42 +578,98 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
     def _process_chunk_for_domain(self, domain, changes_chunk):
         adapters = self.table_manager.get_adapters(domain)
         changes_by_id = {change.id: change for change in changes_chunk}
-        to_delete_by_adapter = defaultdict(list)
-        rows_to_save_by_adapter = defaultdict(list)
-        async_configs_by_doc_id = defaultdict(list)
         to_update = {change for change in changes_chunk if not change.deleted}
         with self._metrics_timer('extract'):
             retry_changes, docs = bulk_fetch_changes_docs(to_update, domain)
-        change_exceptions = []
 
         with self._metrics_timer('single_batch_transform'):
-            for doc in docs:
-                change = changes_by_id[doc['_id']]
-                doc_subtype = change.metadata.document_subtype
-                eval_context = EvaluationContext(doc)
-                with self._metrics_timer('single_doc_transform'):
-                    for adapter in adapters:
-                        with self._per_config_metrics_timer('transform', adapter.config._id):
-                            if adapter.config.filter(doc, eval_context):
-                                if adapter.run_asynchronous:
-                                    async_configs_by_doc_id[doc['_id']].append(adapter.config._id)
-                                else:
-                                    try:
-                                        rows_to_save_by_adapter[adapter].extend(adapter.get_all_values(doc, eval_context))
-                                    except Exception as e:
-                                        change_exceptions.append((change, e))
-                                    eval_context.reset_iteration()
-                            elif (not doc_subtype
-                                    or doc_subtype in adapter.config.get_case_type_or_xmlns_filter()):
-                                # Delete if the subtype is unknown or
-                                # if the subtype matches our filters, but the full filter no longer applies
-                                to_delete_by_adapter[adapter].append(doc)
+            result = _transform_docs(
+                self._get_transform_configs(domain, adapters), docs, _get_subtypes_by_doc_id(changes_chunk)
+            )
+        self._record_transform_timings(result)
+
+        return self._load_chunk_for_domain(domain, adapters, changes_by_id, to_update, result, retry_changes)
+
+    def _process_chunk_in_pool(self, changes_by_domain):
+        """Fan the transform step out to the worker pool.
+
+        Documents are fetched in this process, split into one batch per worker for
+        each domain and evaluated in parallel. The rows are then loaded here so that
+        all database writes and retry handling stay the same as the serial path.
+        """
+        pool = self._get_transform_pool()
+        retry_changes = set()
+        change_exceptions = []
+        pending = []
+        for domain, changes_chunk in changes_by_domain.items():
+            adapters = self.table_manager.get_adapters(domain)
+            config_jsons = [adapter.config.to_json() for adapter in adapters]
+            changes_by_id = {change.id: change for change in changes_chunk}
+            to_update = {change for change in changes_chunk if not change.deleted}
+            with self._metrics_timer('extract'):
+                failed, docs = bulk_fetch_changes_docs(to_update, domain)
+            retry_changes.update(failed)
+            subtypes_by_doc_id = _get_subtypes_by_doc_id(changes_chunk)
+            futures = [
+                pool.submit(
+                    _transform_docs_in_worker, config_jsons, docs_batch, subtypes_by_doc_id,
+                    self.compile_expressions
+                )
+                for docs_batch in _split_docs(docs, self.transform_processes)
+            ]
+            pending.append((domain, adapters, changes_by_id, to_update, futures))
+
+        for domain, adapters, changes_by_id, to_update, futures in pending:
+            result = _TransformResult()
+            failed = set()
+            with self._metrics_timer('single_batch_transform'):
+                for future in futures:
+                    try:
+                        result.merge(future.result())
+                    except Exception as e:
+                        if isinstance(e, BrokenProcessPool):
+                            self._shutdown_transform_pool()
+                        pillow_logging.exception("UCR transform worker failed for domain %s", domain)
+                        failed.update(changes_by_id.values())
+            if failed:
+                # don't load partial results, the whole domain chunk will be reprocessed
+                retry_changes.update(failed)
+                continue
+            self._record_transform_timings(result)
+            with WarmShutdown():
+                failed, exceptions = self._load_chunk_for_domain(
+                    domain, adapters, changes_by_id, to_update, result, set()
+                )
+            retry_changes.update(failed)
+            change_exceptions.extend(exceptions)
+
+        return retry_changes, change_exceptions
+
+    def _get_transform_configs(self, domain, adapters):
+        configs = [adapter.config for adapter in adapters]
+        if not self.compile_expressions:
+            return configs
+
+        # the compiled configs keep references to the configs so their ids can't be reused
+        key = tuple(id(config) for config in configs)
+        cached_key, compiled_configs = self._compiled_configs_by_domain.get(domain, (None, None))
+        if cached_key != key:
+            compiled_configs = compile_data_sources(configs)
+            self._compiled_configs_by_domain[domain] = (key, compiled_configs)
+        return compiled_configs
+
+    def _load_chunk_for_domain(self, domain, adapters, changes_by_id, to_update, result, retry_changes):
+        changes_chunk = list(changes_by_id.values())
+        change_exceptions = [
+            (changes_by_id[doc_id], exception)
+            for doc_id, exception in result.exceptions
+        ]
 
         with self._metrics_timer('single_batch_delete'):
             # bulk delete by adapter
             to_delete = [{'_id': c.id} for c in changes_chunk if c.deleted]
             for adapter in adapters:
-                delete_docs = to_delete_by_adapter[adapter] + to_delete
+                delete_docs = result.to_delete_by_config[adapter.config._id] + to_delete
                 if not delete_docs:
                     continue
                 with self._per_config_metrics_timer('delete', adapter.config._id):
@@ -486,45 +681,85 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
 
         with self._metrics_timer('single_batch_load'):
             # bulk update by adapter
-            for adapter, rows in rows_to_save_by_adapter.items():
+            for adapter in adapters:
+                rows = result.rows_by_config.get(adapter.config._id)
+                if rows is None:
+                    continue
                 with self._per_config_metrics_timer('load', adapter.config._id):
                     try:
                         adapter.save_rows(rows)
                     except Exception:
                         retry_changes.update(to_update)
 
-        if async_configs_by_doc_id:
+        if result.async_configs_by_doc_id:
             with self._metrics_timer('async_config_load'):
                 doc_type_by_id = {
                     _id: changes_by_id[_id].metadata.document_type
-                    for _id in async_configs_by_doc_id.keys()
+                    for _id in result.async_configs_by_doc_id.keys()
                 }
-                AsyncIndicator.bulk_update_records(async_configs_by_doc_id, domain, doc_type_by_id)
+                AsyncIndicator.bulk_update_records(result.async_configs_by_doc_id, domain, doc_type_by_id)
 
         return retry_changes, change_exceptions
 
+    def _record_transform_timings(self, result):
+        for duration in result.doc_durations:
+            metrics_histogram(
+                'commcare.change_feed.processor.timing', duration,
+                bucket_tag='duration', buckets=UCR_TIMING_BUCKETS, bucket_unit='s',
+                tags=self._metrics_tags('single_doc_transform'),
+            )
+        for config_id, durations in result.durations_by_config.items():
+            for duration in durations:
+                metrics_histogram(
+                    'commcare.change_feed.urc.timing', duration,
+                    bucket_tag='duration', buckets=UCR_TIMING_BUCKETS, bucket_unit='s',
+                    tags=self._per_config_metrics_tags('transform', config_id),
+                )
+
+    def _get_transform_pool(self):
+        if self._transform_pool is None:
+            # workers are spawned so that they don't share this process's
+            # connections or threads, see corehq.apps.userreports.transform_worker
+            self._transform_pool = ProcessPoolExecutor(
+                max_workers=self.transform_processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_transform_worker,
+            )
+        return self._transform_pool
+
+    def _shutdown_transform_pool(self):
+        if self._transform_pool is not None:
+            self._transform_pool.shutdown(wait=False)
+            self._transform_pool = None
+
     def _metrics_timer(self, step, config_id=None):
+        return metrics_histogram_timer(
+            'commcare.change_feed.processor.timing',
+            timing_buckets=UCR_TIMING_BUCKETS, tags=self._metrics_tags(step, config_id)
+        )
+
+    def _metrics_tags(self, step, config_id=None):
         tags = {
             'action': step,
             'index': 'ucr',
         }
         if config_id and settings.ENTERPRISE_MODE:
             tags['config_id'] = config_id
+        return tags
+
+    def _per_config_metrics_timer(self, step, config_id):
         return metrics_histogram_timer(
-            'commcare.change_feed.processor.timing',
-            timing_buckets=(.03, .1, .3, 1, 3, 10), tags=tags
+            'commcare.change_feed.urc.timing',
+            timing_buckets=UCR_TIMING_BUCKETS, tags=self._per_config_metrics_tags(step, config_id)
         )
 
-    def _per_config_metrics_timer(self, step, config_id):
+    def _per_config_metrics_tags(self, step, config_id):
         tags = {
             'action': step,
         }
         if settings.ENTERPRISE_MODE:
             tags['config_id'] = config_id
-        return metrics_histogram_timer(
-            'commcare.change_feed.urc.timing',
-            timing_buckets=(.03, .1, .3, 1, 3, 10), tags=tags
-        )
+        return tags
 
     def process_change(self, change):
         self.bootstrap_if_needed()
@@ -628,7 +863,9 @@ def get_ucr_processor(data_source_providers,
                       exclude_ucrs=None,
                       bootstrap_interval=None,
                       run_migrations=True,
-                      ucr_configs=None):
+                      ucr_configs=None,
+                      transform_processes=0,
+                      compile_expressions=False):
     table_manager = ConfigurableReportTableManager(
         data_source_providers=data_source_providers,
         ucr_division=ucr_division,
@@ -642,10 +879,13 @@ def get_ucr_processor(data_source_providers,
             config for config in ucr_configs
             if config.doc_type == "DataSourceConfiguration"
         ])
-    return ConfigurableReportPillowProcessor(table_manager)
+    return ConfigurableReportPillowProcessor(
+        table_manager, transform_processes=transform_processes, compile_expressions=compile_expressions
+    )
 
 
-def get_data_registry_ucr_processor(run_migrations, ucr_configs):
+def get_data_registry_ucr_processor(run_migrations, ucr_configs, transform_processes=0,
+                                    compile_expressions=False):
     table_manager = RegistryDataSourceTableManager(
         run_migrations=run_migrations
     )
@@ -654,15 +894,21 @@ def get_data_registry_ucr_processor(run_migrations, ucr_configs):
             config for config in ucr_configs
             if config.doc_type == "RegistryDataSourceConfiguration"
         ])
-    return ConfigurableReportPillowProcessor(table_manager)
+    return ConfigurableReportPillowProcessor(
+        table_manager, transform_processes=transform_processes, compile_expressions=compile_expressions
+    )
 
 
 def get_kafka_ucr_pillow(pillow_id='kafka-ucr-main', ucr_division=None,
                          include_ucrs=None, exclude_ucrs=None, topics=None,
                          num_processes=1, process_num=0, dedicated_migration_process=False,
-                         processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, **kwargs):
+                         processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, transform_processes=0,
+                         compile_expressions=False, **kwargs):
     """UCR pillow that reads from all Kafka topics and writes data into the UCR database tables.
 
+    Set ``transform_processes`` to evaluate data source indicators in a pool of worker processes
+    and ``compile_expressions`` to share sub-expressions between a domain's data sources.
+
         Processors:
           - :py:class:`corehq.apps.userreports.pillow.ConfigurableReportPillowProcessor`
     """
@@ -677,7 +923,9 @@ def get_kafka_ucr_pillow(pillow_id='kafka-ucr-main', ucr_division=None,
         run_migrations=(process_num == 0)  # only first process runs migrations
     )
     return ConfigurableReportKafkaPillow(
-        processor=ConfigurableReportPillowProcessor(table_manager),
+        processor=ConfigurableReportPillowProcessor(
+            table_manager, transform_processes=transform_processes, compile_expressions=compile_expressions
+        ),
         pillow_name=pillow_id,
         topics=topics,
         num_processes=num_processes,
@@ -690,7 +938,8 @@ def get_kafka_ucr_pillow(pillow_id='kafka-ucr-main', ucr_division=None,
 def get_kafka_ucr_static_pillow(pillow_id='kafka-ucr-static', ucr_division=None,
                                 include_ucrs=None, exclude_ucrs=None, topics=None,
                                 num_processes=1, process_num=0, dedicated_migration_process=False,
-                                processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, **kwargs):
+                                processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, transform_processes=0,
+                                compile_expressions=False, **kwargs):
     """UCR pillow that reads from all Kafka topics and writes data into the UCR database tables.
 
     Only processes `static` UCR datasources (configuration lives in the codebase instead of the database).
@@ -710,7 +959,9 @@ def get_kafka_ucr_static_pillow(pillow_id='kafka-ucr-static', ucr_division=None,
         run_migrations=(process_num == 0)  # only first process runs migrations
     )
     return ConfigurableReportKafkaPillow(
-        processor=ConfigurableReportPillowProcessor(table_manager),
+        processor=ConfigurableReportPillowProcessor(
+            table_manager, transform_processes=transform_processes, compile_expressions=compile_expressions
+        ),
         pillow_name=pillow_id,
         topics=topics,
         num_processes=num_processes,
@@ -760,7 +1011,8 @@ def get_location_pillow(pillow_id='location-ucr-pillow', include_ucrs=None,
 def get_kafka_ucr_registry_pillow(
     pillow_id='kafka-ucr-registry',
     num_processes=1, process_num=0, dedicated_migration_process=False,
-    processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, ucr_configs=None, **kwargs):
+    processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, ucr_configs=None, transform_processes=0,
+    compile_expressions=False, **kwargs):
     """UCR pillow that reads from all 'case' Kafka topics and writes data into the UCR database tables
 
     Only UCRs backed by Data Registries are processed in this pillow.
@@ -770,7 +1022,9 @@ def get_kafka_ucr_registry_pillow(
     """
     ucr_processor = get_data_registry_ucr_processor(
         run_migrations=(process_num == 0),  # only first process runs migrations
-        ucr_configs=ucr_configs
+        ucr_configs=ucr_configs,
+        transform_processes=transform_processes,
+        compile_expressions=compile_expressions,
     )
 
     return ConfigurableReportKafkaPillow(
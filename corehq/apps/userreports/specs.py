@@ -28,6 +28,9 @@ class FactoryContext():
 
     domain: Optional[str] = None
 
+    # set when building a compiled evaluator (see corehq.apps.userreports.compiler)
+    compiler: Optional[object] = field(default=None, repr=False)
+
     @property
     @memoized
     def named_filters(self):
@@ -0,0 +1,135 @@
+from datetime import datetime
+
+from django.test import SimpleTestCase
+
+from unittest import mock
+
+from corehq.apps.userreports.compiler import (
+    DataSourceCompiler,
+    PropertyNameAccessor,
+    PropertyPathAccessor,
+    SharedNode,
+    _DataSourceScope,
+    compile_data_sources,
+)
+from corehq.apps.userreports.expressions.factory import ExpressionFactory
+from corehq.apps.userreports.specs import EvaluationContext, FactoryContext
+from corehq.apps.userreports.tests.utils import (
+    get_data_source_with_repeat,
+    get_sample_data_source,
+    get_sample_doc_and_indicators,
+)
+
+
+def _values(rows):
+    return [
+        [(value.column.id, value.value) for value in row if value.column.id != 'inserted_at']
+        for row in rows
+    ]
+
+
+class CompiledDataSourceTest(SimpleTestCase):
+
+    def setUp(self):
+        self.config = get_sample_data_source()
+        self.config._id = 'config-1'
+        self.other_config = get_sample_data_source()
+        self.other_config._id = 'config-2'
+        self.other_config.table_id = 'other'
+
+    def test_same_values_as_interpreted(self):
+        doc, _ = get_sample_doc_and_indicators(datetime.utcnow())
+        [compiled] = compile_data_sources([self.config])
+        self.assertTrue(compiled.filter(doc, EvaluationContext(doc)))
+        self.assertEqual(
+            _values(self.config.get_all_values(doc)),
+            _values(compiled.get_all_values(doc)),
+        )
+
+    def test_filter_not_matching(self):
+        doc, _ = get_sample_doc_and_indicators(datetime.utcnow())
+        doc['type'] = 'not-ticket'
+        [compiled] = compile_data_sources([self.config])
+        self.assertFalse(compiled.filter(doc, EvaluationContext(doc)))
+        self.assertEqual([], compiled.get_all_values(doc))
+
+    def test_repeat_data_source(self):
+        config = get_data_source_with_repeat()
+        doc = {
+            '_id': 'form-id',
+            'domain': config.domain,
+            'doc_type': 'XFormInstance',
+            'form': {
+                'time_logs': [
+                    {'start_time': '2015-01-01T00:00:00Z', 'end_time': '2015-01-01T01:00:00Z', 'person': 'a'},
+                    {'start_time': '2015-01-02T00:00:00Z', 'end_time': '2015-01-02T01:00:00Z', 'person': 'b'},
+                ]
+            },
+        }
+        [compiled] = compile_data_sources([config])
+        self.assertEqual(_values(config.get_all_values(doc)), _values(compiled.get_all_values(doc)))
+
+    def test_attributes_come_from_config(self):
+        [compiled] = compile_data_sources([self.config])
+        self.assertEqual('config-1', compiled._id)
+        self.assertEqual(self.config.table_id, compiled.table_id)
+
+    def test_shared_nodes(self):
+        compiler = DataSourceCompiler()
+        compiler.compile(self.config)
+        node_count = compiler.node_count
+        compiler.compile(self.other_config)
+        # the second data source is identical so all of its nodes are reused
+        self.assertEqual(node_count, compiler.node_count)
+
+    def test_different_named_expressions_not_shared(self):
+        self.config.named_expressions = {'owner': {'type': 'property_name', 'property_name': 'owner_id'}}
+        self.other_config.named_expressions = {'owner': {'type': 'property_name', 'property_name': 'user_id'}}
+        compiler = DataSourceCompiler()
+        spec = {'type': 'named', 'name': 'owner'}
+        first = ExpressionFactory.from_spec(spec, _compiling_context(compiler, self.config))
+        second = ExpressionFactory.from_spec(spec, _compiling_context(compiler, self.other_config))
+        self.assertIsNot(first, second)
+
+        doc = {'owner_id': 'a', 'user_id': 'b'}
+        self.assertEqual('a', first(doc, EvaluationContext(doc)))
+        self.assertEqual('b', second(doc, EvaluationContext(doc)))
+
+    def test_shared_node_evaluated_once_per_doc(self):
+        doc, _ = get_sample_doc_and_indicators(datetime.utcnow())
+        wrapped = mock.Mock(return_value='value')
+        node = SharedNode(0, wrapped)
+        eval_context = EvaluationContext(doc)
+        self.assertEqual('value', node(doc, eval_context))
+        eval_context.reset_iteration()
+        self.assertEqual('value', node(doc, eval_context))
+        self.assertEqual(1, wrapped.call_count)
+
+        # items other than the root doc are not cached
+        node({'other': 'item'}, eval_context)
+        node({'other': 'item'}, eval_context)
+        self.assertEqual(3, wrapped.call_count)
+
+    def test_property_accessors(self):
+        compiler = DataSourceCompiler()
+        context = _compiling_context(compiler, self.config)
+        name_getter = ExpressionFactory.from_spec(
+            {'type': 'property_name', 'property_name': 'age', 'datatype': 'integer'}, context
+        )
+        path_getter = ExpressionFactory.from_spec(
+            {'type': 'property_path', 'property_path': ['child', 'age'], 'datatype': 'integer'}, context
+        )
+        self.assertIsInstance(name_getter, PropertyNameAccessor)
+        self.assertIsInstance(path_getter, PropertyPathAccessor)
+        doc = {'age': '4', 'child': {'age': '2'}}
+        self.assertEqual(4, name_getter(doc))
+        self.assertEqual(2, path_getter(doc))
+        self.assertIsNone(name_getter('not a dict'))
+        self.assertIsNone(path_getter({'child': 'not a dict'}))
+
+
+def _compiling_context(compiler, config):
+    return FactoryContext(
+        config.named_expression_objects, config.named_filter_objects, config.domain,
+        compiler=_DataSourceScope(compiler, config),
+    )
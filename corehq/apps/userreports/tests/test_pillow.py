@@ -29,6 +29,9 @@ from corehq.apps.userreports.pillow import (
     REBUILD_CHECK_INTERVAL,
     ConfigurableReportPillowProcessor,
     ConfigurableReportTableManager,
+    _split_docs,
+    _transform_docs,
+    _TransformResult,
 )
 from corehq.apps.userreports.tasks import (
     queue_async_indicators,
@@ -46,6 +49,7 @@ from corehq.form_processor.models import CommCareCase
 from corehq.pillows.case import get_case_pillow
 from corehq.util.context_managers import drop_connected_signals
 from corehq.util.test_utils import softer_assert, flaky_slow
+from pillowtop.feed.interface import Change, ChangeMeta
 
 
 def setup_module():
@@ -56,12 +60,12 @@ def teardown_module():
     skip_domain_filter_patch.stop()
 
 
-def _get_pillow(configs, processor_chunk_size=0):
+def _get_pillow(configs, processor_chunk_size=0, transform_processes=0):
     pillow = get_case_pillow(processor_chunk_size=processor_chunk_size)
     # overwrite processors since we're only concerned with UCR here
     table_manager = ConfigurableReportTableManager(data_source_providers=[])
     ucr_processor = ConfigurableReportPillowProcessor(
-        table_manager
+        table_manager, transform_processes=transform_processes
     )
     table_manager.bootstrap(configs)
     pillow.processors = [ucr_processor]
@@ -204,6 +208,8 @@ class ConfigurableReportTableManagerDbTest(TestCase):
 
 
 class ChunkedUCRProcessorTest(TestCase):
+    transform_processes = 0
+
     @classmethod
     def setUpClass(cls):
         super(ChunkedUCRProcessorTest, cls).setUpClass()
@@ -212,7 +218,9 @@ class ChunkedUCRProcessorTest(TestCase):
         cls.adapter = get_indicator_adapter(cls.config)
         cls.adapter.build_table()
         cls.fake_time_now = datetime(2015, 4, 24, 12, 30, 8, 24886)
-        cls.pillow = _get_pillow([cls.config], processor_chunk_size=100)
+        cls.pillow = _get_pillow(
+            [cls.config], processor_chunk_size=100, transform_processes=cls.transform_processes
+        )
 
     @classmethod
     def tearDownClass(cls):
@@ -256,7 +264,9 @@ class ChunkedUCRProcessorTest(TestCase):
         return cases
 
     def _create_and_process_changes(self, docs=[]):
-        self.pillow = _get_pillow([self.config], processor_chunk_size=100)
+        self.pillow = _get_pillow(
+            [self.config], processor_chunk_size=100, transform_processes=self.transform_processes
+        )
         since = self.pillow.get_change_feed().get_latest_offsets()
         cases = self._create_cases(docs=docs)
         # run pillow and check changes
@@ -370,6 +380,75 @@ class ChunkedUCRProcessorTest(TestCase):
         bootstrap_if_needed.assert_called_once_with()
 
 
+class ParallelTransformUCRProcessorTest(ChunkedUCRProcessorTest):
+    transform_processes = 2
+
+    def tearDown(self):
+        for processor in self.pillow.processors:
+            processor._shutdown_transform_pool()
+        super().tearDown()
+
+
+class TransformPoolFailureTest(SimpleTestCase):
+
+    def test_whole_chunk_retried_when_worker_fails(self):
+        table_manager = mock.Mock()
+        table_manager.get_adapters.return_value = []
+        processor = ConfigurableReportPillowProcessor(table_manager, transform_processes=2)
+        pool = mock.Mock()
+        pool.submit.return_value.result.side_effect = Exception("worker failed")
+        changes = [
+            Change(id=doc_id, sequence_id=None, deleted=deleted, metadata=ChangeMeta(
+                document_id=doc_id, data_source_type='sql', data_source_name='case-sql', is_deletion=deleted,
+            ))
+            for doc_id, deleted in [('updated', False), ('deleted', True)]
+        ]
+        with patch.object(processor, '_get_transform_pool', return_value=pool), \
+                patch('corehq.apps.userreports.pillow.bulk_fetch_changes_docs',
+                      return_value=(set(), [{'_id': 'updated'}])), \
+                patch.object(processor, '_load_chunk_for_domain') as load_chunk:
+            retry_changes, exceptions = processor._process_chunk_in_pool({'domain': changes})
+        self.assertEqual(retry_changes, set(changes))
+        load_chunk.assert_not_called()
+
+
+class TransformDocsTest(SimpleTestCase):
+
+    def setUp(self):
+        self.config = get_sample_data_source()
+
+    def test_matching_doc_is_saved(self):
+        doc, expected_indicators = get_sample_doc_and_indicators()
+        result = _transform_docs([self.config], [doc], {})
+        self.assertEqual([self.config._id], list(result.rows_by_config))
+        self.assertEqual(1, len(result.rows_by_config[self.config._id]))
+        self.assertEqual({}, dict(result.to_delete_by_config))
+        self.assertEqual([], result.exceptions)
+
+    def test_non_matching_doc_is_deleted(self):
+        doc = dict(_id='abc', doc_type="CommCareCase", domain='user-reports', type='not-ticket')
+        result = _transform_docs([self.config], [doc], {'abc': 'not-ticket'})
+        self.assertEqual({}, dict(result.rows_by_config))
+        self.assertEqual({}, dict(result.to_delete_by_config))
+
+        result = _transform_docs([self.config], [doc], {'abc': None})
+        self.assertEqual([doc], result.to_delete_by_config[self.config._id])
+
+    def test_merge(self):
+        doc, _ = get_sample_doc_and_indicators()
+        result = _TransformResult()
+        for docs in _split_docs([doc, dict(doc, _id='other')], 2):
+            result.merge(_transform_docs([self.config], docs, {}))
+        self.assertEqual(2, len(result.rows_by_config[self.config._id]))
+        self.assertEqual(2, len(result.doc_durations))
+        self.assertEqual(2, len(result.durations_by_config[self.config._id]))
+
+    def test_split_docs(self):
+        self.assertEqual([[1, 2], [3, 4], [5]], list(_split_docs([1, 2, 3, 4, 5], 3)))
+        self.assertEqual([[1]], list(_split_docs([1], 4)))
+        self.assertEqual([], list(_split_docs([], 4)))
+
+
 class IndicatorPillowTest(TestCase):
 
     @classmethod
@@ -0,0 +1,19 @@
+# Set up for the worker processes of the UCR pillow's transform pool.
+#
+# The workers are spawned rather than forked so that they don't inherit
+# the pillow's database, Kafka, Couch and Redis connections, or any of its
+# threads. This module is imported in a new worker before Django is set
+# up, so it must not import models or anything else that needs settings.
+import os
+
+import django
+
+
+def init_transform_worker():
+    from manage import init_hq_python_path, run_patches
+
+    init_hq_python_path()
+    run_patches()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    django.setup()
@@ -39,6 +39,29 @@ class FilesystemBlobDB(AbstractBlobDB):
 
     def put(self, content, **blob_meta_args):
         meta = self.metadb.new(**blob_meta_args)
+        self._write_content(content, meta)
+        self.metadb.put(meta)
+        return meta
+
+    def put_many(self, items):
+        metas = []
+        try:
+            for content, blob_meta_args in items:
+                meta = self.metadb.new(**blob_meta_args)
+                # added first so a partly written file is removed too
+                metas.append(meta)
+                self._write_content(content, meta)
+            self.metadb.bulk_put(metas)
+        except BaseException:
+            # don't leave files behind without metadata
+            for meta in metas:
+                path = self.get_path(meta.key)
+                if exists(path):
+                    os.remove(path)
+            raise
+        return metas
+
+    def _write_content(self, content, meta):
         path = self.get_path(meta.key)
         dirpath = dirname(path)
         if not isdir(dirpath):
@@ -57,8 +80,6 @@ class FilesystemBlobDB(AbstractBlobDB):
                 digest.update(chunk)
 
         meta.content_length, meta.compressed_length = get_content_size(content, chunk_sizes)
-        self.metadb.put(meta)
-        return meta
 
     def get(self, key=None, type_code=None, meta=None):
         key = self._validate_get_args(key, type_code, meta)
@@ -1,6 +1,7 @@
 from abc import ABCMeta, abstractmethod
 
 from . import CODES
+from .exceptions import NotFound
 from .metadata import MetaDB
 
 NOT_SET = object()
@@ -69,6 +70,34 @@ class AbstractBlobDB(metaclass=ABCMeta):
         """
         raise NotImplementedError
 
+    def put_many(self, items):
+        """Put multiple blobs in persistent storage
+
+        Backends may transfer the blobs concurrently and save their
+        metadata in bulk. The same NOTE as for `put` applies.
+
+        :param items: An iterable of `(content, blob_meta_args)` pairs.
+        `blob_meta_args` is a dict of `put` keyword arguments.
+        :returns: A list of `BlobMeta` objects in the order of `items`.
+        """
+        return [self.put(content, **blob_meta_args) for content, blob_meta_args in items]
+
+    def get_many(self, metas):
+        """Get multiple blobs
+
+        :param metas: A list of `BlobMeta` objects.
+        :returns: An iterator of `BlobStream` objects in the order of
+        `metas`, with `None` in place of blobs that were not found. Blobs
+        are fetched as the iterator is advanced, so backends may only
+        fetch a few ahead of the one being read. The returned objects
+        should be closed when finished reading.
+        """
+        for meta in metas:
+            try:
+                yield self.get(meta=meta)
+            except NotFound:
+                yield None
+
     @staticmethod
     def _validate_get_args(key, type_code, meta):
         if key is not None or type_code is not None:
@@ -137,3 +166,11 @@ class AbstractBlobDB(metaclass=ABCMeta):
         :param key: Blob key.
         """
         raise NotImplementedError
+
+    def copy_many(self, items):
+        """Copy multiple blobs from other blob database
+
+        :param items: An iterable of `(content, key)` pairs.
+        """
+        for content, key in items:
+            self.copy_blob(content, key)
@@ -28,6 +28,6 @@ class Command(BaseCommand):
     def handle(self, zipname, **options):
         from_zip = zipfile.ZipFile(zipname)
         to_db = get_blob_db()
-        for key in from_zip.namelist():
-            blob = io.BytesIO(from_zip.read(key))
-            to_db.copy_blob(blob, key=key)
+        to_db.copy_many(
+            (io.BytesIO(from_zip.read(key)), key) for key in from_zip.namelist()
+        )
@@ -60,6 +60,36 @@ class MetaDB(object):
             metrics_counter('commcare.temp_blobs.count', tags=tags)
             metrics_counter('commcare.temp_blobs.bytes_added', value=length, tags=tags)
 
+    def bulk_put(self, metas):
+        """Save `BlobMeta` objects in the metadata database in bulk
+
+        New objects are inserted with one query per database partition.
+        Objects that have been saved before are updated one by one as
+        with `put`.
+        """
+        new_metas = defaultdict(list)
+        for meta in metas:
+            if meta.id is None:
+                new_metas[meta.parent_id].append(meta)
+            else:
+                meta.save()
+        for dbname, parent_ids in split_list_by_db_partition(new_metas):
+            BlobMeta.objects.using(dbname).bulk_create(
+                [meta for parent_id in parent_ids for meta in new_metas[parent_id]]
+            )
+
+        totals = defaultdict(int)
+        for meta in metas:
+            type_ = _meta_tags(meta)['type']
+            length = meta.stored_content_length
+            totals['commcare.blobs.added.count', type_] += 1
+            totals['commcare.blobs.added.bytes', type_] += length
+            if meta.expires_on is not None:
+                totals['commcare.temp_blobs.count', type_] += 1
+                totals['commcare.temp_blobs.bytes_added', type_] += length
+        for (metric, type_), value in totals.items():
+            metrics_counter(metric, value=value, tags={'type': type_})
+
     def delete(self, key, content_length):
         """Delete blob metadata
 
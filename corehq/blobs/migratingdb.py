@@ -19,12 +19,24 @@ class MigratingBlobDB(object):
     def put(self, *args, **kw):
         return self.new_db.put(*args, **kw)
 
+    def put_many(self, *args, **kw):
+        return self.new_db.put_many(*args, **kw)
+
     def get(self, *args, **kw):
         try:
             return self.new_db.get(*args, **kw)
         except NotFound:
             return self.old_db.get(*args, **kw)
 
+    def get_many(self, metas):
+        for meta, stream in zip(metas, self.new_db.get_many(metas)):
+            if stream is None:
+                try:
+                    stream = self.old_db.get(meta=meta)
+                except NotFound:
+                    pass
+            yield stream
+
     def size(self, *args, **kw):
         try:
             return self.new_db.size(*args, **kw)
@@ -49,3 +61,6 @@ class MigratingBlobDB(object):
 
     def copy_blob(self, *args, **kw):
         self.new_db.copy_blob(*args, **kw)
+
+    def copy_many(self, *args, **kw):
+        self.new_db.copy_many(*args, **kw)
@@ -1,7 +1,12 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from gzip import GzipFile
+from itertools import islice
+from tempfile import SpooledTemporaryFile
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 from botocore.exceptions import ClientError
 from botocore.utils import fix_s3_host
@@ -22,21 +27,36 @@ from corehq.util.metrics import metrics_counter, metrics_histogram_timer
 
 DEFAULT_S3_BUCKET = "blobdb"
 DEFAULT_BULK_DELETE_CHUNKSIZE = 1000
+DEFAULT_BULK_TRANSFER_WORKERS = 8
+DEFAULT_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+DEFAULT_MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+# blobs downloaded by get_many that are larger than this are kept on disk
+GET_MANY_SPOOL_SIZE = 1024 * 1024
 
 
 class S3BlobDB(AbstractBlobDB):
 
     def __init__(self, config):
         super(S3BlobDB, self).__init__()
-        kwargs = {}
-        if "config" in config:
-            kwargs["config"] = Config(**config["config"])
+        self.bulk_transfer_workers = config.get("bulk_transfer_workers", DEFAULT_BULK_TRANSFER_WORKERS)
+        # transfers of blobs larger than the threshold are made in parts
+        # of chunksize bytes, several parts at a time
+        self.transfer_config = TransferConfig(
+            multipart_threshold=config.get("multipart_threshold", DEFAULT_MULTIPART_THRESHOLD),
+            multipart_chunksize=config.get("multipart_chunksize", DEFAULT_MULTIPART_CHUNKSIZE),
+        )
+        # one connection for each concurrent request of a bulk transfer
+        client_config = dict(config.get("config", {}))
+        client_config.setdefault(
+            "max_pool_connections",
+            max(10, self.bulk_transfer_workers * self.transfer_config.max_concurrency),
+        )
         self.db = boto3.resource(
             's3',
             endpoint_url=config.get("url"),
             aws_access_key_id=config.get("access_key"),
             aws_secret_access_key=config.get("secret_key"),
-            **kwargs
+            config=Config(**client_config),
         )
         self.bulk_delete_chunksize = config.get("bulk_delete_chunksize", DEFAULT_BULK_DELETE_CHUNKSIZE)
         self.s3_bucket_name = config.get("s3_bucket", DEFAULT_S3_BUCKET)
@@ -67,14 +87,49 @@ class S3BlobDB(AbstractBlobDB):
     def put(self, content, **blob_meta_args):
         meta = self.metadb.new(**blob_meta_args)
         check_safe_key(meta.key)
-        s3_bucket = self._s3_bucket(create=True)
+        self._put_content(self._s3_bucket(create=True).meta.client, content, meta)
+        self.metadb.put(meta)
+        return meta
+
+    def put_many(self, items):
+        client = self._s3_bucket(create=True).meta.client
+
+        def put_content(content, blob_meta_args):
+            meta = self.metadb.new(**blob_meta_args)
+            check_safe_key(meta.key)
+            self._put_content(client, content, meta)
+            return meta
+
+        # blobs that were uploaded, including any that finished after an error
+        metas = []
+        try:
+            for meta in self._imap(put_content, items, discard=metas.append):
+                metas.append(meta)
+            self.metadb.bulk_put(metas)
+        except BaseException:
+            self._delete_orphaned_content(metas)
+            raise
+        return metas
+
+    def _delete_orphaned_content(self, metas):
+        """Delete uploaded blobs whose metadata was not saved"""
+        try:
+            s3_bucket = self._s3_bucket()
+            for chunk in chunked(metas, self.bulk_delete_chunksize):
+                s3_bucket.delete_objects(Delete={"Objects": [{"Key": meta.key} for meta in chunk]})
+        except Exception:
+            notify_exception(None, "S3BlobDB could not delete blobs after put_many failed", details={
+                'keys': [meta.key for meta in metas],
+            })
+
+    def _put_content(self, client, content, meta):
+        """Upload blob content and set the content lengths of its metadata"""
         if isinstance(content, BlobStream) and content.blob_db is self:
             meta.content_length = content.content_length
             meta.compressed_length = content.compressed_length
-            self.metadb.put(meta)
             source = {"Bucket": self.s3_bucket_name, "Key": content.blob_key}
             with self.report_timing('put-via-copy', meta.key):
-                s3_bucket.copy(source, meta.key)
+                client.copy(source, self.s3_bucket_name, meta.key, Config=self.transfer_config)
         else:
             content.seek(0)
             if meta.is_compressed:
@@ -86,10 +141,11 @@ class S3BlobDB(AbstractBlobDB):
                 chunk_sizes.append(bytes_sent)
 
             with self.report_timing('put', meta.key):
-                s3_bucket.upload_fileobj(content, meta.key, Callback=_track_transfer)
+                client.upload_fileobj(
+                    content, self.s3_bucket_name, meta.key,
+                    Callback=_track_transfer, Config=self.transfer_config,
+                )
             meta.content_length, meta.compressed_length = get_content_size(content, chunk_sizes)
-            self.metadb.put(meta)
-        return meta
 
     @retry_on_slow_down
     def get(self, key=None, type_code=None, meta=None):
@@ -107,6 +163,51 @@ class S3BlobDB(AbstractBlobDB):
             content_length, compressed_length = reported_content_length, None
         return BlobStream(body, self, key, content_length, compressed_length)
 
+    def get_many(self, metas):
+        """Get multiple blobs
+
+        Unlike `get`, the content of each blob is downloaded before it is
+        returned, in parts if it is large, so that the connections used to
+        download the blobs are not held open while the blobs are read.
+        Content larger than `GET_MANY_SPOOL_SIZE` is spooled to disk.
+        Blobs are downloaded `bulk_transfer_workers` at a time, ahead of
+        the one being returned.
+        """
+        for meta in metas:
+            check_safe_key(meta.key)
+        client = self._s3_bucket().meta.client
+
+        def download(meta):
+            try:
+                return self._download(client, meta)
+            except NotFound:
+                return None
+
+        def discard(stream):
+            if stream is not None:
+                stream.close()
+
+        return self._imap(download, [(meta,) for meta in metas], discard)
+
+    @retry_on_slow_down
+    def _download(self, client, meta):
+        fileobj = SpooledTemporaryFile(max_size=GET_MANY_SPOOL_SIZE)
+        try:
+            with maybe_not_found(throw=NotFound(meta.key)), self.report_timing('get', meta.key):
+                client.download_fileobj(self.s3_bucket_name, meta.key, fileobj, Config=self.transfer_config)
+        except Exception:
+            fileobj.close()
+            raise
+        stored_length = fileobj.tell()
+        fileobj.seek(0)
+        if meta.is_compressed:
+            content_length, compressed_length = meta.content_length, meta.compressed_length
+            body = _GzipSpooledFile(meta.key, mode='rb', fileobj=fileobj)
+        else:
+            content_length, compressed_length = stored_length, None
+            body = fileobj
+        return BlobStream(body, self, meta.key, content_length, compressed_length)
+
     def size(self, key):
         check_safe_key(key)
         with maybe_not_found(throw=NotFound(key)), self.report_timing('size', key):
@@ -146,8 +247,46 @@ class S3BlobDB(AbstractBlobDB):
         return success
 
     def copy_blob(self, content, key):
+        self._copy_content(self._s3_bucket(create=True).meta.client, content, key)
+
+    def copy_many(self, items):
+        client = self._s3_bucket(create=True).meta.client
+        for _ in self._imap(self._copy_content, ((client, content, key) for content, key in items)):
+            pass
+
+    def _copy_content(self, client, content, key):
         with self.report_timing('copy_blobdb', key):
-            self._s3_bucket(create=True).upload_fileobj(content, key)
+            client.upload_fileobj(content, self.s3_bucket_name, key, Config=self.transfer_config)
+
+    def _imap(self, func, args_list, discard=None):
+        """Call `func` with each of `args_list` concurrently
+
+        `args_list` is consumed as calls are made, and at most
+        `bulk_transfer_workers` calls are running or have results waiting
+        to be yielded at a time. An error raised by a call is raised when
+        its result would have been yielded.
+
+        :param discard: Function called with the results of calls that
+        are not yielded because iteration stopped early.
+        :returns: An iterator of the results in the order of `args_list`.
+        """
+        args_iter = iter(args_list)
+        pending = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=self.bulk_transfer_workers) as pool:
+                for args in islice(args_iter, self.bulk_transfer_workers):
+                    pending.append(pool.submit(func, *args))
+                while pending:
+                    result = pending[0].result()
+                    pending.popleft()
+                    for args in islice(args_iter, 1):
+                        pending.append(pool.submit(func, *args))
+                    yield result
+        finally:
+            # the pool has finished the calls that were not yielded
+            for future in pending:
+                if discard is not None and future.exception() is None:
+                    discard(future.result())
 
     def _s3_bucket(self, create=False):
         if create and not self._s3_bucket_exists:
@@ -179,3 +318,15 @@ def maybe_not_found(throw=None):
         metrics_counter('commcare.blobdb.notfound')
         if throw is not None:
             raise throw
+
+
+class _GzipSpooledFile(GzipFile):
+    """GzipFile that closes the file of compressed content it reads"""
+
+    def close(self):
+        fileobj = self.fileobj
+        try:
+            super().close()
+        finally:
+            if fileobj is not None:
+                fileobj.close()
@@ -13,11 +13,17 @@ import corehq.blobs.fsdb as mod
 from corehq.blobs import CODES
 from corehq.blobs.metadata import MetaDB
 from corehq.blobs.tasks import delete_expired_blobs
-from corehq.blobs.tests.util import new_meta, temporary_blob_db
+from corehq.blobs.tests.util import get_id, new_meta, temporary_blob_db
 from corehq.util.metrics.tests.utils import capture_metrics
 from corehq.util.test_utils import generate_cases
 
 
+class UnreadableContent(BytesIO):
+
+    def read(self, *args):
+        raise IOError("unreadable")
+
+
 class _BlobDBTests(object):
     meta_kwargs = {}
 
@@ -35,6 +41,47 @@ class _BlobDBTests(object):
         with self.db.get(meta=meta) as fh:
             self.assertEqual(fh.read(), b"content")
 
+    def test_put_many_and_get_many(self):
+        with capture_metrics() as metrics:
+            metas = self.db.put_many([
+                (BytesIO(b"content-1"), {"meta": self.new_meta()}),
+                (BytesIO(b"content-2"), {"meta": self.new_meta()}),
+            ])
+        size = sum(meta.stored_content_length for meta in metas)
+
+        self.assertTrue(all(meta.id for meta in metas))
+        self.assertEqual(metrics.sum('commcare.blobs.added.count', type='tempfile'), 2)
+        self.assertEqual(metrics.sum('commcare.blobs.added.bytes', type='tempfile'), size)
+        contents = []
+        for fh in self.db.get_many(metas):
+            with fh:
+                contents.append(fh.read())
+        self.assertEqual(contents, [b"content-1", b"content-2"])
+
+    def test_put_many_error(self):
+        metas = [self.new_meta(), self.new_meta()]
+        with self.assertRaises(IOError):
+            self.db.put_many([
+                (BytesIO(b"content"), {"meta": metas[0]}),
+                (UnreadableContent(), {"meta": metas[1]}),
+            ])
+        for meta in metas:
+            self.assertFalse(self.db.exists(key=meta.key), 'not deleted')
+
+    def test_get_many_not_found(self):
+        meta = self.db.put(BytesIO(b"content"), meta=self.new_meta())
+        found, missing = self.db.get_many([meta, self.new_meta()])
+        with found:
+            self.assertEqual(found.read(), b"content")
+        self.assertIsNone(missing)
+
+    def test_copy_many(self):
+        keys = [get_id(), get_id()]
+        self.db.copy_many([(BytesIO(b"content-1"), keys[0]), (BytesIO(b"content-2"), keys[1])])
+        for key, content in zip(keys, [b"content-1", b"content-2"]):
+            with self.db.get(key=key, type_code=CODES.tempfile) as fh:
+                self.assertEqual(fh.read(), content)
+
     def test_put_and_size(self):
         identifier = self.new_meta()
         with capture_metrics() as metrics:
@@ -31,6 +31,15 @@ class TestMigratingBlobDB(get_base_class()):
         with self.db.get(meta=meta) as fh:
             self.assertEqual(fh.read(), b"content")
 
+    def test_get_many_falls_back_to_fsdb(self):
+        fs_meta = self.fsdb.put(BytesIO(b"fs content"), meta=new_meta())
+        s3_meta = self.s3db.put(BytesIO(b"s3 content"), meta=new_meta())
+        contents = []
+        for fh in self.db.get_many([fs_meta, s3_meta]):
+            with fh:
+                contents.append(fh.read())
+        self.assertEqual(contents, [b"fs content", b"s3 content"])
+
     def test_copy_blob_masks_old_blob(self):
         content = BytesIO(b"fs content")
         meta = self.fsdb.put(content, meta=new_meta())
@@ -60,16 +60,19 @@ Finally, add the following to `localsettings.py`:
         }
 
 """  # noqa: W605
+import threading
 from io import BytesIO, SEEK_SET, TextIOWrapper
+from unittest.mock import Mock, patch
 
+from botocore.exceptions import ClientError
 from django.conf import settings
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 
 from corehq.blobs import CODES
 from corehq.blobs.s3db import S3BlobDB
 from corehq.blobs.util import BlobStream
 from corehq.blobs.tests.util import new_meta, TemporaryS3BlobDB
-from corehq.blobs.tests.test_fsdb import _BlobDBTests
+from corehq.blobs.tests.test_fsdb import UnreadableContent, _BlobDBTests
 from corehq.util.test_utils import trap_extra_setup
 
 
@@ -102,6 +105,128 @@ class TestS3BlobDBCompressed(TestS3BlobDB):
     meta_kwargs = {'compressed_length': -1}
 
 
+class TestS3BlobDBBulkTransfers(SimpleTestCase):
+    """Test bulk transfers against an in-memory stand-in for S3"""
+
+    def setUp(self):
+        self.client = FakeS3Client()
+        self.db = S3BlobDB({"bulk_transfer_workers": 2})
+        self.db.metadb = Mock()
+        self.db.metadb.new.side_effect = lambda meta: meta
+        self.bucket = bucket = Mock()
+        bucket.meta.client = self.client
+        patcher = patch.object(self.db, "_s3_bucket", return_value=bucket)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_put_many_transfers_concurrently(self):
+        # each transfer waits for another to be in flight
+        self.client.barrier = threading.Barrier(2, timeout=5)
+        metas = self.db.put_many([
+            (BytesIO(b"content-%d" % i), {"meta": new_meta()}) for i in range(4)
+        ])
+        self.assertEqual([meta.content_length for meta in metas], [9] * 4)
+        self.assertEqual(
+            [self.client.objects[meta.key] for meta in metas],
+            [b"content-%d" % i for i in range(4)],
+        )
+        self.db.metadb.bulk_put.assert_called_once_with(metas)
+        self.db.metadb.put.assert_not_called()
+
+    def test_put_many_error_deletes_uploaded_blobs(self):
+        metas = [new_meta() for i in range(4)]
+        contents = [BytesIO(b"content-0"), BytesIO(b"content-1"), UnreadableContent(), BytesIO(b"content-3")]
+        with self.assertRaises(IOError):
+            self.db.put_many([(content, {"meta": meta}) for content, meta in zip(contents, metas)])
+        # the blob after the failed one was already being uploaded
+        deleted = [
+            obj["Key"]
+            for call in self.bucket.delete_objects.call_args_list
+            for obj in call.kwargs["Delete"]["Objects"]
+        ]
+        self.assertEqual(sorted(deleted), sorted(metas[i].key for i in [0, 1, 3]))
+        self.db.metadb.bulk_put.assert_not_called()
+
+    def test_get_many_transfers_concurrently(self):
+        metas = [new_meta() for i in range(4)]
+        for i, meta in enumerate(metas):
+            self.client.objects[meta.key] = b"content-%d" % i
+        self.client.barrier = threading.Barrier(2, timeout=5)
+        contents = []
+        for fh in self.db.get_many(metas):
+            with fh:
+                contents.append((fh.content_length, fh.read()))
+        self.assertEqual(contents, [(9, b"content-%d" % i) for i in range(4)])
+
+    def test_get_many_not_found(self):
+        meta = new_meta()
+        self.client.objects[meta.key] = b"content"
+        found, missing = self.db.get_many([meta, new_meta()])
+        with found:
+            self.assertEqual(found.read(), b"content")
+        self.assertIsNone(missing)
+
+    def test_get_many_downloads_a_bounded_number_ahead(self):
+        metas = [new_meta() for i in range(6)]
+        for i, meta in enumerate(metas):
+            self.client.objects[meta.key] = b"content-%d" % i
+        streams = self.db.get_many(metas)
+        with next(streams) as fh:
+            self.assertEqual(fh.read(), b"content-0")
+        streams.close()
+        # the first two, and the one started when the first was returned
+        self.assertEqual(self.client.downloaded, [meta.key for meta in metas[:3]])
+
+    def test_get_many_closes_blobs_not_returned(self):
+        metas = [new_meta() for i in range(3)]
+        for meta in metas:
+            self.client.objects[meta.key] = b"content"
+        downloaded = []
+        download = self.db._download
+
+        def record_download(*args):
+            downloaded.append(download(*args))
+            return downloaded[-1]
+
+        with patch.object(self.db, "_download", side_effect=record_download):
+            streams = self.db.get_many(metas)
+            with next(streams):
+                streams.close()
+                self.assertEqual([fh.closed for fh in downloaded], [False, True, True])
+
+    def test_copy_many_transfers_concurrently(self):
+        self.client.barrier = threading.Barrier(2, timeout=5)
+        self.db.copy_many([(BytesIO(b"content-%d" % i), "key-%d" % i) for i in range(4)])
+        self.assertEqual(self.client.objects, {"key-%d" % i: b"content-%d" % i for i in range(4)})
+
+
+class FakeS3Client(object):
+    """Stand-in for the transfer methods of a boto3 S3 client"""
+    barrier = None
+
+    def __init__(self):
+        self.objects = {}
+        self.downloaded = []
+
+    def upload_fileobj(self, fileobj, bucket, key, Callback=None, Config=None):
+        self._wait()
+        data = fileobj.read()
+        self.objects[key] = data
+        if Callback is not None:
+            Callback(len(data))
+
+    def download_fileobj(self, bucket, key, fileobj, Config=None):
+        self._wait()
+        if key not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        fileobj.write(self.objects[key])
+        self.downloaded.append(key)
+
+    def _wait(self):
+        if self.barrier is not None:
+            self.barrier.wait()
+
+
 class TestBlobStream(TestCase):
 
     @classmethod
@@ -116,6 +116,34 @@ def count_query(index_cname, q):
     return adapter.count(q)
 
 
+def search_after_query(index_cname, query, after=None, for_export=False, size=None):
+    """Perform a paged search with ``search_after`` rather than a scroll
+    context. Returns a ``SearchAfterCursor`` yielding each doc, which can be
+    resumed from its ``after`` token.
+
+    See `corehq.apps.es.client.ElasticDocumentAdapter.search_after()`
+    """
+    adapter = doc_adapter_from_cname(index_cname, for_export=for_export)
+    return adapter.search_after(query, size=size, after=after)
+
+
+def sliced_scroll_query(index_cname, query, slices, for_export=False, **kw):
+    """Perform a scrolling search split into ``slices`` that are scrolled in
+    parallel, yielding each doc, in no particular order, until all slices
+    are exhausted.
+
+    :param **kw: Additional scroll keyword arguments, as for ``scroll_query``
+    """
+    valid_kw = {"size", "scroll"}
+    if not set(kw).issubset(valid_kw):
+        raise ValueError(f"invalid keyword args: {set(kw) - valid_kw}")
+    adapter = doc_adapter_from_cname(index_cname, for_export=for_export)
+    try:
+        yield from adapter.sliced_scroll(query, slices, **kw)
+    except ElasticsearchException as e:
+        raise ESError(e)
+
+
 class ScanResult(object):
 
     def __init__(self, count, iterator):
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class PhoneAppConfig(AppConfig):
+    name = 'casexml.apps.phone'
+    label = 'phone'
+
+    def ready(self):
+        from . import signals  # noqa: disable=unused-import,F401
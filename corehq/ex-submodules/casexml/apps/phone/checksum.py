@@ -1,10 +1,4 @@
 import hashlib
-import binascii
-from copy import copy
-import six
-from six.moves import zip
-from functools import reduce
-from six.moves import map
 
 
 EMPTY_HASH = ""
@@ -32,6 +26,9 @@ class CaseStateHash(object):
 
 class Checksum(object):
     """
+    XOR of the md5 hashes of a set of ids, kept as a running 128 bit value so
+    that ids can be added and removed without rehashing the rest.
+
     >>> Checksum(['abc123', '123abc']).hexdigest()
     '409c5c597fa2c2a693b769f0d2ad432b'
 
@@ -44,33 +41,63 @@ class Checksum(object):
     >>> c.hexdigest()
     '409c5c597fa2c2a693b769f0d2ad432b'
 
+    >>> c.add('def456')
+    >>> c.remove('def456')
+    >>> c.hexdigest()
+    '409c5c597fa2c2a693b769f0d2ad432b'
+
     >>> Checksum().hexdigest()
     ''
 
     """
 
     def __init__(self, init=None):
-        self._list = init or []
+        self._value = 0
+        self._count = 0
+        if init:
+            self.add_many(init)
 
     def add(self, id):
-        self._list.append(id)
+        self._value ^= self.hash(id)
+        self._count += 1
+
+    def add_many(self, ids):
+        value = self._value
+        count = 0
+        for id in ids:
+            value ^= self.hash(id)
+            count += 1
+        self._value = value
+        self._count += count
+
+    def remove(self, id):
+        """Remove an id that was previously added"""
+        self._value ^= self.hash(id)
+        self._count -= 1
 
     @classmethod
-    def hash(cls, line):
-        if isinstance(line, six.text_type):
-            line = line.encode('utf-8')
-        return bytearray(hashlib.md5(line).digest())
+    def from_value(cls, value, count):
+        """Make a checksum of ``count`` ids from the ``value`` of another"""
+        checksum = cls()
+        checksum._value = value
+        checksum._count = count
+        return checksum
+
+    @property
+    def value(self):
+        """The XOR of the hashes of the ids, as an int"""
+        return self._value
+
+    def __len__(self):
+        return self._count
 
     @classmethod
-    def xor(cls, bytes1, bytes2):
-        assert(len(bytes1) == len(bytes2))
-        return bytearray([b1 ^ b2 for (b1, b2) in zip(bytes1, bytes2)])
+    def hash(cls, line):
+        if isinstance(line, str):
+            line = line.encode('utf-8')
+        return int.from_bytes(hashlib.md5(line).digest(), 'big')
 
     def hexdigest(self):
-        if not self._list:
+        if not self._count:
             return EMPTY_HASH
-        x = copy(self._list)
-        x = list(map(Checksum.hash, x))
-        x = reduce(Checksum.xor, x)
-        x = binascii.hexlify(bytes(x)).decode('utf-8')
-        return x
+        return '{:032x}'.format(self._value)
@@ -16,5 +16,9 @@ ASYNC_RETRY_AFTER = 5
 ASYNC_RESTORE_CACHE_KEY_PREFIX = "async-restore-task"
 RESTORE_CACHE_KEY_PREFIX = "ota-restore"
 
+# gzip compression level for restore payloads. Payloads are mostly repetitive
+# XML so low levels already compress well and are much faster than the default.
+RESTORE_GZIP_LEVEL = 3
+
 # case sync algorithms
 LIVEQUERY = 'livequery'
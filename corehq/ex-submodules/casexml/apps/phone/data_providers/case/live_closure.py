@@ -0,0 +1,182 @@
+"""Stored live case ids for livequery restores
+
+``get_live_case_ids_and_indices`` walks the case index graph out from the
+owned cases with one query per hop, on every sync, even though the result
+rarely changes between syncs. With the LIVEQUERY_CASE_CLOSURE toggle the
+live case ids are stored as a ``LiveCaseClosure`` for the restoring owner ids,
+along with every case id that was visited while computing them. The next
+restore for the same owners gets the live case ids in one query and their
+indices in one more.
+
+A closure is deleted when a case is saved (see casexml.apps.phone.signals)
+that
+
+- was visited while computing it,
+- is owned by one of its owners, or
+- has an index to a case that was visited,
+
+or when a case that was visited is deleted.
+
+A case saved while a closure is being computed may not be seen by the
+computation, and its signal may come before the closure exists. Saved cases
+are also recorded in redis for an hour, and a closure is deleted right after
+it is saved if any of the cases recorded since its computation started are
+relevant to it.
+
+Closures also expire after ``LIVE_CASE_CLOSURE_TIMEOUT`` in case a change
+did not send a post save signal, and a sample of restores that use a closure
+recompute the live case ids and discard the closure if they differ.
+"""
+import hashlib
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+
+from dimagi.utils.chunked import chunked
+from dimagi.utils.couch.cache.cache_core import get_redis_client
+from dimagi.utils.logging import notify_exception
+
+from casexml.apps.phone.models import LiveCaseClosure, LiveCaseClosureCase
+from corehq.form_processor.models import CommCareCase, CommCareCaseIndex
+from corehq.util.metrics import metrics_counter
+
+LIVE_CASE_CLOSURE_TIMEOUT = timedelta(days=1)
+# fraction of restores using a closure that also recompute it
+LIVE_CASE_CLOSURE_CHECK_PROBABILITY = 0.01
+# how long saved cases are remembered, in seconds
+RECENT_CHANGES_TIMEOUT = 60 * 60
+# allowance for clock differences between machines, in seconds
+CLOCK_SKEW = 60
+
+
+def get_owner_key(owner_ids):
+    return hashlib.sha1('\n'.join(sorted(set(owner_ids))).encode('utf-8')).hexdigest()
+
+
+def get_live_case_closure(domain, owner_ids):
+    """Get the stored closure for ``owner_ids`` or None if there isn't a current one"""
+    return LiveCaseClosure.objects.filter(
+        domain=domain,
+        owner_key=get_owner_key(owner_ids),
+        created_on__gt=datetime.utcnow() - LIVE_CASE_CLOSURE_TIMEOUT,
+    ).first()
+
+
+def get_indices_for_cases(domain, case_ids):
+    """Get all indices of the given cases in the format returned by
+    ``get_live_case_ids_and_indices``
+    """
+    indices = defaultdict(list)
+    if case_ids:
+        for index in CommCareCaseIndex.objects.get_related_indices(domain, list(case_ids), set()):
+            indices[index.case_id].append(index)
+    return indices
+
+
+def save_live_case_closure(domain, owner_ids, owned_ids, live_ids, indices, started):
+    """Store the result of ``get_live_case_ids_and_indices``
+
+    Errors are reported and otherwise ignored since the restore does not
+    depend on the closure being saved.
+
+    :param started: ``time.time()`` from before the owned case ids were
+    fetched.
+    """
+    visited_ids = set(owned_ids) | live_ids
+    for case_id, case_indices in indices.items():
+        visited_ids.add(case_id)
+        visited_ids.update(index.referenced_id for index in case_indices if index.referenced_id)
+    try:
+        with transaction.atomic(using=LiveCaseClosure.objects.db):
+            owner_key = get_owner_key(owner_ids)
+            LiveCaseClosure.objects.filter(domain=domain, owner_key=owner_key).delete()
+            closure = LiveCaseClosure.objects.create(
+                domain=domain,
+                owner_key=owner_key,
+                owner_ids=sorted(set(owner_ids)),
+                live_ids=sorted(live_ids),
+            )
+            for case_ids in chunked(visited_ids, 1000):
+                LiveCaseClosureCase.objects.bulk_create([
+                    LiveCaseClosureCase(closure=closure, case_id=case_id) for case_id in case_ids
+                ])
+        # this must come after the closure is committed. Cases saved after
+        # this point will delete it in invalidate_live_case_closures.
+        changed_case_ids, changed_owner_ids = _get_changes_since(domain, started)
+        if not changed_case_ids.isdisjoint(visited_ids) or not changed_owner_ids.isdisjoint(owner_ids):
+            closure.delete()
+    except Exception:
+        notify_exception(None, "Error saving live case closure", details={'domain': domain})
+
+
+def invalidate_live_case_closures(domain, case_ids, owner_id=None):
+    """Delete closures that may change because the given cases changed
+
+    :param case_ids: ids of the changed cases and the cases they index.
+    :param owner_id: owner of the changed case.
+    """
+    _record_change(domain, case_ids, owner_id)
+    closures = Q(visited_cases__case_id__in=list(case_ids))
+    if owner_id:
+        closures |= Q(owner_ids__contains=[owner_id])
+    LiveCaseClosure.objects.filter(Q(domain=domain) & closures).delete()
+
+
+def _recent_changes_key(domain):
+    return 'livequery-closure-changes:{}'.format(domain)
+
+
+def _record_change(domain, case_ids, owner_id):
+    now = time.time()
+    members = {'case:' + case_id: now for case_id in case_ids}
+    if owner_id:
+        members['owner:' + owner_id] = now
+    key = _recent_changes_key(domain)
+    client = get_redis_client().client.get_client()
+    pipeline = client.pipeline()
+    pipeline.zadd(key, members)
+    pipeline.zremrangebyscore(key, '-inf', now - RECENT_CHANGES_TIMEOUT)
+    pipeline.expire(key, RECENT_CHANGES_TIMEOUT)
+    pipeline.execute()
+
+
+def _get_changes_since(domain, since):
+    """
+    :returns: Tuple of sets ``(case_ids, owner_ids)`` recorded since ``since``
+    """
+    client = get_redis_client().client.get_client()
+    case_ids = set()
+    owner_ids = set()
+    for member in client.zrangebyscore(_recent_changes_key(domain), since - CLOCK_SKEW, '+inf'):
+        kind, value = member.decode('utf-8').split(':', 1)
+        (case_ids if kind == 'case' else owner_ids).add(value)
+    return case_ids, owner_ids
+
+
+def should_check_live_case_closure():
+    return random.random() < LIVE_CASE_CLOSURE_CHECK_PROBABILITY
+
+
+def check_live_case_closure(closure, live_ids):
+    """Compare a stored closure with freshly computed live case ids
+
+    Closures that don't match are deleted.
+
+    :returns: True if the closure matches ``live_ids``.
+    """
+    is_consistent = set(closure.live_ids) == live_ids
+    metrics_counter('commcare.restore.live_case_closure.check', tags={
+        'domain': closure.domain,
+        'consistent': is_consistent,
+    })
+    if not is_consistent:
+        closure.delete()
+    return is_consistent
+
+
+def get_owned_case_ids(domain, owner_ids):
+    return CommCareCase.objects.get_case_ids_in_domain_by_owners(domain, owner_ids, closed=False)
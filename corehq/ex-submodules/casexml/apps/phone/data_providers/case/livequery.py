@@ -22,6 +22,7 @@ Example case graphs with outcomes:
    a(closed) <--ext-- b <--chi-- c(owned) >> []
 """
 import logging
+import time
 from collections import defaultdict
 from functools import partial, wraps
 from itertools import chain, islice
@@ -32,11 +33,23 @@ from casexml.apps.phone.tasks import ASYNC_RESTORE_SENT
 
 from corehq.form_processor.models import CommCareCase, CommCareCaseIndex
 from corehq.sql_db.routers import read_from_plproxy_standbys
-from corehq.toggles import LIVEQUERY_READ_FROM_STANDBYS, NAMESPACE_USER
+from corehq.toggles import (
+    LIVEQUERY_CASE_CLOSURE,
+    LIVEQUERY_READ_FROM_STANDBYS,
+    NAMESPACE_DOMAIN,
+    NAMESPACE_USER,
+)
 from corehq.util.metrics import metrics_counter, metrics_histogram
 from corehq.util.metrics.load_counters import case_load_counter
 from corehq.util.timer import TimingContext
 
+from .live_closure import (
+    check_live_case_closure,
+    get_indices_for_cases,
+    get_live_case_closure,
+    save_live_case_closure,
+    should_check_live_case_closure,
+)
 from .load_testing import get_xml_for_response
 from .stock import get_stock_payload
 from .utils import get_case_sync_updates
@@ -69,12 +82,14 @@ def do_livequery(timing_context, restore_state, response, async_task=None):
 
     debug("sync %s for %r", restore_state.current_sync_log._id, owner_ids)
     with timing_context("livequery"):
+        started = time.time()
         with timing_context("get_case_ids_by_owners"):
             owned_ids = CommCareCase.objects.get_case_ids_in_domain_by_owners(
                 domain, owner_ids, closed=False)
             debug("owned: %r", owned_ids)
 
-        live_ids, indices = get_live_case_ids_and_indices(domain, owned_ids, timing_context)
+        live_ids, indices = get_live_case_ids_for_owners(
+            domain, owner_ids, owned_ids, timing_context, started)
 
         if restore_state.last_sync_log:
             with timing_context("discard_already_synced_cases"):
@@ -85,7 +100,7 @@ def do_livequery(timing_context, restore_state, response, async_task=None):
 
         dependent_ids = live_ids - set(owned_ids)
         debug('updating synclog: live=%r dependent=%r', live_ids, dependent_ids)
-        restore_state.current_sync_log.case_ids_on_phone = live_ids
+        restore_state.current_sync_log.set_case_ids_on_phone(live_ids, restore_state.last_sync_log)
         restore_state.current_sync_log.dependent_case_ids_on_phone = dependent_ids
 
         total_cases = len(sync_ids)
@@ -112,6 +127,33 @@ def do_livequery(timing_context, restore_state, response, async_task=None):
             )
 
 
+def get_live_case_ids_for_owners(domain, owner_ids, owned_ids, timing_context, started):
+    """Get live case ids and indices for a restore, using the stored closure
+    for the owners if there is one (see live_closure.py)
+
+    :param started: ``time.time()`` from before ``owned_ids`` were fetched.
+    """
+    if not LIVEQUERY_CASE_CLOSURE.enabled(domain, NAMESPACE_DOMAIN):
+        return get_live_case_ids_and_indices(domain, owned_ids, timing_context)
+
+    with timing_context("get_live_case_closure"):
+        closure = get_live_case_closure(domain, owner_ids)
+    if closure is not None:
+        metrics_counter('commcare.restore.live_case_closure', tags={'domain': domain, 'result': 'hit'})
+        if not should_check_live_case_closure():
+            live_ids = set(closure.live_ids)
+            with timing_context("get_indices_for_cases(%s cases)" % len(live_ids)):
+                return live_ids, get_indices_for_cases(domain, live_ids)
+    else:
+        metrics_counter('commcare.restore.live_case_closure', tags={'domain': domain, 'result': 'miss'})
+
+    live_ids, indices = get_live_case_ids_and_indices(domain, owned_ids, timing_context)
+    if closure is None or not check_live_case_closure(closure, live_ids):
+        with timing_context("save_live_case_closure"):
+            save_live_case_closure(domain, owner_ids, owned_ids, live_ids, indices, started)
+    return live_ids, indices
+
+
 def get_case_hierarchy(domain, cases):
     """Get the combined case hierarchy for the input cases"""
     domains = {case.domain for case in cases}
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from casexml.apps.phone.data_providers.case.live_closure import (
+    check_live_case_closure,
+    get_owned_case_ids,
+)
+from casexml.apps.phone.data_providers.case.livequery import (
+    get_live_case_ids_and_indices,
+)
+from casexml.apps.phone.models import LiveCaseClosure
+from corehq.util.timer import TimingContext
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the live case ids of a domain's stored livequery case closures "
+        "and delete any that don't match"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('domain')
+
+    def handle(self, domain, **options):
+        checked = inconsistent = 0
+        for closure in LiveCaseClosure.objects.filter(domain=domain).iterator():
+            owned_ids = get_owned_case_ids(domain, closure.owner_ids)
+            live_ids, _ = get_live_case_ids_and_indices(domain, owned_ids, TimingContext())
+            checked += 1
+            closure_id = closure.id
+            if not check_live_case_closure(closure, live_ids):
+                inconsistent += 1
+                print("Closure {} for owners {} did not match: {} missing, {} extra".format(
+                    closure_id,
+                    ', '.join(closure.owner_ids),
+                    len(live_ids - set(closure.live_ids)),
+                    len(set(closure.live_ids) - live_ids),
+                ))
+        print("Checked {} closures, deleted {} that did not match".format(checked, inconsistent))
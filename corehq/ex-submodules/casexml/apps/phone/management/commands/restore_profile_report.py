@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from casexml.apps.phone.models import SyncLogSQL
+from casexml.apps.phone.profiling import summarize_restore_profiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Rank the restore providers, fixtures and steps of a domain by the total time "
+        "spent in them, using the profiles stored on recent sync logs"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('domain')
+        parser.add_argument('--days', type=int, default=7, help='Use sync logs from the last N days')
+        parser.add_argument('--user-id', help='Only use sync logs for this user')
+        parser.add_argument('--limit', type=int, default=30, help='Number of timers to show')
+
+    def handle(self, domain, days, user_id, limit, **options):
+        sync_logs = SyncLogSQL.objects.filter(
+            domain=domain,
+            date__gte=datetime.utcnow() - timedelta(days=days),
+            doc__profile__has_key='name',
+        )
+        if user_id:
+            sync_logs = sync_logs.filter(user_id=user_id)
+        reports = list(sync_logs.values_list('doc__profile', flat=True))
+        if not reports:
+            print("No profiled restores found")
+            return
+
+        summaries = summarize_restore_profiles(reports)
+        print(f"{len(reports)} profiled restores\n")
+        print(f"{'timer':<70} {'restores':>8} {'total s':>9} {'mean s':>8} {'max s':>8} "
+              f"{'queries':>8} {'KB':>9}")
+        for summary in summaries[:limit]:
+            print(f"{summary.path[:70]:<70} {summary.count:>8} {summary.duration:>9.2f} "
+                  f"{summary.mean_duration:>8.3f} {summary.max_duration:>8.3f} "
+                  f"{summary.queries / summary.count:>8.1f} {summary.bytes / summary.count / 1024:>9.1f}")
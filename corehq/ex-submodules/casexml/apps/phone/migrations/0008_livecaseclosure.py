@@ -0,0 +1,45 @@
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('phone', '0007_delete_ownershipcleanlinessflag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveCaseClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=255)),
+                ('owner_key', models.CharField(max_length=40)),
+                ('owner_ids', django.contrib.postgres.fields.ArrayField(
+                    base_field=models.CharField(max_length=255), size=None)),
+                ('live_ids', django.contrib.postgres.fields.ArrayField(
+                    base_field=models.CharField(max_length=255), size=None)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('domain', 'owner_key')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='livecaseclosure',
+            index=models.Index(fields=['domain', 'created_on'], name='phone_closure_domain_created'),
+        ),
+        migrations.CreateModel(
+            name='LiveCaseClosureCase',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('case_id', models.CharField(db_index=True, max_length=255)),
+                ('closure', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='visited_cases',
+                    to='phone.livecaseclosure',
+                )),
+            ],
+        ),
+    ]
@@ -5,6 +5,7 @@ from collections import defaultdict, namedtuple
 from copy import copy
 from datetime import datetime
 
+from django.contrib.postgres.fields import ArrayField
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import Q
@@ -289,6 +290,9 @@ class AbstractSyncLog(SafeSaveDocument):
 
     last_ucr_sync_times = SchemaListProperty(UCRSyncLog)
 
+    # see casexml.apps.phone.profiling
+    profile = DictProperty()
+
     strict = True  # for asserts
 
     @classmethod
@@ -474,6 +478,34 @@ class SyncLogSQL(models.Model):
             )
 
 
+class LiveCaseClosure(models.Model):
+    """Live case ids computed by a livequery restore for a set of owners
+
+    See casexml.apps.phone.data_providers.case.live_closure
+    """
+    domain = models.CharField(max_length=255)
+    # sha1 of the sorted owner ids
+    owner_key = models.CharField(max_length=40)
+    owner_ids = ArrayField(models.CharField(max_length=255))
+    live_ids = ArrayField(models.CharField(max_length=255))
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('domain', 'owner_key')
+        indexes = [
+            models.Index(fields=['domain', 'created_on'], name='phone_closure_domain_created'),
+        ]
+
+
+class LiveCaseClosureCase(models.Model):
+    """A case that was visited while computing a LiveCaseClosure
+
+    Saving any of these cases invalidates the closure.
+    """
+    closure = models.ForeignKey(LiveCaseClosure, on_delete=models.CASCADE, related_name='visited_cases')
+    case_id = models.CharField(max_length=255, db_index=True)
+
+
 class IndexTree(DocumentSchema):
     """
     Document type representing a case dependency tree (which is flattened to a single dict)
@@ -614,6 +646,13 @@ class SimplifiedSyncLog(AbstractSyncLog):
     extensions_checked = BooleanProperty(default=False)
     device_id = StringProperty()
     auth_type = StringProperty()
+    # running Checksum of case_ids_on_phone, as hex, and the number of ids in
+    # it. Ids are added to and removed from case_ids_on_phone with
+    # _add_case_id and _remove_case_id, and the set is replaced with
+    # set_case_ids_on_phone, so that the state hash doesn't need every id on
+    # the phone to be hashed again.
+    case_ids_checksum = StringProperty()
+    case_ids_checksum_count = IntegerProperty()
 
     _purged_cases = None
 
@@ -639,6 +678,57 @@ class SimplifiedSyncLog(AbstractSyncLog):
     def get_footprint_of_cases_on_phone(self):
         return list(self.case_ids_on_phone)
 
+    def get_state_hash(self):
+        return CaseStateHash(self._get_case_ids_checksum().hexdigest())
+
+    def _get_case_ids_checksum(self):
+        """Get the checksum of case_ids_on_phone
+
+        It is computed from all the ids if it isn't stored, as with sync logs
+        saved before it was, or if the ids were changed without updating it.
+        """
+        count = len(self.case_ids_on_phone)
+        if self.case_ids_checksum is None or self.case_ids_checksum_count != count:
+            self._set_case_ids_checksum(Checksum(self.case_ids_on_phone))
+        return Checksum.from_value(int(self.case_ids_checksum, 16), count)
+
+    def _set_case_ids_checksum(self, checksum):
+        self.case_ids_checksum = '{:032x}'.format(checksum.value)
+        self.case_ids_checksum_count = len(checksum)
+
+    def _add_case_id(self, case_id):
+        if case_id not in self.case_ids_on_phone:
+            checksum = self._get_case_ids_checksum()
+            self.case_ids_on_phone.add(case_id)
+            checksum.add(case_id)
+            self._set_case_ids_checksum(checksum)
+
+    def _remove_case_id(self, case_id):
+        checksum = self._get_case_ids_checksum()
+        self.case_ids_on_phone.remove(case_id)
+        checksum.remove(case_id)
+        self._set_case_ids_checksum(checksum)
+
+    def set_case_ids_on_phone(self, case_ids, last_sync_log=None):
+        """Replace the case ids on the phone
+
+        :param last_sync_log: sync log that the phone had. The checksum of
+        ``case_ids`` is updated from its checksum with only the ids that
+        differ from its case ids, rather than computed from all of them.
+        """
+        case_ids = set(case_ids)
+        if isinstance(last_sync_log, SimplifiedSyncLog):
+            checksum = last_sync_log._get_case_ids_checksum()
+            last_case_ids = last_sync_log.case_ids_on_phone
+            for case_id in case_ids - last_case_ids:
+                checksum.add(case_id)
+            for case_id in last_case_ids - case_ids:
+                checksum.remove(case_id)
+        else:
+            checksum = Checksum(case_ids)
+        self.case_ids_on_phone = case_ids
+        self._set_case_ids_checksum(checksum)
+
     @property
     def primary_case_ids(self):
         return self.case_ids_on_phone - self.dependent_case_ids_on_phone
@@ -779,7 +869,7 @@ class SimplifiedSyncLog(AbstractSyncLog):
         self._validate_case_removal(to_remove, all_to_remove, deleted_indices, checked_case_id, xform_id)
 
         try:
-            self.case_ids_on_phone.remove(to_remove)
+            self._remove_case_id(to_remove)
         except KeyError:
             should_fail_softly = not xform_id or _domain_has_legacy_toggle_set()
             if should_fail_softly:
@@ -815,7 +905,7 @@ class SimplifiedSyncLog(AbstractSyncLog):
         #                 "expected {} in {} but wasn't".format(index, all_to_remove))
 
     def _add_primary_case(self, case_id):
-        self.case_ids_on_phone.add(case_id)
+        self._add_case_id(case_id)
         if case_id in self.dependent_case_ids_on_phone:
             self.dependent_case_ids_on_phone.remove(case_id)
 
@@ -984,7 +1074,7 @@ class SimplifiedSyncLog(AbstractSyncLog):
             )
             if is_dependent:
                 _get_logger().debug('adding dependent case %s', case_id)
-                self.case_ids_on_phone.add(case_id)
+                self._add_case_id(case_id)
                 self.dependent_case_ids_on_phone.add(case_id)
 
                 for update in non_live_updates_by_case_id[case_id]:
@@ -996,7 +1086,7 @@ class SimplifiedSyncLog(AbstractSyncLog):
             for update in non_live_updates_by_case_id[case_id]:
                 if update.has_extension_indices_to_add():
                     # non-live cases with extension indices should be added and processed
-                    self.case_ids_on_phone.add(update.case_id)
+                    self._add_case_id(update.case_id)
                     for index in update.indices_to_add:
                         self._add_index(index, update)
                     made_changes = True
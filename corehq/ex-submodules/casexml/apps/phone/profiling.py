@@ -0,0 +1,129 @@
+"""Restore profiling
+
+A profiled restore records, for every timer in the restore's
+``TimingContext``, the number of SQL queries made and the number of
+(uncompressed) payload bytes written while that timer was the innermost
+running one. Fixture and case timers are started inside the providers'
+element generators, so elements and queries are attributed to the fixture
+or case batch that produced them.
+
+The report is stored on the sync log as ``profile`` and looks like::
+
+    {
+        "name": "restore-domain-username",
+        "duration": 1.234,
+        "queries": 12,
+        "bytes": 4567,
+        "subs": [{"name": "FixtureElementProvider", ...}, ...]
+    }
+
+Query and byte counts include those of sub timers. Cached restore responses
+are not profiled since no payload is generated for them.
+"""
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+TIMER_COUNTS = re.compile(r'\s*\(.*\)$')
+
+
+class RestoreProfiler(object):
+
+    def __init__(self, timing_context):
+        self.timing_context = timing_context
+        self.queries = Counter()
+        self.bytes = Counter()
+
+    @contextmanager
+    def record_queries(self):
+        """Count queries made on this thread's database connections"""
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self._count_query))
+            yield
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries[self._current_timer_id()] += 1
+        return execute(sql, params, many, context)
+
+    def add_bytes(self, num_bytes):
+        self.bytes[self._current_timer_id()] += num_bytes
+
+    def _current_timer_id(self):
+        if self.timing_context.is_finished():
+            return self.timing_context.root.uuid
+        return self.timing_context.peek().uuid
+
+    def get_report(self):
+        return self._get_timer_report(self.timing_context.root)
+
+    def _get_timer_report(self, timer):
+        subs = [self._get_timer_report(sub) for sub in timer.subs]
+        report = {
+            'name': timer.name,
+            'duration': round(timer.duration or 0, 3),
+            'queries': self.queries[timer.uuid] + sum(sub['queries'] for sub in subs),
+            'bytes': self.bytes[timer.uuid] + sum(sub['bytes'] for sub in subs),
+        }
+        if subs:
+            report['subs'] = subs
+        return report
+
+
+class ProfileSummary(object):
+    """Totals for one timer across a set of restore profiles"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.duration = 0
+        self.max_duration = 0
+        self.queries = 0
+        self.bytes = 0
+
+    def add(self, report):
+        self.count += 1
+        self.duration += report['duration']
+        self.max_duration = max(self.max_duration, report['duration'])
+        self.queries += report['queries']
+        self.bytes += report['bytes']
+
+    @property
+    def mean_duration(self):
+        return self.duration / self.count
+
+
+def summarize_restore_profiles(reports):
+    """Aggregate restore profiles by timer
+
+    The root timer is named after the user so timers are identified by their
+    path below it, e.g. ``FixtureElementProvider.fixture:locations``, and the
+    root is summarized as ``restore``. Counts in timer names, like
+    ``compile_response(20 cases)``, are dropped and timers with the same name
+    under the same parent, like the case batches of one restore, are added
+    together.
+
+    :returns: list of ``ProfileSummary``, slowest total duration first.
+    """
+    summaries = {}
+    for report in reports:
+        for path, totals in _flatten_profile(report).items():
+            if path not in summaries:
+                summaries[path] = ProfileSummary(path)
+            summaries[path].add(totals)
+    return sorted(summaries.values(), key=lambda summary: summary.duration, reverse=True)
+
+
+def _flatten_profile(report, path='restore', totals=None):
+    if totals is None:
+        totals = {}
+    if path not in totals:
+        totals[path] = {'duration': 0, 'queries': 0, 'bytes': 0}
+    for key in totals[path]:
+        totals[path][key] += report[key]
+    for sub in report.get('subs', []):
+        name = TIMER_COUNTS.sub('', sub['name'])
+        _flatten_profile(sub, name if path == 'restore' else '{}.{}'.format(path, name), totals)
+    return totals
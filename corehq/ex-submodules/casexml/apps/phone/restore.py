@@ -1,8 +1,10 @@
+import gzip
 import logging
 import os
 import shutil
 import tempfile
 import uuid
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from distutils.version import LooseVersion
 from io import BytesIO
@@ -41,6 +43,7 @@ from .const import (
     INITIAL_ASYNC_TIMEOUT_THRESHOLD,
     INITIAL_SYNC_CACHE_THRESHOLD,
     INITIAL_SYNC_CACHE_TIMEOUT,
+    RESTORE_GZIP_LEVEL,
 )
 from .data_providers import get_async_providers, get_element_providers
 from .exceptions import (
@@ -55,6 +58,7 @@ from .models import (
     SimplifiedSyncLog,
     get_properly_wrapped_sync_log,
 )
+from .profiling import RestoreProfiler
 from .restore_caching import AsyncRestoreTaskIdCache, RestorePayloadPathCache
 from .tasks import ASYNC_RESTORE_SENT, get_async_restore_payload
 from .utils import get_cached_items_with_count
@@ -99,6 +103,16 @@ class StockSettings(object):
 
 
 class RestoreContent(object):
+    """Writes the restore payload to a temporary file as elements are added
+
+    :param username: Username shown in the restore message.
+    :param items: Include a count of the items in the payload. The
+    count goes in the opening tag, so the body is buffered in a second
+    file until it is known. Otherwise elements are written straight to
+    the payload file.
+    :param compress: Gzip the payload file as it is written.
+    :param profiler: ``RestoreProfiler`` to record the size of each element.
+    """
     start_tag_template = (
         b'<OpenRosaResponse xmlns="http://openrosa.org/http/response"%(items)s>'
         b'<message nature="%(nature)s">Successfully restored account %(username)s!</message>'
@@ -106,62 +120,89 @@ class RestoreContent(object):
     items_template = b' items="%s"'
     closing_tag = b'</OpenRosaResponse>'
 
-    def __init__(self, username=None, items=False):
+    def __init__(self, username=None, items=False, compress=False, profiler=None):
         self.username = username
         self.items = items
+        self.compress = compress
+        self.profiler = profiler
         self.num_items = 0
 
     def __enter__(self):
-        self.response_body = tempfile.TemporaryFile('w+b')
+        self._fileobj = tempfile.TemporaryFile('w+b')
+        self._fileobj_returned = False
+        if self.compress:
+            self._output = gzip.GzipFile(fileobj=self._fileobj, mode='wb', compresslevel=RESTORE_GZIP_LEVEL)
+        else:
+            self._output = self._fileobj
+        if self.items:
+            self.response_body = tempfile.TemporaryFile('w+b')
+        else:
+            self._write_start_tag()
+            self.response_body = self._output
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.response_body.close()
+        if self.items:
+            self.response_body.close()
+        if not self._fileobj_returned:
+            self._fileobj.close()
 
     def append(self, xml_element):
         self.num_items += 1
         if isinstance(xml_element, bytes):
             xml_element, num = get_cached_items_with_count(xml_element)
             self.num_items += num - 1
-            self.response_body.write(xml_element)
         else:
-            self.response_body.write(ElementTree.tostring(xml_element, encoding='utf-8'))
+            xml_element = ElementTree.tostring(xml_element, encoding='utf-8')
+        self.response_body.write(xml_element)
+        if self.profiler is not None:
+            self.profiler.add_bytes(len(xml_element))
 
     def extend(self, iterable):
         for element in iterable:
             self.append(element)
 
-    def _write_to_file(self, fileobj):
+    def _write_start_tag(self):
         # Add 1 to num_items to account for message element
         items = (self.items_template % ('%s' % (self.num_items + 1)).encode('utf-8')) if self.items else b''
-        fileobj.write(self.start_tag_template % {
+        self._output.write(self.start_tag_template % {
             b"items": items,
             b"username": self.username.encode("utf8"),
             b"nature": ResponseNature.OTA_RESTORE_SUCCESS.encode("utf8"),
         })
 
-        self.response_body.seek(0)
-        shutil.copyfileobj(self.response_body, fileobj)
-
-        fileobj.write(self.closing_tag)
-
     def get_fileobj(self):
-        fileobj = tempfile.TemporaryFile('w+b')
+        """Finish the payload and return the file it was written to
+
+        The file is gzip compressed if ``compress`` was set. It is not
+        closed on exit, so the caller is responsible for closing it.
+        """
         try:
-            self._write_to_file(fileobj)
-            fileobj.seek(0)
-            return fileobj
+            if self.items:
+                self._write_start_tag()
+                self.response_body.seek(0)
+                shutil.copyfileobj(self.response_body, self._output)
+            self._output.write(self.closing_tag)
+            if self.compress:
+                # writes the gzip trailer. This does not close self._fileobj
+                self._output.close()
+            self._fileobj.seek(0)
         except:
-            fileobj.close()
+            self._fileobj.close()
             raise
+        self._fileobj_returned = True
+        return self._fileobj
 
 
 class RestoreResponse(object):
 
-    def __init__(self, fileobj):
+    def __init__(self, fileobj, compressed=False):
         self.fileobj = fileobj
+        self.compressed = compressed
 
     def as_file(self):
+        if self.compressed:
+            return gzip.GzipFile(fileobj=self.fileobj, mode='rb')
         return self.fileobj
 
     def as_string(self):
@@ -171,12 +212,14 @@ class RestoreResponse(object):
         Cannot be called more than once, and `self.as_file()` will
         return a closed file after this is called.
         """
-        with self.fileobj:
-            return self.fileobj.read()
+        with self.fileobj, self.as_file() as fileobj:
+            return fileobj.read()
 
     def get_http_response(self):
         self.fileobj.seek(0, os.SEEK_END)
         headers = {'Content-Length': self.fileobj.tell()}
+        if self.compressed:
+            headers['Content-Encoding'] = 'gzip'
         self.fileobj.seek(0)
         return stream_response(self.fileobj, headers)
 
@@ -216,8 +259,14 @@ class AsyncRestoreResponse(object):
 
 
 class CachedResponse(object):
+    """A restore response saved in the blob db
 
-    def __init__(self, name):
+    :param name: Blob key of the saved response.
+    :param accept_gzip: The client accepts a gzip encoded response.
+    Compressed responses are decompressed for other clients.
+    """
+
+    def __init__(self, name, accept_gzip=False):
         if name and name.startswith("restore-response-"):
             # Name template was 'restore-response-{}.xml' before new
             # blob metadata API was implemented. This can be removed
@@ -226,16 +275,19 @@ class CachedResponse(object):
             # '_default' is the bucket name from the old blob db API.
             name = "_default/" + name
         self.name = name
+        self.accept_gzip = accept_gzip
+        self.compressed = bool(name) and name.endswith('.gz')
 
     @classmethod
-    def save_for_later(cls, fileobj, timeout, domain, restore_user_id):
+    def save_for_later(cls, fileobj, timeout, domain, restore_user_id, compressed=False):
         """Save restore response for later
 
         :param fileobj: A file-like object.
         :param timeout: Minimum content expiration in seconds.
+        :param compressed: `fileobj` contains gzip compressed content.
         :returns: A new `CachedResponse` pointing to the saved content.
         """
-        name = 'restore-{}.xml'.format(uuid4().hex)
+        name = 'restore-{}.xml{}'.format(uuid4().hex, '.gz' if compressed else '')
         get_blob_db().put(
             NoClose(fileobj),
             domain=domain,
@@ -244,11 +296,11 @@ class CachedResponse(object):
             key=name,
             timeout=max(timeout // 60, 60),
         )
-        return cls(name)
+        return cls(name, accept_gzip=compressed)
 
     def __bool__(self):
         try:
-            return bool(self.as_file())
+            return bool(self._get_blob())
         except NotFound:
             return False
 
@@ -259,6 +311,12 @@ class CachedResponse(object):
             return fileobj.read()
 
     def as_file(self):
+        blob = self._get_blob()
+        if blob is not None and self.compressed:
+            return gzip.GzipFile(fileobj=blob, mode='rb')
+        return blob
+
+    def _get_blob(self):
         try:
             value = self._fileobj
         except AttributeError:
@@ -267,8 +325,13 @@ class CachedResponse(object):
         return value
 
     def get_http_response(self):
-        file = self.as_file()
+        if self.compressed and not self.accept_gzip:
+            # the decompressed length is not known up front
+            return stream_response(self.as_file())
+        file = self._get_blob()
         headers = {'Content-Length': file.content_length}
+        if self.compressed:
+            headers['Content-Encoding'] = 'gzip'
         return stream_response(file, headers)
 
 
@@ -283,6 +346,8 @@ class RestoreParams(object):
     :param state_hash:          The case state hash string to use to verify the state of the phone
     :param include_item_count:  Set to `True` to include the item count in the response
     :param device_id:           The Device id of the device restoring
+    :param accept_gzip:         Set to `True` if the client accepts a gzip encoded response
+    :param profile:             Set to `True` to store a profile of the restore on the sync log
     """
 
     def __init__(self,
@@ -292,13 +357,17 @@ class RestoreParams(object):
             include_item_count=False,
             device_id=None,
             app=None,
-            openrosa_version=None):
+            openrosa_version=None,
+            accept_gzip=False,
+            profile=False):
         self.sync_log_id = sync_log_id
         self.version = version
         self.state_hash = state_hash
         self.include_item_count = include_item_count
         self.app = app
         self.device_id = device_id
+        self.accept_gzip = accept_gzip
+        self.profile = profile
         self.openrosa_version = (LooseVersion(openrosa_version)
             if isinstance(openrosa_version, str) else openrosa_version)
 
@@ -542,6 +611,7 @@ class RestoreConfig(object):
         self.overwrite_cache = self.cache_settings.overwrite_cache
 
         self.timing_context = TimingContext('restore-{}-{}'.format(self.domain, self.restore_user.username))
+        self.profiler = RestoreProfiler(self.timing_context) if self.params.profile else None
 
     @property
     @memoized
@@ -631,7 +701,7 @@ class RestoreConfig(object):
 
         cache_payload_path = self.restore_payload_path_cache.get_value()
 
-        return CachedResponse(cache_payload_path)
+        return CachedResponse(cache_payload_path, accept_gzip=self.params.accept_gzip)
 
     def generate_payload(self, async_task=None):
         if async_task:
@@ -639,6 +709,8 @@ class RestoreConfig(object):
         self.restore_state.start_sync()
         fileobj = self._generate_restore_response(async_task=async_task)
         try:
+            if self.profiler is not None:
+                self.restore_state.current_sync_log.profile = self.profiler.get_report()
             self.restore_state.finish_sync()
             cached_response = self.set_cached_payload_if_necessary(
                 fileobj, self.restore_state.duration, async_task)
@@ -650,7 +722,7 @@ class RestoreConfig(object):
                 self._record_timing('async')
             else:
                 fileobj.seek(0)
-                response = RestoreResponse(fileobj)
+                response = RestoreResponse(fileobj, compressed=self.params.accept_gzip)
         except:
             fileobj.close()
             raise
@@ -688,7 +760,7 @@ class RestoreConfig(object):
             if isinstance(response_or_name, bytes):
                 response_or_name = response_or_name.decode('utf-8')
             if isinstance(response_or_name, str):
-                response = CachedResponse(response_or_name)
+                response = CachedResponse(response_or_name, accept_gzip=self.params.accept_gzip)
             else:
                 response = response_or_name
         except TimeoutError:
@@ -705,11 +777,14 @@ class RestoreConfig(object):
 
     def _generate_restore_response(self, async_task=None):
         """
-        :returns: A file-like object containing response content.
+        :returns: A file-like object containing response content. The
+        content is gzip compressed if the client accepts it.
         """
         username = self.restore_user.username
         count_items = self.params.include_item_count
-        with RestoreContent(username, count_items) as content:
+        content = RestoreContent(username, count_items, compress=self.params.accept_gzip, profiler=self.profiler)
+        record_queries = self.profiler.record_queries() if self.profiler is not None else nullcontext()
+        with content, record_queries:
             for provider in get_element_providers(self.timing_context, skip_fixtures=self.skip_fixtures):
                 with self.timing_context(provider.__class__.__name__):
                     content.extend(provider.get_elements(self.restore_state))
@@ -741,6 +816,7 @@ class RestoreConfig(object):
                 self.cache_timeout,
                 self.domain,
                 self.restore_user.user_id,
+                compressed=self.params.accept_gzip,
             )
             self.restore_payload_path_cache.set_value(response.name, self.cache_timeout)
             return response
@@ -0,0 +1,23 @@
+from django.dispatch import receiver
+
+from corehq.form_processor.models import CommCareCase
+from corehq.form_processor.signals import sql_case_post_save, sql_cases_deleted
+from corehq.toggles import LIVEQUERY_CASE_CLOSURE, NAMESPACE_DOMAIN
+
+
+@receiver(sql_case_post_save, sender=CommCareCase, dispatch_uid="invalidate_live_case_closures")
+def invalidate_live_case_closures_for_case(sender, case, **kwargs):
+    from casexml.apps.phone.data_providers.case.live_closure import invalidate_live_case_closures
+    if not LIVEQUERY_CASE_CLOSURE.enabled(case.domain, NAMESPACE_DOMAIN):
+        return
+    case_ids = [case.case_id] + [index.referenced_id for index in case.indices if index.referenced_id]
+    invalidate_live_case_closures(case.domain, case_ids, case.owner_id)
+
+
+@receiver(sql_cases_deleted, sender=CommCareCase, dispatch_uid="invalidate_live_case_closures_for_deleted")
+def invalidate_live_case_closures_for_deleted_cases(sender, domain, case_ids, **kwargs):
+    from casexml.apps.phone.data_providers.case.live_closure import invalidate_live_case_closures
+    if not LIVEQUERY_CASE_CLOSURE.enabled(domain, NAMESPACE_DOMAIN):
+        return
+    # a deleted case can only change a closure that visited it
+    invalidate_live_case_closures(domain, case_ids)
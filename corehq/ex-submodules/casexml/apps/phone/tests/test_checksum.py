@@ -0,0 +1,35 @@
+import doctest
+
+from django.test import SimpleTestCase
+
+from casexml.apps.phone import checksum
+from casexml.apps.phone.checksum import EMPTY_HASH, Checksum
+
+
+def test_doctests():
+    results = doctest.testmod(checksum)
+    assert results.failed == 0
+
+
+class ChecksumTest(SimpleTestCase):
+
+    def test_order_independent(self):
+        ids = ['case{}'.format(i) for i in range(100)]
+        self.assertEqual(Checksum(ids).hexdigest(), Checksum(reversed(ids)).hexdigest())
+
+    def test_add_many_matches_add(self):
+        ids = ['case{}'.format(i) for i in range(10)]
+        incremental = Checksum()
+        for id in ids:
+            incremental.add(id)
+        batch = Checksum()
+        batch.add_many(iter(ids))
+        self.assertEqual(incremental.hexdigest(), batch.hexdigest())
+        self.assertEqual(10, len(batch))
+
+    def test_remove_all(self):
+        c = Checksum({'abc123', '123abc'})
+        c.remove('abc123')
+        c.remove('123abc')
+        self.assertEqual(EMPTY_HASH, c.hexdigest())
+
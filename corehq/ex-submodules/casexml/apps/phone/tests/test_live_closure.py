@@ -0,0 +1,111 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from casexml.apps.phone.data_providers.case import livequery
+from casexml.apps.phone.data_providers.case.live_closure import get_owner_key
+from casexml.apps.phone.models import LiveCaseClosure, LiveCaseClosureCase
+from corehq.form_processor.models import CommCareCase
+from corehq.form_processor.tests.utils import create_case, sharded
+from corehq.util.test_utils import flag_enabled
+from corehq.util.timer import TimingContext
+
+DOMAIN = 'live-closure-test'
+
+
+class OwnerKeyTest(SimpleTestCase):
+
+    def test_order_independent(self):
+        self.assertEqual(get_owner_key(['a', 'b']), get_owner_key(['b', 'a']))
+
+    def test_duplicates_ignored(self):
+        self.assertEqual(get_owner_key(['a', 'b']), get_owner_key(['a', 'b', 'a']))
+
+    def test_different_owners(self):
+        self.assertNotEqual(get_owner_key(['a', 'b']), get_owner_key(['a', 'bc']))
+
+
+@mock.patch.object(livequery, 'save_live_case_closure')
+@mock.patch.object(livequery, 'get_indices_for_cases', return_value={'c1': []})
+@mock.patch.object(livequery, 'get_live_case_ids_and_indices', return_value=({'c1', 'c2'}, {}))
+@mock.patch.object(livequery, 'should_check_live_case_closure', return_value=False)
+@mock.patch.object(livequery, 'get_live_case_closure')
+class GetLiveCaseIdsForOwnersTest(SimpleTestCase):
+
+    def _get_live_ids(self):
+        return livequery.get_live_case_ids_for_owners(
+            DOMAIN, ['owner'], ['c1'], TimingContext('test'), started=0)
+
+    def test_toggle_disabled(self, get_closure, should_check, compute, get_indices, save):
+        self.assertEqual(({'c1', 'c2'}, {}), self._get_live_ids())
+        get_closure.assert_not_called()
+        save.assert_not_called()
+
+    @flag_enabled('LIVEQUERY_CASE_CLOSURE')
+    def test_miss(self, get_closure, should_check, compute, get_indices, save):
+        get_closure.return_value = None
+        self.assertEqual(({'c1', 'c2'}, {}), self._get_live_ids())
+        save.assert_called_once_with(DOMAIN, ['owner'], ['c1'], {'c1', 'c2'}, {}, 0)
+
+    @flag_enabled('LIVEQUERY_CASE_CLOSURE')
+    def test_hit(self, get_closure, should_check, compute, get_indices, save):
+        get_closure.return_value = mock.Mock(domain=DOMAIN, live_ids=['c1'])
+        self.assertEqual(({'c1'}, {'c1': []}), self._get_live_ids())
+        compute.assert_not_called()
+        save.assert_not_called()
+
+    @flag_enabled('LIVEQUERY_CASE_CLOSURE')
+    def test_check_consistent(self, get_closure, should_check, compute, get_indices, save):
+        closure = mock.Mock(domain=DOMAIN, live_ids=['c2', 'c1'])
+        get_closure.return_value = closure
+        should_check.return_value = True
+        self.assertEqual(({'c1', 'c2'}, {}), self._get_live_ids())
+        closure.delete.assert_not_called()
+        save.assert_not_called()
+
+    @flag_enabled('LIVEQUERY_CASE_CLOSURE')
+    def test_check_inconsistent(self, get_closure, should_check, compute, get_indices, save):
+        closure = mock.Mock(domain=DOMAIN, live_ids=['c1'])
+        get_closure.return_value = closure
+        should_check.return_value = True
+        self.assertEqual(({'c1', 'c2'}, {}), self._get_live_ids())
+        closure.delete.assert_called_once_with()
+        save.assert_called_once_with(DOMAIN, ['owner'], ['c1'], {'c1', 'c2'}, {}, 0)
+
+
+@sharded
+@flag_enabled('LIVEQUERY_CASE_CLOSURE')
+class DeletedCaseInvalidatesClosureTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.case = create_case(DOMAIN, user_id='owner', save=True)
+        self.other_closure = self._create_closure(['other-owner'], [])
+        self.closure = self._create_closure(['owner'], [self.case.case_id])
+
+    @staticmethod
+    def _create_closure(owner_ids, live_ids):
+        closure = LiveCaseClosure.objects.create(
+            domain=DOMAIN,
+            owner_key=get_owner_key(owner_ids),
+            owner_ids=owner_ids,
+            live_ids=live_ids,
+        )
+        LiveCaseClosureCase.objects.bulk_create([
+            LiveCaseClosureCase(closure=closure, case_id=case_id) for case_id in live_ids
+        ])
+        return closure
+
+    def _assert_only_other_closure_left(self):
+        self.assertEqual(
+            list(LiveCaseClosure.objects.filter(domain=DOMAIN).values_list('id', flat=True)),
+            [self.other_closure.id],
+        )
+
+    def test_soft_delete(self):
+        CommCareCase.objects.soft_delete_cases(DOMAIN, [self.case.case_id])
+        self._assert_only_other_closure_left()
+
+    def test_hard_delete(self):
+        CommCareCase.objects.hard_delete_cases(DOMAIN, [self.case.case_id])
+        self._assert_only_other_closure_left()
@@ -3,7 +3,6 @@ from corehq.blobs import get_blob_db
 from casexml.apps.phone.utils import MockDevice
 from corehq.apps.domain.models import Domain
 from corehq.apps.fixtures.models import (
-    FIXTURE_BUCKET,
     Field,
     LookupTable,
     LookupTableRow,
@@ -37,11 +36,11 @@ class OtaFixtureTest(TestCase):
         cls.group2 = Group(domain=DOMAIN, name='group2', case_sharing=True, users=[])
         cls.group2.save()
 
-        make_item_lists(SA_PROVINCES, 'western cape'),
+        global_table, _ = make_item_lists(SA_PROVINCES, 'western cape')
         make_item_lists(FR_PROVINCES, 'burgundy', cls.group1),
         make_item_lists(CA_PROVINCES, 'alberta', cls.group2),
 
-        cls.addClassCleanup(get_blob_db().delete, key=FIXTURE_BUCKET + "/" + DOMAIN)
+        cls.addClassCleanup(get_blob_db().delete, key=global_table.fixture_blob_key)
 
         cls.restore_user = cls.user.to_ota_restore_user(DOMAIN)
 
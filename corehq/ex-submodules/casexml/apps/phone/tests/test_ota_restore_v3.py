@@ -1,3 +1,5 @@
+import gzip
+
 from django.test import TestCase
 from django.test.testcases import SimpleTestCase
 from corehq.apps.users.dbaccessors import delete_all_users
@@ -7,7 +9,7 @@ from casexml.apps.case.tests.util import (
     delete_all_sync_logs,
 )
 from casexml.apps.case.mock import CaseBlock
-from casexml.apps.phone.restore import RestoreContent
+from casexml.apps.phone.restore import RestoreContent, RestoreResponse
 from casexml.apps.phone.tests.utils import create_restore_user
 from casexml.apps.phone.utils import MockDevice
 
@@ -73,3 +75,25 @@ class TestRestoreContent(SimpleTestCase):
             response.append(body.encode('utf-8'))
             with response.get_fileobj() as fileobj:
                 self.assertEqual(expected, fileobj.read().decode('utf-8'))
+
+    def test_compressed(self):
+        user = 'user1'
+        body = '<elem>data0</elem>'
+        for items in [None, 2]:
+            expected = self._expected(user, body, items=items)
+            with RestoreContent(user, items is not None, compress=True) as response:
+                response.append(body.encode('utf-8'))
+                with response.get_fileobj() as fileobj:
+                    self.assertEqual(expected, gzip.decompress(fileobj.read()).decode('utf-8'))
+
+    def test_compressed_response(self):
+        user = 'user1'
+        body = '<elem>data0</elem>'
+        with RestoreContent(user, compress=True) as content:
+            content.append(body.encode('utf-8'))
+            fileobj = content.get_fileobj()
+        http_response = RestoreResponse(fileobj, compressed=True).get_http_response()
+        self.assertEqual('gzip', http_response['Content-Encoding'])
+        payload = b''.join(http_response.streaming_content)
+        self.assertEqual(str(len(payload)), http_response['Content-Length'])
+        self.assertEqual(self._expected(user, body), gzip.decompress(payload).decode('utf-8'))
@@ -0,0 +1,97 @@
+from unittest import mock
+from xml.etree import cElementTree as ElementTree
+
+from django.test import SimpleTestCase
+
+from casexml.apps.phone.profiling import RestoreProfiler, summarize_restore_profiles
+from casexml.apps.phone.restore import RestoreContent
+from corehq.util.timer import TimingContext
+
+
+class RestoreProfilerTest(SimpleTestCase):
+
+    def _profile(self):
+        timing_context = TimingContext('restore')
+        profiler = RestoreProfiler(timing_context)
+        with timing_context:
+            with RestoreContent('user', profiler=profiler) as content:
+                with timing_context('SyncElementProvider'):
+                    content.append(ElementTree.Element('Sync'))
+                with timing_context('FixtureElementProvider'):
+                    with timing_context('fixture:one'):
+                        content.append(b'<fixture id="one"/>')
+                        profiler._count_query(mock.Mock(), 'select 1', None, False, {})
+                    profiler._count_query(mock.Mock(), 'select 2', None, False, {})
+                content.get_fileobj().close()
+        return profiler.get_report()
+
+    def test_report(self):
+        report = self._profile()
+        self.assertEqual(report['name'], 'restore')
+        self.assertEqual(report['queries'], 2)
+        self.assertEqual(report['bytes'], len(b'<Sync />') + len(b'<fixture id="one"/>'))
+        sync, fixtures = report['subs']
+        self.assertEqual(
+            {key: sync[key] for key in ('name', 'queries', 'bytes')},
+            {'name': 'SyncElementProvider', 'queries': 0, 'bytes': len(b'<Sync />')},
+        )
+        self.assertEqual(fixtures['queries'], 2)
+        fixture, = fixtures['subs']
+        self.assertEqual(
+            {key: fixture[key] for key in ('name', 'queries', 'bytes')},
+            {'name': 'fixture:one', 'queries': 1, 'bytes': len(b'<fixture id="one"/>')},
+        )
+        self.assertNotIn('subs', fixture)
+
+    def test_query_passed_through(self):
+        profiler = RestoreProfiler(TimingContext('restore'))
+        execute = mock.Mock(return_value='result')
+        self.assertEqual(profiler._count_query(execute, 'select 1', None, False, {}), 'result')
+        execute.assert_called_once_with('select 1', None, False, {})
+
+
+def _timer(name, duration, queries=0, bytes=0, subs=None):
+    report = {'name': name, 'duration': duration, 'queries': queries, 'bytes': bytes}
+    if subs:
+        report['subs'] = subs
+    return report
+
+
+class SummarizeRestoreProfilesTest(SimpleTestCase):
+
+    def test_summarize(self):
+        reports = [
+            _timer('restore-domain-alice', 10, queries=6, subs=[
+                _timer('FixtureElementProvider', 2, queries=1),
+                _timer('CasePayloadProvider', 8, queries=5, subs=[
+                    _timer('get_xml_for_response (100 updates)', 3, queries=2),
+                    _timer('get_xml_for_response (50 updates)', 1, queries=3),
+                ]),
+            ]),
+            _timer('restore-domain-bob', 4, queries=1, subs=[
+                _timer('FixtureElementProvider', 4, queries=1),
+            ]),
+        ]
+        summaries = {summary.path: summary for summary in summarize_restore_profiles(reports)}
+        self.assertEqual(
+            set(summaries),
+            {'restore', 'FixtureElementProvider', 'CasePayloadProvider',
+             'CasePayloadProvider.get_xml_for_response'},
+        )
+        fixtures = summaries['FixtureElementProvider']
+        self.assertEqual(
+            (fixtures.count, fixtures.duration, fixtures.max_duration, fixtures.queries),
+            (2, 6, 4, 2),
+        )
+        batches = summaries['CasePayloadProvider.get_xml_for_response']
+        self.assertEqual((batches.count, batches.duration, batches.queries), (1, 4, 5))
+
+    def test_slowest_first(self):
+        reports = [_timer('restore-domain-alice', 10, subs=[
+            _timer('SyncElementProvider', 1),
+            _timer('CasePayloadProvider', 8),
+        ])]
+        self.assertEqual(
+            [summary.path for summary in summarize_restore_profiles(reports)],
+            ['restore', 'CasePayloadProvider', 'SyncElementProvider'],
+        )
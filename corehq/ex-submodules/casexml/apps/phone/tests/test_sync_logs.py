@@ -1,9 +1,11 @@
 import uuid
+from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 
 from casexml.apps.case.xml import V1
-from casexml.apps.phone.models import SyncLogSQL
+from casexml.apps.phone.checksum import Checksum
+from casexml.apps.phone.models import SimplifiedSyncLog, SyncLogSQL
 from casexml.apps.phone.restore import RestoreConfig, RestoreParams
 from casexml.apps.phone.tests.utils import create_restore_user
 from casexml.apps.phone.utils import MockDevice
@@ -52,3 +54,40 @@ class SyncLogModelTest(TestCase):
         self.assertEqual(self.restore_user.domain, sync_log.domain)
         self.assertEqual(app._id, sync_log.build_id)
         self.addCleanup(app.delete)
+
+
+class SyncLogStateHashTest(SimpleTestCase):
+
+    def assert_state_hash(self, sync_log, case_ids):
+        self.assertEqual(sync_log.get_state_hash().hash, Checksum(case_ids).hexdigest())
+
+    def test_add_and_remove_case_ids(self):
+        sync_log = SimplifiedSyncLog(case_ids_on_phone={'a', 'b'})
+        self.assert_state_hash(sync_log, ['a', 'b'])
+        sync_log._add_primary_case('c')
+        sync_log._add_primary_case('c')
+        sync_log._remove_case_id('a')
+        self.assertEqual(sync_log.case_ids_checksum_count, 2)
+        self.assert_state_hash(sync_log, ['b', 'c'])
+
+    def test_set_case_ids_on_phone_from_last_sync_log(self):
+        last_sync_log = SimplifiedSyncLog(case_ids_on_phone={'a', 'b'})
+        sync_log = SimplifiedSyncLog()
+        sync_log.set_case_ids_on_phone({'b', 'c'}, last_sync_log)
+        self.assertEqual(sync_log.case_ids_on_phone, {'b', 'c'})
+        self.assert_state_hash(sync_log, ['b', 'c'])
+        self.assertEqual(last_sync_log.case_ids_on_phone, {'a', 'b'})
+
+    def test_checksum_saved(self):
+        sync_log = SimplifiedSyncLog()
+        sync_log.set_case_ids_on_phone({'a', 'b'})
+        sync_log = SimplifiedSyncLog.wrap(sync_log.to_json())
+        with patch.object(Checksum, 'hash', side_effect=AssertionError("ids hashed again")):
+            state_hash = sync_log.get_state_hash()
+        self.assertEqual(state_hash.hash, Checksum(['a', 'b']).hexdigest())
+
+    def test_ids_changed_without_checksum(self):
+        sync_log = SimplifiedSyncLog()
+        sync_log.set_case_ids_on_phone({'a', 'b'})
+        sync_log.case_ids_on_phone = {'c'}
+        self.assert_state_hash(sync_log, ['c'])
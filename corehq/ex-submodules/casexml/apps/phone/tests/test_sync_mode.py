@@ -1898,7 +1898,7 @@ class SyncTokenReprocessingTest(BaseSyncTest):
         self.assertEqual({case_id}, sync_log.case_ids_on_phone)
 
         # manually delete it and then try to update
-        sync_log.case_ids_on_phone = set()
+        sync_log.set_case_ids_on_phone(set())
         sync_log.save()
 
         self.device.post_changes(CaseBlock(
@@ -1,17 +1,22 @@
 from codecs import BOM_UTF8
 from contextlib import closing
+import datetime
 import io
 import os
+import zipfile
 
 from django.test import SimpleTestCase
 from lxml import html, etree
 from unittest.mock import patch, Mock
+import pyarrow.parquet
 
 from couchexport.export import export_from_tables
 from couchexport.models import Format
 from couchexport.writers import (
     MAX_XLS_COLUMNS,
     CsvFileWriter,
+    ParquetExportWriter,
+    ParquetFileWriter,
     PythonDictWriter,
     XlsLengthException,
     ZippedExportWriter,
@@ -233,3 +238,88 @@ class HeaderNameTest(SimpleTestCase):
         preview = writer.get_preview()
         table_names = {table['table_name'] for table in preview}
         self.assertEqual(len(table_names), 2)
+
+
+class ParquetExportWriterTests(SimpleTestCase):
+
+    def _write_parquet(self, rows, column_types=None):
+        writer = ParquetExportWriter()
+        file = io.BytesIO()
+        headers = ['number', 'count', 'weight', 'day', 'submitted', 'name']
+        writer.open(
+            [('forms', [headers]), ('visits', [['number']])],
+            file,
+            table_titles={'forms': 'Forms', 'visits': 'Visits'},
+            archive_basepath='Export',
+            column_types=column_types,
+        )
+        writer.write([('forms', rows)])
+        writer.close()
+        return zipfile.ZipFile(file)
+
+    def _read_table(self, archive, path):
+        return pyarrow.parquet.read_table(io.BytesIO(archive.read(path)))
+
+    def test_file_per_table(self):
+        archive = self._write_parquet([])
+        self.assertEqual(archive.namelist(), ['Export/Forms.parquet', 'Export/Visits.parquet'])
+        self.assertEqual(self._read_table(archive, 'Export/Visits.parquet').column_names, ['number'])
+
+    def test_typed_columns(self):
+        archive = self._write_parquet([
+            ['0', '3', '1.5', '2021-03-01', '2021-03-01T10:30:00.000000Z', 'ひらがな'],
+            ['1', '---', '', '---', '2021-03-01 10:30:00', '---'],
+            ['2', '4', '2', '2021-03-02', '2021-03-01T13:30:00.000+03:00', None],
+        ], column_types={'forms': ['string', 'integer', 'decimal', 'date', 'datetime', 'string']})
+        table = self._read_table(archive, 'Export/Forms.parquet')
+        self.assertEqual(
+            [str(field.type) for field in table.schema],
+            ['string', 'int64', 'double', 'date32[day]', 'timestamp[us]', 'string'],
+        )
+        submitted = datetime.datetime(2021, 3, 1, 10, 30)
+        self.assertEqual(table.to_pylist(), [
+            {'number': '0', 'count': 3, 'weight': 1.5, 'day': datetime.date(2021, 3, 1),
+             'submitted': submitted, 'name': 'ひらがな'},
+            {'number': '1', 'count': None, 'weight': None, 'day': None,
+             'submitted': submitted, 'name': '---'},
+            {'number': '2', 'count': 4, 'weight': 2.0, 'day': datetime.date(2021, 3, 2),
+             'submitted': submitted, 'name': None},
+        ])
+
+    def test_unparseable_values_written_as_strings(self):
+        archive = self._write_parquet([
+            ['0', '3', '1.5', '2021-03-01', '', ''],
+            ['1', 'many', '', '---', '', ''],
+        ], column_types={'forms': ['string', 'integer', 'decimal', 'date', 'datetime', 'string']})
+        table = self._read_table(archive, 'Export/Forms.parquet')
+        self.assertEqual(
+            [str(field.type) for field in table.schema],
+            ['string', 'string', 'double', 'date32[day]', 'timestamp[us]', 'string'],
+        )
+        self.assertEqual(table.column('count').to_pylist(), ['3', 'many'])
+
+    def test_unparseable_value_after_first_row_group(self):
+        rows = [['0', '3', '1.5', '', '', ''], ['1', 'many', '2', '', '', '']]
+        with patch.object(ParquetFileWriter, 'row_group_size', 1):
+            archive = self._write_parquet(rows, column_types={
+                'forms': ['string', 'integer', 'decimal', 'date', 'datetime', 'string'],
+            })
+        parquet_file = pyarrow.parquet.ParquetFile(io.BytesIO(archive.read('Export/Forms.parquet')))
+        self.assertEqual(parquet_file.num_row_groups, 2)
+        table = parquet_file.read()
+        self.assertEqual(str(table.schema.field('count').type), 'string')
+        self.assertEqual(table.column('count').to_pylist(), ['3', 'many'])
+        self.assertEqual(table.column('weight').to_pylist(), [1.5, 2.0])
+
+    def test_untyped_columns_are_strings(self):
+        archive = self._write_parquet([['0', 3, '1.5', '', '', 'name']])
+        table = self._read_table(archive, 'Export/Forms.parquet')
+        self.assertEqual({str(field.type) for field in table.schema}, {'string'})
+        self.assertEqual(table.to_pylist()[0]['count'], '3')
+
+    def test_row_groups(self):
+        with patch.object(ParquetFileWriter, 'row_group_size', 2):
+            archive = self._write_parquet([[str(i), i, '', '', '', ''] for i in range(5)])
+        parquet_file = pyarrow.parquet.ParquetFile(io.BytesIO(archive.read('Export/Forms.parquet')))
+        self.assertEqual(parquet_file.num_row_groups, 3)
+        self.assertEqual(parquet_file.read().column('number').to_pylist(), ['0', '1', '2', '3', '4'])
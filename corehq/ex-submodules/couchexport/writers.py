@@ -6,9 +6,13 @@ import tempfile
 import zipfile
 import csv
 import json
+import datetime
 from collections import OrderedDict
 import openpyxl
 import math
+import logging
+import pyarrow
+import pyarrow.parquet
 
 from django.template.loader import render_to_string, get_template
 from django.utils.functional import Promise
@@ -19,8 +23,21 @@ from openpyxl.styles import numbers
 from openpyxl.cell import WriteOnlyCell
 
 from couchexport.util import get_excel_format_value, get_legacy_excel_safe_value
+from corehq.apps.export.const import EMPTY_VALUE, MISSING_VALUE
+from corehq.apps.userreports.datatypes import (
+    DATA_TYPE_BOOLEAN,
+    DATA_TYPE_DATE,
+    DATA_TYPE_DATETIME,
+    DATA_TYPE_DECIMAL,
+    DATA_TYPE_INTEGER,
+    DATA_TYPE_SMALL_INTEGER,
+    DATA_TYPE_STRING,
+)
 
 MAX_XLS_COLUMNS = 256
+PARQUET_ROW_GROUP_SIZE = 10000
+
+logger = logging.getLogger(__name__)
 
 
 class XlsLengthException(Exception):
@@ -157,24 +174,188 @@ class HtmlFileWriter(PartialHtmlFileWriter):
         self._write_from_template({"section": "doc_end"})
 
 
+def _parquet_string(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return str(value)
+
+
+def _parquet_value(parse):
+    """
+    Return a function that converts export values with ``parse``. Missing and
+    blank values are written as nulls. Other values that can't be parsed
+    raise ``ValueError``.
+    """
+    def convert(value):
+        value = _parquet_string(value)
+        if value is None or value.strip() in (EMPTY_VALUE, MISSING_VALUE):
+            return None
+        return parse(value.strip())
+    return convert
+
+
+def _can_convert(convert, values):
+    try:
+        for value in values:
+            convert(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _parse_date(value):
+    return datetime.date.fromisoformat(value[:10])
+
+
+def _parse_datetime(value):
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    value = datetime.datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _parse_boolean(value):
+    value = value.lower()
+    if value in ('true', '1'):
+        return True
+    if value in ('false', '0'):
+        return False
+    raise ValueError(value)
+
+
+# datatype: (arrow type, function to convert export values to it)
+PARQUET_TYPES = {
+    DATA_TYPE_STRING: (pyarrow.string(), _parquet_string),
+    DATA_TYPE_INTEGER: (pyarrow.int64(), _parquet_value(int)),
+    DATA_TYPE_SMALL_INTEGER: (pyarrow.int64(), _parquet_value(int)),
+    DATA_TYPE_DECIMAL: (pyarrow.float64(), _parquet_value(float)),
+    DATA_TYPE_BOOLEAN: (pyarrow.bool_(), _parquet_value(_parse_boolean)),
+    DATA_TYPE_DATE: (pyarrow.date32(), _parquet_value(_parse_date)),
+    DATA_TYPE_DATETIME: (pyarrow.timestamp('us'), _parquet_value(_parse_datetime)),
+}
+
+
+class ParquetFileWriter(ExportFileWriter):
+    """
+    Writes a table to a Parquet file. The first row written is the header
+    row. Columns are typed with ``column_types``, a list of datatypes
+    matching the headers, or are strings if it is not set. Datetimes with a
+    timezone are written in UTC.
+
+    The schema of a Parquet file can't change once rows are written to it,
+    and a column can have values that aren't of its type, e.g. from before
+    the type of a question was changed. So rows are first spooled to a
+    temporary file of strings, ``row_group_size`` rows at a time, checking
+    each typed column's values as they are. Columns with values that can't
+    be converted to their type are written as strings. The file is written
+    from the spooled rows when the table is finished.
+    """
+    row_group_size = PARQUET_ROW_GROUP_SIZE
+
+    def __init__(self, column_types=None):
+        super(ParquetFileWriter, self).__init__()
+        self.column_types = column_types
+
+    def _open(self):
+        self._headers = None
+        self._spool = None
+
+    def write_row(self, row):
+        if self._headers is None:
+            self._start_spool([_parquet_string(header) for header in row])
+            return
+        self._rows.append(row)
+        if len(self._rows) >= self.row_group_size:
+            self._spool_rows()
+
+    def _start_spool(self, headers):
+        column_types = self.column_types or [DATA_TYPE_STRING] * len(headers)
+        assert len(column_types) == len(headers), (headers, column_types)
+        self._headers = headers
+        self._column_types = list(column_types)
+        self._rows = []
+        self._spool = tempfile.TemporaryFile()
+        self._spool_schema = pyarrow.schema([pyarrow.field(header, pyarrow.string()) for header in headers])
+        self._spool_writer = pyarrow.parquet.ParquetWriter(self._spool, self._spool_schema)
+
+    def _spool_rows(self):
+        columns = []
+        for index, header in enumerate(self._headers):
+            column = [_parquet_string(row[index]) for row in self._rows]
+            column_type = self._column_types[index]
+            if column_type in PARQUET_TYPES and column_type != DATA_TYPE_STRING:
+                arrow_type, convert = PARQUET_TYPES[column_type]
+                if not _can_convert(convert, column):
+                    logger.warning("Writing Parquet column %r as strings: it has values that aren't %s",
+                                   header, column_type)
+                    self._column_types[index] = DATA_TYPE_STRING
+            columns.append(pyarrow.array(column, type=pyarrow.string()))
+        self._spool_writer.write_table(pyarrow.Table.from_arrays(columns, schema=self._spool_schema))
+        self._rows = []
+
+    def _end_file(self):
+        if self._headers is None:
+            return
+        if self._rows:
+            self._spool_rows()
+        self._spool_writer.close()
+        types = [
+            PARQUET_TYPES.get(column_type, PARQUET_TYPES[DATA_TYPE_STRING])
+            for column_type in self._column_types
+        ]
+        schema = pyarrow.schema([
+            pyarrow.field(header, arrow_type) for header, (arrow_type, convert) in zip(self._headers, types)
+        ])
+        writer = pyarrow.parquet.ParquetWriter(self._file, schema)
+        spooled = pyarrow.parquet.ParquetFile(self._spool)
+        for index in range(spooled.num_row_groups):
+            table = spooled.read_row_group(index)
+            arrays = []
+            for column, field, (arrow_type, convert) in zip(table.columns, schema, types):
+                if field.type != pyarrow.string():
+                    column = pyarrow.array([convert(value) for value in column.to_pylist()], type=field.type)
+                arrays.append(column)
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+        writer.close()
+        self._close_spool()
+
+    def _close_spool(self):
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+    def close(self):
+        self._close_spool()
+        super(ParquetFileWriter, self).close()
+
+
 class ExportWriter(object):
     max_table_name_size = 500
     target_app = 'Excel'  # Where does this writer export to? Export button to say "Export to Excel"
 
-    def open(self, header_table, file, max_column_size=2000, table_titles=None, archive_basepath=''):
+    def open(self, header_table, file, max_column_size=2000, table_titles=None, archive_basepath='',
+             column_types=None):
         """
         Create any initial files, headings, etc necessary.
         :param header_table: tuple of one of the following formats
             tuple(sheet_name, [['col1header', 'col2header', ....]])
             tuple(sheet_name, [FormattedRow])
+        :param column_types: optional dict mapping table indexes to a list of
+            the datatypes of their columns, for writers that keep types
         """
         table_titles = table_titles or {}
+        column_types = column_types or {}
 
         self._isopen = True
         self.max_column_size = max_column_size
         self._current_primary_id = 0
         self.file = file
         self.archive_basepath = archive_basepath
+        self.column_types = {}
 
         self._init()
         self.table_name_generator = UniqueHeaderGenerator(
@@ -184,10 +365,11 @@ class ExportWriter(object):
             self.add_table(
                 table_index,
                 list(table)[0],
-                table_title=table_titles.get(table_index)
+                table_title=table_titles.get(table_index),
+                column_types=column_types.get(table_index),
             )
 
-    def add_table(self, table_index, headers, table_title=None):
+    def add_table(self, table_index, headers, table_title=None, column_types=None):
         def _clean_name(name):
             if isinstance(name, bytes):
                 name = name.decode('utf8')
@@ -207,6 +389,8 @@ class ExportWriter(object):
             except AttributeError:
                 headers = [g.next_unique(header) for header in headers]
 
+        if column_types is not None:
+            self.column_types[table_index] = column_types
         self._init_table(table_index, table_title_truncated)
         self.write_row(table_index, headers)
 
@@ -321,9 +505,10 @@ class ZippedExportWriter(OnDiskExportWriter):
     Writer that creates a zip file containing a csv for each table.
     """
     table_file_extension = ".csv"
+    compression = zipfile.ZIP_DEFLATED
 
     def _write_final_result(self):
-        archive = zipfile.ZipFile(self.file, 'w', zipfile.ZIP_DEFLATED)
+        archive = zipfile.ZipFile(self.file, 'w', self.compression)
         for index, name in self.table_names.items():
             if isinstance(name, bytes):
                 name = name.decode('utf-8')
@@ -357,6 +542,25 @@ class UnzippedCsvExportWriter(OnDiskExportWriter):
         self.file.seek(0)
 
 
+class ParquetExportWriter(ZippedExportWriter):
+    """
+    Writer that creates a zip file containing a Parquet file for each table.
+    Columns are typed with the ``column_types`` the tables were added with.
+    """
+    format = Format.PARQUET
+    writer_class = ParquetFileWriter
+    table_file_extension = ".parquet"
+    # Parquet files are already compressed
+    compression = zipfile.ZIP_STORED
+
+    def _init_table(self, table_index, table_title):
+        super(ParquetExportWriter, self)._init_table(table_index, table_title)
+        self.tables[table_index].column_types = self.column_types.get(table_index)
+
+    def _write_row(self, sheet_index, row):
+        self.tables[sheet_index].write_row(row)
+
+
 class Excel2007ExportWriter(ExportWriter):
     format = Format.XLS_2007
     max_table_name_size = 31
@@ -2,3 +2,7 @@
 CHECKPOINT_FREQUENCY = 100
 CHECKPOINT_MIN_WAIT = 300
 DEFAULT_PROCESSOR_CHUNK_SIZE = 10
+# seconds a change may wait in a pending chunk before the chunk is processed
+CHUNK_MAX_WAIT_SECONDS = 30
+# processing time per chunk that adaptive chunk sizing aims for, in seconds
+CHUNK_TARGET_SECONDS = 5
@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 from datetime import datetime
 from abc import ABCMeta, abstractmethod
 
@@ -184,3 +185,15 @@ class ChangeFeed(metaclass=ABCMeta):
                    * int change ID for single kafka topic
                    * or a dict if multiple kafka topics are used
         """
+
+    @contextmanager
+    def processed_offsets_pinned(self, offsets):
+        """
+        Use ``offsets`` in place of the processed offsets for checkpoints taken
+        inside this block. Used when another thread is already reading ahead
+        in the feed (see ``pillowtop.pillow.pipeline``), so the feed must not
+        use that thread's connections inside the block.
+
+        :param offsets: a value returned by ``get_processed_offsets``
+        """
+        yield
@@ -78,6 +78,23 @@ class Command(BaseCommand):
             help="The batch size for this pillow. Some pillows process changes in bulk, "
             "setting this value to 1 will process each change as it comes in.",
         )
+        parser.add_argument(
+            '--max-processor-chunk-size',
+            action='store',
+            dest='max_processor_chunk_size',
+            default=0,
+            type=int,
+            help="If greater than --processor-chunk-size, the batch size is adjusted between "
+            "the two based on processing time and the backlog of changes.",
+        )
+        parser.add_argument(
+            '--prefetch-next-chunk',
+            action='store_true',
+            dest='prefetch_next_chunk',
+            default=False,
+            help="Read the next chunk of changes and fetch its documents on a background "
+            "thread while the current chunk is processed.",
+        )
         parser.add_argument(
             '--dedicated-migration-process',
             action='store_true',
@@ -102,6 +119,8 @@ class Command(BaseCommand):
         num_processes = options['num_processes']
         process_number = options['process_number']
         processor_chunk_size = options['processor_chunk_size']
+        max_processor_chunk_size = options['max_processor_chunk_size']
+        prefetch_next_chunk = options['prefetch_next_chunk']
         dedicated_migration_process = options['dedicated_migration_process']
         exclude_ucrs = options['exclude_ucrs']
         assert 0 <= process_number < num_processes
@@ -134,6 +153,10 @@ class Command(BaseCommand):
             pillow = get_pillow_by_name(pillow_name, num_processes=num_processes, process_num=process_number,
             processor_chunk_size=processor_chunk_size, dedicated_migration_process=dedicated_migration_process,
             **other_options)
+            if max_processor_chunk_size:
+                pillow.max_processor_chunk_size = max_processor_chunk_size
+            if prefetch_next_chunk:
+                pillow.prefetch_next_chunk = True
             start_pillow(pillow)
             sys.exit()
         elif list_checkpoints:
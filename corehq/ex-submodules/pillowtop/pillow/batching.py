@@ -0,0 +1,132 @@
+import time
+
+from corehq.util.metrics import metrics_counter, metrics_gauge
+from corehq.util.metrics.const import MPM_MAX
+from pillowtop.const import CHUNK_MAX_WAIT_SECONDS, CHUNK_TARGET_SECONDS
+
+
+class ChunkSizer(object):
+    """
+    Decides when a pillow's pending chunk of changes should be processed.
+
+    A chunk is processed once it reaches ``chunk_size`` changes or once the
+    oldest change in it has been waiting ``max_wait_seconds``.
+    """
+
+    def __init__(self, chunk_size, max_wait_seconds=CHUNK_MAX_WAIT_SECONDS, pillow_name=None):
+        self.chunk_size = chunk_size
+        self.max_wait_seconds = max_wait_seconds
+        self.pillow_name = pillow_name
+        self._chunk_started = None
+
+    def change_added(self):
+        if self._chunk_started is None:
+            self._chunk_started = time.monotonic()
+
+    def should_process(self, pending_count):
+        """
+        :param pending_count: number of changes in the pending chunk
+        """
+        if not pending_count:
+            return False
+        waited = time.monotonic() - self._chunk_started if self._chunk_started is not None else 0
+        if pending_count >= self.chunk_size:
+            reason = 'size'
+        elif waited >= self.max_wait_seconds:
+            reason = 'timer'
+        else:
+            return False
+        # the next change starts a new chunk
+        self._chunk_started = None
+        self._record_flush(reason)
+        return True
+
+    def chunk_processed(self, chunk_size, duration, change_feed=None):
+        """Called after each chunk is processed and checkpointed
+
+        :param chunk_size: number of changes in the chunk
+        :param duration: processing time for the chunk, in seconds
+        :param change_feed: the pillow's change feed, used to check the backlog
+        """
+
+    def _record_flush(self, reason):
+        metrics_counter('commcare.change_feed.chunk_flush', tags={
+            'pillow_name': self.pillow_name,
+            'reason': reason,
+        })
+
+
+class AdaptiveChunkSizer(ChunkSizer):
+    """
+    Grows or shrinks the chunk size between ``min_size`` and ``max_size``.
+
+    The size is adjusted after each chunk so that processing a chunk takes about
+    ``target_seconds``. It only grows when there is a backlog of unprocessed
+    changes, so quiet topics keep small chunks and low latency.
+    """
+    growth_factor = 1.5
+    # seconds between checks of the change feed for the latest offsets
+    backlog_check_interval = 60
+
+    def __init__(self, chunk_size, max_size, min_size=1, target_seconds=CHUNK_TARGET_SECONDS,
+                 max_wait_seconds=CHUNK_MAX_WAIT_SECONDS, pillow_name=None):
+        super().__init__(chunk_size, max_wait_seconds, pillow_name)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self._backlog = None
+        self._backlog_checked = None
+
+    def chunk_processed(self, chunk_size, duration, change_feed=None):
+        super().chunk_processed(chunk_size, duration, change_feed)
+        backlog = self._get_backlog(change_feed)
+        previous_size = self.chunk_size
+        if duration > self.target_seconds:
+            # scale down in proportion to how far over the target we were
+            new_size = int(chunk_size * self.target_seconds / duration)
+        elif chunk_size >= self.chunk_size and (backlog is None or backlog > self.chunk_size):
+            new_size = int(self.chunk_size * self.growth_factor) + 1
+        else:
+            new_size = self.chunk_size
+        self.chunk_size = max(self.min_size, min(self.max_size, new_size))
+        self._record_decision(previous_size, duration, backlog)
+
+    def _get_backlog(self, change_feed):
+        if change_feed is None:
+            return None
+        now = time.monotonic()
+        if self._backlog_checked is not None and now - self._backlog_checked < self.backlog_check_interval:
+            return self._backlog
+        self._backlog_checked = now
+        self._backlog = get_change_feed_backlog(change_feed)
+        return self._backlog
+
+    def _record_decision(self, previous_size, duration, backlog):
+        tags = {'pillow_name': self.pillow_name}
+        metrics_gauge('commcare.change_feed.chunk_size', self.chunk_size, tags=tags, multiprocess_mode=MPM_MAX)
+        if backlog is not None:
+            metrics_gauge('commcare.change_feed.backlog', backlog, tags=tags, multiprocess_mode=MPM_MAX)
+        if self.chunk_size != previous_size:
+            direction = 'grow' if self.chunk_size > previous_size else 'shrink'
+            metrics_counter('commcare.change_feed.chunk_size_change', tags={**tags, 'direction': direction})
+
+
+def get_change_feed_backlog(change_feed):
+    """Number of changes in the feed that have not been processed yet
+
+    Returns None if the feed can't report offsets per partition.
+    """
+    try:
+        latest = change_feed.get_latest_offsets()
+        processed = change_feed.get_processed_offsets()
+    except Exception:
+        return None
+    if not isinstance(latest, dict) or not isinstance(processed, dict):
+        return None
+    backlog = 0
+    for topic_partition, latest_offset in latest.items():
+        processed_offset = processed.get(tuple(topic_partition))
+        if processed_offset is None:
+            continue
+        backlog += max(0, latest_offset - processed_offset - 1)
+    return backlog
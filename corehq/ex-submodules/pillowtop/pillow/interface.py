@@ -17,6 +17,8 @@ from dimagi.utils.logging import notify_exception
 from kafka.common import TopicPartition
 from pillowtop.const import CHECKPOINT_MIN_WAIT
 from pillowtop.dao.exceptions import DocumentMissingError
+from pillowtop.pillow.batching import AdaptiveChunkSizer, ChunkSizer
+from pillowtop.pillow.pipeline import ChunkPrefetcher
 from pillowtop.utils import force_seq_int
 from pillowtop.exceptions import PillowtopCheckpointReset
 from pillowtop.logger import pillow_logging
@@ -55,6 +57,12 @@ class PillowBase(metaclass=ABCMeta):
     retry_errors = True
     # this will be the batch size for processors that support batch processing
     processor_chunk_size = 0
+    # if greater than processor_chunk_size the batch size is adjusted between the two
+    # based on processing time and backlog (see pillowtop.pillow.batching)
+    max_processor_chunk_size = 0
+    # read the next chunk and fetch its documents on a background thread while
+    # the current chunk is processed (see pillowtop.pillow.pipeline)
+    prefetch_next_chunk = False
 
     @abstractproperty
     def pillow_id(self):
@@ -147,18 +155,24 @@ class PillowBase(metaclass=ABCMeta):
             batch processors. If there are batch processors, checkpoint is updated
             at the end of the batch, otherwise is updated for every change.
         """
+        if self.prefetch_next_chunk and self.batch_processors:
+            return self._process_changes_pipelined(since, forever)
+
         context = PillowRuntimeContext(changes_seen=0)
-        min_wait_seconds = 30
+        chunk_sizer = self.get_chunk_sizer()
 
         def process_offset_chunk(chunk, context):
             if not chunk:
                 return
-            self._batch_process_with_error_handling(chunk)
-            self._update_checkpoint(chunk[-1], context)
+            timer = TimingContext()
+            with timer:
+                self._batch_process_with_error_handling(chunk)
+                # update checkpoint for just the latest change
+                self._update_checkpoint(chunk[-1], context)
+            chunk_sizer.chunk_processed(len(chunk), timer.duration, self.get_change_feed())
 
         # keep track of chunk for batch processors
         changes_chunk = []
-        last_process_time = datetime.utcnow()
 
         try:
             for change in self.get_change_feed().iter_changes(since=since or None, forever=forever):
@@ -168,13 +182,9 @@ class PillowBase(metaclass=ABCMeta):
                         # Queue and process in chunks for both batch
                         #   and serial processors
                         changes_chunk.append(change)
-                        chunk_full = len(changes_chunk) == self.processor_chunk_size
-                        time_elapsed = (datetime.utcnow() - last_process_time).seconds > min_wait_seconds
-                        if chunk_full or time_elapsed:
-                            last_process_time = datetime.utcnow()
-                            self._batch_process_with_error_handling(changes_chunk)
-                            # update checkpoint for just the latest change
-                            self._update_checkpoint(changes_chunk[-1], context)
+                        chunk_sizer.change_added()
+                        if chunk_sizer.should_process(len(changes_chunk)):
+                            process_offset_chunk(changes_chunk, context)
                             # reset for next chunk
                             changes_chunk = []
                     else:
@@ -183,6 +193,10 @@ class PillowBase(metaclass=ABCMeta):
                         self._record_change_in_datadog(change, processing_time)
                         self._update_checkpoint(change, context)
                 else:
+                    # the feed is idle, flush the pending chunk if it has waited long enough
+                    if chunk_sizer.should_process(len(changes_chunk)):
+                        process_offset_chunk(changes_chunk, context)
+                        changes_chunk = []
                     self._update_checkpoint(None, None)
             process_offset_chunk(changes_chunk, context)
         except PillowtopCheckpointReset:
@@ -192,6 +206,50 @@ class PillowBase(metaclass=ABCMeta):
             if context.changes_seen and change:
                 self._update_checkpoint(change, context)
 
+    def _process_changes_pipelined(self, since, forever):
+        """
+        Process changes in chunks while the next chunk is read from the feed
+        and its documents are fetched by a ``ChunkPrefetcher`` thread.
+
+            The checkpoint for a chunk is only updated once it has been processed,
+            using the feed offsets recorded when the chunk was read.
+        """
+        context = PillowRuntimeContext(changes_seen=0)
+        chunk_sizer = self.get_chunk_sizer()
+        change_feed = self.get_change_feed()
+        prefetcher = ChunkPrefetcher(self, since or None, forever, chunk_sizer)
+        prefetcher.start()
+        checkpoint_reset = False
+        try:
+            for chunk in prefetcher:
+                if not chunk.changes:
+                    self._update_checkpoint(None, None)
+                    continue
+                context.changes_seen += len(chunk.changes)
+                timer = TimingContext()
+                with change_feed.processed_offsets_pinned(chunk.offsets):
+                    with timer:
+                        self._batch_process_with_error_handling(chunk.changes)
+                        self._update_checkpoint(chunk.changes[-1], context)
+                    # the feed doesn't use the prefetch thread's consumer while
+                    # its offsets are pinned, so the backlog can be checked here
+                    chunk_sizer.chunk_processed(len(chunk.changes), timer.duration, change_feed)
+        except PillowtopCheckpointReset:
+            checkpoint_reset = True
+        finally:
+            prefetcher.stop()
+        if checkpoint_reset:
+            self.process_changes(since=self.get_last_checkpoint_sequence(), forever=forever)
+
+    def get_chunk_sizer(self):
+        if self.max_processor_chunk_size > self.processor_chunk_size:
+            return AdaptiveChunkSizer(
+                self.processor_chunk_size,
+                max_size=self.max_processor_chunk_size,
+                pillow_name=self.get_name(),
+            )
+        return ChunkSizer(self.processor_chunk_size, pillow_name=self.get_name())
+
     def _batch_process_with_error_handling(self, changes_chunk):
         """
         Process given chunk in batch mode first on batch-processors
@@ -429,11 +487,14 @@ class ConstructedPillow(PillowBase):
 
     def __init__(self, name, checkpoint, change_feed, processor, process_num=0,
                  change_processed_event_handler=None, processor_chunk_size=0,
-                 is_dedicated_migration_process=False):
+                 is_dedicated_migration_process=False, max_processor_chunk_size=0,
+                 prefetch_next_chunk=False):
         self._name = name
         self._checkpoint = checkpoint
         self._change_feed = change_feed
         self.processor_chunk_size = processor_chunk_size
+        self.max_processor_chunk_size = max_processor_chunk_size
+        self.prefetch_next_chunk = prefetch_next_chunk
         if isinstance(processor, list):
             self.processors = processor
         else:
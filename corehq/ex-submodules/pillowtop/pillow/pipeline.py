@@ -0,0 +1,152 @@
+"""
+Pipelined change processing for batch pillows.
+
+Without pipelining a batch pillow reads a chunk of changes from its feed,
+fetches the documents for the chunk and then processes it, one chunk after
+another. ``ChunkPrefetcher`` moves the first two steps onto a background
+thread so that the next chunk is read and its documents are fetched while
+the pillow is still processing the current one.
+
+The pillow only checkpoints a chunk once it has been processed. Since the
+feed has already been read past the end of the chunk by then, each chunk
+carries the feed's processed offsets as of its last change and the checkpoint
+is taken with those offsets pinned.
+"""
+import threading
+from queue import Empty, Full, Queue
+
+from django import db
+
+from pillowtop.logger import pillow_logging
+from pillowtop.utils import bulk_fetch_changes_docs
+
+# seconds to wait between checks of the stop event while the queue is full
+PUT_TIMEOUT = 1
+
+
+class PrefetchedChunk(object):
+    """A chunk of changes read by the prefetch thread
+
+    An empty chunk is sent when the feed is idle.
+
+    :param changes: list of changes
+    :param offsets: the feed's processed offsets after reading the last change
+    """
+
+    def __init__(self, changes, offsets=None):
+        self.changes = changes
+        self.offsets = offsets
+
+
+class _Finished(object):
+
+    def __init__(self, error=None):
+        self.error = error
+
+
+class ChunkPrefetcher(threading.Thread):
+    """
+    Reads chunks of changes from a pillow's change feed and fetches their
+    documents on a background thread.
+
+    Chunks are handed over through a queue that holds a single chunk, so the
+    thread never gets more than one chunk ahead of the pillow.
+
+    Usage::
+
+        prefetcher = ChunkPrefetcher(pillow, since, forever, chunk_sizer)
+        prefetcher.start()
+        try:
+            for chunk in prefetcher:
+                ...
+        finally:
+            prefetcher.stop()
+    """
+
+    def __init__(self, pillow, since, forever, chunk_sizer):
+        super().__init__(name='{}-prefetch'.format(pillow.get_name()), daemon=True)
+        self.pillow = pillow
+        self.since = since
+        self.forever = forever
+        self.chunk_sizer = chunk_sizer
+        self._queue = Queue(maxsize=1)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            self._read_chunks()
+        except Exception as e:
+            self._put(_Finished(e))
+        else:
+            self._put(_Finished())
+        finally:
+            # close any connections that were opened on this thread
+            db.connections.close_all()
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if isinstance(item, _Finished):
+                if item.error is not None:
+                    raise item.error
+                return
+            yield item
+
+    def stop(self):
+        self._stop_event.set()
+        # unblock the thread if it is waiting to hand over a chunk
+        try:
+            self._queue.get_nowait()
+        except Empty:
+            pass
+        self.join()
+
+    def _read_chunks(self):
+        change_feed = self.pillow.get_change_feed()
+        changes = []
+        for change in change_feed.iter_changes(since=self.since, forever=self.forever):
+            if self._stop_event.is_set():
+                return
+            if change:
+                changes.append(change)
+                self.chunk_sizer.change_added()
+            if self.chunk_sizer.should_process(len(changes)):
+                self._dispatch(changes, change_feed.get_processed_offsets())
+                changes = []
+            elif change is None and self._queue.empty():
+                # let the pillow know the feed is idle. Skip this if it has not
+                # taken the last chunk yet since it will be busy with that.
+                self._put(PrefetchedChunk([]), block=False)
+        if changes:
+            self._dispatch(changes, change_feed.get_processed_offsets())
+
+    def _dispatch(self, changes, offsets):
+        self._prefetch_documents(changes)
+        self._put(PrefetchedChunk(changes, offsets))
+
+    def _prefetch_documents(self, changes):
+        to_fetch = [
+            change for change in self.pillow._deduplicate_changes(changes)
+            if change.metadata and not change.deleted and change.should_fetch_document()
+        ]
+        if not to_fetch:
+            return
+        try:
+            bulk_fetch_changes_docs(to_fetch)
+        except Exception:
+            # the processors will fetch anything that is still missing
+            pillow_logging.exception("[%s] Error prefetching documents", self.pillow.get_name())
+
+    def _put(self, item, block=True):
+        if not block:
+            try:
+                self._queue.put_nowait(item)
+            except Full:
+                pass
+            return
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=PUT_TIMEOUT)
+                return
+            except Full:
+                continue
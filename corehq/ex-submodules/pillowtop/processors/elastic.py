@@ -3,6 +3,7 @@ import time
 
 from django.conf import settings
 
+from corehq.apps.es.query_cache import invalidate_es_query_cache
 from corehq.util.es.elasticsearch import (
     ConflictError,
     ConnectionError,
@@ -76,6 +77,7 @@ class ElasticProcessor(PillowProcessor):
                     self._delete_doc_if_exists(change.id)
             else:
                 self._delete_doc_if_exists(change.id)
+            self._invalidate_query_cache([change])
             return
 
         with self._datadog_timing('extract'):
@@ -90,6 +92,7 @@ class ElasticProcessor(PillowProcessor):
 
             if doc.get('doc_type') is not None and doc['doc_type'].endswith("-Deleted"):
                 self._delete_doc_if_exists(change.id)
+                self._invalidate_query_cache([change])
                 return
 
             # prepare doc for es
@@ -105,6 +108,10 @@ class ElasticProcessor(PillowProcessor):
                 name='ElasticProcessor',
                 data=doc_ready_to_save,
             )
+        self._invalidate_query_cache([change])
+
+    def _invalidate_query_cache(self, changes):
+        invalidate_es_query_cache(self.index_info.alias, {_get_change_domain(change) for change in changes})
 
     def _delete_doc_if_exists(self, doc_id):
         send_to_elasticsearch(
@@ -166,12 +173,10 @@ class BulkElasticProcessor(ElasticProcessor, BulkPillowProcessor):
 
         try:
             with self._datadog_timing('bulk_load'):
-                _, errors = self.es_interface.bulk_ops(
+                _, errors = self.es_interface.bulk_write(
                     self.index_info.alias,
                     self.index_info.type,
                     es_actions,
-                    raise_on_error=False,
-                    raise_on_exception=False,
                 )
         except Exception as e:
             pillow_logging.exception("Elastic bulk error: %s", e)
@@ -181,9 +186,16 @@ class BulkElasticProcessor(ElasticProcessor, BulkPillowProcessor):
         else:
             for change_id, error_msg in get_errors_with_ids(errors):
                 error_changes.append((changes_to_process[change_id], BulkDocException(error_msg)))
+        self._invalidate_query_cache(changes_to_process.values())
         return retry_changes, error_changes
 
 
+def _get_change_domain(change):
+    if change.metadata is not None:
+        return change.metadata.domain
+    return (change.document or {}).get('domain')
+
+
 def send_to_elasticsearch(index_info, doc_type, doc_id, es_getter, name, data=None,
                           delete=False, es_merge_update=False):
     """
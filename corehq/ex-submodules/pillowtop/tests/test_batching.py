@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from kafka.common import TopicPartition
+
+from pillowtop.pillow.batching import (
+    AdaptiveChunkSizer,
+    ChunkSizer,
+    get_change_feed_backlog,
+)
+
+
+class FakeFeed(object):
+
+    def __init__(self, latest, processed):
+        self.latest = latest
+        self.processed = processed
+
+    def get_latest_offsets(self):
+        return self.latest
+
+    def get_processed_offsets(self):
+        return self.processed
+
+
+@mock.patch('pillowtop.pillow.batching.time.monotonic')
+class ChunkSizerTest(SimpleTestCase):
+
+    def test_process_when_full(self, monotonic):
+        monotonic.return_value = 0
+        sizer = ChunkSizer(3)
+        sizer.change_added()
+        self.assertFalse(sizer.should_process(2))
+        self.assertTrue(sizer.should_process(3))
+
+    def test_process_after_max_wait(self, monotonic):
+        monotonic.return_value = 0
+        sizer = ChunkSizer(10, max_wait_seconds=30)
+        sizer.change_added()
+        monotonic.return_value = 29
+        self.assertFalse(sizer.should_process(1))
+        monotonic.return_value = 30
+        self.assertTrue(sizer.should_process(1))
+
+    def test_empty_chunk_never_processed(self, monotonic):
+        monotonic.return_value = 100
+        sizer = ChunkSizer(10, max_wait_seconds=30)
+        self.assertFalse(sizer.should_process(0))
+
+    def test_wait_resets_after_chunk(self, monotonic):
+        monotonic.return_value = 0
+        sizer = ChunkSizer(10, max_wait_seconds=30)
+        sizer.change_added()
+        monotonic.return_value = 30
+        self.assertTrue(sizer.should_process(1))
+        monotonic.return_value = 40
+        sizer.change_added()
+        self.assertFalse(sizer.should_process(1))
+
+
+class AdaptiveChunkSizerTest(SimpleTestCase):
+
+    def test_grows_with_backlog(self):
+        sizer = AdaptiveChunkSizer(10, max_size=100, target_seconds=5)
+        feed = FakeFeed({('case', 0): 1000}, {('case', 0): 10})
+        sizer.chunk_processed(10, 1, feed)
+        self.assertEqual(16, sizer.chunk_size)
+
+    def test_does_not_grow_without_backlog(self):
+        sizer = AdaptiveChunkSizer(10, max_size=100, target_seconds=5)
+        feed = FakeFeed({('case', 0): 11}, {('case', 0): 10})
+        sizer.chunk_processed(10, 1, feed)
+        self.assertEqual(10, sizer.chunk_size)
+
+    def test_does_not_grow_for_partial_chunk(self):
+        sizer = AdaptiveChunkSizer(10, max_size=100, target_seconds=5)
+        sizer.chunk_processed(4, 1)
+        self.assertEqual(10, sizer.chunk_size)
+
+    def test_shrinks_when_slow(self):
+        sizer = AdaptiveChunkSizer(100, max_size=1000, target_seconds=5)
+        sizer.chunk_processed(100, 20)
+        self.assertEqual(25, sizer.chunk_size)
+
+    def test_limits(self):
+        sizer = AdaptiveChunkSizer(90, max_size=100, min_size=5, target_seconds=5)
+        sizer.chunk_processed(90, 1)
+        self.assertEqual(100, sizer.chunk_size)
+        sizer.chunk_processed(100, 1000)
+        self.assertEqual(5, sizer.chunk_size)
+
+
+class ChangeFeedBacklogTest(SimpleTestCase):
+
+    def test_backlog(self):
+        feed = FakeFeed(
+            {TopicPartition('case', 0): 100, TopicPartition('case', 1): 50},
+            {('case', 0): 89, ('case', 1): 49},
+        )
+        self.assertEqual(10, get_change_feed_backlog(feed))
+
+    def test_unknown_partition_ignored(self):
+        feed = FakeFeed({TopicPartition('case', 0): 100}, {})
+        self.assertEqual(0, get_change_feed_backlog(feed))
+
+    def test_not_offsets(self):
+        self.assertIsNone(get_change_feed_backlog(FakeFeed(1234, {})))
@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from pillowtop.feed.interface import Change
+from pillowtop.feed.mock import MockChangeFeed
+from pillowtop.pillow.batching import ChunkSizer
+from pillowtop.pillow.interface import ConstructedPillow
+from pillowtop.pillow.pipeline import ChunkPrefetcher
+from pillowtop.processors.interface import BulkPillowProcessor
+
+
+class RecordingBulkProcessor(BulkPillowProcessor):
+
+    def __init__(self):
+        self.chunks = []
+
+    def process_change(self, change):
+        pass
+
+    def process_changes_chunk(self, changes_chunk):
+        self.chunks.append([change.id for change in changes_chunk])
+        return set(), []
+
+
+class PinningFeed(MockChangeFeed):
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.pinned = []
+
+    def iter_changes(self, since, forever=False):
+        # the pillow passes None for a since of 0
+        return super().iter_changes(since or 0, forever)
+
+    def processed_offsets_pinned(self, offsets):
+        self.pinned.append(offsets)
+        return super().processed_offsets_pinned(offsets)
+
+
+def _changes(count):
+    return [Change(id='doc{}'.format(i), sequence_id=i) for i in range(count)]
+
+
+class PipelinedPillowTest(SimpleTestCase):
+
+    def _get_pillow(self, feed, processor, handler):
+        return ConstructedPillow(
+            name='test-pipelined-pillow',
+            checkpoint=mock.Mock(),
+            change_feed=feed,
+            processor=processor,
+            change_processed_event_handler=handler,
+            processor_chunk_size=2,
+            prefetch_next_chunk=True,
+        )
+
+    def test_process_in_chunks(self):
+        feed = PinningFeed(_changes(5))
+        processor = RecordingBulkProcessor()
+        handler = mock.Mock()
+        handler.update_checkpoint.return_value = False
+        pillow = self._get_pillow(feed, processor, handler)
+        with mock.patch.object(pillow, '_record_datadog_metrics'):
+            pillow.process_changes(since=0, forever=False)
+
+        self.assertEqual([['doc0', 'doc1'], ['doc2', 'doc3'], ['doc4']], processor.chunks)
+        # each chunk is checkpointed at its last change with the offsets from when it was read
+        checkpointed = [call[0][0].id for call in handler.update_checkpoint.call_args_list]
+        self.assertEqual(['doc1', 'doc3', 'doc4'], checkpointed)
+        self.assertEqual([{'test': 1}, {'test': 3}, {'test': 5}], feed.pinned)
+
+    def test_chunk_sizer_checks_feed(self):
+        feed = PinningFeed(_changes(3))
+        handler = mock.Mock()
+        handler.update_checkpoint.return_value = False
+        pillow = self._get_pillow(feed, RecordingBulkProcessor(), handler)
+        chunk_sizer = mock.Mock(wraps=ChunkSizer(2))
+        with mock.patch.object(pillow, '_record_datadog_metrics'), \
+                mock.patch.object(pillow, 'get_chunk_sizer', return_value=chunk_sizer):
+            pillow.process_changes(since=0, forever=False)
+
+        self.assertEqual(
+            [(2, feed), (1, feed)],
+            [(call.args[0], call.args[2]) for call in chunk_sizer.chunk_processed.call_args_list]
+        )
+
+
+class ChunkPrefetcherTest(SimpleTestCase):
+
+    def _prefetch(self, changes, chunk_size):
+        pillow = mock.Mock()
+        pillow.get_change_feed.return_value = MockChangeFeed(changes)
+        pillow._deduplicate_changes.side_effect = lambda changes: changes
+        prefetcher = ChunkPrefetcher(pillow, 0, False, ChunkSizer(chunk_size))
+        prefetcher.start()
+        try:
+            return list(prefetcher)
+        finally:
+            prefetcher.stop()
+
+    @mock.patch('pillowtop.pillow.pipeline.bulk_fetch_changes_docs')
+    def test_chunks(self, bulk_fetch):
+        chunks = self._prefetch(_changes(3), chunk_size=2)
+        self.assertEqual(
+            [['doc0', 'doc1'], ['doc2']],
+            [[change.id for change in chunk.changes] for chunk in chunks]
+        )
+
+    @mock.patch('pillowtop.pillow.pipeline.bulk_fetch_changes_docs')
+    def test_skips_changes_without_metadata(self, bulk_fetch):
+        self._prefetch(_changes(2), chunk_size=2)
+        bulk_fetch.assert_not_called()
+
+    def test_feed_error_raised(self):
+        pillow = mock.Mock()
+        pillow.get_change_feed.return_value.iter_changes.side_effect = ValueError('bad feed')
+        prefetcher = ChunkPrefetcher(pillow, 0, False, ChunkSizer(2))
+        prefetcher.start()
+        try:
+            with self.assertRaises(ValueError):
+                list(prefetcher)
+        finally:
+            prefetcher.stop()
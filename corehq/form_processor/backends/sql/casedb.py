@@ -1,4 +1,7 @@
+from redis.exceptions import RedisError
+
 from casexml.apps.case.exceptions import IllegalCaseId
+from dimagi.utils.couch import acquire_lock
 from corehq.form_processor.backends.sql.update_strategy import SqlCaseUpdateStrategy
 from corehq.form_processor.casedb_base import AbstractCaseDbCache
 from corehq.form_processor.models import CommCareCase
@@ -20,6 +23,33 @@ class CaseDbCacheSQL(AbstractCaseDbCache):
             if not self.deleted_ok:
                 raise IllegalCaseId("Case [%s] is deleted " % case.case_id)
 
+    def lock_and_populate(self, case_ids):
+        """Lock and load a set of cases up front
+
+        Cases that don't exist yet are locked too. The locks are held until
+        the current context exits and ``get`` won't try to lock these cases
+        again, so this must be called in the outermost context.
+        """
+        assert len(self.lock_stack) <= 1, "lock_and_populate must be called in the outermost context"
+        case_ids = set(case_ids) - self._prelocked
+        if self.lock:
+            # lock in a consistent order so that concurrent batches can't deadlock
+            for case_id in sorted(case_ids):
+                try:
+                    lock = acquire_lock(CommCareCase.get_obj_lock_by_id(case_id), False, blocking=True)
+                except RedisError:
+                    # same as get(): carry on without the lock
+                    continue
+                self.locks.append(lock)
+            self._prelocked.update(case_ids)
+
+        for case in self._iter_cases(list(case_ids - set(self.cache))):
+            try:
+                self.set(case.case_id, case)
+            except IllegalCaseId:
+                # leave it for get() to raise while processing the form that uses it
+                pass
+
     def _iter_cases(self, case_ids):
         return iter(CommCareCase.objects.get_cases(case_ids))
 
@@ -55,6 +55,8 @@ class AbstractCaseDbCache(metaclass=ABCMeta):
         # this is used to allow casedb to be re-entrant. Each new context pushes the parent context locks
         # onto this stack and restores them when the context exits
         self.lock_stack = []
+        # cases locked by lock_and_populate, which get() must not try to lock again
+        self._prelocked = set()
         self.processor_interface = FormProcessorInterface(self.domain)
 
     def _populate_from_initial(self, initial_cases):
@@ -65,9 +67,10 @@ class AbstractCaseDbCache(metaclass=ABCMeta):
             self.cache = {}
 
     def __enter__(self):
-        if self.locks:
-            self.lock_stack.append(self.locks)
-            self.locks = []
+        # push on every entry, even without locks, so the stack tracks how
+        # deeply the contexts are nested
+        self.lock_stack.append(self.locks)
+        self.locks = []
 
         return self
 
@@ -75,10 +78,10 @@ class AbstractCaseDbCache(metaclass=ABCMeta):
         for lock in self.locks:
             if lock is not None:
                 release_lock(lock, True)
-        self.locks = []
+        self.locks = self.lock_stack.pop()
 
-        if self.lock_stack:
-            self.locks = self.lock_stack.pop()
+        if not self.lock_stack:
+            self._prelocked = set()
 
     @abstractmethod
     def _validate_case(self, case):
@@ -92,7 +95,8 @@ class AbstractCaseDbCache(metaclass=ABCMeta):
         if case_id in self.cache:
             return self.cache[case_id]
 
-        case, lock = self.processor_interface.get_case_with_lock(case_id, self.lock, self.wrap)
+        lock = self.lock and case_id not in self._prelocked
+        case, lock = self.processor_interface.get_case_with_lock(case_id, lock, self.wrap)
         if lock:
             self.locks.append(lock)
 
@@ -107,6 +111,14 @@ class AbstractCaseDbCache(metaclass=ABCMeta):
         self._validate_case(case)
         self.cache[case_id] = case
 
+    def uncache(self, case_ids):
+        """Remove cases from the cache so that they are loaded again the next
+        time they are needed. Any unsaved changes to them are discarded.
+        """
+        for case_id in list(case_ids):
+            self.cache.pop(case_id, None)
+            self._changed.discard(case_id)
+
     def in_cache(self, case_id):
         return case_id in self.cache
 
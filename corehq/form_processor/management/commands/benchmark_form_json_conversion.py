@@ -0,0 +1,85 @@
+import glob
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import xml2json
+
+from corehq.form_processor.models import XFormInstance
+from corehq.form_processor.utils import adjust_datetimes, convert_xform_to_json
+
+DEFAULT_FORM_DIRS = [
+    'corehq/ex-submodules/couchforms/tests/data/posts',
+    'corehq/apps/receiverwrapper/tests/data',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of xml2json followed by adjust_datetimes with "
+        "convert_xform_to_json over a set of form XML files or stored forms"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='XML files or directories of them. Defaults to the form fixtures used in tests.'
+        )
+        parser.add_argument('--domain')
+        parser.add_argument('--form-id', dest='form_ids', action='append', default=[])
+        parser.add_argument('--iterations', type=int, default=10)
+
+    def handle(self, paths, domain, form_ids, iterations, **options):
+        if form_ids and not domain:
+            raise CommandError("--domain is required with --form-id")
+        if not paths and not form_ids:
+            paths = DEFAULT_FORM_DIRS
+        forms = [xml for xml in _load_files(paths) if _is_valid(xml)]
+        forms.extend(XFormInstance.objects.get_form(form_id, domain).get_xml() for form_id in form_ids)
+        if not forms:
+            raise CommandError("No forms to convert")
+        size = sum(len(xml) for xml in forms)
+        print(f"{len(forms)} forms, {size / 1024:.0f} KB, {iterations} iterations")
+
+        different = sum(_two_pass(xml) != convert_xform_to_json(xml, adjust_datetimes=True) for xml in forms)
+        if different:
+            print(f"WARNING: convert_xform_to_json produced different json for {different} forms")
+
+        two_pass = _benchmark(_two_pass, forms, iterations)
+        one_pass = _benchmark(lambda xml: convert_xform_to_json(xml, adjust_datetimes=True), forms, iterations)
+        print(f"xml2json + adjust_datetimes: {two_pass:.1f} forms/sec")
+        print(f"convert_xform_to_json:       {one_pass:.1f} forms/sec ({one_pass / two_pass:.2f}x)")
+
+
+def _load_files(paths):
+    for path in paths:
+        if not os.path.isabs(path):
+            path = os.path.join(settings.BASE_DIR, path)
+        filenames = sorted(glob.glob(os.path.join(path, '*.xml'))) if os.path.isdir(path) else [path]
+        for filename in filenames:
+            with open(filename, 'rb') as f:
+                yield f.read()
+
+
+def _is_valid(xml):
+    try:
+        xml2json.xml2json(xml)
+    except xml2json.XMLSyntaxError:
+        return False
+    return True
+
+
+def _two_pass(xml):
+    name, form_json = xml2json.xml2json(xml)
+    form_json['#type'] = name
+    return adjust_datetimes(form_json)
+
+
+def _benchmark(convert, forms, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        for xml in forms:
+            convert(xml)
+    return len(forms) * iterations / (time.perf_counter() - start)
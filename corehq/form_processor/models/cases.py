@@ -37,6 +37,7 @@ from ..exceptions import (
     CaseSaveError,
     UnknownActionType,
 )
+from ..signals import sql_cases_deleted
 from ..track_related import TrackRelatedChanges
 from .attachment import AttachmentContent, AttachmentMixin
 from .forms import XFormInstance
@@ -296,6 +297,7 @@ class CommCareCaseManager(RequireDBManager):
         from ..change_publishers import publish_case_deleted
         for case_id in case_ids:
             publish_case_deleted(domain, case_id)
+        sql_cases_deleted.send(CommCareCase, domain=domain, case_ids=case_ids)
 
 
 class CommCareCase(PartitionedModel, models.Model, RedisLockableMixIn,
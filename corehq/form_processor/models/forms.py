@@ -588,14 +588,13 @@ class XFormInstance(PartitionedModel, models.Model, RedisLockableMixIn,
     def form_data(self):
         """Returns the JSON representation of the form XML"""
         from couchforms import XMLSyntaxError
-        from ..utils import convert_xform_to_json, adjust_datetimes
+        from ..utils import convert_xform_to_json
         from corehq.form_processor.utils.metadata import scrub_form_meta
         xml = self.get_xml()
         try:
-            form_json = convert_xform_to_json(xml)
+            form_json = convert_xform_to_json(xml, adjust_datetimes=True)
         except XMLSyntaxError:
             return {}
-        adjust_datetimes(form_json)
 
         scrub_form_meta(self.form_id, form_json)
         return form_json
@@ -2,3 +2,4 @@ from django.dispatch.dispatcher import Signal
 
 
 sql_case_post_save = Signal()  # providing args: case
+sql_cases_deleted = Signal()  # providing args: domain, case_ids
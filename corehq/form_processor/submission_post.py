@@ -1,5 +1,6 @@
 import logging
-from collections import namedtuple
+from collections import defaultdict, namedtuple
+from contextlib import nullcontext
 
 from ddtrace import tracer
 from django.db import IntegrityError
@@ -13,7 +14,7 @@ from django.urls import reverse
 from django.utils.translation import gettext as _
 import sys
 
-from casexml.apps.case.xform import close_extension_cases
+from casexml.apps.case.xform import close_extension_cases, get_case_updates
 from casexml.apps.phone.restore_caching import AsyncRestoreTaskIdCache, RestorePayloadPathCache
 import couchforms
 from casexml.apps.case.exceptions import PhoneDateValueError, IllegalCaseId, UsesReferrals, InvalidCaseIndex, \
@@ -29,12 +30,13 @@ from corehq.apps.domain_migration_flags.api import any_migrations_in_progress
 from corehq.apps.es.client import BulkActionItem
 from corehq.apps.users.models import CouchUser
 from corehq.apps.users.permissions import has_permission_to_view_report
-from corehq.form_processor.exceptions import PostSaveError, XFormSaveError
+from corehq.form_processor.exceptions import PostSaveError, XFormLockError, XFormSaveError
 from corehq.form_processor.interfaces.processor import FormProcessorInterface
 from corehq.form_processor.models import XFormInstance
 from corehq.form_processor.parsers.form import process_xform_xml
 from corehq.form_processor.system_action import SYSTEM_ACTION_XMLNS, handle_system_action
 from corehq.form_processor.utils.metadata import scrub_meta
+from corehq.form_processor.utils import convert_xform_to_json, extract_meta_instance_id
 from corehq.form_processor.submission_process_tracker import unfinished_submission
 from corehq.util.metrics import metrics_counter
 from corehq.util.metrics.load_counters import form_load_counter
@@ -47,8 +49,15 @@ from couchforms.const import DEVICE_LOG_XMLNS
 from couchforms.models import DefaultAuthContext, UnfinishedSubmissionStub
 from couchforms.signals import successful_form_received
 from couchforms.util import legacy_notification_assert
-from couchforms.openrosa_response import OpenRosaResponse, ResponseNature
+from couchforms.openrosa_response import (
+    RESPONSE_XMLNS,
+    OpenRosaResponse,
+    ResponseNature,
+    parse_openrosa_response,
+)
+from casexml.apps.stock.const import COMMTRACK_REPORT_XMLNS
 from dimagi.utils.logging import notify_exception, log_signal_errors
+from lxml import etree
 from phonelog.utils import process_device_log, SumoLogicLog
 
 
@@ -93,7 +102,7 @@ class SubmissionPost(object):
         self.interface = FormProcessorInterface(domain)
         self.partial_submission = partial_submission
         # always None except in the case where a system form is being processed as part of another submission
-        # e.g. for closing extension cases
+        # e.g. for closing extension cases, or where the form is part of a bulk submission
         self.case_db = case_db
         if case_db:
             assert case_db.domain == domain
@@ -290,7 +299,8 @@ class SubmissionPost(object):
                 self.track_load(len(xforms) - 1)
             if self.case_db:
                 case_db_cache = self.case_db
-                case_db_cache.cached_xforms.extend(xforms)
+                # the cache is shared with other forms, which are saved by now
+                case_db_cache.cached_xforms = list(xforms)
             else:
                 case_db_cache = self.interface.casedb_cache(
                     domain=self.domain, lock=True, deleted_ok=True,
@@ -627,6 +637,211 @@ class SubmissionPost(object):
         return FormProcessingResult(response, device_log_form, [], [], 'device-log')
 
 
+class BulkSubmissionPost(object):
+    """Process a batch of forms submitted in a single request
+
+    The forms are split into groups so that forms which update the same cases,
+    or share a form ID, are in the same group (see ``get_submission_groups``).
+    Each group is processed with a single case DB cache that locks and loads
+    all of the group's cases up front, so a case that several forms update is
+    only locked and fetched once for the batch instead of once per form.
+
+    Within a group the forms are processed in the order they were submitted,
+    each through ``SubmissionPost`` as if it had been submitted on its own, so
+    duplicate and edit handling is unchanged. Groups don't share any cases,
+    so the order of forms in different groups doesn't matter.
+
+    If a form fails in a way that the client should retry, the rest of its
+    group is not processed so that later updates to the same cases are not
+    applied ahead of it.
+
+    :param instances: list of form XML, in the order they were submitted
+    :param ignored: indices of forms that are accepted without being processed
+    (see ``should_ignore_submission``)
+    :param kwargs: passed to ``SubmissionPost`` for each form
+    """
+
+    def __init__(self, instances, domain, ignored=(), **kwargs):
+        assert domain, "'domain' is required"
+        self.instances = instances
+        self.domain = domain
+        self.ignored = set(ignored)
+        self.submission_kwargs = kwargs
+        self.interface = FormProcessorInterface(domain)
+
+    def run(self):
+        """
+        :returns: list of ``FormProcessingResult``, one per form in the order
+        they were submitted
+        """
+        results = [None] * len(self.instances)
+        for index in self.ignored:
+            results[index] = FormProcessingResult(
+                openrosa_response.SUBMISSION_IGNORED_RESPONSE, None, [], [], 'ignored')
+        indices = [index for index in range(len(self.instances)) if index not in self.ignored]
+        for group_positions, case_ids in get_submission_groups([self.instances[index] for index in indices]):
+            form_indices = [indices[position] for position in group_positions]
+            if case_ids:
+                case_db = self.interface.casedb_cache(
+                    domain=self.domain, lock=True, deleted_ok=True, load_src="bulk_form_submission",
+                )
+            else:
+                case_db = None
+            with case_db if case_db is not None else nullcontext():
+                if case_db is not None:
+                    case_db.lock_and_populate(case_ids)
+                self._process_group(form_indices, case_ids, case_db, results)
+        return results
+
+    def _process_group(self, form_indices, case_ids, case_db, results):
+        for position, index in enumerate(form_indices):
+            result = self._process_form(self.instances[index], case_db)
+            results[index] = result
+            if case_db is not None:
+                if result.submission_type == 'normal':
+                    # only keep the cases this batch has locked
+                    case_db.uncache(set(case_db.cache) - case_ids)
+                else:
+                    # the form may have left unsaved changes in the cache
+                    case_db.uncache(set(case_db.cache))
+            if result.response.status_code >= 500 or result.submission_type == 'locked':
+                for skipped in form_indices[position + 1:]:
+                    results[skipped] = FormProcessingResult(
+                        _get_skipped_response(), None, [], [], 'skipped')
+                return
+
+    def _process_form(self, instance, case_db):
+        submission_post = SubmissionPost(
+            instance=instance,
+            domain=self.domain,
+            case_db=case_db,
+            **self.submission_kwargs
+        )
+        try:
+            return submission_post.run()
+        except XFormLockError as err:
+            logging.warning('Unable to get lock for form %s', err)
+            response = OpenRosaResponse(
+                message="Unable to get lock for form %s" % err,
+                nature=ResponseNature.SUBMIT_ERROR,
+                status=423,
+            ).response()
+            return FormProcessingResult(response, None, [], [], 'locked')
+        except Exception:
+            notify_exception(get_request(), "Error processing form in bulk submission", details={
+                'domain': self.domain,
+            })
+            response = OpenRosaResponse(
+                message="There was an error processing the form", nature=ResponseNature.SUBMIT_ERROR, status=500,
+            ).response()
+            return FormProcessingResult(response, None, [], [], 'error')
+
+    @staticmethod
+    def get_response(results):
+        """Combine the OpenRosa responses for the forms in a batch
+
+        The response has one ``<submission>`` element per form, in the order
+        they were submitted, with the form's status code, form ID and
+        OpenRosa message. Its status is 201 if every form was accepted and
+        207 (Multi-Status) otherwise.
+        """
+        root = etree.Element('OpenRosaResponse', nsmap={None: RESPONSE_XMLNS})
+        for index, result in enumerate(results):
+            response = result.response
+            submission = etree.SubElement(root, 'submission')
+            submission.set('index', str(index))
+            submission.set('status', str(response.status_code))
+            form_id = response.get('X-CommCareHQ-FormID')
+            if form_id:
+                submission.set('form_id', form_id)
+            parsed = parse_openrosa_response(response.content)
+            if parsed is not None:
+                message = etree.SubElement(submission, 'message')
+                if parsed.nature:
+                    message.set('nature', parsed.nature)
+                message.text = parsed.message
+        status = 201 if all(result.response.status_code == 201 for result in results) else 207
+        return HttpResponse(etree.tostring(root, encoding='utf-8'), status=status)
+
+
+def get_submission_groups(instances):
+    """Group the forms in a batch so that no two groups touch the same case
+
+    Forms are in the same group if they update or index the same case, have
+    the same form ID, or if both contain ledger updates.
+
+    :param instances: list of form XML
+    :returns: list of ``(form_indices, case_ids)`` tuples ordered by each
+    group's first form. The form indices in each group are in submission order.
+    """
+    parents = list(range(len(instances)))
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    case_ids_by_form = []
+    first_form_by_key = {}
+    for index, instance in enumerate(instances):
+        case_ids, keys = _get_grouping_keys(instance)
+        case_ids_by_form.append(case_ids)
+        for key in keys:
+            if key in first_form_by_key:
+                # the smallest index is always the root so groups sort by their first form
+                roots = find(index), find(first_form_by_key[key])
+                parents[max(roots)] = min(roots)
+            else:
+                first_form_by_key[key] = index
+
+    groups = defaultdict(list)
+    for index in range(len(instances)):
+        groups[find(index)].append(index)
+    return [
+        (form_indices, set().union(*(case_ids_by_form[index] for index in form_indices)))
+        for root, form_indices in sorted(groups.items())
+    ]
+
+
+def _get_grouping_keys(instance):
+    """
+    :returns: tuple ``(case_ids, keys)`` of the ids of cases the form updates
+    or indexes, and the keys used to group it with other forms
+    """
+    try:
+        form_json = convert_xform_to_json(instance)
+        case_updates = get_case_updates(form_json)
+    except Exception:
+        # leave the error for SubmissionPost to handle
+        return set(), set()
+
+    case_ids = set()
+    for case_update in case_updates:
+        case_ids.add(case_update.id)
+        index_action = case_update.get_index_action()
+        if index_action:
+            case_ids.update(index.referenced_id for index in index_action.indices)
+    case_ids.discard(None)
+    case_ids.discard('')
+
+    keys = {'case:' + case_id for case_id in case_ids}
+    form_id = extract_meta_instance_id(form_json)
+    if form_id:
+        keys.add('form:' + form_id)
+    if COMMTRACK_REPORT_XMLNS.encode('utf-8') in instance:
+        keys.add('ledgers')
+    return case_ids, keys
+
+
+def _get_skipped_response():
+    return OpenRosaResponse(
+        message=_("This form was not processed because an earlier form for the same cases failed"),
+        nature=ResponseNature.SUBMIT_ERROR,
+        status=424,
+    ).response()
+
+
 def _transform_instance_to_error(interface, exception, instance):
     error_message = '{}: {}'.format(type(exception).__name__, str(exception))
     return interface.xformerror_from_xform_instance(instance, error_message)
@@ -0,0 +1,144 @@
+import uuid
+
+from django.test import SimpleTestCase, TestCase
+
+from lxml import etree
+
+from casexml.apps.case.mock import CaseBlock
+from couchforms.openrosa_response import RESPONSE_XMLNS
+
+from corehq.apps.receiverwrapper.auth import AuthContext
+from corehq.form_processor.models import CommCareCase, XFormInstance
+from corehq.form_processor.submission_post import (
+    BulkSubmissionPost,
+    get_submission_groups,
+)
+from corehq.form_processor.tests.utils import FormProcessorTestUtils, sharded
+from corehq.form_processor.utils.xform import FormSubmissionBuilder
+
+DOMAIN = 'bulk-submission-test'
+
+
+def _form(*case_blocks, form_id=None):
+    return FormSubmissionBuilder(
+        form_id=form_id or uuid.uuid4().hex,
+        case_blocks=list(case_blocks),
+    ).as_xml_string().encode('utf-8')
+
+
+class GetSubmissionGroupsTest(SimpleTestCase):
+
+    def test_grouped_by_case(self):
+        groups = get_submission_groups([
+            _form(CaseBlock('a', create=True)),
+            _form(CaseBlock('b', create=True)),
+            _form(CaseBlock('a', update={'prop': '1'})),
+        ])
+        self.assertEqual([([0, 2], {'a'}), ([1], {'b'})], groups)
+
+    def test_grouped_by_index(self):
+        groups = get_submission_groups([
+            _form(CaseBlock('parent', create=True)),
+            _form(CaseBlock('child', create=True, index={'parent': ('person', 'parent')})),
+        ])
+        self.assertEqual([([0, 1], {'parent', 'child'})], groups)
+
+    def test_groups_merged(self):
+        groups = get_submission_groups([
+            _form(CaseBlock('a', create=True)),
+            _form(CaseBlock('b', create=True)),
+            _form(CaseBlock('c', create=True)),
+            _form(CaseBlock('b', update={'prop': '1'}), CaseBlock('a', update={'prop': '1'})),
+        ])
+        self.assertEqual([([0, 1, 3], {'a', 'b'}), ([2], {'c'})], groups)
+
+    def test_grouped_by_form_id(self):
+        groups = get_submission_groups([
+            _form(form_id='form1'),
+            _form(CaseBlock('a', create=True)),
+            _form(form_id='form1'),
+        ])
+        self.assertEqual([([0, 2], set()), ([1], {'a'})], groups)
+
+    def test_invalid_form(self):
+        groups = get_submission_groups([b'<not-xml', _form()])
+        self.assertEqual([([0], set()), ([1], set())], groups)
+
+
+@sharded
+class BulkSubmissionPostTest(TestCase):
+
+    def tearDown(self):
+        FormProcessorTestUtils.delete_all_xforms(DOMAIN)
+        FormProcessorTestUtils.delete_all_cases(DOMAIN)
+        super().tearDown()
+
+    def _run(self, instances, ignored=()):
+        bulk_post = BulkSubmissionPost(
+            instances,
+            domain=DOMAIN,
+            ignored=ignored,
+            auth_context=AuthContext(domain=DOMAIN, user_id='user1', authenticated=True),
+        )
+        results = bulk_post.run()
+        return results, bulk_post.get_response(results)
+
+    def test_forms_for_same_case(self):
+        results, response = self._run([
+            _form(CaseBlock('a', create=True, case_type='person', update={'count': '1'})),
+            _form(CaseBlock('b', create=True, case_type='person')),
+            _form(CaseBlock('a', update={'count': '2'})),
+            _form(CaseBlock('a', update={'count': '3'})),
+        ])
+
+        self.assertEqual(['normal'] * 4, [result.submission_type for result in results])
+        case = CommCareCase.objects.get_case('a', DOMAIN)
+        self.assertEqual('3', case.get_case_property('count'))
+        self.assertEqual(
+            [result.xform.form_id for result in results if result.cases and result.cases[0].case_id == 'a'],
+            case.xform_ids,
+        )
+        self.assertEqual(201, response.status_code)
+        root = etree.fromstring(response.content)
+        submissions = root.findall('{%s}submission' % RESPONSE_XMLNS)
+        self.assertEqual(
+            [(str(i), '201', result.xform.form_id) for i, result in enumerate(results)],
+            [(s.get('index'), s.get('status'), s.get('form_id')) for s in submissions],
+        )
+
+    def test_duplicate_form(self):
+        form = _form(CaseBlock('a', create=True), form_id='form1')
+        results, response = self._run([form, form])
+
+        self.assertEqual(['normal', 'duplicate'], [result.submission_type for result in results])
+        self.assertEqual(['form1'], XFormInstance.objects.get_form_ids_in_domain(DOMAIN))
+
+    def test_ignored_forms(self):
+        results, response = self._run([
+            _form(CaseBlock('a', create=True), form_id='form1'),
+            _form(CaseBlock('a', update={'prop': '1'}), form_id='form2'),
+        ], ignored=[1])
+
+        self.assertEqual(['normal', 'ignored'], [result.submission_type for result in results])
+        self.assertEqual(['form1'], XFormInstance.objects.get_form_ids_in_domain(DOMAIN))
+        self.assertEqual(201, response.status_code)
+
+    def test_cached_forms_not_kept(self):
+        bulk_post = BulkSubmissionPost(
+            [_form(CaseBlock('a', create=True)), _form(CaseBlock('a', update={'prop': '1'}))],
+            domain=DOMAIN,
+            auth_context=AuthContext(domain=DOMAIN, user_id='user1', authenticated=True),
+        )
+        case_dbs = []
+        process_form = bulk_post._process_form
+
+        def _process_form(instance, case_db):
+            case_dbs.append(case_db)
+            return process_form(instance, case_db)
+
+        bulk_post._process_form = _process_form
+        results = bulk_post.run()
+        self.assertEqual(
+            [results[1].xform.form_id],
+            [xform.form_id for xform in case_dbs[-1].cached_xforms],
+        )
@@ -0,0 +1,89 @@
+import copy
+import glob
+import os
+
+from django.test import SimpleTestCase
+
+import xml2json
+
+from couchforms import XMLSyntaxError
+from corehq.form_processor.utils import adjust_datetimes, convert_xform_to_json
+
+CORE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FIXTURE_PATTERNS = [
+    os.path.join(CORE_DIR, 'ex-submodules', 'couchforms', 'tests', 'data', 'posts', '*.xml'),
+    os.path.join(CORE_DIR, 'apps', 'receiverwrapper', 'tests', 'data', '*.xml'),
+]
+
+
+def get_fixture_forms():
+    for pattern in FIXTURE_PATTERNS:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, 'rb') as f:
+                xml = f.read()
+            try:
+                name, expected = xml2json.xml2json(xml)
+            except xml2json.XMLSyntaxError:
+                continue
+            expected['#type'] = name
+            yield os.path.basename(path), xml, expected
+
+
+class ConvertXFormToJsonTest(SimpleTestCase):
+
+    def test_same_as_xml2json(self):
+        forms = list(get_fixture_forms())
+        self.assertTrue(forms)
+        for name, xml, expected in forms:
+            self.assertEqual(convert_xform_to_json(xml), expected, name)
+
+    def test_adjust_datetimes_same_as_second_pass(self):
+        for name, xml, expected in get_fixture_forms():
+            expected = adjust_datetimes(copy.deepcopy(expected))
+            self.assertEqual(convert_xform_to_json(xml, adjust_datetimes=True), expected, name)
+
+    def test_structure(self):
+        xml = b"""<?xml version="1.0" ?>
+        <data xmlns="http://example.com/form" version="3">
+            <name> Jo </name>
+            <empty/>
+            <item id="1">one</item>
+            <item id="2"/>
+            <item>three</item>
+            <group><!-- a comment -->
+                <q>a</q>
+            </group>
+            <meta xmlns="http://openrosa.org/jr/xforms"><userID>abc</userID></meta>
+        </data>
+        """
+        self.assertEqual(convert_xform_to_json(xml), {
+            '#type': 'data',
+            '@xmlns': 'http://example.com/form',
+            '@version': '3',
+            'name': ' Jo ',
+            'empty': '',
+            'item': [{'@id': '1', '#text': 'one'}, {'@id': '2'}, 'three'],
+            'group': {'q': 'a'},
+            'meta': {'@xmlns': 'http://openrosa.org/jr/xforms', 'userID': 'abc'},
+        })
+
+    def test_adjust_datetimes(self):
+        xml = b"""<data xmlns="http://example.com/form" when="2013-03-09T06:30:09.007+03">
+            <date>2015-04-03</date>
+            <datetime>2013-03-09T06:30:09.007</datetime>
+            <not_a_datetime>2015-07-14 2015-06-07 </not_a_datetime>
+        </data>
+        """
+        form = convert_xform_to_json(xml, adjust_datetimes=True)
+        self.assertEqual(form['@when'], '2013-03-09T03:30:09.007000Z')
+        self.assertEqual(form['date'], '2015-04-03')
+        self.assertEqual(form['datetime'], '2013-03-09T06:30:09.007000Z')
+        self.assertEqual(form['not_a_datetime'], '2015-07-14 2015-06-07 ')
+
+    def test_invalid_xml(self):
+        with self.assertRaises(XMLSyntaxError):
+            convert_xform_to_json(b'<data><unclosed></data>')
+
+    def test_undefined_namespace_prefix(self):
+        with self.assertRaises(XMLSyntaxError):
+            convert_xform_to_json(b'<data><n0:case/></data>')
@@ -1,5 +1,9 @@
 import uuid
+from unittest.mock import patch
+
 from django.test import TestCase, SimpleTestCase
+from redis.exceptions import RedisError
+
 from casexml.apps.case.exceptions import IllegalCaseId
 from casexml.apps.case.mock import CaseBlock
 from corehq.apps.hqcase.utils import submit_case_blocks
@@ -79,6 +83,32 @@ class CaseDbCacheTest(TestCase):
             case = cache.get(id)
             self.assertEqual(str(i), case.dynamic_case_properties()['my_index'])
 
+    def testLockAndPopulate(self):
+        case_ids = _make_some_cases(2)
+        new_id = uuid.uuid4().hex
+        cache = self.interface.casedb_cache(domain='dbcache-test', lock=True)
+        with cache:
+            cache.lock_and_populate(case_ids + [new_id])
+            for id in case_ids:
+                self.assertTrue(cache.in_cache(id))
+            self.assertEqual(3, len(cache.locks))
+            # doesn't try to lock the case again
+            self.assertIsNone(cache.get(new_id))
+            with cache:
+                cache.get(case_ids[0])
+            self.assertEqual(3, len(cache.locks))
+        self.assertEqual([], cache.locks)
+
+    def testUncache(self):
+        case_ids = _make_some_cases(2)
+        cache = self.interface.casedb_cache()
+        cache.populate(case_ids)
+        cache.mark_changed(cache.get(case_ids[0]))
+        cache.uncache([case_ids[0]])
+        self.assertFalse(cache.in_cache(case_ids[0]))
+        self.assertTrue(cache.in_cache(case_ids[1]))
+        self.assertEqual([], cache.get_changed())
+
 
 class CaseDbCacheNoDbTest(SimpleTestCase):
 
@@ -88,6 +118,25 @@ class CaseDbCacheNoDbTest(SimpleTestCase):
             # invalid
             CaseDbCacheSQL(domain='some-domain', wrap=False)
 
+    def test_prelocked_cases_kept_without_locks(self):
+        cache = CaseDbCacheSQL(domain='some-domain', lock=True)
+        with patch('corehq.form_processor.backends.sql.casedb.acquire_lock', side_effect=RedisError), \
+                patch.object(CaseDbCacheSQL, '_iter_cases', return_value=iter([])), \
+                patch.object(cache.processor_interface, 'get_case_with_lock',
+                             return_value=(None, None)) as get_case_with_lock:
+            with cache:
+                cache.lock_and_populate(['case1'])
+                self.assertEqual([], cache.locks)
+                with cache:
+                    cache.get('case1')
+                with cache:
+                    cache.get('case1')
+            cache.get('case1')
+        self.assertEqual(
+            [call.args for call in get_case_with_lock.call_args_list],
+            [('case1', False, True), ('case1', False, True), ('case1', True, True)],
+        )
+
 
 def _make_some_cases(howmany, domain='dbcache-test'):
     ids = [uuid.uuid4().hex for i in range(howmany)]
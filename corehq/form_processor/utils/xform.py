@@ -1,11 +1,11 @@
 from datetime import datetime
+from functools import lru_cache
 from lxml import etree
 import re
 
 import iso8601
 import pytz
 
-import xml2json
 from corehq.form_processor.interfaces.processor import XFormQuestionValueIterator
 from corehq.form_processor.models import Attachment, XFormInstance
 from corehq.form_processor.exceptions import XFormQuestionValueNotFound
@@ -179,22 +179,143 @@ def extract_meta_user_id(form):
     return user_id
 
 
-def convert_xform_to_json(xml_string):
+def convert_xform_to_json(xml_string, adjust_datetimes=False):
     """
     takes xform payload as xml_string and returns the equivalent json
     i.e. the json that will show up as xform.form
 
-    """
+    The conversion is done while the XML is parsed, without building an
+    element tree, and gives the same result as ``xml2json.xml2json``.
 
+    :param adjust_datetimes: normalize datetimes during the conversion.
+    The same as calling ``adjust_datetimes`` on the result, but without a
+    second pass over it.
+    """
+    from couchforms import XMLSyntaxError
+    parser = etree.XMLParser(target=_XFormJsonBuilder(adjust_datetimes))
     try:
-        name, json_form = xml2json.xml2json(xml_string)
-    except xml2json.XMLSyntaxError as e:
-        from couchforms import XMLSyntaxError
+        name, json_form = etree.fromstring(xml_string, parser)
+    except etree.XMLSyntaxError as e:
         raise XMLSyntaxError('Invalid XML: %s' % e)
+    errors = parser.error_log.filter_from_errors()
+    if errors:
+        # e.g. undefined namespace prefixes, which only raise when building a tree
+        raise XMLSyntaxError('Invalid XML: %s' % errors[0].message)
     json_form['#type'] = name
     return json_form
 
 
+class _XFormJsonBuilder(object):
+    """lxml parser target that builds form json from parser events
+
+    Element names lose their namespace, which is added as an ``@xmlns``
+    property when it differs from the parent's. Elements without children,
+    attributes or a new namespace become their text. Other elements become
+    dicts of their attributes (prefixed with ``@``), children (repeated
+    children become lists) and any non-blank text as ``#text``.
+    """
+
+    def __init__(self, adjust_datetimes=False):
+        self.adjust = _adjust_datetime_text if adjust_datetimes else None
+        # one frame per open element:
+        # [name, xmlns, xmlns changed, attrib, text, still collecting text, children]
+        self.stack = []
+        self.root = None
+
+    def start(self, tag, attrib):
+        xmlns, name = _split_tag(tag)
+        stack = self.stack
+        if stack:
+            parent = stack[-1]
+            # like element.text, the parent's text ends at its first child
+            parent[5] = False
+            if parent[6] is None:
+                parent[6] = {}
+            xmlns_changed = xmlns != parent[1]
+        else:
+            xmlns_changed = xmlns is not None
+        stack.append([name, xmlns, xmlns_changed, attrib, '', True, None])
+
+    def data(self, data):
+        frame = self.stack[-1]
+        if frame[5]:
+            frame[4] += data
+
+    def comment(self, text):
+        if self.stack:
+            self.stack[-1][5] = False
+
+    def pi(self, target, data=None):
+        if self.stack:
+            self.stack[-1][5] = False
+
+    def end(self, tag):
+        name, xmlns, xmlns_changed, attrib, text, _, children = self.stack.pop()
+        adjust = self.adjust
+        if children is None and not attrib and not xmlns_changed:
+            value = adjust(text) if adjust and text else text
+        else:
+            value = {} if children is None else children
+            if text and not text.isspace():
+                value['#text'] = adjust(text) if adjust else text
+            if xmlns_changed:
+                value['@xmlns'] = xmlns
+            if attrib:
+                for key, attr in attrib.items():
+                    value['@' + _split_tag(key)[1]] = adjust(attr) if adjust and attr else attr
+
+        if not self.stack:
+            self.root = (name, value)
+            return
+        siblings = self.stack[-1][6]
+        existing = siblings.get(name)
+        if existing is None:
+            siblings[name] = value
+        elif type(existing) is list:
+            existing.append(value)
+        else:
+            siblings[name] = [existing, value]
+
+    def close(self):
+        return self.root
+
+
+_split_tags = {}
+
+
+def _split_tag(tag):
+    """
+    :returns: tuple ``(namespace, name)``. Namespace is None if there isn't one.
+    """
+    try:
+        return _split_tags[tag]
+    except KeyError:
+        pass
+    if tag[0] == '{':
+        xmlns, name = tag[1:].split('}', 1)
+        split = (xmlns, name)
+    else:
+        split = (None, tag)
+    if len(_split_tags) < 10000:
+        _split_tags[tag] = split
+    return split
+
+
+@lru_cache(maxsize=1000)
+def _adjust_datetime_text(text):
+    """Normalize ``text`` as ``adjust_datetimes`` would
+
+    Cached since forms tend to repeat the same datetimes, e.g. the
+    ``date_modified`` of each case block.
+    """
+    if RE_DATETIME_MATCH.match(text):
+        try:
+            return str(json_format_datetime(adjust_text_to_datetime(text)))
+        except (iso8601.ParseError, ValueError):
+            pass
+    return text
+
+
 def adjust_text_to_datetime(text):
     matching_datetime = iso8601.parse_date(text)
     return matching_datetime.astimezone(pytz.utc).replace(tzinfo=None)
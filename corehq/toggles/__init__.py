@@ -843,6 +843,25 @@ ASYNC_RESTORE = StaticToggle(
     [NAMESPACE_DOMAIN],
 )
 
+GZIP_RESTORE = StaticToggle(
+    'gzip_restore',
+    'Write restore payloads gzip compressed and send them gzip encoded to clients that accept it',
+    TAG_INTERNAL,
+    [NAMESPACE_DOMAIN],
+)
+
+PROFILE_RESTORES = StaticToggle(
+    'profile_restores',
+    'Store a profile of each restore on its sync log',
+    TAG_INTERNAL,
+    [NAMESPACE_DOMAIN, NAMESPACE_USER],
+    description=(
+        "Records the time, SQL queries and payload size of each restore provider, fixture "
+        "and case batch. Enabled for a user, all of their restores are profiled. Enabled "
+        "for a domain, restores are profiled when requested with profile=true."
+    ),
+)
+
 REPORT_BUILDER_BETA_GROUP = StaticToggle(
     'report_builder_beta_group',
     'RB beta group',
@@ -1212,6 +1231,17 @@ FORM_SUBMISSION_BLACKLIST = StaticToggle(
 )
 
 
+BULK_FORM_SUBMISSION_API = StaticToggle(
+    'bulk_form_submission_api',
+    'Accept batches of forms in a single request at the bulk form submission API',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="For integrations that submit large numbers of queued forms. "
+                "Forms that update the same cases are processed with their cases "
+                "locked and loaded once for the whole batch.",
+)
+
+
 def _commtrackify(domain_name, toggle_is_enabled):
     from corehq.apps.domain.models import Domain
     domain_obj = Domain.get_by_name(domain_name, strict=True)
@@ -1553,6 +1583,20 @@ PAGINATED_EXPORTS = StaticToggle(
     [NAMESPACE_DOMAIN]
 )
 
+PARQUET_EXPORTS = StaticToggle(
+    'parquet_exports',
+    'Allows exports to be downloaded as Parquet files, with typed columns, for analysis tools',
+    TAG_SOLUTIONS_LIMITED,
+    [NAMESPACE_DOMAIN]
+)
+
+INCREMENTAL_DAILY_SAVED_EXPORTS = StaticToggle(
+    'incremental_daily_saved_exports',
+    'Rebuild daily saved exports by only exporting forms and cases that changed since the last rebuild',
+    TAG_SOLUTIONS_LIMITED,
+    [NAMESPACE_DOMAIN]
+)
+
 INCREMENTAL_EXPORTS = StaticToggle(
     'incremental_exports',
     'Allows sending of incremental CSV exports to a particular endpoint',
@@ -1945,6 +1989,19 @@ SHOW_BUILD_PROFILE_IN_APPLICATION_STATUS = StaticToggle(
     [NAMESPACE_DOMAIN]
 )
 
+LIVEQUERY_CASE_CLOSURE = StaticToggle(
+    'livequery_case_closure',
+    'Store the live case ids computed by livequery restores and reuse them until the cases change',
+    TAG_INTERNAL,
+    [NAMESPACE_DOMAIN],
+    description="""
+    Saves walking the case index graph on every sync for users with deep
+    extension chains. Stored case lists are not invalidated while this is off,
+    so turning it off and on again may serve stale ones until they expire a
+    day after they were computed.
+    """
+)
+
 LIVEQUERY_READ_FROM_STANDBYS = DynamicallyPredictablyRandomToggle(
     'livequery_read_from_standbys',
     'Allow livequery restore to read data from plproxy standbys if they are available',
@@ -66,6 +66,10 @@ class ElasticsearchInterface:
         doc_adapter = self._get_doc_adapter(index_alias, doc_type)
         return doc_adapter.bulk(actions, **kwargs)
 
+    def bulk_write(self, index_alias, doc_type, actions, **kwargs):
+        doc_adapter = self._get_doc_adapter(index_alias, doc_type)
+        return doc_adapter.bulk_writer(**kwargs).write(actions)
+
     def search(self, index_alias, doc_type, body=None, **kwargs):
         doc_adapter = self._get_doc_adapter(index_alias, doc_type)
         query = {} if body is None else body
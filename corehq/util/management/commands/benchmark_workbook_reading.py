@@ -0,0 +1,82 @@
+import csv
+import datetime
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+import openpyxl
+
+from corehq.util.workbook_reading import open_any_workbook
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the peak memory use and throughput of reading a spreadsheet "
+        "with the default and the streaming workbook adapters. Generates an "
+        "xlsx and a csv file with --rows rows if no files are given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('filenames', nargs='*', help='xlsx or csv files')
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--columns', type=int, default=6)
+
+    def handle(self, filenames, rows, columns, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            if not filenames:
+                filenames = [os.path.join(tmp, 'benchmark.xlsx'), os.path.join(tmp, 'benchmark.csv')]
+                print(f"Writing {rows} rows of {columns} columns")
+                _write_xlsx(filenames[0], rows, columns)
+                _write_csv(filenames[1], rows, columns)
+
+            for filename in filenames:
+                size = os.path.getsize(filename) / 1024 / 1024
+                print(f"{os.path.basename(filename)} ({size:.1f} MB)")
+                for streaming in (False, True):
+                    # read each file in a new process so that peak memory
+                    # use isn't carried over from reading the last one
+                    with multiprocessing.get_context('fork').Pool(1) as pool:
+                        row_count, seconds, rss_before, rss_peak = pool.apply(_read, (filename, streaming))
+                    print(
+                        f"  {'streaming' if streaming else 'default':<9}: "
+                        f"{row_count / seconds:>9.0f} rows/sec, "
+                        f"peak RSS {rss_peak / 1024:.0f} MB (+{(rss_peak - rss_before) / 1024:.0f} MB)"
+                    )
+
+
+def _read(filename, streaming):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    row_count = 0
+    with open_any_workbook(filename, streaming=streaming) as workbook:
+        for row in workbook.worksheets[0].iter_rows():
+            row_count += 1
+    seconds = time.perf_counter() - start
+    return row_count, seconds, rss_before, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _iter_rows(rows, columns):
+    yield ['column {}'.format(i) for i in range(columns)]
+    start = datetime.date(2000, 1, 1)
+    for i in range(rows):
+        values = ['case {}'.format(i), i, i / 7, start + datetime.timedelta(days=i % 10000), i % 2 == 0]
+        yield [values[j % len(values)] for j in range(columns)]
+
+
+def _write_xlsx(filename, rows, columns):
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    for row in _iter_rows(rows, columns):
+        worksheet.append(row)
+    workbook.save(filename)
+
+
+def _write_csv(filename, rows, columns):
+    with open(filename, 'w', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for row in _iter_rows(rows, columns):
+            writer.writerow(row)
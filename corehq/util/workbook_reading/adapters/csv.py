@@ -3,18 +3,27 @@ import csv
 import os
 
 from corehq.util.workbook_reading import (
+    Cell,
     SpreadsheetFileInvalidError,
     SpreadsheetFileNotFound,
     Workbook,
+    Worksheet,
 )
 from .raw_data import make_worksheet
 
 
 @contextmanager
-def open_csv_workbook(filename):
+def open_csv_workbook(filename, streaming=False):
+    """
+    :param streaming: read the rows from the file each time they are
+    iterated instead of holding them all in memory
+    """
     try:
         if os.stat(filename).st_size <= 1:
             raise SpreadsheetFileInvalidError('File is empty')
+        if streaming:
+            yield _StreamingCSVWorkbookAdaptor(filename).to_workbook()
+            return
         with open(filename, "r", encoding="utf-8") as csv_file:
             yield _CSVWorkbookAdaptor(csv_file).to_workbook()
     except (UnicodeDecodeError, csv.Error) as error:
@@ -41,3 +50,32 @@ class _CSVWorkbookAdaptor(object):
             rows.append(row)
 
         return Workbook(worksheets=[make_worksheet(rows, title='Sheet1')])
+
+
+class _StreamingCSVWorkbookAdaptor(object):
+
+    def __init__(self, filename):
+        self._filename = filename
+
+    def _iter_csv_rows(self):
+        with open(self._filename, "r", encoding="utf-8") as csv_file:
+            yield from csv.reader(csv_file, delimiter=",")
+
+    def iter_rows(self):
+        for row in self._iter_csv_rows():
+            yield [Cell(value) for value in row]
+
+    def to_workbook(self):
+        # Read the file once up front to count the rows and to raise any
+        # errors reading it before the rows are iterated
+        max_row = 0
+        row_length = None
+        for row in self._iter_csv_rows():
+            if row_length is None:
+                row_length = len(row)
+            elif len(row) != row_length:
+                raise SpreadsheetFileInvalidError("Rows must be all the same length")
+            max_row += 1
+        return Workbook(worksheets=[
+            Worksheet(title='Sheet1', max_row=max_row, iter_rows=self.iter_rows)
+        ])
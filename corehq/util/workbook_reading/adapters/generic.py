@@ -14,15 +14,19 @@ valid_extensions = extensions_to_functions_dict.keys()
 
 
 @contextmanager
-def open_any_workbook(filename):
-    """Call the relevant function from extensions_to_functions_dict, based on the filename."""
+def open_any_workbook(filename, streaming=False):
+    """Call the relevant function from extensions_to_functions_dict, based on the filename.
+
+    :param streaming: read the rows of xlsx and csv files as they are
+    iterated, with memory use that doesn't grow with the number of rows
+    """
     file_has_valid_extension = False
     if '.' in filename:
         extension = filename.split('.')[-1]
         if extension in valid_extensions:
             file_has_valid_extension = True
             function_to_open_workbook = extensions_to_functions_dict[extension]
-            with function_to_open_workbook(filename) as workbook:
+            with function_to_open_workbook(filename, streaming=streaming) as workbook:
                 yield workbook
 
     if not file_has_valid_extension:
@@ -15,7 +15,11 @@ from corehq.util.workbook_reading import (
 
 
 @contextmanager
-def open_xls_workbook(filename):
+def open_xls_workbook(filename, streaming=False):
+    """
+    :param streaming: ignored. xlrd reads the whole of an xls file when it is
+    opened; it is accepted so that all of the adapters can be opened alike.
+    """
     try:
         with xlrd.open_workbook(filename) as xlrd_workbook:
             yield _XLSWorkbookAdaptor(xlrd_workbook).to_workbook()
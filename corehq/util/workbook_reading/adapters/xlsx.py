@@ -1,5 +1,5 @@
 from contextlib import contextmanager
-from zipfile import BadZipfile
+from zipfile import BadZipfile, ZipFile
 from datetime import datetime, time
 
 from memoized import memoized
@@ -10,6 +10,8 @@ from openpyxl.utils.exceptions import InvalidFileException
 from corehq.util.workbook_reading import Worksheet, Cell, Workbook, \
     SpreadsheetFileNotFound, SpreadsheetFileInvalidError, SpreadsheetFileEncrypted
 
+from .xlsx_streaming import _StreamingXLSXWorkbookAdaptor
+
 # Got this from running hexdump and then googling
 # which matched something on https://en.wikipedia.org/wiki/List_of_file_signatures:
 #     Compound File Binary Format,
@@ -20,7 +22,12 @@ XLSX_ENCRYPTED_MARKER = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
 
 
 @contextmanager
-def open_xlsx_workbook(filename):
+def open_xlsx_workbook(filename, streaming=False):
+    """
+    :param streaming: parse the rows of each sheet as they are iterated
+    instead of with openpyxl, so that memory use doesn't grow with the size
+    of the sheet. See ``xlsx_streaming``.
+    """
     try:
         f = open(filename, 'rb')
     except IOError as e:
@@ -28,7 +35,11 @@ def open_xlsx_workbook(filename):
 
     with f as f:
         try:
-            openpyxl_workbook = openpyxl.load_workbook(f, read_only=True, data_only=True)
+            if streaming:
+                workbook = _StreamingXLSXWorkbookAdaptor(ZipFile(f)).to_workbook()
+            else:
+                openpyxl_workbook = openpyxl.load_workbook(f, read_only=True, data_only=True)
+                workbook = _XLSXWorkbookAdaptor(openpyxl_workbook).to_workbook()
         except InvalidFileException as e:
             raise SpreadsheetFileInvalidError(str(e))
         except BadZipfile as e:
@@ -37,7 +48,11 @@ def open_xlsx_workbook(filename):
                 raise SpreadsheetFileEncrypted('Workbook is encrypted')
             else:
                 raise SpreadsheetFileInvalidError(str(e))
-        yield _XLSXWorkbookAdaptor(openpyxl_workbook).to_workbook()
+        except (KeyError, SyntaxError) as e:
+            # a part the workbook refers to is missing or isn't valid XML
+            # (ElementTree's and lxml's parse errors are both SyntaxErrors)
+            raise SpreadsheetFileInvalidError(str(e))
+        yield workbook
 
 
 class _XLSXWorksheetAdaptor(object):
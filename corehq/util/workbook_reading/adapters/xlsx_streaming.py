@@ -0,0 +1,290 @@
+"""
+Streaming reader for xlsx workbooks
+
+openpyxl, even in read-only mode, creates a cell object with its style
+for every cell of a sheet, and ``_XLSXWorksheetAdaptor`` reads each sheet
+twice that way: once to find the last row with data and once to read
+the rows. The adaptors here parse the sheet XML with lxml's ``iterparse``
+and convert the cells of each row to values as the row is parsed,
+discarding the XML as they go, so memory use does not grow with the number
+of rows. Only the shared strings table is held in memory. The pass to find
+the last row stops converting the cells of a row at the first with a value.
+
+Like openpyxl's parser, entities are not resolved.
+
+Values and the rows returned match those of ``_XLSXWorksheetAdaptor``
+(openpyxl with ``read_only=True, data_only=True``).
+"""
+import posixpath
+
+from lxml import etree
+from memoized import memoized
+from openpyxl.styles.numbers import builtin_format_code, is_date_format
+from openpyxl.utils.cell import column_index_from_string, range_boundaries
+from openpyxl.utils.datetime import MAC_EPOCH, WINDOWS_EPOCH, from_excel, from_ISO8601
+from openpyxl.xml.constants import REL_NS, SHEET_MAIN_NS
+from openpyxl.xml.functions import fromstring
+
+from corehq.util.workbook_reading import Cell, Workbook, Worksheet
+
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+OFFICE_DOCUMENT_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+SHARED_STRINGS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings'
+STYLES_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles'
+
+ROW_TAG = '{%s}row' % SHEET_MAIN_NS
+CELL_TAG = '{%s}c' % SHEET_MAIN_NS
+VALUE_TAG = '{%s}v' % SHEET_MAIN_NS
+INLINE_STRING_TAG = '{%s}is' % SHEET_MAIN_NS
+TEXT_TAG = '{%s}t' % SHEET_MAIN_NS
+RICH_TEXT_RUN_TAG = '{%s}r' % SHEET_MAIN_NS
+STRING_ITEM_TAG = '{%s}si' % SHEET_MAIN_NS
+SHEET_DATA_TAG = '{%s}sheetData' % SHEET_MAIN_NS
+DIMENSION_TAG = '{%s}dimension' % SHEET_MAIN_NS
+
+# see _XLSXWorksheetAdaptor._max_row
+MAX_BLANK_ROWS = 1000
+DIGITS = '0123456789'
+
+
+class _StreamingXLSXWorksheetAdaptor(object):
+
+    def __init__(self, workbook, title, path):
+        self._workbook = workbook
+        self._title = title
+        self._path = path
+
+    def _make_cell_value(self, element):
+        data_type = element.get('t', 'n')
+        value = None
+        for child in element:
+            if child.tag == VALUE_TAG:
+                value = child.text
+                break
+            elif child.tag == INLINE_STRING_TAG and data_type == 'inlineStr':
+                return _get_text(child)
+        if not value:
+            return None
+
+        if data_type == 'n':
+            value = _cast_number(value)
+            if element.get('s') in self._workbook.date_styles:
+                try:
+                    value = from_excel(value, self._workbook.epoch)
+                except (OverflowError, ValueError):
+                    return '#VALUE!'
+                if hasattr(value, 'date') and value.time().isoformat() == '00:00:00':
+                    return value.date()
+        elif data_type == 's':
+            value = self._workbook.shared_strings[int(value)]
+        elif data_type == 'b':
+            value = bool(int(value))
+        elif data_type == 'd':
+            value = from_ISO8601(value)
+        elif data_type == 'inlineStr':
+            return None
+        return value
+
+    def _iter_sheet_rows(self):
+        """Yield the number and element of each row in the sheet XML"""
+        row_num = 0
+        with self._workbook.archive.open(self._path) as source:
+            for event, element in _iterparse(source, tag=ROW_TAG):
+                row_num = int(float(element.get('r', row_num + 1)))
+                yield row_num, element
+                # drop the row, and the empty rows before it, so that parsed
+                # rows don't accumulate
+                element.clear()
+                parent = element.getparent()
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    def _iter_cells(self, row, max_col):
+        """Yield the column number and element of each cell in the row"""
+        column = 0
+        for element in row.iterchildren(CELL_TAG):
+            coordinate = element.get('r')
+            if coordinate:
+                column = column_index_from_string(coordinate.rstrip(DIGITS))
+            else:
+                column += 1
+            if max_col is None or column <= max_col:
+                yield column, element
+
+    def _iter_values(self, max_row):
+        """
+        Yield a list of the values of each row up to ``max_row``, filling in
+        missing rows and cells as openpyxl does
+        """
+        dimensions = self._dimensions
+        max_col = None
+        if dimensions is not None:
+            max_col, max_row = dimensions[2], min(max_row, dimensions[3])
+        empty_row = [] if max_col is None else [None] * max_col
+        next_row_num = 1
+        for row_num, row in self._iter_sheet_rows():
+            if row_num > max_row:
+                break
+            if row_num < next_row_num:
+                continue
+            for _ in range(next_row_num, row_num):
+                yield list(empty_row)
+            next_row_num = row_num + 1
+
+            cells = list(self._iter_cells(row, max_col))
+            values = list(empty_row) if max_col else [None] * (cells[-1][0] if cells else 0)
+            for column, element in cells:
+                values[column - 1] = self._make_cell_value(element)
+            yield values
+
+    @property
+    @memoized
+    def _dimensions(self):
+        # <dimension> comes before <sheetData>, so stop parsing at the start
+        # of the sheet data
+        with self._workbook.archive.open(self._path) as source:
+            for event, element in _iterparse(source, events=('start',), tag=(DIMENSION_TAG, SHEET_DATA_TAG)):
+                if element.tag == DIMENSION_TAG:
+                    ref = element.get('ref')
+                    if ref and ':' not in ref:
+                        ref = '{0}:{0}'.format(ref)
+                    return range_boundaries(ref) if ref else None
+                if element.tag == SHEET_DATA_TAG:
+                    return None
+
+    @property
+    @memoized
+    def _max_row(self):
+        # The same as _XLSXWorksheetAdaptor._max_row: the last row with a
+        # value before MAX_BLANK_ROWS blank rows. Cells are only converted
+        # until one with a value is found, and rows that aren't in the sheet
+        # XML are blank, so they aren't read.
+        dimensions = self._dimensions
+        max_col = max_row = None
+        if dimensions is not None:
+            max_col, max_row = dimensions[2], dimensions[3]
+        last_row_with_value = 0
+        for row_num, row in self._iter_sheet_rows():
+            if max_row is not None and row_num > max_row:
+                break
+            if row_num - last_row_with_value > MAX_BLANK_ROWS:
+                break
+            if any(self._make_cell_value(element) for column, element in self._iter_cells(row, max_col)):
+                last_row_with_value = row_num
+        return max(last_row_with_value, 1)
+
+    def iter_rows(self):
+        for values in self._iter_values(self._max_row):
+            yield [Cell(value) for value in values]
+
+    def to_worksheet(self):
+        return Worksheet(title=self._title, max_row=self._max_row, iter_rows=self.iter_rows)
+
+
+class _StreamingXLSXWorkbookAdaptor(object):
+
+    def __init__(self, archive):
+        self.archive = archive
+        root_rels = _read_rels(archive, '_rels/.rels')
+        self._workbook_path = root_rels.get(OFFICE_DOCUMENT_REL, [None])[0] or 'xl/workbook.xml'
+        self._workbook_xml = fromstring(archive.read(self._workbook_path))
+        self._rels = _read_rels(archive, _rels_path(self._workbook_path), self._workbook_path)
+        properties = self._workbook_xml.find('{%s}workbookPr' % SHEET_MAIN_NS)
+        if properties is not None and properties.get('date1904') in ('1', 'true'):
+            self.epoch = MAC_EPOCH
+        else:
+            self.epoch = WINDOWS_EPOCH
+
+    @property
+    @memoized
+    def shared_strings(self):
+        strings = []
+        for path in self._rels.get(SHARED_STRINGS_REL, []):
+            with self.archive.open(path) as source:
+                for event, element in _iterparse(source, tag=STRING_ITEM_TAG):
+                    strings.append(_get_text(element).replace('x005F_', ''))
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del element.getparent()[0]
+        return strings
+
+    @property
+    @memoized
+    def date_styles(self):
+        """Indexes of the cell styles that format numbers as dates, as they
+        appear in the "s" attribute of cells"""
+        paths = self._rels.get(STYLES_REL)
+        if not paths:
+            return set()
+        styles = fromstring(self.archive.read(paths[0]))
+        custom_formats = {
+            int(num_fmt.get('numFmtId')): num_fmt.get('formatCode')
+            for num_fmt in styles.iter('{%s}numFmt' % SHEET_MAIN_NS)
+        }
+        cell_xfs = styles.find('{%s}cellXfs' % SHEET_MAIN_NS)
+        if cell_xfs is None:
+            return set()
+        date_styles = set()
+        for index, xf in enumerate(cell_xfs.iter('{%s}xf' % SHEET_MAIN_NS)):
+            num_fmt_id = int(xf.get('numFmtId', 0))
+            number_format = custom_formats.get(num_fmt_id) or builtin_format_code(num_fmt_id)
+            if number_format and is_date_format(number_format):
+                date_styles.add(str(index))
+        return date_styles
+
+    def to_workbook(self):
+        sheets = self._workbook_xml.find('{%s}sheets' % SHEET_MAIN_NS)
+        return Workbook(worksheets=[
+            _StreamingXLSXWorksheetAdaptor(
+                self, sheet.get('name'), self._rels['by_id'][sheet.get('{%s}id' % REL_NS)]
+            ).to_worksheet()
+            for sheet in ([] if sheets is None else sheets)
+        ])
+
+
+def _iterparse(source, **kwargs):
+    return etree.iterparse(source, resolve_entities=False, no_network=True, **kwargs)
+
+
+def _read_rels(archive, path, source_path=''):
+    """
+    Returns a dict of relationship type: [target path, ...] of the part's
+    relationships, with targets by relationship id under "by_id"
+    """
+    rels = {'by_id': {}}
+    if path not in archive.namelist():
+        return rels
+    base = posixpath.dirname(source_path)
+    for rel in fromstring(archive.read(path)).iter('{%s}Relationship' % PKG_REL_NS):
+        if rel.get('TargetMode') == 'External':
+            continue
+        target = rel.get('Target')
+        if target.startswith('/'):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(base, target))
+        rels.setdefault(rel.get('Type'), []).append(target)
+        rels['by_id'][rel.get('Id')] = target
+    return rels
+
+
+def _rels_path(path):
+    directory, filename = posixpath.split(path)
+    return posixpath.join(directory, '_rels', filename + '.rels')
+
+
+def _get_text(element):
+    """Text of a string item, without its phonetic runs"""
+    snippets = []
+    for child in element:
+        if child.tag == TEXT_TAG:
+            snippets.append(child.text or '')
+        elif child.tag == RICH_TEXT_RUN_TAG:
+            snippets.append(child.findtext(TEXT_TAG) or '')
+    return ''.join(snippets)
+
+
+def _cast_number(value):
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
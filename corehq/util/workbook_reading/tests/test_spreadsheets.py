@@ -1,10 +1,18 @@
 from datetime import date, datetime, time
 from itertools import zip_longest
+from tempfile import NamedTemporaryFile
 
 from django.test import SimpleTestCase
 
+import openpyxl
+
 from corehq.util.test_utils import make_make_path
-from corehq.util.workbook_reading import Workbook, Worksheet, make_worksheet
+from corehq.util.workbook_reading import (
+    Workbook,
+    Worksheet,
+    make_worksheet,
+    open_xlsx_workbook,
+)
 from corehq.util.workbook_reading.tests.utils import (
     get_file,
     run_on_all_adapters_except_csv,
@@ -35,6 +43,27 @@ class SpreadsheetCellTypeTest(SimpleTestCase):
                 worksheet1.iter_rows(), worksheet2.iter_rows(), fillvalue=fillvalue):
             self.assertEqual(self_row, other_row)
 
+    def test_xlsx_streaming_same_as_openpyxl(self):
+        openpyxl_workbook = openpyxl.Workbook()
+        sheet = openpyxl_workbook.active
+        sheet.append(['name', 'dob', 'count'])
+        sheet.append(['Danny', date(1988, 7, 7), 28])
+        sheet['E5'] = 'sparse'
+        sheet['B8'] = '=1+1'
+        blanks = openpyxl_workbook.create_sheet('Blanks')
+        blanks['A1'] = 'before'
+        blanks['A1500'] = 'after 1000 blank rows'
+        formatted = openpyxl_workbook.create_sheet('Formatted')
+        formatted['A1'] = 'formatted'
+        formatted['C2000'].number_format = '0.0'
+        openpyxl_workbook.create_sheet('Empty')
+
+        with NamedTemporaryFile(suffix='.xlsx') as f:
+            openpyxl_workbook.save(f.name)
+            with open_xlsx_workbook(f.name) as workbook, \
+                    open_xlsx_workbook(f.name, streaming=True) as streaming_workbook:
+                self.assert_workbooks_equal(streaming_workbook, workbook)
+
 
 @run_on_all_adapters_except_csv(SpreadsheetCellTypeTest)
 def test_xlsx_types(self, open_workbook, ext):
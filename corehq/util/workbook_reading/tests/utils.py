@@ -13,9 +13,23 @@ def get_file(name, ext):
     return _make_path('files', ext, '{}.{}'.format(name, ext))
 
 
+def open_csv_workbook_streaming(filename):
+    return open_csv_workbook(filename, streaming=True)
+
+
+def open_xlsx_workbook_streaming(filename):
+    return open_xlsx_workbook(filename, streaming=True)
+
+
+def open_any_workbook_streaming(filename):
+    return open_any_workbook(filename, streaming=True)
+
+
 csv_cases = [
     (open_csv_workbook, 'csv'),
     (open_any_workbook, 'csv'),
+    (open_csv_workbook_streaming, 'csv'),
+    (open_any_workbook_streaming, 'csv'),
 ]
 xls_cases = [
     (open_xls_workbook, 'xls'),
@@ -24,6 +38,8 @@ xls_cases = [
 xlsx_cases = [
     (open_xlsx_workbook, 'xlsx'),
     (open_any_workbook, 'xlsx'),
+    (open_xlsx_workbook_streaming, 'xlsx'),
+    (open_any_workbook_streaming, 'xlsx'),
 ]
 all_cases = csv_cases + xls_cases + xlsx_cases
 
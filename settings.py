@@ -854,6 +854,9 @@ ELASTICSEARCH_PORT = 9200
 ELASTICSEARCH_MAJOR_VERSION = 2
 # If elasticsearch queries take more than this, they result in timeout errors
 ES_SEARCH_TIMEOUT = 30
+# seconds to cache the results of ESQuery searches and counts for
+# (see corehq.apps.es.query_cache). 0 disables the cache.
+ES_QUERY_CACHE_TIMEOUT = 0
 
 BITLY_OAUTH_TOKEN = None
 